@@ -28,6 +28,7 @@ class Cloud:
         """
         self._node = node
         self._services = []
+        self._version = 0  # incremented whenever the services of the cloud change
         self._migration_algorithm_instance = None
 
     def get_migration_algorithm_instance(self) -> Any:
@@ -57,9 +58,11 @@ class Cloud:
 
         service.set_cloud(self)
         self._services.append(service)
+        self._version += 1
 
     def remove_service(self, service: Any) -> None:
         self._services.remove(service)
+        self._version += 1
 
     def node(self) -> CloudNode:
         return self._node
@@ -67,6 +70,12 @@ class Cloud:
     def services(self) -> Any:
         return self._services
 
+    def version(self) -> int:
+        """
+        :return: a number that changes whenever a service is added to or removed from the cloud
+        """
+        return self._version
+
 
 class LimitedMemoryCloud(Cloud):
 
@@ -94,6 +103,7 @@ class LimitedMemoryCloud(Cloud):
 
         service.set_cloud(self)
         self._services.append(service)
+        self._version += 1
         self._total_memory_requirement += service.get_memory_requirement()
         if self._total_memory_requirement > self._memoryCapacity:
             raise LimitedMemoryCloud.CloudOverallocatedException()
@@ -102,6 +112,7 @@ class LimitedMemoryCloud(Cloud):
         if service in self._services:
             self._total_memory_requirement -= service.get_memory_requirement()
             self._services.remove(service)
+            self._version += 1
         assert self._total_memory_requirement >= 0
 
     # def __calculate_total_memory_requirement(self) -> float:
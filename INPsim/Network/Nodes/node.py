@@ -14,6 +14,10 @@
 # You should have received a copy of the GNU General Public License
 # along with flbrandh/MEC-Simulator-2-BigMEC.  If not, see <http://www.gnu.org/licenses/>.
 
+import logging
+
+logger = logging.getLogger(__name__)
+
 
 class Node:
     """
@@ -38,7 +42,7 @@ class Node:
         if connection not in self._outgoing_connections:
             self._outgoing_connections.append(connection)
         else:
-            print('deleting a duplicate connection')
+            logger.debug('deleting a duplicate connection')
 
     def get_connections(self):
         """
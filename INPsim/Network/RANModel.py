@@ -16,6 +16,8 @@
 
 
 from INPsim.vmath import *
+import numpy as np
+from scipy.spatial import cKDTree
 
 
 class RANModel:
@@ -26,6 +28,22 @@ class RANModel:
     def update_user_access_points(self, user_manager, cloud_network):
         pass
 
+    def base_stations(self):
+        """
+        Returns the base stations of this RAN model. Indices returned by get_closest_base_station_indices refer to
+        this list.
+        :return: list of base stations
+        """
+        raise NotImplementedError
+
+    def get_closest_base_station_indices(self, positions):
+        """
+        Determines the access points of many users at once.
+        :param positions: array of shape (N,2) with the positions of the users
+        :return: integer array of shape (N,) with the indices of the base stations in base_stations()
+        """
+        raise NotImplementedError
+
 
 class NearestNeighborRANModel(RANModel):
     """
@@ -45,6 +63,26 @@ class NearestNeighborRANModel(RANModel):
         self._initialize_grid()
         self._insert_base_stations_into_grid()
 
+        # kd-tree over all base stations for batched queries
+        self._base_station_positions = np.array(
+            [base_station.get_pos() for base_station in self._base_stations], dtype=np.float64).reshape(-1, 2)
+        self._kd_tree = cKDTree(self._base_station_positions)
+
+    def base_stations(self):
+        return self._base_stations
+
+    def get_closest_base_station_indices(self, positions):
+        """
+        Determines the closest base station (euclidian distance) for many positions with one kd-tree query.
+        :param positions: array of shape (N,2) with the positions of the users
+        :return: integer array of shape (N,) with the indices of the base stations in base_stations()
+        """
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        if len(positions) == 0:
+            return np.zeros(0, dtype=np.intp)
+        _, indices = self._kd_tree.query(positions)
+        return indices
+
     def _insert_base_stations_into_grid(self):
         for base_station in self._base_stations:
             x, y = base_station.get_pos()
@@ -190,3 +228,205 @@ class NearestNeighborRANModel(RANModel):
                     Vec2.from_tuple(
                         user.get_movement_model().get_pos()),
                     cloud_network))
+
+
+class RasterNearestNeighborRANModel(NearestNeighborRANModel):
+    """
+    Assigns each user to the closest base station (euclidian distance), using a precomputed raster.
+    The raster subdivides each cell of the NearestNeighborRANModel grid into raster_subdivisions^2 cells. Each raster
+    cell stores the base station that is closest to all points in the cell, or, if the cell straddles a Voronoi
+    boundary, the short list of base stations that can be closest to a point in the cell. A lookup is an array index,
+    followed by an exact distance comparison for points in such ambiguous cells. Points outside the raster are looked
+    up in the kd-tree. Ties are broken like in _get_closest_base_station_brute_force, in favor of the first base
+    station.
+    """
+
+    # transient memory per raster corner while the raster is built: the corner coordinates and positions, and the
+    # distances and indices of the two closest base stations
+    _CORNER_MEMORY = 64
+    # transient memory per ambiguous cell while its candidates are searched: its center and the list of candidates
+    _AMBIGUOUS_CELL_MEMORY = 256
+
+    def __init__(self, base_stations, grid_resolution, raster_subdivisions=16, max_raster_memory=64 * 2**20):
+        """
+        Initializes the RAN model and precomputes the raster.
+        :param base_stations: list of all base stations
+        :param grid_resolution: number of cells per dimension of the underlying grid
+        :param raster_subdivisions: number of raster cells per grid cell and dimension
+        :param max_raster_memory: upper bound for the memory of the raster in bytes, including the temporary memory
+        that is needed to build it. If the raster would be larger, the number of subdivisions is reduced.
+        """
+        super(RasterNearestNeighborRANModel, self).__init__(base_stations, grid_resolution)
+        self._max_raster_memory = max_raster_memory
+        self._raster_subdivisions = max(1, int(raster_subdivisions))
+        while self._raster_subdivisions > 1 and \
+                self._estimate_raster_memory(self._raster_subdivisions) > max_raster_memory:
+            self._raster_subdivisions -= 1
+        self._build_raster()
+
+    def _raster_block_rows(self, raster_subdivisions):
+        """
+        Determines how many rows of raster cells are classified at once, such that the corners of a block of rows
+        take at most a quarter of the memory bound.
+        :param raster_subdivisions: number of raster cells per grid cell and dimension
+        :return: number of rows per block
+        """
+        raster_resolution = self._grid_resolution * raster_subdivisions
+        corner_row_memory = self._CORNER_MEMORY * (raster_resolution + 1)
+        return max(1, min(raster_resolution, self._max_raster_memory // (4 * corner_row_memory) - 1))
+
+    def _ambiguous_block_size(self):
+        """
+        Determines how many ambiguous cells are searched for candidates at once, such that they take at most a quarter
+        of the memory bound.
+        :return: number of ambiguous cells per block
+        """
+        return max(1, self._max_raster_memory // (4 * self._AMBIGUOUS_CELL_MEMORY))
+
+    def _estimate_raster_memory(self, raster_subdivisions):
+        """
+        Estimates the peak memory of building the raster, assuming that the ambiguous cells make up a small fraction
+        of all cells.
+        :param raster_subdivisions: number of raster cells per grid cell and dimension
+        :return: estimated memory in bytes
+        """
+        raster_resolution = self._grid_resolution * raster_subdivisions
+        # the owner of each cell and whether it is ambiguous
+        owner_memory = 5 * raster_resolution**2
+        # ambiguous cells lie along the Voronoi edges, whose number is linear in the number of base stations. Each one
+        # stores its index, its search radius and about four candidates.
+        num_ambiguous_cells = 3 * len(self._base_stations) * raster_subdivisions
+        candidate_memory = (8 + 8 + 4 * 4) * num_ambiguous_cells
+        # the corners and the candidate search are processed in blocks, one after the other
+        corner_memory = self._CORNER_MEMORY * (self._raster_block_rows(raster_subdivisions) + 1) * \
+            (raster_resolution + 1)
+        search_memory = self._AMBIGUOUS_CELL_MEMORY * min(self._ambiguous_block_size(), num_ambiguous_cells)
+        return owner_memory + candidate_memory + max(corner_memory, search_memory)
+
+    def _build_raster(self):
+        raster_resolution = self._grid_resolution * self._raster_subdivisions
+        self._raster_resolution = raster_resolution
+        raster_cell_size = self._tile_size / self._raster_subdivisions
+
+        # the corners are only needed to classify the cells, so they are computed one block of rows at a time
+        owners = np.empty(raster_resolution**2, dtype=np.int32)
+        ambiguous = np.empty(raster_resolution**2, dtype=bool)
+        block_rows = self._raster_block_rows(self._raster_subdivisions)
+        for first_row in range(0, raster_resolution, block_rows):
+            last_row = min(first_row + block_rows, raster_resolution)
+            block = slice(first_row * raster_resolution, last_row * raster_resolution)
+            owners[block], ambiguous[block] = self._classify_raster_rows(first_row, last_row)
+
+        ambiguous_cells = np.flatnonzero(ambiguous)
+        del ambiguous
+        # the number of candidates of each cell determines the width of the candidate table, so the candidates are
+        # searched twice: once to count them, and once to store them
+        ambiguous_blocks = [slice(first, first + self._ambiguous_block_size())
+                            for first in range(0, len(ambiguous_cells), self._ambiguous_block_size())]
+        search_radii = np.empty(len(ambiguous_cells))
+        max_num_candidates = 1
+        for block in ambiguous_blocks:
+            centers = self._raster_cell_centers(ambiguous_cells[block])
+            # any base station that is the closest one to a point in an ambiguous cell is at most one cell diagonal
+            # farther away from the cell's center than the base station that is closest to the center.
+            center_dists, _ = self._kd_tree.query(centers)
+            search_radii[block] = center_dists + raster_cell_size * (math.sqrt(2) + 1e-6)
+            num_candidates = self._kd_tree.query_ball_point(centers, search_radii[block], return_length=True)
+            max_num_candidates = max(max_num_candidates, int(np.max(num_candidates)))
+
+        # ambiguous cells store -(i+1), where i is the row of the cell in the candidate table
+        # candidates are sorted by base station index and padded with -1
+        self._raster_candidates = np.full((len(ambiguous_cells), max_num_candidates), -1, dtype=np.int32)
+        for block in ambiguous_blocks:
+            candidate_lists = self._kd_tree.query_ball_point(self._raster_cell_centers(ambiguous_cells[block]),
+                                                             search_radii[block])
+            for i, candidates in enumerate(candidate_lists, start=block.start):
+                self._raster_candidates[i, :len(candidates)] = sorted(candidates)
+        owners[ambiguous_cells] = -(np.arange(len(ambiguous_cells), dtype=np.int32) + 1)
+        self._raster_owners = owners
+
+    def _raster_cell_centers(self, cells):
+        """
+        :param cells: indices of raster cells (row-major)
+        :return: array of shape (N,2) with the centers of the cells
+        """
+        raster_cell_size = self._tile_size / self._raster_subdivisions
+        rx, ry = np.divmod(cells, self._raster_resolution)
+        return np.stack([self._grid_offset_x + (rx + 0.5) * raster_cell_size,
+                         self._grid_offset_y + (ry + 0.5) * raster_cell_size], axis=1)
+
+    def _classify_raster_rows(self, first_row, last_row):
+        """
+        Determines the base station that is closest to all points of each cell in a block of raster rows.
+        :param first_row: first row of the block
+        :param last_row: row after the last row of the block
+        :return: the closest base station of each cell of the block (row-major), and whether the cell is ambiguous
+        """
+        raster_resolution = self._raster_resolution
+        raster_cell_size = self._tile_size / self._raster_subdivisions
+        num_corner_rows = last_row - first_row + 1
+
+        # Voronoi regions are convex. So, if all four corners of a cell are strictly closer to the same base station
+        # than to any other one, this base station is the closest one for all points in the cell.
+        # The margin accounts for rounding in the mapping of points to cells.
+        margin = raster_cell_size * 1e-6
+        cx, cy = np.meshgrid(np.arange(first_row, last_row + 1), np.arange(raster_resolution + 1), indexing='ij')
+        corners = np.stack([self._grid_offset_x + cx.ravel() * raster_cell_size,
+                            self._grid_offset_y + cy.ravel() * raster_cell_size], axis=1)
+        del cx, cy
+        k = min(2, len(self._base_stations))
+        corner_dists, corner_indices = self._kd_tree.query(corners, k=k)
+        del corners
+        corner_dists = corner_dists.reshape(-1, k)
+        corner_owners = corner_indices.reshape(-1, k)[:, 0].reshape(num_corner_rows, raster_resolution + 1)
+        if k == 1:
+            corner_unique = np.ones(corner_owners.shape, dtype=bool)
+        else:
+            corner_unique = (corner_dists[:, 1] - corner_dists[:, 0] > margin).reshape(corner_owners.shape)
+        owners = corner_owners[:-1, :-1]
+        unique = corner_unique[:-1, :-1] & corner_unique[1:, :-1] & corner_unique[:-1, 1:] & corner_unique[1:, 1:]
+        unique &= (owners == corner_owners[1:, :-1]) & (owners == corner_owners[:-1, 1:]) & \
+            (owners == corner_owners[1:, 1:])
+        return owners.ravel(), ~unique.ravel()
+
+    def get_closest_base_station_indices(self, positions):
+        """
+        Determines the closest base station (euclidian distance) for many positions with a raster lookup.
+        :param positions: array of shape (N,2) with the positions of the users
+        :return: integer array of shape (N,) with the indices of the base stations in base_stations()
+        """
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        result = np.empty(len(positions), dtype=np.intp)
+        gx, gy = self._world_to_grid_coordinates(positions[:, 0], positions[:, 1])
+        rx = np.floor(gx * self._raster_subdivisions)
+        ry = np.floor(gy * self._raster_subdivisions)
+        inside = (rx >= 0) & (rx < self._raster_resolution) & (ry >= 0) & (ry < self._raster_resolution)
+
+        outside = np.flatnonzero(~inside)
+        if len(outside):
+            result[outside] = super(RasterNearestNeighborRANModel, self).get_closest_base_station_indices(
+                positions[outside])
+
+        inside = np.flatnonzero(inside)
+        owners = self._raster_owners[rx[inside].astype(np.intp) * self._raster_resolution
+                                     + ry[inside].astype(np.intp)]
+        result[inside] = owners
+
+        # exact check among the candidates of ambiguous cells
+        ambiguous = owners < 0
+        if np.any(ambiguous):
+            points = inside[ambiguous]
+            candidates = self._raster_candidates[-owners[ambiguous] - 1]
+            candidate_positions = self._base_station_positions[candidates]
+            sq_distances = (candidate_positions[:, :, 0] - positions[points, 0, None])**2 + \
+                (candidate_positions[:, :, 1] - positions[points, 1, None])**2
+            sq_distances[candidates < 0] = np.inf
+            # argmin returns the first minimum, which is the candidate with the lowest base station index
+            result[points] = candidates[np.arange(len(points)), np.argmin(sq_distances, axis=1)]
+        return result
+
+    def get_closest_base_station(self, user_position, blacklist=[]):
+        if blacklist:
+            return super(RasterNearestNeighborRANModel, self).get_closest_base_station(user_position, blacklist)
+        index = self.get_closest_base_station_indices(np.array([user_position[0], user_position[1]]))[0]
+        return self._base_stations[index]
@@ -105,3 +105,9 @@ class Service:
 
     def get_last_cloud(self) -> Optional[Cloud]:
         return self._last_cloud
+
+    def set_last_cloud(self, cloud: Optional[Cloud]) -> None:
+        """
+        Overrides the previous cloud of the service, e.g. when restoring a checkpoint.
+        """
+        self._last_cloud = cloud
@@ -18,6 +18,7 @@
 import abc
 import copy
 import random
+from INPsim.Utils.checkpointState import prefixed, unprefixed, python_random_state, restore_python_random_state
 
 
 class ServiceConfigurator:
@@ -35,6 +36,15 @@ class ServiceConfigurator:
         """
         pass
 
+    def get_checkpoint_state(self):
+        """
+        :return: the state of the configurator, see INPsim.Utils.checkpointState
+        """
+        return {}
+
+    def set_checkpoint_state(self, state):
+        pass
+
 
 class PrototypeBasedServiceConfigurator(
         ServiceConfigurator):  # TODO rewrite such that the random priority, memory req., latency req. is not such a hack
@@ -74,6 +84,12 @@ class PrototypeBasedServiceConfigurator(
             services.append(new_service)
         return services
 
+    def get_checkpoint_state(self):
+        return prefixed(python_random_state(self._rng), 'rng')
+
+    def set_checkpoint_state(self, state):
+        restore_python_random_state(self._rng, unprefixed(state, 'rng'))
+
 
 class ServiceModel:
     """
@@ -93,6 +109,15 @@ class ServiceModel:
         return self._service_configurator.create_service_group(
             self.num_services_for_new_user())
 
+    def get_checkpoint_state(self):
+        """
+        :return: the state of the service model, see INPsim.Utils.checkpointState
+        """
+        return self._service_configurator.get_checkpoint_state()
+
+    def set_checkpoint_state(self, state):
+        self._service_configurator.set_checkpoint_state(state)
+
     @abc.abstractmethod
     def num_services_for_new_user(self):
         """
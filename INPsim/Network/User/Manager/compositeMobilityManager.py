@@ -47,6 +47,12 @@ class CompositeMobilityManager(UserManager):
         for user_manager in self.user_manager_list:
             user_manager.users()
 
+    def arrived_users(self):
+        return [user for user_manager in self.user_manager_list for user in user_manager.arrived_users()]
+
+    def departed_users(self):
+        return [user for user_manager in self.user_manager_list for user in user_manager.departed_users()]
+
     def services(self):
         for user_manager in self.user_manager_list:
             user_manager.services()
@@ -18,6 +18,7 @@
 from INPsim.Network.User.MovementModel.brownianModel import BrownianMovementModel
 from INPsim.Network.User.MovementModel.linearModel import LinearMovementModel
 from INPsim.Network.User.Manager.userManager import UserManager
+from INPsim.Utils.checkpointState import prefixed, unprefixed, python_random_state, restore_python_random_state
 from INPsim.vmath import AABB2
 
 
@@ -81,4 +82,13 @@ class ConstantRandomUserManager(UserManager):
                                                      self._aabb))
             else:
                 raise ValueError(
-                    "invalid movement model specified in parameter '_movement_model'. Valid options are 'brownian' and 'linear'.")
\ No newline at end of file
+                    "invalid movement model specified in parameter '_movement_model'. Valid options are 'brownian' and 'linear'.")
+
+    def get_checkpoint_state(self, cloud_network):
+        state = super(ConstantRandomUserManager, self).get_checkpoint_state(cloud_network)
+        state.update(prefixed(python_random_state(self._rng), 'rng'))
+        return state
+
+    def set_checkpoint_state(self, state, cloud_network):
+        super(ConstantRandomUserManager, self).set_checkpoint_state(state, cloud_network)
+        restore_python_random_state(self._rng, unprefixed(state, 'rng'))
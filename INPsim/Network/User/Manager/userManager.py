@@ -15,7 +15,11 @@
 # along with flbrandh/MEC-Simulator-2-BigMEC.  If not, see <http://www.gnu.org/licenses/>.
 
 
+import numpy as np
+from INPsim.Network.Nodes.cloud import LimitedMemoryCloud
 from INPsim.Network.User.user import User
+from INPsim.Network.User.MovementModel.populationEngine import PopulationMovementEngine
+from INPsim.Utils.checkpointState import prefixed, unprefixed
 
 
 class UserManager:
@@ -29,6 +33,12 @@ class UserManager:
         """
         self._users = set()
         self._service_model = service_model
+        # advances the movement models of all users at once
+        self._movement_engine = PopulationMovementEngine()
+        # users that were created/removed during the last step
+        self._arrived_users = []
+        self._departed_users = []
+        self._num_created_users = 0
 
     def step(self, time_step):
         """
@@ -36,19 +46,35 @@ class UserManager:
         :param time_step: the length of time since the last step in seconds.
         :return:
         """
-        for user in self._users:
-            user.get_movement_model().step(time_step)
+        self._arrived_users = []
+        self._departed_users = []
+        self._update_population(time_step)
+        self._movement_engine.step(time_step)
+
+    def _update_population(self, time_step):
+        """
+        Creates and removes users at the beginning of a step. Does nothing by default.
+        :param time_step: the length of time since the last step in seconds.
+        """
+        pass
 
-    def create_user(self, movement_model):
+    def create_user(self, movement_model, user_id=None):
         """
         Adds a new user with services according to the service model.
         :param movement_model: movement model of the new user
+        :param user_id: id of the user. By default, users are numbered in the order of their creation.
         :return:
         """
+        if user_id is None:
+            user_id = self._num_created_users
+        self._num_created_users = max(self._num_created_users, user_id + 1)
         new_user = User(
             movement_model,
-            self._service_model.create_user_services())
+            self._service_model.create_user_services(),
+            user_id)
+        self._movement_engine.attach(movement_model)
         self._users.add(new_user)
+        self._arrived_users.append(new_user)
         return new_user
 
     def remove_user(self, user):
@@ -59,10 +85,38 @@ class UserManager:
         """
         user.remove_all_services()
         self._users.remove(user)
+        self._movement_engine.detach(user.get_movement_model())
+        self._departed_users.append(user)
 
     def users(self):
         return self._users
 
+    def arrived_users(self):
+        """
+        :return: list of the users that were created during the last step
+        """
+        return self._arrived_users
+
+    def departed_users(self):
+        """
+        :return: list of the users that were removed during the last step
+        """
+        return self._departed_users
+
+    def num_arrivals(self):
+        return len(self.arrived_users())
+
+    def num_departures(self):
+        return len(self.departed_users())
+
+    def get_user_positions(self, users):
+        """
+        Returns the current positions of a sequence of users as one array.
+        :param users: sequence of users that are managed by this UserManager
+        :return: array of shape (len(users), 2)
+        """
+        return self._movement_engine.get_positions([user.get_movement_model() for user in users])
+
     def services(self):
         for user in self._users:
             for service in user.services():
@@ -74,3 +128,120 @@ class UserManager:
             sum += len(user.services())
         return sum
 
+    def checkpoint_users(self):
+        """
+        :return: the users in the order of their ids, which is the order of the users in checkpoints
+        """
+        return sorted(self._users, key=lambda user: user.get_id())
+
+    def checkpoint_services(self):
+        """
+        :return: the services of all users in the order of checkpoint_users(), which is the order of the services in
+                 checkpoints
+        """
+        return [service for user in self.checkpoint_users() for service in user.services()]
+
+    def get_checkpoint_state(self, cloud_network):
+        """
+        Returns the state of the users, their movement and their services as flat arrays (see
+        INPsim.Utils.checkpointState). Clouds and base stations are stored as indices into cloud_network.clouds() and
+        cloud_network.nodes(), services as indices into checkpoint_services().
+        :param cloud_network: the cloud network
+        :return: checkpoint state
+        """
+        users = self.checkpoint_users()
+        services = [service for user in users for service in user.services()]
+        service_indices = dict((service, i) for i, service in enumerate(services))
+        clouds = cloud_network.clouds()
+        cloud_indices = dict((cloud, i) for i, cloud in enumerate(clouds))
+        cloud_indices[None] = -1
+
+        def node_index(node):
+            return -1 if node is None else cloud_network.node_index(node)
+
+        state = {'num_created_users': self._num_created_users,
+                 'user_ids': np.array([user.get_id() for user in users], dtype=np.int64),
+                 'base_stations': np.array([node_index(user.get_base_station()) for user in users], dtype=np.int64),
+                 'previous_base_stations': np.array([node_index(user.get_previous_base_station()) for user in users],
+                                                    dtype=np.int64),
+                 'num_services': np.array([len(user.services()) for user in users], dtype=np.int64),
+                 'service_memory_requirements': np.array([s.memory_requirement for s in services], dtype=np.float64),
+                 'service_latency_requirements': np.array([s.latency_requirement for s in services], dtype=np.float64),
+                 'service_priorities': np.array([s.priority for s in services], dtype=np.float64),
+                 'service_clouds': np.array([cloud_indices[s.get_cloud()] for s in services], dtype=np.int64),
+                 'service_last_clouds': np.array([cloud_indices[s.get_last_cloud()] for s in services], dtype=np.int64),
+                 # the services of each cloud in their order at the cloud
+                 'cloud_num_services': np.array([len(cloud.services()) for cloud in clouds], dtype=np.int64),
+                 'cloud_services': np.array([service_indices[service] for cloud in clouds for service in cloud.services()],
+                                            dtype=np.int64)}
+        state.update(prefixed(self._movement_engine.get_checkpoint_state(
+            [user.get_movement_model() for user in users]), 'movement'))
+        state.update(prefixed(self._service_model.get_checkpoint_state(), 'service_model'))
+        return state
+
+    def set_checkpoint_state(self, state, cloud_network):
+        """
+        Restores a state from get_checkpoint_state. The user manager must be configured like the one that the state was
+        taken from.
+        :param state: checkpoint state
+        :param cloud_network: the cloud network, which must be the same as when the state was taken
+        """
+        user_ids = state['user_ids'].tolist()
+        self._restore_population(user_ids, state)
+        users = self.checkpoint_users()
+        if [user.get_id() for user in users] != user_ids:
+            raise Exception('The users of the user manager don\'t match the checkpoint.')
+
+        # remove all services from the clouds, they are placed again below
+        for cloud in cloud_network.clouds():
+            for service in list(cloud.services()):
+                cloud.remove_service(service)
+                service.set_cloud(None)
+        self._num_created_users = state['num_created_users']
+        self._arrived_users = []
+        self._departed_users = []
+
+        nodes = cloud_network.nodes()
+        for user, base_station, previous_base_station in zip(users, state['base_stations'].tolist(),
+                                                             state['previous_base_stations'].tolist()):
+            user.restore_base_stations(nodes[base_station] if base_station >= 0 else None,
+                                       nodes[previous_base_station] if previous_base_station >= 0 else None)
+        self._movement_engine.set_checkpoint_state([user.get_movement_model() for user in users],
+                                                   unprefixed(state, 'movement'))
+
+        if [len(user.services()) for user in users] != state['num_services'].tolist():
+            raise Exception('The services of the users don\'t match the checkpoint.')
+        services = [service for user in users for service in user.services()]
+        for service, memory_requirement, latency_requirement, priority in zip(
+                services, state['service_memory_requirements'].tolist(),
+                state['service_latency_requirements'].tolist(), state['service_priorities'].tolist()):
+            service.memory_requirement = memory_requirement
+            service.latency_requirement = latency_requirement
+            service.priority = priority
+
+        # place the services in their order at each cloud
+        clouds = cloud_network.clouds()
+        cloud_services = state['cloud_services'].tolist()
+        first = 0
+        for cloud, num_services in zip(clouds, state['cloud_num_services'].tolist()):
+            for service_index in cloud_services[first:first + num_services]:
+                try:
+                    cloud.add_service(services[service_index])
+                except LimitedMemoryCloud.CloudOverallocatedException:
+                    pass  # the checkpoint was taken during a momentary over-allocation
+            first += num_services
+        for service, cloud, last_cloud in zip(services, state['service_clouds'].tolist(),
+                                              state['service_last_clouds'].tolist()):
+            assert service.get_cloud() is (clouds[cloud] if cloud >= 0 else None)
+            service.set_last_cloud(clouds[last_cloud] if last_cloud >= 0 else None)
+
+        self._service_model.set_checkpoint_state(unprefixed(state, 'service_model'))
+
+    def _restore_population(self, user_ids, state):
+        """
+        Creates the users of a checkpoint, if they don't exist yet. By default, the users must already exist, e.g.
+        because all users are created when the user manager is initialized.
+        :param user_ids: the ids of the users of the checkpoint, in ascending order
+        :param state: checkpoint state
+        """
+        pass
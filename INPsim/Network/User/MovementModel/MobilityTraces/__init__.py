@@ -17,3 +17,6 @@
 
 from .mobilityTraceModel import MobilityTraceMovementModel
 from .mobilityTraces import MobilityTrace, ImmutableMobilityTrace
+from .columnarTraces import ColumnarMobilityTrace, MobilityTraceCursor, MobilityTraceSet
+from .traceDataset import TraceDatasetWriter, write_trace_dataset, open_trace_dataset, convert_pickled_traces
+from .traceIngestion import ingest_cabspotting_traces, ingest_geolife_traces
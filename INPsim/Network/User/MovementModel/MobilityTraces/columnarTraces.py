@@ -0,0 +1,265 @@
+# Copyright (C) 2020 Florian Brandherm
+# This file is part of flbrandh/MEC-Simulator-2-BigMEC <https://github.com/flbrandh/MEC-Simulator-2-BigMEC>.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with flbrandh/MEC-Simulator-2-BigMEC.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from typing import Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+
+from INPsim.vmath import AABB2, Vec2
+
+
+def interpolate_trace_position(time, time1, time2, x1, y1, x2, y2):
+    """
+    Interpolates the position between two data points of a trace with the same weights as
+    MobilityTrace.get_position, so that columnar traces reproduce the positions of the original traces exactly.
+    Works on scalars and on numpy arrays.
+    :return: x, y
+    """
+    fraction = (time - time2) / (time2 - time1)
+    return x1 * fraction + x2 * (1 - fraction), y1 * fraction + y2 * (1 - fraction)
+
+
+class ColumnarMobilityTrace:
+    """
+    Represents a mobility trace as contiguous float64 arrays of time points and x/y coordinates.
+    Positions are looked up with binary search, or, for monotonically increasing times, with a MobilityTraceCursor.
+    The arrays may be views into the arrays of a MobilityTraceSet. The trace must be treated as immutable.
+    """
+
+    def __init__(self, time: np.ndarray, x: np.ndarray, y: np.ndarray, aabb: Optional[AABB2] = None,
+                 source: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray, int]] = None) -> None:
+        """
+        Initializes the trace.
+        :param time: sorted time points in seconds
+        :param x: x-coordinates in meters, relative to some point of reference
+        :param y: y-coordinates in meters, relative to some point of reference
+        :param aabb: optional precomputed bounding box of the positions
+        :param source: optional (time, x, y, offset), if the arrays are views into larger arrays starting at offset
+        """
+        assert len(time) == len(x) == len(y)
+        self.time = time
+        self.x = x
+        self.y = y
+        self._pos_aabb = aabb
+        self._source = source
+
+    @staticmethod
+    def from_mobility_trace(mobility_trace) -> 'ColumnarMobilityTrace':
+        """
+        Converts a MobilityTrace or ImmutableMobilityTrace with Vec2 positions.
+        :param mobility_trace: the trace to convert
+        :return: ColumnarMobilityTrace
+        """
+        if isinstance(mobility_trace, ColumnarMobilityTrace):
+            return mobility_trace
+        return ColumnarMobilityTrace(np.array(mobility_trace.time_points, dtype=np.float64),
+                                     np.array([pos.x for pos in mobility_trace.positions], dtype=np.float64),
+                                     np.array([pos.y for pos in mobility_trace.positions], dtype=np.float64))
+
+    def get_position_tuple(self, time: float) -> Optional[Tuple[float, float]]:
+        """
+        Gets the position of this trace at an instant of time, using binary search.
+        :param time: time in seconds
+        :return: tuple of x and y coordinates in meters, or None, if time lies outside the trace interval
+        """
+        t = self.time
+        if len(t) < 2 or time < t[0] or time > t[-1]:
+            return None
+        step = int(np.searchsorted(t, time, side='left'))
+        return self._interpolate(step, time)
+
+    def get_position(self, time: float) -> Optional[Vec2]:
+        """
+        Gets the position of this trace at an instant of time, like MobilityTrace.get_position.
+        :param time: time in seconds
+        :return: 2d position Vec2 in meters, or None, if time lies outside the trace interval
+        """
+        pos = self.get_position_tuple(time)
+        if pos is None:
+            return None
+        return Vec2(pos[0], pos[1])
+
+    def _interpolate(self, step: int, time: float) -> Tuple[float, float]:
+        """
+        Interpolates the position between data points step-1 and step.
+        :param step: index of the first data point whose time is not before time
+        :param time: time in seconds
+        :return: x, y
+        """
+        if step == 0:
+            return float(self.x[0]), float(self.y[0])
+        x, y = interpolate_trace_position(time,
+                                          float(self.time[step - 1]), float(self.time[step]),
+                                          float(self.x[step - 1]), float(self.y[step - 1]),
+                                          float(self.x[step]), float(self.y[step]))
+        return x, y
+
+    def source_arrays(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+        """
+        Returns the arrays that the data of this trace is stored in. Traces of a MobilityTraceSet share the arrays of the
+        set, which allows processing many traces with the same array operations.
+        :return: (time, x, y, offset), where offset is the index of the first data point of this trace in the arrays
+        """
+        if self._source is None:
+            return self.time, self.x, self.y, 0
+        return self._source
+
+    def cursor(self) -> 'MobilityTraceCursor':
+        """
+        Returns a new cursor for sequential access to this trace.
+        :return: MobilityTraceCursor
+        """
+        return MobilityTraceCursor(self)
+
+    def start_time(self) -> float:
+        return float(self.time[0])
+
+    def end_time(self) -> float:
+        return float(self.time[-1])
+
+    def pos_aabb(self) -> AABB2:
+        if self._pos_aabb is None:
+            self._pos_aabb = AABB2(float(self.x.min()), float(self.x.max()), float(self.y.min()), float(self.y.max()))
+        return self._pos_aabb
+
+    def min_x(self) -> float:
+        return self.pos_aabb().min_x
+
+    def max_x(self) -> float:
+        return self.pos_aabb().max_x
+
+    def min_y(self) -> float:
+        return self.pos_aabb().min_y
+
+    def max_y(self) -> float:
+        return self.pos_aabb().max_y
+
+    def __len__(self) -> int:
+        return len(self.time)
+
+
+class MobilityTraceCursor:
+    """
+    Forward-only iterator over a ColumnarMobilityTrace.
+    For monotonically increasing query times, each lookup continues the search where the last one ended, which makes
+    stepping through a trace amortized O(1) per step. Earlier times fall back to binary search.
+    """
+
+    def __init__(self, trace: ColumnarMobilityTrace) -> None:
+        self._trace = trace
+        self._time = trace.time
+        self._step = 0
+
+    def get_position(self, time: float) -> Optional[Tuple[float, float]]:
+        """
+        Gets the position of the trace at an instant of time.
+        :param time: time in seconds
+        :return: tuple of x and y coordinates in meters, or None, if time lies outside the trace interval
+        """
+        t = self._time
+        if len(t) < 2 or time < t[0] or time > t[-1]:
+            return None
+        step = self._step
+        if step > 0 and t[step - 1] >= time:
+            # moving backwards in time
+            step = int(np.searchsorted(t, time, side='left'))
+        while t[step] < time:
+            step += 1
+        self._step = step
+        return self._trace._interpolate(step, time)
+
+
+class MobilityTraceSet:
+    """
+    A set of mobility traces, stored as one concatenated array per column and an array of offsets.
+    Trace i consists of the data points offsets[i] to offsets[i+1]-1. All traces must contain at least one data point.
+    The arrays may be memory-mapped.
+    """
+
+    def __init__(self, offsets: np.ndarray, time: np.ndarray, x: np.ndarray, y: np.ndarray,
+                 aabbs: Optional[np.ndarray] = None) -> None:
+        """
+        Initializes the trace set.
+        :param offsets: int64 array of shape (num_traces+1,)
+        :param time: float64 array of all time points
+        :param x: float64 array of all x-coordinates
+        :param y: float64 array of all y-coordinates
+        :param aabbs: optional float64 array of shape (num_traces, 4) with min_x, max_x, min_y, max_y per trace
+        """
+        assert len(time) == len(x) == len(y) == offsets[-1]
+        assert np.all(np.diff(offsets) > 0)
+        self.offsets = offsets
+        self.time = time
+        self.x = x
+        self.y = y
+        starts = offsets[:-1]
+        if aabbs is None and len(starts) == 0:
+            aabbs = np.zeros((0, 4))
+        elif aabbs is None:
+            aabbs = np.stack([np.minimum.reduceat(x, starts), np.maximum.reduceat(x, starts),
+                              np.minimum.reduceat(y, starts), np.maximum.reduceat(y, starts)], axis=1)
+        self.aabbs = aabbs
+
+    @staticmethod
+    def from_mobility_traces(mobility_traces: Iterable) -> 'MobilityTraceSet':
+        """
+        Converts a sequence of MobilityTraces, ImmutableMobilityTraces or ColumnarMobilityTraces.
+        :param mobility_traces: the traces to convert
+        :return: MobilityTraceSet
+        """
+        columnar_traces = [ColumnarMobilityTrace.from_mobility_trace(trace) for trace in mobility_traces]
+        lengths = [len(trace) for trace in columnar_traces]
+        offsets = np.zeros(len(columnar_traces) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+
+        def concatenate(arrays: Sequence[np.ndarray]) -> np.ndarray:
+            return np.concatenate(arrays).astype(np.float64) if arrays else np.zeros(0)
+        return MobilityTraceSet(offsets,
+                                concatenate([trace.time for trace in columnar_traces]),
+                                concatenate([trace.x for trace in columnar_traces]),
+                                concatenate([trace.y for trace in columnar_traces]))
+
+    def start_times(self) -> np.ndarray:
+        return self.time[self.offsets[:-1]]
+
+    def end_times(self) -> np.ndarray:
+        return self.time[self.offsets[1:] - 1]
+
+    def aabb(self) -> Optional[AABB2]:
+        """
+        Returns the bounding box of all traces.
+        :return: AABB2, or None, if the set is empty
+        """
+        if len(self) == 0:
+            return None
+        return AABB2(float(self.aabbs[:, 0].min()), float(self.aabbs[:, 1].max()),
+                     float(self.aabbs[:, 2].min()), float(self.aabbs[:, 3].max()))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> ColumnarMobilityTrace:
+        """
+        Returns trace i as a view into the arrays of this set.
+        :param i: index of the trace
+        :return: ColumnarMobilityTrace
+        """
+        begin, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        min_x, max_x, min_y, max_y = self.aabbs[i].tolist()
+        return ColumnarMobilityTrace(self.time[begin:end], self.x[begin:end], self.y[begin:end],
+                                     aabb=AABB2(min_x, max_x, min_y, max_y),
+                                     source=(self.time, self.x, self.y, begin))
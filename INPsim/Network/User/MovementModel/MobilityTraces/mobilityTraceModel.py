@@ -16,7 +16,7 @@
 
 
 from INPsim.Network.User.MovementModel.interface import MovementModel
-import abc
+from INPsim.Network.User.MovementModel.MobilityTraces.columnarTraces import ColumnarMobilityTrace
 
 
 class MobilityTraceMovementModel(MovementModel):
@@ -27,25 +27,29 @@ class MobilityTraceMovementModel(MovementModel):
     def __init__(self, mobility_trace):
         """
         Initializes the movement model with an initial position
-        :param initial_position:
+        :param mobility_trace: the trace to follow. Traces that aren't columnar are converted.
         """
-        self._mobility_trace = mobility_trace
+        self._mobility_trace = ColumnarMobilityTrace.from_mobility_trace(mobility_trace)
+        super(MobilityTraceMovementModel, self).__init__(
+            (float(self._mobility_trace.x[0]), float(self._mobility_trace.y[0])))
+        self._cursor = self._mobility_trace.cursor()
         self._trace_time = 0
-        self._trace_length = mobility_trace.end_time() - mobility_trace.start_time()
+        self._trace_length = self._mobility_trace.end_time() - self._mobility_trace.start_time()
+
+    def mobility_trace(self):
+        return self._mobility_trace
 
-    @abc.abstractmethod
     def step(self, timestep):
         """
         Advance the movement model by one step.
         :param timestep: the length of the step in seconds
         :return: nothing
         """
+        assert self._engine is None, "attached models are advanced by their PopulationMovementEngine"
         self._trace_time += timestep
         if self._trace_time < self._trace_length:
             # update the position
-            posV = self._mobility_trace.get_position(
+            self.pos = self._cursor.get_position(
                 self._trace_time + self._mobility_trace.start_time())
-            # todo change all vectors from tuples to the Vec2 class
-            self.pos = (posV.x, posV.y)
 
 
@@ -0,0 +1,166 @@
+# Copyright (C) 2020 Florian Brandherm
+# This file is part of flbrandh/MEC-Simulator-2-BigMEC <https://github.com/flbrandh/MEC-Simulator-2-BigMEC>.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with flbrandh/MEC-Simulator-2-BigMEC.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import os
+import pickle
+import random
+import tempfile
+from unittest import TestCase
+from INPsim.vmath import Vec2
+from INPsim.Network.User.MovementModel.MobilityTraces import MobilityTrace, ImmutableMobilityTrace, \
+    ColumnarMobilityTrace, MobilityTraceSet, write_trace_dataset, open_trace_dataset, convert_pickled_traces, \
+    ingest_cabspotting_traces, ingest_geolife_traces
+from INPsim.Network.User.MovementModel.MobilityTraces.traceIngestion import CABSPOTTING_UTM_PROJECTION
+import pyproj
+
+
+def random_trace(rng, num_points):
+    trace = MobilityTrace()
+    time = rng.uniform(0, 100)
+    for _ in range(num_points):
+        trace.add_data_point(time, Vec2(rng.uniform(0, 1000), rng.uniform(0, 1000)))
+        time += rng.uniform(1, 60)
+    return ImmutableMobilityTrace(trace)
+
+
+class TestColumnarMobilityTrace(TestCase):
+
+    def setUp(self):
+        self.rng = random.Random(42)
+        self.traces = [random_trace(self.rng, self.rng.randint(2, 50)) for _ in range(20)]
+
+    def test_get_position_matches_mobility_trace(self):
+        for trace in self.traces:
+            columnar_trace = ColumnarMobilityTrace.from_mobility_trace(trace)
+            times = [self.rng.uniform(trace.start_time() - 10, trace.end_time() + 10) for _ in range(50)]
+            times += trace.time_points
+            for time in times:
+                expected = trace.get_position(time)
+                actual = columnar_trace.get_position(time)
+                if expected is None:
+                    self.assertIsNone(actual)
+                else:
+                    self.assertEqual((expected.x, expected.y), (actual.x, actual.y))
+
+    def test_cursor(self):
+        for trace in self.traces:
+            cursor = ColumnarMobilityTrace.from_mobility_trace(trace).cursor()
+            time = trace.start_time()
+            while time <= trace.end_time():
+                expected = trace.get_position(time)
+                self.assertEqual((expected.x, expected.y), cursor.get_position(time))
+                time += self.rng.uniform(0, 10)
+            # going back in time is allowed, too
+            expected = trace.get_position(trace.start_time() + 1)
+            self.assertEqual((expected.x, expected.y), cursor.get_position(trace.start_time() + 1))
+
+    def test_trace_set(self):
+        trace_set = MobilityTraceSet.from_mobility_traces(self.traces)
+        self.assertEqual(len(self.traces), len(trace_set))
+        for i, trace in enumerate(self.traces):
+            self.assertEqual(trace.start_time(), trace_set.start_times()[i])
+            self.assertEqual(trace.end_time(), trace_set.end_times()[i])
+            self.assertEqual(trace.pos_aabb().min_x, trace_set[i].min_x())
+            self.assertEqual(trace.pos_aabb().max_y, trace_set[i].max_y())
+            self.assertEqual(len(trace), len(trace_set[i]))
+            time = (trace.start_time() + trace.end_time()) / 2
+            self.assertEqual(trace.get_position(time).x, trace_set[i].get_position(time).x)
+
+
+class TestTraceDataset(TestCase):
+
+    def test_round_trip(self):
+        rng = random.Random(42)
+        traces = [random_trace(rng, rng.randint(1, 50)) for _ in range(10)]
+        with tempfile.TemporaryDirectory() as directory:
+            pickle_path = os.path.join(directory, 'traces.pickled')
+            with open(pickle_path, 'wb') as file:
+                pickle.dump(traces, file)
+            dataset_path = os.path.join(directory, 'traces.traces')
+            convert_pickled_traces(pickle_path, dataset_path)
+            trace_set = open_trace_dataset(dataset_path)
+
+            self.assertEqual(len(traces), len(trace_set))
+            for trace, loaded_trace in zip(traces, [trace_set[i] for i in range(len(trace_set))]):
+                self.assertEqual(trace.time_points, loaded_trace.time.tolist())
+                self.assertEqual([pos.x for pos in trace.positions], loaded_trace.x.tolist())
+                self.assertEqual([pos.y for pos in trace.positions], loaded_trace.y.tolist())
+                self.assertEqual(trace.pos_aabb().max_x, loaded_trace.max_x())
+            del trace_set, loaded_trace
+
+    def test_empty_dataset(self):
+        with tempfile.TemporaryDirectory() as directory:
+            dataset_path = os.path.join(directory, 'traces.traces')
+            write_trace_dataset(dataset_path, [])
+            self.assertEqual(0, len(open_trace_dataset(dataset_path)))
+
+
+class TestTraceIngestion(TestCase):
+
+    def test_cabspotting(self):
+        rng = random.Random(42)
+        utm = pyproj.Proj(CABSPOTTING_UTM_PROJECTION)
+        with tempfile.TemporaryDirectory() as directory:
+            expected = []
+            for cab in range(6):
+                points = [(rng.uniform(37.7, 37.8), rng.uniform(-122.5, -122.4), rng.randint(0, 1), 1000 + 30 * i)
+                          for i in range(rng.randint(0, 40))]
+                with open(os.path.join(directory, 'new_cab' + str(cab) + '.txt'), 'w') as file:
+                    for point in reversed(points):
+                        file.write('%.5f %.5f %d %d\n' % point)
+                points = [(round(lat, 5), round(lon, 5), t) for lat, lon, _, t in points if 1300 <= t <= 1900]
+                if points:
+                    expected.append(points)
+            with open(os.path.join(directory, '_cabs.txt'), 'w') as file:
+                file.write('not a trace')
+
+            for processes in (1, 2):
+                dataset_path = os.path.join(directory, 'cabs.traces')
+                ingest_cabspotting_traces(directory, dataset_path, 1300, 1900, processes=processes)
+                trace_set = open_trace_dataset(dataset_path)
+                # traces may be found in any directory order
+                traces = sorted((trace_set[i] for i in range(len(trace_set))), key=lambda trace: trace.x[0])
+                expected.sort(key=lambda points: utm(points[0][1], points[0][0])[0])
+                self.assertEqual(len(expected), len(traces))
+                for points, trace in zip(expected, traces):
+                    self.assertEqual([t for _, _, t in points], trace.time.tolist())
+                    for (lat, lon, _), x, y in zip(points, trace.x, trace.y):
+                        self.assertAlmostEqual(utm(lon, lat)[0], x, places=6)
+                        self.assertAlmostEqual(utm(lon, lat)[1], y, places=6)
+                del trace_set, traces
+
+    def test_geolife(self):
+        header = 'Geolife trajectory\nWGS 84\nAltitude is in Feet\nReserved 3\n0,2,255,My Track,0,0,2,8421376\n0\n'
+        with tempfile.TemporaryDirectory() as directory:
+            trajectories = {'inside.plt': [(39.9, 116.4, '2009-02-01', '10:00:00'),
+                                           (39.91, 116.41, '2009-02-01', '10:00:05')],
+                            'outside_of_beijing.plt': [(31.2, 121.5, '2009-02-01', '10:00:00')],
+                            'outside_of_window.plt': [(39.9, 116.4, '2009-06-30', '23:59:59'),
+                                                      (39.9, 116.4, '2009-07-01', '00:00:01')],
+                            'empty.plt': []}
+            for filename, points in trajectories.items():
+                with open(os.path.join(directory, filename), 'w') as file:
+                    file.write(header)
+                    for lat, lon, date, time in points:
+                        file.write('%f,%f,0,492,39845.4,%s,%s\n' % (lat, lon, date, time))
+
+            dataset_path = os.path.join(directory, 'geolife.traces')
+            self.assertEqual(2, ingest_geolife_traces(directory, dataset_path, processes=2))
+            self.assertEqual(1, ingest_geolife_traces(directory, dataset_path, reduced_data_set=True, processes=1))
+            trace_set = open_trace_dataset(dataset_path)
+            self.assertEqual([1233482400.0, 1233482405.0], trace_set[0].time.tolist())
+            del trace_set
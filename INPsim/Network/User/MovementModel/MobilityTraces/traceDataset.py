@@ -0,0 +1,202 @@
+# Copyright (C) 2020 Florian Brandherm
+# This file is part of flbrandh/MEC-Simulator-2-BigMEC <https://github.com/flbrandh/MEC-Simulator-2-BigMEC>.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with flbrandh/MEC-Simulator-2-BigMEC.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import gzip
+import os
+import pickle
+import shutil
+import struct
+import tempfile
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from INPsim.Network.User.MovementModel.MobilityTraces.columnarTraces import ColumnarMobilityTrace, MobilityTraceSet
+
+# Binary trace dataset format (all numbers little endian):
+#
+#     header (64 bytes): magic b'INPTRACE', uint32 format version, uint32 header size,
+#                        uint64 number of traces n, uint64 number of data points p, zero padding
+#     sections, each starting at a multiple of 64 bytes:
+#         offsets      int64[n+1]   trace i consists of the data points offsets[i] to offsets[i+1]-1
+#         start_times  float64[n]
+#         end_times    float64[n]
+#         aabbs        float64[n,4] min_x, max_x, min_y, max_y
+#         time         float64[p]
+#         x            float64[p]
+#         y            float64[p]
+#
+# The sections are memory-mapped when the dataset is opened, so that no data point is deserialized and parallel runs
+# share the OS page cache.
+
+TRACE_DATASET_MAGIC = b'INPTRACE'
+TRACE_DATASET_VERSION = 1
+_HEADER_FORMAT = '<8sIIQQ'
+_HEADER_SIZE = 64
+_ALIGNMENT = 64
+
+
+def _section_layout(num_traces: int, num_points: int) -> List[Tuple[str, np.dtype, Tuple[int, ...], int]]:
+    """
+    Computes the position of all sections in a dataset file.
+    :return: list of (name, dtype, shape, byte offset)
+    """
+    sections = [('offsets', np.dtype('<i8'), (num_traces + 1,)),
+                ('start_times', np.dtype('<f8'), (num_traces,)),
+                ('end_times', np.dtype('<f8'), (num_traces,)),
+                ('aabbs', np.dtype('<f8'), (num_traces, 4)),
+                ('time', np.dtype('<f8'), (num_points,)),
+                ('x', np.dtype('<f8'), (num_points,)),
+                ('y', np.dtype('<f8'), (num_points,))]
+    layout = []
+    position = _HEADER_SIZE
+    for name, dtype, shape in sections:
+        layout.append((name, dtype, shape, position))
+        size = dtype.itemsize * int(np.prod(shape))
+        position += (size + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+    return layout
+
+
+class TraceDatasetWriter:
+    """
+    Writes a binary trace dataset one trace at a time, without holding the data points of all traces in memory.
+    The columns are streamed into temporary files and assembled when the writer is closed. The dataset file is
+    replaced atomically, so readers never see a partially written file.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        :param path: path of the dataset file to write
+        """
+        self._path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._tmp_directory = tempfile.mkdtemp(prefix='.traces-', dir=directory)
+        self._column_files = dict((name, open(os.path.join(self._tmp_directory, name), 'wb'))
+                                  for name in ('time', 'x', 'y'))
+        self._lengths: List[int] = []
+        self._start_times: List[float] = []
+        self._end_times: List[float] = []
+        self._aabbs: List[Tuple[float, float, float, float]] = []
+
+    def add_trace(self, time: np.ndarray, x: np.ndarray, y: np.ndarray) -> None:
+        """
+        Appends a trace.
+        :param time: sorted time points in seconds
+        :param x: x-coordinates in meters
+        :param y: y-coordinates in meters
+        """
+        assert len(time) == len(x) == len(y) > 0
+        for name, column in (('time', time), ('x', x), ('y', y)):
+            self._column_files[name].write(np.ascontiguousarray(column, dtype='<f8').tobytes())
+        self._lengths.append(len(time))
+        self._start_times.append(float(time[0]))
+        self._end_times.append(float(time[-1]))
+        self._aabbs.append((float(np.min(x)), float(np.max(x)), float(np.min(y)), float(np.max(y))))
+
+    def close(self) -> None:
+        """
+        Assembles the dataset file.
+        """
+        for column_file in self._column_files.values():
+            column_file.close()
+        try:
+            num_traces = len(self._lengths)
+            offsets = np.zeros(num_traces + 1, dtype='<i8')
+            np.cumsum(self._lengths, out=offsets[1:])
+            num_points = int(offsets[-1])
+            metadata = {'offsets': offsets,
+                        'start_times': np.array(self._start_times, dtype='<f8'),
+                        'end_times': np.array(self._end_times, dtype='<f8'),
+                        'aabbs': np.array(self._aabbs, dtype='<f8').reshape(num_traces, 4)}
+            tmp_path = os.path.join(self._tmp_directory, 'dataset')
+            with open(tmp_path, 'wb') as file:
+                file.write(struct.pack(_HEADER_FORMAT, TRACE_DATASET_MAGIC, TRACE_DATASET_VERSION, _HEADER_SIZE,
+                                       num_traces, num_points).ljust(_HEADER_SIZE, b'\0'))
+                for name, _, _, position in _section_layout(num_traces, num_points):
+                    file.write(b'\0' * (position - file.tell()))
+                    if name in metadata:
+                        file.write(metadata[name].tobytes())
+                    else:
+                        with open(os.path.join(self._tmp_directory, name), 'rb') as column_file:
+                            shutil.copyfileobj(column_file, file, 1 << 24)
+            os.replace(tmp_path, self._path)
+        finally:
+            shutil.rmtree(self._tmp_directory, ignore_errors=True)
+
+    def __enter__(self) -> 'TraceDatasetWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            for column_file in self._column_files.values():
+                column_file.close()
+            shutil.rmtree(self._tmp_directory, ignore_errors=True)
+
+
+def write_trace_dataset(path: str, mobility_traces: Iterable) -> None:
+    """
+    Writes traces to a binary trace dataset.
+    :param path: path of the dataset file
+    :param mobility_traces: MobilityTraces, ImmutableMobilityTraces or ColumnarMobilityTraces
+    """
+    with TraceDatasetWriter(path) as writer:
+        for trace in mobility_traces:
+            trace = ColumnarMobilityTrace.from_mobility_trace(trace)
+            if len(trace) > 0:
+                writer.add_trace(trace.time, trace.x, trace.y)
+
+
+def open_trace_dataset(path: str) -> MobilityTraceSet:
+    """
+    Opens a binary trace dataset by memory-mapping it.
+    :param path: path of the dataset file
+    :return: MobilityTraceSet whose arrays are read-only memory maps
+    """
+    with open(path, 'rb') as file:
+        header = file.read(struct.calcsize(_HEADER_FORMAT))
+    if len(header) < struct.calcsize(_HEADER_FORMAT):
+        raise ValueError(path + ' is not a trace dataset.')
+    magic, version, header_size, num_traces, num_points = struct.unpack(_HEADER_FORMAT, header)
+    if magic != TRACE_DATASET_MAGIC:
+        raise ValueError(path + ' is not a trace dataset.')
+    if version != TRACE_DATASET_VERSION or header_size != _HEADER_SIZE:
+        raise ValueError('Unsupported trace dataset version ' + str(version) + ' in ' + path)
+
+    sections: Dict[str, np.ndarray] = {}
+    for name, dtype, shape, position in _section_layout(num_traces, num_points):
+        if int(np.prod(shape)) == 0:
+            sections[name] = np.zeros(shape, dtype=dtype)
+        else:
+            sections[name] = np.memmap(path, dtype=dtype, mode='r', offset=position, shape=shape)
+    return MobilityTraceSet(sections['offsets'], sections['time'], sections['x'], sections['y'],
+                            aabbs=sections['aabbs'])
+
+
+def convert_pickled_traces(pickle_path: str, dataset_path: str) -> None:
+    """
+    Converts a (possibly gzipped) pickle of a list of MobilityTraces/ImmutableMobilityTraces to a binary trace dataset.
+    :param pickle_path: path of the pickle file
+    :param dataset_path: path of the dataset file to write
+    """
+    with open(pickle_path, 'rb') as file:
+        is_gzip = file.read(2) == b'\x1f\x8b'
+    with (gzip.open(pickle_path, 'rb') if is_gzip else open(pickle_path, 'rb')) as file:
+        mobility_traces = pickle.load(file)
+    write_trace_dataset(dataset_path, mobility_traces)
@@ -0,0 +1,234 @@
+# Copyright (C) 2020 Florian Brandherm
+# This file is part of flbrandh/MEC-Simulator-2-BigMEC <https://github.com/flbrandh/MEC-Simulator-2-BigMEC>.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with flbrandh/MEC-Simulator-2-BigMEC.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import logging
+import functools
+import math
+import multiprocessing
+import os
+import warnings
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pyproj
+
+from INPsim.Network.User.MovementModel.MobilityTraces.traceDataset import TraceDatasetWriter
+from INPsim.vmath import AABB2
+
+logger = logging.getLogger(__name__)
+
+
+# The UTM zones are needed to accurately convert longitude and latitude to meters, acting as a reference point for the
+# planar projection.
+CABSPOTTING_UTM_PROJECTION = "+proj=utm +zone=10 +north +ellps=WGS84 +datum=WGS84 +units=m +no_defs"
+GEOLIFE_UTM_PROJECTION = "+proj=utm +zone=50 +north +ellps=WGS84 +datum=WGS84 +units=m +no_defs"
+
+# these boundaries are a hand-chosen box around the 5th ring-road of beijing that is used to filter out traces that are
+# not in beijing. (latitude, longitude)
+BEIJING_NORTH_WEST_BOUNDARY = (40.1, 116.15)
+BEIJING_SOUTH_EAST_BOUNDARY = (39.75, 116.6)
+# the time window of the reduced geolife dataset (the first half of 2009)
+BEGINNING_OF_2009_TIMESTAMP = 1230764400
+MIDDLE_OF_2009_TIMESTAMP = 1246399200
+
+# number of header lines of a geolife .plt file
+_GEOLIFE_HEADER_LINES = 6
+
+# transformers are expensive to create, so each (worker) process creates one per projection and reuses it
+_transformers: Dict[str, pyproj.Transformer] = {}
+
+Trace = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+def utm_transformer(projection: str) -> pyproj.Transformer:
+    """
+    Returns the (cached) transformer from WGS84 longitude/latitude to a projection.
+    :param projection: proj string of the target projection
+    :return: pyproj.Transformer with (longitude, latitude) axis order
+    """
+    transformer = _transformers.get(projection)
+    if transformer is None:
+        crs = pyproj.CRS.from_user_input(projection)
+        transformer = pyproj.Transformer.from_crs(crs.geodetic_crs, crs, always_xy=True)
+        _transformers[projection] = transformer
+    return transformer
+
+
+def _load_columns(path: str, **kwargs) -> np.ndarray:
+    """
+    Loads the columns of a whitespace or comma separated text file into a 2d array (one row per line).
+    Empty files result in an array with 0 rows.
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', UserWarning)  # empty input
+        return np.loadtxt(path, ndmin=2, **kwargs)
+
+
+def parse_cabspotting_file(path: str,
+                           timestamp_lower_bound: float = -math.inf,
+                           timestamp_upper_bound: float = math.inf) -> Optional[Trace]:
+    """
+    Parses one cabspotting trace file (lines of "latitude longitude fare_active timestamp", newest first).
+    :param path: path of the trace file
+    :param timestamp_lower_bound: data points before this timestamp are dropped
+    :param timestamp_upper_bound: data points after this timestamp are dropped
+    :return: (time, x, y) arrays in chronological order, or None if no data point remains
+    """
+    columns = _load_columns(path, usecols=(0, 1, 3))
+    latitude, longitude, timestamp = columns[:, 0], columns[:, 1], columns[:, 2]
+    in_window = (timestamp_lower_bound <= timestamp) & (timestamp <= timestamp_upper_bound)
+    if not in_window.any():
+        return None
+    # the data points are stored in reverse chronological order
+    latitude, longitude, timestamp = latitude[in_window][::-1], longitude[in_window][::-1], timestamp[in_window][::-1]
+    order = np.argsort(timestamp, kind='stable')
+    timestamp = timestamp[order]
+    x, y = utm_transformer(CABSPOTTING_UTM_PROJECTION).transform(longitude[order], latitude[order])
+    return timestamp, np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+
+
+def parse_geolife_file(path: str,
+                       time_window: Optional[Tuple[float, float]] = None,
+                       aabb: Optional[AABB2] = None) -> Optional[Trace]:
+    """
+    Parses one geolife .plt trajectory file.
+    :param path: path of the trajectory file
+    :param time_window: optional (start, end) timestamps. Traces that are not completely inside the window are rejected.
+    :param aabb: optional bounding box in UTM coordinates. Traces whose bounding box doesn't intersect it are rejected.
+    :return: (time, x, y) arrays, or None if the trace is empty or rejected
+    """
+    columns = _load_columns(path, delimiter=',', skiprows=_GEOLIFE_HEADER_LINES, usecols=(0, 1, 5, 6), dtype=str)
+    if len(columns) == 0:
+        return None
+    # the dates and times are in GMT
+    timestamp = np.char.add(np.char.add(columns[:, 2], 'T'), columns[:, 3]) \
+        .astype('datetime64[s]').astype(np.int64).astype(float)
+    if time_window is not None and ((timestamp < time_window[0]) | (timestamp > time_window[1])).any():
+        return None
+
+    latitude, longitude = columns[:, 0].astype(float), columns[:, 1].astype(float)
+    x, y = utm_transformer(GEOLIFE_UTM_PROJECTION).transform(longitude, latitude)
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    if aabb is not None and not aabb.intersects(AABB2(x.min(), x.max(), y.min(), y.max())):
+        return None
+    return timestamp, x, y
+
+
+def find_files(dataset_dir: str, predicate: Callable[[str], bool]) -> List[str]:
+    """
+    Lists all files in a directory tree whose names satisfy a predicate.
+    :param dataset_dir: root directory
+    :param predicate: function that decides for a file name if it should be included
+    :return: list of paths
+    """
+    paths = []
+    for (dirpath, dirnames, filenames) in os.walk(dataset_dir):
+        for filename in filenames:
+            if predicate(filename):
+                paths.append(os.path.join(dirpath, filename))
+    return paths
+
+
+def ingest_traces(paths: List[str],
+                  parse_file: Callable[[str], Optional[Trace]],
+                  dataset_path: str,
+                  processes: Optional[int] = None) -> Tuple[int, int]:
+    """
+    Parses trace files in a process pool and streams the traces into a binary trace dataset. The traces are written in
+    the order of paths, and only the traces that are in flight are held in memory.
+    :param paths: paths of the trace files
+    :param parse_file: picklable function that parses a file to (time, x, y) arrays or None
+    :param dataset_path: path of the dataset file to write
+    :param processes: number of worker processes. None uses all CPUs, 1 parses in this process.
+    :return: (number of parsed files, number of written traces)
+    """
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = max(1, min(processes, len(paths)))
+    num_processed = 0
+    num_traces = 0
+    pool = multiprocessing.Pool(processes) if processes > 1 else None
+    try:
+        traces = pool.imap(parse_file, paths, chunksize=4) if pool else map(parse_file, paths)
+        with TraceDatasetWriter(dataset_path) as writer:
+            for trace in traces:
+                if trace is not None:
+                    writer.add_trace(*trace)
+                    num_traces += 1
+                num_processed += 1
+                if num_processed % 100 == 0:
+                    logger.info("parsed %d / %d files, #traces: %d", num_processed, len(paths), num_traces)
+    finally:
+        if pool:
+            pool.terminate()
+    return num_processed, num_traces
+
+
+def ingest_cabspotting_traces(dataset_dir: str,
+                              dataset_path: str,
+                              timestamp_lower_bound: float = -math.inf,
+                              timestamp_upper_bound: float = math.inf,
+                              processes: Optional[int] = None) -> int:
+    """
+    Parses the raw cabspotting dataset into a binary trace dataset.
+    :param dataset_dir: directory of the cabspotting dataset (containing the new_*.txt files)
+    :param dataset_path: path of the dataset file to write
+    :param timestamp_lower_bound: data points before this timestamp are dropped
+    :param timestamp_upper_bound: data points after this timestamp are dropped
+    :param processes: number of worker processes, see ingest_traces()
+    :return: number of traces
+    """
+    paths = find_files(dataset_dir, lambda filename: filename.startswith("new_"))
+    parse_file = functools.partial(parse_cabspotting_file,
+                                   timestamp_lower_bound=timestamp_lower_bound,
+                                   timestamp_upper_bound=timestamp_upper_bound)
+    _, num_traces = ingest_traces(paths, parse_file, dataset_path, processes)
+    logger.info("parsed %d files, #traces: %d", len(paths), num_traces)
+    return num_traces
+
+
+def beijing_aabb() -> AABB2:
+    """
+    :return: the bounding box around beijing's 5th ring-road in UTM coordinates
+    """
+    transformer = utm_transformer(GEOLIFE_UTM_PROJECTION)
+    x, y = transformer.transform([BEIJING_NORTH_WEST_BOUNDARY[1], BEIJING_SOUTH_EAST_BOUNDARY[1]],
+                                 [BEIJING_NORTH_WEST_BOUNDARY[0], BEIJING_SOUTH_EAST_BOUNDARY[0]])
+    return AABB2(min(x), max(x), min(y), max(y))
+
+
+def ingest_geolife_traces(dataset_dir: str,
+                          dataset_path: str,
+                          reduced_data_set: bool = False,
+                          processes: Optional[int] = None) -> int:
+    """
+    Parses the raw geolife dataset into a binary trace dataset. Only traces in beijing are kept.
+    :param dataset_dir: directory of the geolife dataset (the "Data" directory)
+    :param dataset_path: path of the dataset file to write
+    :param reduced_data_set: if True, only traces within the first half of 2009 are kept
+    :param processes: number of worker processes, see ingest_traces()
+    :return: number of traces
+    """
+    aabb = beijing_aabb()
+    logger.info("beijing aabb: %s, w: %s km, h: %s km", aabb, aabb.width() / 1000, aabb.height() / 1000)
+
+    paths = find_files(dataset_dir, lambda filename: filename.endswith(".plt"))
+    time_window = (BEGINNING_OF_2009_TIMESTAMP, MIDDLE_OF_2009_TIMESTAMP) if reduced_data_set else None
+    parse_file = functools.partial(parse_geolife_file, time_window=time_window, aabb=aabb)
+    _, num_traces = ingest_traces(paths, parse_file, dataset_path, processes)
+    logger.info("parsed %d files, #traces: %d, #rejected: %d", len(paths), num_traces, len(paths) - num_traces)
+    return num_traces
@@ -39,5 +39,6 @@ class BrownianMovementModel(MovementModel):
         :param timestep: the length of the time step in seconds
         :return:
         """
+        assert self._engine is None, "attached models are advanced by their PopulationMovementEngine"
         self.pos = ((self.pos[0] + self.rng.uniform(-self.speed * timestep, self.speed * timestep)) %
                     1.0, (self.pos[1] + self.rng.uniform(-self.speed * timestep, self.speed * timestep)) % 1.0)
\ No newline at end of file
@@ -21,8 +21,13 @@ import abc
 class MovementModel:
     """
     Encapsulates a movement model for users.
+    While a model is attached to a PopulationMovementEngine, its position is stored in the arrays of the engine, and the
+    engine advances it.
     """
 
+    _engine = None
+    _slot = -1
+
     def __init__(self, initial_position):
         """
         Initializes the movement model with an initial position
@@ -30,6 +35,25 @@ class MovementModel:
         """
         self.pos = initial_position
 
+    @property
+    def pos(self):
+        if self._engine is not None:
+            return self._engine.get_position(self._slot)
+        return self._pos
+
+    @pos.setter
+    def pos(self, pos):
+        if self._engine is not None:
+            self._engine.set_position(self._slot, pos)
+        else:
+            self._pos = pos
+
+    def movement_engine(self):
+        """
+        :return: the PopulationMovementEngine this model is attached to, or None
+        """
+        return self._engine
+
     def get_pos(self):
         """
         Returns the position of a user, given this movement model.
@@ -57,6 +57,7 @@ class LinearMovementModel(MovementModel):
         :param timestep: Length of the timestep in seconds
         :return: nothing
         """
+        assert self._engine is None, "attached models are advanced by their PopulationMovementEngine"
         x, y = self.get_pos()
         dx, dy = self.destination[0] - x, self.destination[1] - y
         distance = math.sqrt(dx ** 2 + dy ** 2)
@@ -0,0 +1,347 @@
+# Copyright (C) 2020 Florian Brandherm
+# This file is part of flbrandh/MEC-Simulator-2-BigMEC <https://github.com/flbrandh/MEC-Simulator-2-BigMEC>.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with flbrandh/MEC-Simulator-2-BigMEC.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from INPsim.Network.User.MovementModel.interface import MovementModel
+from INPsim.Network.User.MovementModel.brownianModel import BrownianMovementModel
+from INPsim.Network.User.MovementModel.linearModel import LinearMovementModel
+from INPsim.Network.User.MovementModel.MobilityTraces.columnarTraces import interpolate_trace_position
+from INPsim.Network.User.MovementModel.MobilityTraces.mobilityTraceModel import MobilityTraceMovementModel
+from INPsim.Utils.checkpointState import numpy_random_state, restore_numpy_random_state
+
+# kinds of movement models. Models of all other types are stepped one by one.
+_SCALAR = 0
+_BROWNIAN = 1
+_LINEAR = 2
+_TRACE = 3
+
+
+class PopulationMovementEngine:
+    """
+    Advances the movement models of a whole user population with vectorized array operations.
+    The state of all attached models (positions, speeds, destinations, trace cursors) is stored in one array per
+    attribute (struct of arrays). The attached models are thin views: MovementModel.get_pos() reads the position from
+    the engine. The slots of the attached models are kept dense, so that all array operations run on arrays without
+    gaps.
+    Brownian, linear and mobility trace models (of exactly these types) are vectorized. Models of other types keep
+    their own step() implementation, which is called for each of them.
+    """
+
+    def __init__(self, rng: Optional[np.random.Generator] = None, capacity: int = 64) -> None:
+        """
+        :param rng: random number generator for the random movement models. If None, it is seeded from the rng of the
+                    first attached random movement model.
+        :param capacity: initial number of slots
+        """
+        self._rng = rng
+        self._size = 0
+        self._models: List[Optional[MovementModel]] = []
+        self._positions = np.zeros((0, 2))
+        self._kinds = np.zeros(0, dtype=np.int8)
+        self._speeds = np.zeros(0)
+        # linear movement: destination and the bounding box (min_x, max_x, min_y, max_y) of new destinations
+        self._destinations = np.zeros((0, 2))
+        self._bounds = np.zeros((0, 4))
+        # trace movement: the trace data of slot i is stored in the arrays of trace source _trace_sources[i] between
+        # the indices _trace_begin[i] and _trace_end[i]. _trace_step[i] is the cursor of slot i.
+        self._trace_sources = np.zeros(0, dtype=np.int64)
+        self._trace_begin = np.zeros(0, dtype=np.int64)
+        self._trace_end = np.zeros(0, dtype=np.int64)
+        self._trace_step = np.zeros(0, dtype=np.int64)
+        self._trace_start_time = np.zeros(0)
+        self._trace_elapsed_time = np.zeros(0)
+        self._trace_length = np.zeros(0)
+        # the (time, x, y) arrays of all trace sources that are used by attached models, and their reference counts
+        self._sources: List[Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]]] = []
+        self._source_ids: Dict[int, int] = {}
+        self._source_ref_counts: List[int] = []
+        self._kind_slots: Optional[Dict[int, np.ndarray]] = None
+        self._grow(capacity)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _grow(self, capacity: int) -> None:
+        """
+        Enlarges all slot arrays to a capacity.
+        """
+        def grown(array):
+            new_array = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+            new_array[:len(array)] = array
+            return new_array
+        for name in ('_positions', '_kinds', '_speeds', '_destinations', '_bounds', '_trace_sources', '_trace_begin',
+                     '_trace_end', '_trace_step', '_trace_start_time', '_trace_elapsed_time', '_trace_length'):
+            setattr(self, name, grown(getattr(self, name)))
+        self._models.extend([None] * (capacity - len(self._models)))
+
+    def _seed_rng(self, python_rng) -> None:
+        if self._rng is None:
+            self._rng = np.random.default_rng(python_rng.getrandbits(64))
+
+    def _source_index(self, time: np.ndarray, x: np.ndarray, y: np.ndarray) -> int:
+        """
+        Returns the index of a trace source and increments its reference count.
+        """
+        index = self._source_ids.get(id(time))
+        if index is None:
+            index = len(self._sources)
+            self._sources.append((time, x, y))
+            self._source_ref_counts.append(0)
+            self._source_ids[id(time)] = index
+        self._source_ref_counts[index] += 1
+        return index
+
+    def _release_source(self, index: int) -> None:
+        self._source_ref_counts[index] -= 1
+        if self._source_ref_counts[index] == 0:
+            del self._source_ids[id(self._sources[index][0])]
+            self._sources[index] = None
+            if all(source is None for source in self._sources):
+                self._sources = []
+                self._source_ref_counts = []
+
+    def attach(self, model: MovementModel) -> None:
+        """
+        Moves the state of a movement model into the engine. From now on, the engine advances the model.
+        :param model: a movement model that isn't attached to any engine
+        """
+        assert model.movement_engine() is None
+        pos = model.get_pos()
+        if self._size == len(self._models):
+            self._grow(2 * len(self._models))
+        slot = self._size
+        self._size += 1
+        self._models[slot] = model
+        self._kind_slots = None
+
+        model_type = type(model)
+        if model_type is BrownianMovementModel:
+            self._seed_rng(model.rng)
+            self._kinds[slot] = _BROWNIAN
+            self._speeds[slot] = model.speed
+        elif model_type is LinearMovementModel:
+            self._seed_rng(model._rng)
+            self._kinds[slot] = _LINEAR
+            self._speeds[slot] = model.speed
+            self._destinations[slot] = model.destination
+            aabb = model._aabb
+            self._bounds[slot] = aabb.min_x, aabb.max_x, aabb.min_y, aabb.max_y
+        elif model_type is MobilityTraceMovementModel:
+            trace = model.mobility_trace()
+            time, x, y, offset = trace.source_arrays()
+            self._kinds[slot] = _TRACE
+            self._trace_sources[slot] = self._source_index(time, x, y)
+            self._trace_begin[slot] = offset
+            self._trace_end[slot] = offset + len(trace)
+            self._trace_start_time[slot] = trace.start_time()
+            self._trace_elapsed_time[slot] = model._trace_time
+            self._trace_length[slot] = model._trace_length
+            # position the cursor at the current time of the model
+            self._trace_step[slot] = offset + min(len(trace) - 1, int(np.searchsorted(
+                trace.time, trace.start_time() + model._trace_time, side='left')))
+        else:
+            self._kinds[slot] = _SCALAR
+
+        model._engine = self
+        model._slot = slot
+        self._positions[slot] = pos
+
+    def detach(self, model: MovementModel) -> None:
+        """
+        Moves the state of an attached movement model back into the model.
+        :param model: a movement model that is attached to this engine
+        """
+        assert model.movement_engine() is self
+        slot = model._slot
+        kind = self._kinds[slot]
+        pos = self.get_position(slot)
+        if kind == _LINEAR:
+            model.destination = tuple(self._destinations[slot].tolist())
+        elif kind == _TRACE:
+            model._trace_time = float(self._trace_elapsed_time[slot])
+            model._cursor = model.mobility_trace().cursor()
+            self._release_source(int(self._trace_sources[slot]))
+        model._engine = None
+        model._slot = -1
+        model.pos = pos
+
+        # move the last slot into the gap
+        last = self._size - 1
+        if slot != last:
+            for array in (self._positions, self._kinds, self._speeds, self._destinations, self._bounds,
+                          self._trace_sources, self._trace_begin, self._trace_end, self._trace_step,
+                          self._trace_start_time, self._trace_elapsed_time, self._trace_length):
+                array[slot] = array[last]
+            self._models[slot] = self._models[last]
+            self._models[slot]._slot = slot
+        self._models[last] = None
+        self._size = last
+        self._kind_slots = None
+
+    def get_position(self, slot: int) -> Tuple[float, float]:
+        x, y = self._positions[slot].tolist()
+        return x, y
+
+    def set_position(self, slot: int, pos: Sequence[float]) -> None:
+        self._positions[slot] = pos
+
+    def get_positions(self, models: Sequence[MovementModel]) -> np.ndarray:
+        """
+        Returns the positions of attached movement models.
+        :param models: sequence of movement models that are attached to this engine
+        :return: array of shape (len(models), 2)
+        """
+        slots = np.fromiter((model._slot for model in models), dtype=np.int64, count=len(models))
+        return self._positions[slots]
+
+    def get_checkpoint_state(self, models: Sequence[MovementModel]) -> Dict[str, Any]:
+        """
+        Returns the state of attached movement models as flat arrays (see INPsim.Utils.checkpointState). Models that
+        aren't vectorized are only stored with their position.
+        :param models: sequence of movement models that are attached to this engine
+        :return: checkpoint state
+        """
+        slots = np.fromiter((model._slot for model in models), dtype=np.int64, count=len(models))
+        state = {'kinds': self._kinds[slots],
+                 'positions': self._positions[slots],
+                 'speeds': self._speeds[slots],
+                 'destinations': self._destinations[slots],
+                 'bounds': self._bounds[slots],
+                 'trace_elapsed_time': self._trace_elapsed_time[slots],
+                 'trace_cursors': self._trace_step[slots] - self._trace_begin[slots]}
+        if self._rng is not None:
+            state['rng'] = numpy_random_state(self._rng)
+        return state
+
+    def set_checkpoint_state(self, models: Sequence[MovementModel], state: Dict[str, Any]) -> None:
+        """
+        Restores the state of attached movement models.
+        :param models: movement models of the same kinds as the stored models, in the same order
+        :param state: checkpoint state from get_checkpoint_state
+        """
+        slots = np.fromiter((model._slot for model in models), dtype=np.int64, count=len(models))
+        if not np.array_equal(self._kinds[slots], state['kinds']):
+            raise Exception('The movement models don\'t match the checkpoint.')
+        self._positions[slots] = state['positions']
+        self._speeds[slots] = state['speeds']
+        self._destinations[slots] = state['destinations']
+        self._bounds[slots] = state['bounds']
+        self._trace_elapsed_time[slots] = state['trace_elapsed_time']
+        self._trace_step[slots] = self._trace_begin[slots] + state['trace_cursors']
+        if 'rng' in state:
+            if self._rng is None:
+                self._rng = np.random.default_rng()
+            restore_numpy_random_state(self._rng, state['rng'])
+
+    def _slots_of_kind(self, kind: int) -> np.ndarray:
+        if self._kind_slots is None:
+            kinds = self._kinds[:self._size]
+            self._kind_slots = dict((k, np.flatnonzero(kinds == k)) for k in (_SCALAR, _BROWNIAN, _LINEAR, _TRACE))
+        return self._kind_slots[kind]
+
+    def step(self, timestep: float) -> None:
+        """
+        Advances all attached movement models by one step.
+        :param timestep: the length of the step in seconds
+        """
+        self._step_brownian(self._slots_of_kind(_BROWNIAN), timestep)
+        self._step_linear(self._slots_of_kind(_LINEAR), timestep)
+        self._step_traces(self._slots_of_kind(_TRACE), timestep)
+        for slot in self._slots_of_kind(_SCALAR).tolist():
+            model = self._models[slot]
+            # the model may have replaced its position, so it is stepped detached
+            model._engine = None
+            model._pos = self.get_position(slot)
+            model.step(timestep)
+            model._engine = self
+            self._positions[slot] = model._pos
+
+    def _step_brownian(self, slots: np.ndarray, timestep: float) -> None:
+        """
+        Vectorized BrownianMovementModel.step
+        """
+        if len(slots) == 0:
+            return
+        max_offset = (self._speeds[slots] * timestep)[:, np.newaxis]
+        offsets = self._rng.uniform(-max_offset, max_offset, size=(len(slots), 2))
+        self._positions[slots] = (self._positions[slots] + offsets) % 1.0
+
+    def _step_linear(self, slots: np.ndarray, timestep: float) -> None:
+        """
+        Vectorized LinearMovementModel.step
+        """
+        if len(slots) == 0:
+            return
+        pos = self._positions[slots]
+        destinations = self._destinations[slots]
+        speeds = self._speeds[slots]
+        delta = destinations - pos
+        distance = np.sqrt(delta[:, 0] ** 2 + delta[:, 1] ** 2)
+        arrived = distance < speeds
+
+        moving = ~arrived
+        direction = delta[moving] / distance[moving, np.newaxis]
+        pos[moving] += (speeds[moving] * timestep)[:, np.newaxis] * direction
+        pos[arrived] = destinations[arrived]
+        self._positions[slots] = pos
+
+        arrived_slots = slots[arrived]
+        if len(arrived_slots):
+            bounds = self._bounds[arrived_slots]
+            self._destinations[arrived_slots, 0] = self._rng.uniform(bounds[:, 0], bounds[:, 1])
+            self._destinations[arrived_slots, 1] = self._rng.uniform(bounds[:, 2], bounds[:, 3])
+
+    def _step_traces(self, slots: np.ndarray, timestep: float) -> None:
+        """
+        Vectorized MobilityTraceMovementModel.step. The cursors of all traces that share the same source arrays are
+        advanced together.
+        """
+        if len(slots) == 0:
+            return
+        self._trace_elapsed_time[slots] += timestep
+        slots = slots[self._trace_elapsed_time[slots] < self._trace_length[slots]]
+        if len(slots) == 0:
+            return
+        sources = self._trace_sources[slots]
+        if len(self._sources) == 1:
+            self._step_trace_source(slots, 0)
+        else:
+            for source in np.unique(sources).tolist():
+                self._step_trace_source(slots[sources == source], source)
+
+    def _step_trace_source(self, slots: np.ndarray, source: int) -> None:
+        time, x, y = self._sources[source]
+        query_time = self._trace_elapsed_time[slots] + self._trace_start_time[slots]
+        # advance the cursors to the first data point that is not before the query time (which exists, because the
+        # query time lies within the trace)
+        steps = self._trace_step[slots]
+        behind = np.flatnonzero(time[steps] < query_time)
+        while len(behind):
+            steps[behind] += 1
+            behind = behind[time[steps[behind]] < query_time[behind]]
+        self._trace_step[slots] = steps
+
+        at_start = steps == self._trace_begin[slots]
+        previous = np.where(at_start, steps, steps - 1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            new_x, new_y = interpolate_trace_position(query_time, time[previous], time[steps],
+                                                      x[previous], y[previous], x[steps], y[steps])
+        self._positions[slots, 0] = np.where(at_start, x[steps], new_x)
+        self._positions[slots, 1] = np.where(at_start, y[steps], new_y)
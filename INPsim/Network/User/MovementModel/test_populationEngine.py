@@ -0,0 +1,84 @@
+# Copyright (C) 2020 Florian Brandherm
+# This file is part of flbrandh/MEC-Simulator-2-BigMEC <https://github.com/flbrandh/MEC-Simulator-2-BigMEC>.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with flbrandh/MEC-Simulator-2-BigMEC.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import math
+import random
+from unittest import TestCase
+from INPsim.vmath import AABB2
+from INPsim.Network.User.MovementModel.interface import MovementModel
+from INPsim.Network.User.MovementModel.brownianModel import BrownianMovementModel
+from INPsim.Network.User.MovementModel.linearModel import LinearMovementModel
+from INPsim.Network.User.MovementModel.populationEngine import PopulationMovementEngine
+from INPsim.Network.User.MovementModel.MobilityTraces import MobilityTraceMovementModel, MobilityTraceSet
+from INPsim.Network.User.MovementModel.MobilityTraces.test_columnarTraces import random_trace
+
+
+class ConstantVelocityModel(MovementModel):
+
+    def step(self, timestep):
+        self.pos = (self.pos[0] + timestep, self.pos[1])
+
+
+class TestPopulationMovementEngine(TestCase):
+
+    def test_traces_match_scalar_models(self):
+        rng = random.Random(42)
+        trace_set = MobilityTraceSet.from_mobility_traces([random_trace(rng, rng.randint(2, 30)) for _ in range(30)])
+        engine = PopulationMovementEngine()
+        attached = [MobilityTraceMovementModel(trace_set[i]) for i in range(len(trace_set))]
+        scalar = [MobilityTraceMovementModel(trace_set[i]) for i in range(len(trace_set))]
+        for model in attached:
+            engine.attach(model)
+        for step in range(400):
+            timestep = rng.choice([0.5, 1, 7])
+            if step == 100:
+                # detaching moves the last slot into the gap, and the detached model continues on its own
+                engine.detach(attached[3])
+            engine.step(timestep)
+            if step >= 100:
+                attached[3].step(timestep)
+            for model in scalar:
+                model.step(timestep)
+            self.assertEqual([model.get_pos() for model in scalar], [model.get_pos() for model in attached])
+
+    def test_linear_and_brownian(self):
+        rng = random.Random(42)
+        aabb = AABB2(0, 100, 0, 50)
+        engine = PopulationMovementEngine()
+        linear = [LinearMovementModel((rng.uniform(0, 100), rng.uniform(0, 50)), 3, rng, aabb) for _ in range(20)]
+        brownian = [BrownianMovementModel((rng.random(), rng.random()), 0.1, rng) for _ in range(20)]
+        custom = ConstantVelocityModel((0.0, 1.0))
+        for model in linear + brownian + [custom]:
+            engine.attach(model)
+        for _ in range(100):
+            previous_positions = [model.get_pos() for model in linear]
+            engine.step(1)
+            for model, (x, y) in zip(linear, previous_positions):
+                new_x, new_y = model.get_pos()
+                self.assertLessEqual(math.hypot(new_x - x, new_y - y), 3 + 1e-9)
+                self.assertTrue(aabb.min_x <= new_x <= aabb.max_x and aabb.min_y <= new_y <= aabb.max_y)
+            for model in brownian:
+                self.assertTrue(all(0 <= coordinate < 1 for coordinate in model.get_pos()))
+        self.assertEqual((100.0, 1.0), custom.get_pos())
+
+        # detached models continue on their own
+        for model in linear + brownian + [custom]:
+            engine.detach(model)
+        self.assertEqual(0, len(engine))
+        custom.step(1)
+        linear[0].step(1)
+        self.assertEqual((101.0, 1.0), custom.get_pos())
@@ -24,13 +24,15 @@ class User(ServiceOwner):
     Describes a user.
     """
 
-    def __init__(self, movement_model: MovementModel, services):
+    def __init__(self, movement_model: MovementModel, services, user_id: int = -1):
         """
         initializes the user.
         :param movement_model: The movement model of the user
         :param services: the services that this user is initialized with.
+        :param user_id: identifies the user among the users of its UserManager (e.g. in checkpoints)
         """
         super(User, self).__init__()
+        self._id = user_id
         self._base_station = None
         self._previous_base_station = None
         self._movement_model: MovementModel = movement_model
@@ -38,6 +40,9 @@ class User(ServiceOwner):
         for service in services:
             self.add_service(service)
 
+    def get_id(self) -> int:
+        return self._id
+
     def get_movement_model(self) -> MovementModel:
         """
         Returns this User's movement model, which defines its location over time.
@@ -55,3 +60,10 @@ class User(ServiceOwner):
         if base_station != self._base_station:  # ignore re-assignments of the same base station
             self._previous_base_station = self._base_station
             self._base_station = base_station
+
+    def restore_base_stations(self, base_station, previous_base_station):
+        """
+        Sets the current and the previous base station at once, e.g. when restoring a checkpoint.
+        """
+        self._base_station = base_station
+        self._previous_base_station = previous_base_station
@@ -0,0 +1,253 @@
+# Copyright (C) 2020 Florian Brandherm
+# This file is part of flbrandh/MEC-Simulator-2-BigMEC <https://github.com/flbrandh/MEC-Simulator-2-BigMEC>.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with flbrandh/MEC-Simulator-2-BigMEC.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra, floyd_warshall
+
+
+def build_csr_graph(nodes: Sequence, node_ids: Dict) -> csr_matrix:
+    """
+    Builds the sparse adjacency matrix of a network directly from the Connections of its nodes.
+    If a node has several connections to the same destination, the last one wins.
+    :param nodes: the nodes of the network
+    :param node_ids: dict that maps each node to its index in nodes
+    :return: csr_matrix of shape (len(nodes), len(nodes)) with the connection weights
+    """
+    weights = {}
+    for i, node in enumerate(nodes):
+        for connection in node.get_connections():
+            weights[(i, node_ids[connection.dst()])] = connection.weight()
+    edges = [(i, j, w) for (i, j), w in weights.items() if w != 0]
+    rows = np.array([i for i, _, _ in edges], dtype=np.int32)
+    cols = np.array([j for _, j, _ in edges], dtype=np.int32)
+    data = np.array([w for _, _, w in edges], dtype=np.float64)
+    return csr_matrix((data, (rows, cols)), shape=(len(nodes), len(nodes)))
+
+
+class DistanceStore:
+    """
+    Interface for the storage of shortest path distances between the nodes of a network.
+    Nodes are referred to by their index in the network.
+    """
+
+    backend: str = ''
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        """
+        Returns the precomputed distances as named arrays, e.g. for storing them on disk.
+        The store can be restored from these arrays with create_distance_store_from_arrays.
+        :return: dict of array name to array
+        """
+        raise NotImplementedError
+
+    def dist(self, i_src: int, i_target: int) -> float:
+        """
+        Returns the shortest path distance between two nodes.
+        :param i_src: index of the source node
+        :param i_target: index of the target node
+        :return: the distance, math.inf if there is no path
+        """
+        raise NotImplementedError
+
+    def row(self, i_src: int) -> np.ndarray:
+        """
+        Returns the distances from one node to all nodes.
+        :param i_src: index of the source node
+        :return: array of shape (num_nodes,)
+        """
+        raise NotImplementedError
+
+    def pair_dists(self, i_src: np.ndarray, i_target: np.ndarray) -> np.ndarray:
+        """
+        Returns the shortest path distances between pairs of nodes, with the same values as dist().
+        :param i_src: indices of the source nodes
+        :param i_target: indices of the target nodes, aligned with i_src
+        :return: float64 array of shape (len(i_src),)
+        """
+        return np.array([self.dist(s, t) for s, t in zip(i_src.tolist(), i_target.tolist())], dtype=np.float64)
+
+    def columns(self, target_ids: Sequence[int]) -> np.ndarray:
+        """
+        Returns the distances from all nodes to a set of target nodes.
+        :param target_ids: indices of the target nodes
+        :return: array of shape (num_nodes, len(target_ids))
+        """
+        raise NotImplementedError
+
+
+class DenseDistanceStore(DistanceStore):
+    """
+    Stores all pairwise distances in a dense matrix, computed with the Floyd-Warshall algorithm.
+    This needs O(N^3) time and O(N^2) memory, which is only feasible for small networks.
+    """
+
+    backend = 'dense'
+
+    def __init__(self, csr_graph: csr_matrix, matrix: Optional[np.ndarray] = None) -> None:
+        """
+        :param csr_graph: the sparse adjacency matrix of the network
+        :param matrix: optional precomputed distance matrix, e.g. loaded from disk
+        """
+        if matrix is None:
+            matrix = floyd_warshall(csgraph=csr_graph, directed=False)
+        self.matrix = matrix
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {'matrix': self.matrix}
+
+    def dist(self, i_src: int, i_target: int) -> float:
+        return float(self.matrix[i_src, i_target])
+
+    def row(self, i_src: int) -> np.ndarray:
+        return self.matrix[i_src]
+
+    def pair_dists(self, i_src: np.ndarray, i_target: np.ndarray) -> np.ndarray:
+        return self.matrix[i_src, i_target].astype(np.float64)
+
+    def columns(self, target_ids: Sequence[int]) -> np.ndarray:
+        return self.matrix[:, target_ids]
+
+
+class SparseDistanceStore(DistanceStore):
+    """
+    Stores only the distances from a set of source nodes (typically the cloud nodes) to all other nodes as float32.
+    They are computed with a multi-source run of Dijkstra's algorithm on the sparse graph. Since the graph is
+    undirected, this covers all distances between base stations and cloud nodes. Distances between two nodes that are
+    both not sources are computed on demand, one source row at a time, and the max_cached_rows most recently used of
+    these rows are cached.
+    """
+
+    backend = 'sparse'
+
+    def __init__(self, csr_graph: csr_matrix, source_ids: Iterable[int], rows: Optional[np.ndarray] = None,
+                 max_cached_rows: int = 256) -> None:
+        """
+        :param csr_graph: the sparse adjacency matrix of the network
+        :param source_ids: indices of the nodes whose distance rows are precomputed
+        :param rows: optional precomputed distance rows of the source nodes, e.g. loaded from disk
+        :param max_cached_rows: maximum number of cached distance rows of nodes that aren't sources
+        """
+        if max_cached_rows < 0:
+            raise ValueError('The number of cached distance rows must not be negative.')
+        self._csr_graph = csr_graph
+        source_ids = list(source_ids)
+        self._source_ids = np.array(source_ids, dtype=np.int64)
+        self._source_rows: Dict[int, int] = dict(
+            (i, r) for r, i in enumerate(source_ids))
+        if rows is not None:
+            assert rows.shape == (len(source_ids), csr_graph.shape[0])
+            self._rows = rows
+        elif source_ids:
+            self._rows = dijkstra(
+                csgraph=csr_graph,
+                directed=False,
+                indices=source_ids).astype(np.float32)
+        else:
+            self._rows = np.zeros((0, csr_graph.shape[0]), dtype=np.float32)
+        # least recently used first
+        self._on_demand_rows: 'OrderedDict[int, np.ndarray]' = OrderedDict()
+        self._max_cached_rows = max_cached_rows
+        # source row of each node (-1 for nodes that aren't sources), built on first use
+        self._source_row_lookup: Optional[np.ndarray] = None
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {'source_ids': self._source_ids, 'rows': self._rows}
+
+    def dist(self, i_src: int, i_target: int) -> float:
+        r = self._source_rows.get(i_src)
+        if r is not None:
+            return float(self._rows[r, i_target])
+        r = self._source_rows.get(i_target)
+        if r is not None:
+            return float(self._rows[r, i_src])
+        return float(self.row(i_src)[i_target])
+
+    def pair_dists(self, i_src: np.ndarray, i_target: np.ndarray) -> np.ndarray:
+        if self._source_row_lookup is None:
+            self._source_row_lookup = np.full(self._csr_graph.shape[0], -1, dtype=np.int64)
+            self._source_row_lookup[self._source_ids] = np.arange(len(self._source_ids))
+        dists = np.empty(len(i_src), dtype=np.float64)
+        src_rows = self._source_row_lookup[i_src]
+        target_rows = self._source_row_lookup[i_target]
+        from_src = src_rows >= 0
+        from_target = ~from_src & (target_rows >= 0)
+        dists[from_src] = self._rows[src_rows[from_src], i_target[from_src]]
+        dists[from_target] = self._rows[target_rows[from_target], i_src[from_target]]
+        for i in np.flatnonzero(~from_src & ~from_target).tolist():
+            dists[i] = self.dist(int(i_src[i]), int(i_target[i]))
+        return dists
+
+    def row(self, i_src: int) -> np.ndarray:
+        r = self._source_rows.get(i_src)
+        if r is not None:
+            return self._rows[r]
+        row = self._on_demand_rows.get(i_src)
+        if row is not None:
+            self._on_demand_rows.move_to_end(i_src)
+            return row
+        row = dijkstra(csgraph=self._csr_graph, directed=False,
+                       indices=i_src).astype(np.float32)
+        if self._max_cached_rows > 0:
+            if len(self._on_demand_rows) >= self._max_cached_rows:
+                self._on_demand_rows.popitem(last=False)
+            self._on_demand_rows[i_src] = row
+        return row
+
+    def columns(self, target_ids: Sequence[int]) -> np.ndarray:
+        return np.stack([self.row(i) for i in target_ids], axis=1) if len(target_ids) else \
+            np.zeros((self._csr_graph.shape[0], 0), dtype=np.float32)
+
+
+DISTANCE_BACKENDS: List[str] = ['dense', 'sparse']
+
+
+def create_distance_store(csr_graph: csr_matrix, backend: str, source_ids: Iterable[int]) -> DistanceStore:
+    """
+    Creates a distance store for a network graph.
+    :param csr_graph: the sparse adjacency matrix of the network
+    :param backend: one of DISTANCE_BACKENDS
+    :param source_ids: indices of the nodes whose distances to all other nodes are queried frequently. Only used by
+    the 'sparse' backend.
+    :return: DistanceStore
+    """
+    if backend == 'dense':
+        return DenseDistanceStore(csr_graph)
+    elif backend == 'sparse':
+        return SparseDistanceStore(csr_graph, source_ids)
+    else:
+        raise Exception('Distance backend ' + str(backend) + ' is not a valid argument.')
+
+
+def create_distance_store_from_arrays(csr_graph: csr_matrix, backend: str,
+                                      arrays: Dict[str, np.ndarray]) -> DistanceStore:
+    """
+    Restores a distance store from the arrays returned by DistanceStore.arrays().
+    :param csr_graph: the sparse adjacency matrix of the network
+    :param backend: one of DISTANCE_BACKENDS
+    :param arrays: the stored arrays
+    :return: DistanceStore
+    """
+    if backend == 'dense':
+        return DenseDistanceStore(csr_graph, matrix=arrays['matrix'])
+    elif backend == 'sparse':
+        return SparseDistanceStore(csr_graph, arrays['source_ids'].tolist(), rows=arrays['rows'])
+    else:
+        raise Exception('Distance backend ' + str(backend) + ' is not a valid argument.')
@@ -15,6 +15,7 @@
 # along with flbrandh/MEC-Simulator-2-BigMEC.  If not, see <http://www.gnu.org/licenses/>.
 
 
+import logging
 from typing import List
 from INPsim.Network.Nodes.node import Node
 from INPsim.Network.connection import Connection, ConstantLatencyConnection
@@ -29,6 +30,11 @@ import pyproj
 import numpy as np
 from scipy.spatial import Delaunay
 
+logger = logging.getLogger(__name__)
+
+
+SAN_FRANCISCO_CELL_TOWERS_CSV = 'Datasets/openCellId/cell_towers_san_francisco.csv'
+
 
 def connect_hierarchical(rng, nodes, ConnectionClass, depth):
 
@@ -112,7 +118,7 @@ def connect_hierarchical(rng, nodes, ConnectionClass, depth):
                 # replace list with representative node:
                 new_cluster.content = centermost_node
                 clusters.append(new_cluster)
-        print('level', d, ':', len(clusters), 'clusters')
+        logger.debug('level %d: %d clusters', d, len(clusters))
 
     # connect the final clusters:
     # first: find the center-most representative
@@ -331,7 +337,8 @@ def generate_san_francisco_cloud_network(
         num_clouds,
         cloudlet_memory_capacity,
         cloud_memory_capacity,
-        random_seed):
+        random_seed,
+        distance_backend='dense'):
     """
     Creates a network from the base stations in san francisco.
     :param topology: one of 'delaunay','2-tier-hierarchical'
@@ -340,6 +347,7 @@ def generate_san_francisco_cloud_network(
     :param num_internal_nodes: number of internal nodes
     :param num_clouds: number of clouds
     :param random_seed: random seed for the generation of the network
+    :param distance_backend: 'dense' or 'sparse', see CloudNetwork
     :return: CloudNetwork
     """
     aabb = AABB2(
@@ -363,8 +371,8 @@ def generate_san_francisco_cloud_network(
     #utm_san_francisco = pyproj.Proj(proj='utm', zone=utm_zone, ellps='WGS84', datum='WGS84', units='m')
 
     base_stations = []
-    print('loading network...')
-    with open('Datasets/openCellId/cell_towers_san_francisco.csv') as file:
+    logger.info('loading network...')
+    with open(SAN_FRANCISCO_CELL_TOWERS_CSV) as file:
         first_line = file.readline()
         for line in file:
             radio, mcc, net, area, cell, unit, lon, lat, rrange, samples, changeable, created, updated, average_signal = line.split(
@@ -376,7 +384,7 @@ def generate_san_francisco_cloud_network(
             x, y = utm_san_francisco(lon, lat)
             base_stations.append(CloudBaseStation(pos=(x, y)))
 
-    print('network loaded. Connecting...')
+    logger.info('network loaded. Connecting...')
 
     # testing the accelerated RAN-model. right now, it should always find itself
     # TODO(1) give it a blacklist to never find itself
@@ -392,10 +400,10 @@ def generate_san_francisco_cloud_network(
     nodes = base_stations + [central_cloud_node]
 
     if topology == 'delaunay':
-        print('connecting delaunay')
+        logger.info('connecting delaunay')
         connect_nodes_delaunay(nodes, Connection)
     elif topology == '2-tier-hierarchical':
-        print('connecting 2-tier-hierarchical')
+        logger.info('connecting 2-tier-hierarchical')
         centermost_node = connect_hierarchical(rng, nodes, Connection, 2)
         central_cloud_distance = 10
         centermost_node.add_connection(
@@ -440,6 +448,6 @@ def generate_san_francisco_cloud_network(
                 node.set_cloud(cloud)
                 break
 
-    print('network loaded and connected')
+    logger.info('network loaded and connected')
 
-    return CloudNetwork(nodes, central_cloud=central_cloud)
+    return CloudNetwork(nodes, central_cloud=central_cloud, distance_backend=distance_backend)
@@ -16,11 +16,12 @@
 
 
 from INPsim.Network.Nodes.node import CloudBaseStation
+from INPsim.Network.distances import build_csr_graph, create_distance_store, create_distance_store_from_arrays
 from INPsim.vmath import AABB2
+import hashlib
 import math
 
-from scipy.sparse import csr_matrix
-from scipy.sparse.csgraph import floyd_warshall
+import numpy as np
 
 
 class Network:
@@ -29,10 +30,16 @@ class Network:
     This class must be treated as immutable. #TODO change this through refactoring?
     """
 
-    def __init__(self, nodes):
+    def __init__(self, nodes, distance_backend='dense', distance_source_nodes=(), distance_arrays=None):
         """
         Constructs a network with a set of connected Nodes.
         :param nodes: already finally connected set of Nodes
+        :param distance_backend: how the shortest path distances are stored. 'dense' computes all pairwise distances
+        with Floyd-Warshall. 'sparse' computes only the distances from distance_source_nodes to all nodes up front and
+        all other rows on demand.
+        :param distance_source_nodes: nodes whose distances to all other nodes are needed frequently
+        :param distance_arrays: optional precomputed distances of this network, as returned by
+        distance_store().arrays(). If given, no distances are computed.
         """
         self.__nodes = nodes
         #self.__node_dist_cache = dict([(node, LRU(20)) for node in self.__nodes])
@@ -41,16 +48,19 @@ class Network:
         self._node_ids = dict([(node, i)
                                for i, node in enumerate(self.__nodes)])
 
-        graph = []
-        for i in range(len(self.__nodes)):
-            row = [0] * len(self.__nodes)
-            connections = self.__nodes[i].get_connections()
-            for connection in connections:
-                idx = self._node_ids[connection.dst()]
-                row[idx] = connection.weight()
-            graph.append(row)
-        csr_graph = csr_matrix(graph)
-        self._dist_matrix = floyd_warshall(csgraph=csr_graph, directed=False)
+        csr_graph = build_csr_graph(self.__nodes, self._node_ids)
+        if distance_arrays is not None:
+            self._distances = create_distance_store_from_arrays(
+                csr_graph, distance_backend, distance_arrays)
+        else:
+            self._distances = create_distance_store(
+                csr_graph,
+                distance_backend,
+                [self._node_ids[node] for node in distance_source_nodes])
+        # rows of node indices sorted by distance, computed on first use
+        self._nearest_node_order = {}
+        # positions of the nodes, computed on first use
+        self._node_positions = None
 
     def __getstate__(self):
         """
@@ -76,10 +86,59 @@ class Network:
         """
         return self.__nodes
 
+    def distance_store(self):
+        """
+        Returns the store of the shortest path distances between the nodes of this network.
+        :return: DistanceStore
+        """
+        return self._distances
+
+    def node_index(self, node):
+        """
+        Returns the index of a node, which is its position in nodes().
+        :param node: a node of the network
+        :return: int
+        """
+        return self._node_ids[node]
+
+    def node_positions(self):
+        """
+        Returns the positions of all nodes as one array, aligned with nodes(). Nodes without a position are NaN.
+        :return: float64 array of shape (num_nodes, 2)
+        """
+        if self._node_positions is None:
+            positions = np.full((len(self.__nodes), 2), math.nan)
+            for i, node in enumerate(self.__nodes):
+                pos = node.get_pos() if hasattr(node, 'get_pos') else None
+                if pos is not None:
+                    positions[i] = pos
+            self._node_positions = positions
+        return self._node_positions
+
+    def pair_dists(self, src_ids, target_ids):
+        """
+        Returns the shortest distances between pairs of nodes. Unlike dist_to_node(), missing paths are math.inf.
+        :param src_ids: array of source node indices
+        :param target_ids: array of target node indices, aligned with src_ids
+        :return: float64 array of the distances
+        """
+        return self._distances.pair_dists(np.asarray(src_ids, dtype=np.int64), np.asarray(target_ids, dtype=np.int64))
+
     def dist_to_node(self, src_node, target_node, fallback_value=math.inf):
+        """
+        Returns the shortest distance between two nodes of the network.
+        The distance is the sum of the Connection weights.
+        :param src_node: The Node from which the distance should be computed.
+        :param target_node: The Node to which the distance should be computed.
+        :param fallback_value: Value that is returned when no path exists. The default is math.inf.
+        :return: The distance between the nodes. If no path exists, fallback_value is returned.
+        """
         i_src = self._node_ids[src_node]
         i_target = self._node_ids[target_node]
-        return self._dist_matrix[i_src][i_target]
+        dist = self._distances.dist(i_src, i_target)
+        if dist == math.inf:
+            return fallback_value
+        return dist
 
     def __calculate_dist_to_node(
             self,
@@ -131,6 +190,21 @@ class Network:
                         fringe.add(neighbor)
         return fallback_value
 
+    def _get_nearest_node_order(self, i_src):
+        """
+        Returns the indices of all nodes that are reachable from the node with index i_src, sorted by distance.
+        Ties are broken by node index. The rows are computed lazily and cached.
+        :param i_src: index of the source node
+        :return: list of node indices
+        """
+        order = self._nearest_node_order.get(i_src)
+        if order is None:
+            row = self._distances.row(i_src)
+            order = np.argsort(row, kind='stable')
+            order = order[np.isfinite(row[order])].tolist()
+            self._nearest_node_order[i_src] = order
+        return order
+
     def get_nearest_nodes(
             self,
             src_node,
@@ -139,6 +213,7 @@ class Network:
             node_filter=lambda node: True):
         """
         Returns the k nearest nodes from src.
+        The distance is the sum of the Connection weights, as in dist_to_node.
         :param k: number of nearest nodes t be searched
         :param include_src_node: True, if the returned nodes should include the src-node. False, if only other nodes should be considered
         :param node_filter: a function that can filter the searched nodes, e.g. to exclude non-cloud nodes. It returns True for valid nodes and False for invalid ones
@@ -146,55 +221,20 @@ class Network:
         """
         if k == 0:
             return []
+        i_src = self._node_ids[src_node]
+        row = self._distances.row(i_src)
         knn_nodes = []
-        # djikstra's algorithm until knn_nodes are found
-        fringe = set()
-        closed = set()
-        shortest_distances = {}
-
-        fringe.add(src_node)
-        shortest_distances[src_node] = 0
-
-        while fringe:
-            next_node = None
-            lowest_dist_in_fringe = math.inf
-            # find closest node in fringe
-            for node in fringe:
-                d = shortest_distances[node]
-                if d < lowest_dist_in_fringe:
-                    lowest_dist_in_fringe = d
-                    next_node = node
-            # remove the closest node from the fringe and add it to the closed
-            # nodes
-            fringe.remove(next_node)
-            dist_to_next_node = shortest_distances[next_node]
-            # collect node and return if enough clouds are collected
-            if (include_src_node or ((not include_src_node)
-                                     and src_node is not next_node)) and node_filter(next_node):
-                knn_nodes.append(next_node)
-                if len(knn_nodes) is k:
-                    # established
-                    if include_src_node:
-                        if node_filter(
-                                src_node):  # only include he node itself, if it passes the filte, of couse
-                            assert src_node in knn_nodes
-                    else:
-                        assert src_node not in knn_nodes
-                    return [(node, shortest_distances[node])
-                            for node in knn_nodes]
-            closed.add(next_node)
-            for neighbor in next_node.get_neighbor_nodes():
-                if neighbor not in closed:
-                    if neighbor not in shortest_distances:
-                        shortest_distances[
-                            neighbor] = dist_to_next_node + 1
-                    elif dist_to_next_node + 1 < shortest_distances[neighbor]:
-                        shortest_distances[
-                            neighbor] = dist_to_next_node + 1
-                    if neighbor not in fringe:
-                        fringe.add(neighbor)
-        # in this case, the returned number of nodes is lower than k
-        return [(node, shortest_distances[node]) for node in knn_nodes]
+        for i in self._get_nearest_node_order(i_src):
+            if i == i_src and not include_src_node:
+                continue
+            node = self.__nodes[i]
+            if node_filter(node):
+                knn_nodes.append((node, float(row[i])))
+                if len(knn_nodes) == k:
+                    break
+        # if not enough nodes are reachable, the returned number of nodes is
+        # lower than k
+        return knn_nodes
 
 
 class CloudNetwork(Network):
@@ -203,16 +243,48 @@ class CloudNetwork(Network):
     This class must be treated as immutable.
     """
 
-    def __init__(self, cloud_nodes, central_cloud=None):
+    def __init__(self, cloud_nodes, central_cloud=None, distance_backend='dense', distance_arrays=None):
         """
         Initializes a Network of nodes that are already interconnected and assigned to clouds.
         :param cloud_nodes: the set of nodes with their clouds assigned.
         :param central_cloud: one of the clouds within the network that is the designated central cloud, where all services are to be created and which has  practically unlimited capacity.
+        :param distance_backend: 'dense' or 'sparse', see Network. The sparse backend precomputes the distances from all cloud nodes.
+        :param distance_arrays: optional precomputed distances, see Network.
         """
-        super(CloudNetwork, self).__init__(cloud_nodes)
+        super(CloudNetwork, self).__init__(
+            cloud_nodes,
+            distance_backend=distance_backend,
+            distance_source_nodes=[node for node in cloud_nodes if node.get_cloud() is not None],
+            distance_arrays=distance_arrays)
         self.__clouds = self.__collect_clouds(cloud_nodes)
         self.__central_cloud = central_cloud
         self.__base_stations = self.__collect_base_stations(cloud_nodes)
+        self.__build_nearest_cloud_index(cloud_nodes)
+        # the key of the network in the network cache, if it was loaded from or stored in a cache
+        self._cache_key = None
+
+    def set_cache_key(self, key):
+        """
+        Sets the key of this network in the network cache (see INPsim.Network.networkCache).
+        :param key: content address of the network
+        """
+        self._cache_key = key
+
+    def cache_key(self):
+        """
+        Returns the key of this network in the network cache.
+        :return: content address of the network, or None if the network wasn't cached
+        """
+        return self._cache_key
+
+    def fingerprint(self):
+        """
+        Returns a hash of the node positions and the clouds, which identifies the network also if it isn't cached.
+        :return: hex digest
+        """
+        fingerprint = hashlib.sha256(np.ascontiguousarray(self.node_positions()).tobytes())
+        fingerprint.update(np.array([self.node_index(cloud.node()) for cloud in self.__clouds], dtype=np.int64).tobytes())
+        return fingerprint.hexdigest()
 
     def clouds(self):
         """
@@ -256,6 +328,26 @@ class CloudNetwork(Network):
                 clouds.append(cloud_node.get_cloud())
         return clouds
 
+    def __build_nearest_cloud_index(self, cloud_nodes):
+        """
+        Precomputes, for every node, the order of all clouds by distance from that node.
+        The clouds are ordered by their distances from the node, as given by the distance store. Ties are broken by
+        the order of the clouds in self.clouds().
+        :param cloud_nodes: the nodes of the network, in the same order as passed to the constructor.
+        :return: None
+        """
+        self._cloud_node_mask = np.array(
+            [cloud_node.get_cloud() is not None for cloud_node in cloud_nodes], dtype=bool)
+        # index of the node of each cloud, aligned with self.clouds()
+        self._cloud_node_ids = np.flatnonzero(self._cloud_node_mask)
+        node_to_cloud_dists = self._distances.columns(self._cloud_node_ids)
+        self._nearest_cloud_order = np.argsort(
+            node_to_cloud_dists, axis=1, kind='stable')
+        self._nearest_cloud_dists = np.take_along_axis(
+            node_to_cloud_dists, self._nearest_cloud_order, axis=1)
+        self._num_reachable_clouds = np.isfinite(
+            self._nearest_cloud_dists).sum(axis=1)
+
     def __collect_base_stations(self, cloud_nodes):
         """
         Collects all clouds from a set of nodes.
@@ -272,18 +364,42 @@ class CloudNetwork(Network):
             self,
             src_node,
             k,
-            cloud_filter=lambda cloud: True,
-            include_src_node=True):
+            cloud_filter=None,
+            include_src_node=True,
+            required_memory_capacity=None):
         """
-        :param node: the node from which to search for the closest cloud, including this node
+        Returns the k closest clouds to a node, using the precomputed nearest cloud index.
+        :param src_node: the node from which to search for the closest cloud
+        :param k: the number of clouds to be searched
+        :param cloud_filter: optional function that returns True for valid clouds and False for invalid ones
+        :param include_src_node: True, if a cloud at src_node itself should be considered
+        :param required_memory_capacity: if not None, only clouds with at least this much free memory capacity are considered
         :return: a list of tuples of the k closest clouds and their distances
         """
+        if k == 0:
+            return []
+        i_src = self._node_ids[src_node]
+        num_reachable = self._num_reachable_clouds[i_src]
+        order = self._nearest_cloud_order[i_src]
+        dists = self._nearest_cloud_dists[i_src]
+        clouds = self.__clouds
+        if cloud_filter is None and required_memory_capacity is None and include_src_node:
+            # fast path: the first k entries of the presorted row
+            num_clouds = min(k, num_reachable)
+            return [(clouds[i], d) for i, d in zip(
+                order[:num_clouds].tolist(), dists[:num_clouds].tolist())]
 
-        closest_cloud_node_tuples = self.get_nearest_nodes(
-            src_node,
-            k=k,
-            include_src_node=include_src_node,
-            node_filter=lambda node: node.get_cloud() is not None and cloud_filter(
-                node.get_cloud()))  # filter away all nodes without clouds
-        return [(node.get_cloud(), distance)
-                for node, distance in closest_cloud_node_tuples]
\ No newline at end of file
+        src_cloud = src_node.get_cloud() if hasattr(src_node, 'get_cloud') else None
+        nearest_clouds = []
+        for i, d in zip(order[:num_reachable].tolist(), dists[:num_reachable].tolist()):
+            cloud = clouds[i]
+            if cloud is src_cloud and not include_src_node:
+                continue
+            if required_memory_capacity is not None and cloud.free_memory_capacity() < required_memory_capacity:
+                continue
+            if cloud_filter is not None and not cloud_filter(cloud):
+                continue
+            nearest_clouds.append((cloud, d))
+            if len(nearest_clouds) == k:
+                break
+        return nearest_clouds
@@ -0,0 +1,239 @@
+# Copyright (C) 2020 Florian Brandherm
+# This file is part of flbrandh/MEC-Simulator-2-BigMEC <https://github.com/flbrandh/MEC-Simulator-2-BigMEC>.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with flbrandh/MEC-Simulator-2-BigMEC.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import logging
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from typing import Any, Callable, Dict
+
+import numpy as np
+
+from INPsim.Network.Nodes.node import CloudNode, CloudBaseStation
+from INPsim.Network.Nodes.cloud import LimitedMemoryCloud
+from INPsim.Network.connection import Connection, ConstantLatencyConnection
+from INPsim.Network.network import CloudNetwork
+from INPsim.Network.generator import SAN_FRANCISCO_CELL_TOWERS_CSV, generate_san_francisco_cloud_network
+
+logger = logging.getLogger(__name__)
+
+
+# bump this whenever the stored format or the network generators change
+NETWORK_CACHE_FORMAT_VERSION = 1
+
+_NODE_TYPES = [CloudNode, CloudBaseStation]
+_CONNECTION_TYPES = [Connection, ConstantLatencyConnection]
+
+
+def file_hash(path: str) -> str:
+    """
+    Computes the SHA-256 hash of a file's content.
+    :param path: path of the file
+    :return: hex digest
+    """
+    sha = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def network_cache_key(parameters: Dict[str, Any]) -> str:
+    """
+    Computes the content address of a generated network.
+    :param parameters: all json-serializable parameters that determine the generated network, including hashes of the
+    input data
+    :return: hex digest that identifies the network
+    """
+    description = json.dumps({'format_version': NETWORK_CACHE_FORMAT_VERSION, 'parameters': parameters},
+                             sort_keys=True)
+    return hashlib.sha256(description.encode('utf-8')).hexdigest()
+
+
+def save_cloud_network(network: CloudNetwork, directory: str) -> None:
+    """
+    Stores a CloudNetwork as a directory of .npy files that can be memory-mapped when loading.
+    The network must consist of CloudNodes/CloudBaseStations, Connections/ConstantLatencyConnections and
+    LimitedMemoryClouds.
+    :param network: the network to store
+    :param directory: the directory to create. It must not exist yet.
+    """
+    nodes = network.nodes()
+    node_ids = dict((node, i) for i, node in enumerate(nodes))
+    positions = np.array([node.get_pos() for node in nodes], dtype=np.float64)
+    node_types = np.array([_NODE_TYPES.index(type(node)) for node in nodes], dtype=np.int8)
+
+    edge_src, edge_dst, edge_weights, edge_types = [], [], [], []
+    for i, node in enumerate(nodes):
+        for connection in node.get_connections():
+            edge_src.append(i)
+            edge_dst.append(node_ids[connection.dst()])
+            edge_weights.append(connection.weight())
+            edge_types.append(_CONNECTION_TYPES.index(type(connection)))
+
+    clouds = network.clouds()
+    for cloud in clouds:
+        if type(cloud) is not LimitedMemoryCloud:
+            raise Exception('Only networks of LimitedMemoryClouds can be cached.')
+    cloud_node_ids = np.array([node_ids[cloud.node()] for cloud in clouds], dtype=np.int64)
+    cloud_memory_capacities = np.array([cloud.memory_capacity() for cloud in clouds], dtype=np.float64)
+    central_cloud = network.central_cloud()
+    central_cloud_index = clouds.index(central_cloud) if central_cloud is not None else -1
+
+    distance_store = network.distance_store()
+    arrays = {
+        'positions': positions,
+        'node_types': node_types,
+        'edge_src': np.array(edge_src, dtype=np.int64),
+        'edge_dst': np.array(edge_dst, dtype=np.int64),
+        'edge_weights': np.array(edge_weights, dtype=np.float64),
+        'edge_types': np.array(edge_types, dtype=np.int8),
+        'cloud_node_ids': cloud_node_ids,
+        'cloud_memory_capacities': cloud_memory_capacities,
+    }
+    for name, array in distance_store.arrays().items():
+        arrays['distances_' + name] = np.ascontiguousarray(array)
+
+    os.makedirs(directory)
+    for name, array in arrays.items():
+        np.save(os.path.join(directory, name + '.npy'), array)
+    with open(os.path.join(directory, 'network.json'), 'w') as file:
+        json.dump({'format_version': NETWORK_CACHE_FORMAT_VERSION,
+                   'distance_backend': distance_store.backend,
+                   'central_cloud_index': central_cloud_index}, file)
+
+
+def load_cloud_network(directory: str) -> CloudNetwork:
+    """
+    Loads a CloudNetwork that was stored with save_cloud_network.
+    The distance arrays are memory-mapped read-only, so that processes that load the same network share their pages.
+    :param directory: the directory of the stored network
+    :return: CloudNetwork
+    """
+    with open(os.path.join(directory, 'network.json')) as file:
+        metadata = json.load(file)
+    if metadata['format_version'] != NETWORK_CACHE_FORMAT_VERSION:
+        raise Exception('Unsupported network cache format version ' + str(metadata['format_version']))
+
+    def load(name, mmap_mode=None):
+        return np.load(os.path.join(directory, name + '.npy'), mmap_mode=mmap_mode)
+
+    positions = load('positions')
+    nodes = [_NODE_TYPES[node_type](pos=(x, y))
+             for node_type, (x, y) in zip(load('node_types').tolist(), positions.tolist())]
+    for src, dst, weight, connection_type in zip(load('edge_src').tolist(),
+                                                 load('edge_dst').tolist(),
+                                                 load('edge_weights').tolist(),
+                                                 load('edge_types').tolist()):
+        if _CONNECTION_TYPES[connection_type] is ConstantLatencyConnection:
+            connection = ConstantLatencyConnection(nodes[src], nodes[dst], weight)
+        else:
+            connection = Connection(nodes[src], nodes[dst])
+        nodes[src].add_connection(connection)
+
+    clouds = []
+    for node_id, memory_capacity in zip(load('cloud_node_ids').tolist(),
+                                        load('cloud_memory_capacities').tolist()):
+        cloud = LimitedMemoryCloud(node=nodes[node_id], memory_capacity=memory_capacity)
+        nodes[node_id].set_cloud(cloud)
+        clouds.append(cloud)
+    central_cloud_index = metadata['central_cloud_index']
+    central_cloud = clouds[central_cloud_index] if central_cloud_index >= 0 else None
+
+    distance_arrays = {}
+    for filename in os.listdir(directory):
+        if filename.startswith('distances_') and filename.endswith('.npy'):
+            name = filename[len('distances_'):-len('.npy')]
+            distance_arrays[name] = load('distances_' + name, mmap_mode='r')
+
+    return CloudNetwork(nodes,
+                        central_cloud=central_cloud,
+                        distance_backend=metadata['distance_backend'],
+                        distance_arrays=distance_arrays)
+
+
+def load_or_generate_cloud_network(cache_directory: str, key: str,
+                                   generator: Callable[[], CloudNetwork]) -> CloudNetwork:
+    """
+    Loads a network from the cache, or generates and caches it if it isn't cached yet.
+    Entries are written to a temporary directory first and then renamed atomically, so that concurrently starting
+    processes never see partially written entries. If several processes generate the same network at the same time,
+    the first one to finish wins.
+    :param cache_directory: directory that contains all cached networks
+    :param key: content address of the network, see network_cache_key
+    :param generator: function that generates the network if it isn't cached
+    :return: CloudNetwork
+    """
+    entry_directory = os.path.join(cache_directory, key)
+    if os.path.isdir(entry_directory):
+        logger.info('loading network from cache %s', entry_directory)
+        network = load_cloud_network(entry_directory)
+        network.set_cache_key(key)
+        return network
+
+    network = generator()
+    network.set_cache_key(key)
+    os.makedirs(cache_directory, exist_ok=True)
+    tmp_directory = tempfile.mkdtemp(prefix=key + '.tmp-', dir=cache_directory)
+    try:
+        save_cloud_network(network, os.path.join(tmp_directory, 'network'))
+        try:
+            os.rename(os.path.join(tmp_directory, 'network'), entry_directory)
+            logger.info('stored network in cache %s', entry_directory)
+        except OSError:
+            pass  # another process has stored the same network in the meantime
+    finally:
+        shutil.rmtree(tmp_directory, ignore_errors=True)
+    return network
+
+
+def load_or_generate_san_francisco_cloud_network(
+        cache_directory: str,
+        topology: str,
+        num_clouds: int,
+        cloudlet_memory_capacity: float,
+        cloud_memory_capacity: float,
+        random_seed: int,
+        distance_backend: str = 'dense') -> CloudNetwork:
+    """
+    Cached version of generate_san_francisco_cloud_network.
+    The cache key includes all generator parameters and the hash of the cell tower dataset.
+    :param cache_directory: directory that contains all cached networks
+    :return: CloudNetwork
+    """
+    parameters = {
+        'generator': 'san_francisco',
+        'topology': topology,
+        'num_clouds': num_clouds,
+        'cloudlet_memory_capacity': cloudlet_memory_capacity,
+        'cloud_memory_capacity': cloud_memory_capacity,
+        'random_seed': random_seed,
+        'distance_backend': distance_backend,
+        'cell_towers_hash': file_hash(SAN_FRANCISCO_CELL_TOWERS_CSV),
+    }
+    return load_or_generate_cloud_network(
+        cache_directory,
+        network_cache_key(parameters),
+        lambda: generate_san_francisco_cloud_network(
+            topology=topology,
+            num_clouds=num_clouds,
+            cloudlet_memory_capacity=cloudlet_memory_capacity,
+            cloud_memory_capacity=cloud_memory_capacity,
+            random_seed=random_seed,
+            distance_backend=distance_backend))
@@ -36,7 +36,7 @@ num_seconds = 60 * 60 * 24 * 30
 num_active_traces_per_step = []
 for i in range(num_seconds):
     m.step(1)
-    num_active_traces_per_step.append(len(m.active_traces))
+    num_active_traces_per_step.append(m.num_active_traces())
 plt.plot(num_active_traces_per_step)
 plt.show()
 print("average number of simultaneous traces: ",
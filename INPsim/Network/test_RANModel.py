@@ -0,0 +1,75 @@
+# Copyright (C) 2020 Florian Brandherm
+# This file is part of flbrandh/MEC-Simulator-2-BigMEC <https://github.com/flbrandh/MEC-Simulator-2-BigMEC>.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with flbrandh/MEC-Simulator-2-BigMEC.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import random
+import tracemalloc
+from unittest import TestCase
+import numpy as np
+from INPsim.Network.Nodes.node import CloudBaseStation
+from INPsim.Network.RANModel import NearestNeighborRANModel, RasterNearestNeighborRANModel
+
+
+class TestNearestNeighborRANModel(TestCase):
+
+    def setUp(self):
+        rng = random.Random(42)
+        self.base_stations = [CloudBaseStation((rng.uniform(0, 1000), rng.uniform(0, 500))) for _ in range(200)]
+        self.positions = np.array([(rng.uniform(-100, 1100), rng.uniform(-100, 600)) for _ in range(2000)])
+
+    def test_get_closest_base_station_indices(self):
+        ran_model = NearestNeighborRANModel(self.base_stations, 40)
+        indices = ran_model.get_closest_base_station_indices(self.positions)
+        for position, index in zip(self.positions.tolist(), indices.tolist()):
+            self.assertIs(ran_model._get_closest_base_station_brute_force(position),
+                          ran_model.base_stations()[index])
+        self.assertEqual(0, len(ran_model.get_closest_base_station_indices(np.zeros((0, 2)))))
+
+    def test_raster_is_exact(self):
+        ran_model = RasterNearestNeighborRANModel(self.base_stations, 20, raster_subdivisions=4)
+        self.assert_raster_is_exact(ran_model)
+
+    def test_raster_built_in_blocks_is_exact(self):
+        ran_model = RasterNearestNeighborRANModel(self.base_stations, 20, raster_subdivisions=4,
+                                                  max_raster_memory=2**18)
+        self.assertLess(ran_model._raster_block_rows(ran_model._raster_subdivisions), ran_model._raster_resolution)
+        self.assertLess(ran_model._ambiguous_block_size(), len(ran_model._raster_candidates))
+        self.assert_raster_is_exact(ran_model)
+
+    def assert_raster_is_exact(self, ran_model):
+        # include points on the Voronoi boundaries between neighboring base stations
+        midpoints = np.array([((a.get_pos()[0] + b.get_pos()[0]) / 2, (a.get_pos()[1] + b.get_pos()[1]) / 2)
+                              for a, b in zip(self.base_stations[:-1], self.base_stations[1:])])
+        positions = np.concatenate([self.positions, midpoints])
+        indices = ran_model.get_closest_base_station_indices(positions)
+        for position, index in zip(positions.tolist(), indices.tolist()):
+            self.assertIs(ran_model._get_closest_base_station_brute_force(position),
+                          ran_model.base_stations()[index])
+        self.assertIs(ran_model._get_closest_base_station_brute_force(positions[0]),
+                      ran_model.get_closest_base_station(positions[0]))
+
+    def test_raster_memory_bound(self):
+        ran_model = RasterNearestNeighborRANModel(self.base_stations, 20, raster_subdivisions=64,
+                                                  max_raster_memory=2**20)
+        self.assertLessEqual(ran_model._raster_owners.nbytes, 2**20)
+        # the temporary memory of building the raster is bounded as well
+        tracemalloc.start()
+        try:
+            RasterNearestNeighborRANModel(self.base_stations, 20, raster_subdivisions=64, max_raster_memory=2**20)
+            _, peak_memory = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertLessEqual(peak_memory, 2**20)
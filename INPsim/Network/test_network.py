@@ -0,0 +1,165 @@
+# Copyright (C) 2020 Florian Brandherm
+# This file is part of flbrandh/MEC-Simulator-2-BigMEC <https://github.com/flbrandh/MEC-Simulator-2-BigMEC>.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with flbrandh/MEC-Simulator-2-BigMEC.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import os
+import tempfile
+from unittest import TestCase
+from INPsim.Network.Nodes.node import Node, CloudNode
+from INPsim.Network.Nodes.cloud import LimitedMemoryCloud
+from INPsim.Network.connection import ConstantLatencyConnection
+from INPsim.Network.network import Network, CloudNetwork
+from INPsim.Network.distances import SparseDistanceStore, build_csr_graph
+from INPsim.Network.networkCache import save_cloud_network, load_cloud_network
+
+
+class DummyService:
+
+    def __init__(self):
+        self.cloud = None
+
+    def get_memory_requirement(self):
+        return 1
+
+    def get_cloud(self):
+        return self.cloud
+
+    def set_cloud(self, cloud):
+        self.cloud = cloud
+
+
+class TestNetwork(TestCase):
+
+    def test_get_nearest_nodes_diamond(self):
+        node1 = Node()
+        node2 = Node()
+        node3 = Node()
+        node4 = Node()
+        ConstantLatencyConnection.connect_default_bidirectional(node1, node2)
+        ConstantLatencyConnection.connect_default_bidirectional(node1, node3)
+        ConstantLatencyConnection.connect_default_bidirectional(node2, node4)
+        ConstantLatencyConnection.connect_default_bidirectional(node3, node4)
+        node1.valid = True
+        node2.valid = False
+        node3.valid = True
+        node4.valid = True
+        network = Network([node1, node2, node3, node4])
+
+        # without condition
+        self.assertEqual([(node1, 0)], network.get_nearest_nodes(node1, 1, True))
+        self.assertEqual([(node1, 0), (node2, 1), (node3, 1)],
+                         network.get_nearest_nodes(node1, 3, True))
+        self.assertEqual([(node2, 1), (node3, 1), (node4, 2)],
+                         network.get_nearest_nodes(node1, 3, False))
+        # with condition
+        self.assertEqual([(node3, 1), (node4, 2)], network.get_nearest_nodes(
+            node1, 2, False, lambda node: node.valid))
+        # fewer reachable nodes than requested
+        self.assertEqual(3, len(network.get_nearest_nodes(node1, 10, False)))
+
+    def test_get_nearest_nodes_weighted(self):
+        node1 = Node()
+        node2 = Node()
+        node3 = Node()
+        node1.add_connection(ConstantLatencyConnection(node1, node3, 5))
+        node3.add_connection(ConstantLatencyConnection(node3, node1, 5))
+        ConstantLatencyConnection.connect_default_bidirectional(node1, node2)
+        ConstantLatencyConnection.connect_default_bidirectional(node2, node3)
+        network = Network([node1, node2, node3])
+
+        self.assertEqual([(node2, 1), (node3, 2)],
+                         network.get_nearest_nodes(node1, 2, False))
+        self.assertEqual(2, network.dist_to_node(node1, node3))
+
+    def test_get_nearest_clouds(self):
+        nodes = [CloudNode((i, 0)) for i in range(4)]
+        for node1, node2 in zip(nodes[:-1], nodes[1:]):
+            ConstantLatencyConnection.connect_default_bidirectional(node1, node2)
+        for node in (nodes[0], nodes[2], nodes[3]):
+            node.set_cloud(LimitedMemoryCloud(node, 1))
+        cloud0, cloud2, cloud3 = nodes[0].get_cloud(), nodes[2].get_cloud(), nodes[3].get_cloud()
+        network = CloudNetwork(nodes, central_cloud=cloud0)
+
+        self.assertEqual([(cloud0, 1), (cloud2, 1)],
+                         network.get_nearest_clouds(nodes[1], 2))
+        self.assertEqual([(cloud2, 0), (cloud3, 1), (cloud0, 2)],
+                         network.get_nearest_clouds(nodes[2], 3))
+        self.assertEqual([(cloud3, 1)],
+                         network.get_nearest_clouds(nodes[2], 1, include_src_node=False))
+        self.assertEqual([(cloud3, 1)], network.get_nearest_clouds(
+            nodes[2], 1, cloud_filter=lambda cloud: cloud is not cloud2))
+
+        cloud2.add_service(DummyService())
+        self.assertEqual([(cloud0, 1), (cloud3, 2)], network.get_nearest_clouds(
+            nodes[1], 2, required_memory_capacity=1))
+
+    def test_sparse_distance_backend(self):
+        nodes = [CloudNode((i, 0)) for i in range(6)]
+        for node1, node2 in zip(nodes[:-1], nodes[1:]):
+            ConstantLatencyConnection.connect_default_bidirectional(node1, node2)
+        nodes[0].add_connection(ConstantLatencyConnection(nodes[0], nodes[5], 3))
+        nodes[5].add_connection(ConstantLatencyConnection(nodes[5], nodes[0], 3))
+        for node in (nodes[1], nodes[4]):
+            node.set_cloud(LimitedMemoryCloud(node, 1))
+        dense_network = CloudNetwork(nodes, distance_backend='dense')
+        sparse_network = CloudNetwork(nodes, distance_backend='sparse')
+
+        for node1 in nodes:
+            for node2 in nodes:
+                self.assertEqual(dense_network.dist_to_node(node1, node2),
+                                 sparse_network.dist_to_node(node1, node2))
+            self.assertEqual(dense_network.get_nearest_clouds(node1, 2),
+                             sparse_network.get_nearest_clouds(node1, 2))
+            self.assertEqual(dense_network.get_nearest_nodes(node1, 3),
+                             sparse_network.get_nearest_nodes(node1, 3))
+
+    def test_sparse_distance_row_cache_is_bounded(self):
+        nodes = [CloudNode((i, 0)) for i in range(6)]
+        for node1, node2 in zip(nodes[:-1], nodes[1:]):
+            ConstantLatencyConnection.connect_default_bidirectional(node1, node2)
+        dense_network = CloudNetwork(nodes, distance_backend='dense')
+        csr_graph = build_csr_graph(nodes, dict((node, i) for i, node in enumerate(nodes)))
+        distances = SparseDistanceStore(csr_graph, [0], max_cached_rows=2)
+
+        for i in (1, 2, 1, 3, 4, 1, 5):
+            self.assertEqual(dense_network.distance_store().row(i).tolist(), distances.row(i).tolist())
+            self.assertLessEqual(len(distances._on_demand_rows), 2)
+        # the least recently used rows are evicted
+        self.assertEqual([1, 5], list(distances._on_demand_rows.keys()))
+        uncached_distances = SparseDistanceStore(csr_graph, [0], max_cached_rows=0)
+        self.assertEqual(dense_network.distance_store().row(3).tolist(), uncached_distances.row(3).tolist())
+        self.assertEqual(0, len(uncached_distances._on_demand_rows))
+
+    def test_network_cache_round_trip(self):
+        nodes = [CloudNode((i, 0)) for i in range(5)]
+        for node1, node2 in zip(nodes[:-1], nodes[1:]):
+            ConstantLatencyConnection.connect_default_bidirectional(node1, node2)
+        for node in (nodes[0], nodes[3]):
+            node.set_cloud(LimitedMemoryCloud(node, 2))
+        for backend in ('dense', 'sparse'):
+            network = CloudNetwork(nodes, central_cloud=nodes[3].get_cloud(), distance_backend=backend)
+            with tempfile.TemporaryDirectory() as directory:
+                save_cloud_network(network, os.path.join(directory, 'network'))
+                loaded_network = load_cloud_network(os.path.join(directory, 'network'))
+
+                loaded_nodes = loaded_network.nodes()
+                self.assertEqual([node.get_pos() for node in nodes], [node.get_pos() for node in loaded_nodes])
+                self.assertIs(loaded_nodes[3].get_cloud(), loaded_network.central_cloud())
+                self.assertEqual(2, loaded_network.central_cloud().memory_capacity())
+                for i in range(len(nodes)):
+                    for j in range(len(nodes)):
+                        self.assertEqual(network.dist_to_node(nodes[i], nodes[j]),
+                                         loaded_network.dist_to_node(loaded_nodes[i], loaded_nodes[j]))
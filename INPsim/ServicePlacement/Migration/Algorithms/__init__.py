@@ -17,6 +17,6 @@
 
 from .basicMigrationAlgorithms import *
 from .evalMigrationAlgorithms import *
-from .migrationAlgorithm import MigrationAlgorithm
+from .migrationAlgorithm import MigrationAlgorithm, PendingMigrationDecision
 from .migrationAlgorithmServicePlacementStrategy import *
 from .initialServicePlacementStrategy import *
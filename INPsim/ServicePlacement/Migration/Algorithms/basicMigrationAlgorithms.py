@@ -93,9 +93,7 @@ class AlwaysMigrateAlgorithm(MigrationAlgorithm):
                     closest_available_cloud_with_distance = self._cloud_network.get_nearest_clouds(
                         current_base_station,
                         k=1,
-                        cloud_filter=lambda cloud: (
-                            cloud.total_memory_requirement() +
-                            service.get_memory_requirement()) <= cloud.memory_capacity())
+                        required_memory_capacity=service.get_memory_requirement())
                     if closest_available_cloud_with_distance:
                         [(target_cloud, _)] = closest_available_cloud_with_distance
                     else:
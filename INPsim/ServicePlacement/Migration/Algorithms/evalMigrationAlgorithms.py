@@ -15,6 +15,7 @@
 # along with flbrandh/MEC-Simulator-2-BigMEC.  If not, see <http://www.gnu.org/licenses/>.
 
 
+import logging
 from INPsim.ServicePlacement.Migration.Algorithms import MigrationAlgorithm, RewardAggregatorAgent
 from INPsim.ServicePlacement.Migration.Action.migrationActionInterface import MigrationAction
 from INPsim.ServicePlacement.Migration.Action.noMigrationActionInterface import NoMigrationAction
@@ -22,6 +23,8 @@ from INPsim.ServicePlacement.Migration.CloudCandidateSelector.destinationCloudCa
 import math
 from collections import defaultdict
 
+logger = logging.getLogger(__name__)
+
 
 def priority_weighted_latency_utility(cloud_network, service, cloud):
     """
@@ -237,7 +240,7 @@ class AlwaysMigrateToHighestUtilityInNeighborhoodAlgorithm(MigrationAlgorithm):
                     if combined_utility > best_displacement_option_set_combined_utility:
                         best_displacement_option_set = displacement_option_set
                         best_displacement_option_set_combined_utility = combined_utility
-            print("solved one!")
+            logger.debug("solved one!")
             if len(best_displacement_option_set) > 0:
                 return (best_displacement_option_set_combined_utility, [(s, n) for s,n,u in best_displacement_option_set])
             else:
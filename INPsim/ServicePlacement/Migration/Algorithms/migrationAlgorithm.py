@@ -16,11 +16,37 @@
 
 
 import abc
+import math
+from typing import Any, Dict, List, Set, Tuple
 from INPsim.Network import CloudNetwork
 from INPsim.Network.Service import Service
 from INPsim.Network.Nodes import Cloud
 
 
+class PendingMigrationDecision:
+    """
+    A migration decision whose inputs have been gathered, but that hasn't been made yet.
+    Pending decisions of different services can be evaluated together (see MigrationAlgorithm.evaluate_migration_decisions).
+    """
+
+    def __init__(self,
+                 service: Service,
+                 capacity_checks: Dict[Cloud, Tuple[int, int]],
+                 inspected_clouds: Set[Cloud],
+                 possible_moves: Set[Tuple[Service, Cloud]]) -> None:
+        """
+        :param service: the service that the decision is made for
+        :param capacity_checks: the clouds whose free memory the decision depends on, mapped to the minimum and maximum
+                                memory requirement that was checked against their free memory
+        :param inspected_clouds: the clouds whose services the decision depends on
+        :param possible_moves: all (service, target cloud) migrations that the decision may perform
+        """
+        self.service = service
+        self.capacity_checks = capacity_checks
+        self.inspected_clouds = inspected_clouds
+        self.possible_moves = possible_moves
+
+
 class MigrationAlgorithm:
 
     class Instance:
@@ -34,6 +60,23 @@ class MigrationAlgorithm:
             """
             pass
 
+        def prepare_migration_decision(self, service: Service) -> PendingMigrationDecision:
+            """
+            Gathers the inputs of a migration decision without making it. Only needed if the algorithm supports batched
+            decisions.
+            :param service: the service that this function was invoked for
+            :return: the pending decision
+            """
+            raise NotImplementedError()
+
+        def finish_migration_decision(self, decision: PendingMigrationDecision):
+            """
+            Makes an evaluated pending decision. Only needed if the algorithm supports batched decisions.
+            :param decision: a pending decision of this instance that was passed to evaluate_migration_decisions()
+            :return: the same as process_migration_event()
+            """
+            raise NotImplementedError()
+
         def give_reward(self, reward: float):
             """
             This function gives an immediate reward for the last action. If this method isn't called, the reward for the last action is 0.
@@ -49,4 +92,55 @@ class MigrationAlgorithm:
         :param cloud: cloud of the created algorithm instance
         :param cloud_network: network that the instance operates in
         :return: an Algorithm Instance obj
-        """
\ No newline at end of file
+        """
+
+    def supports_batched_decisions(self) -> bool:
+        """
+        :return: True, if the algorithm implements prepare_migration_decision(), evaluate_migration_decisions() and
+                 finish_migration_decision()
+        """
+        return False
+
+    def max_decision_batch_size(self) -> float:
+        """
+        :return: the maximum number of pending decisions that can be evaluated together from now on, e.g. because the
+                 algorithm changes after a number of decisions
+        """
+        return math.inf
+
+    def begin_placement_update(self) -> None:
+        """
+        Is called before the placements of the services are updated, e.g. to discard state that was cached during the
+        last update.
+        """
+        pass
+
+    def evaluate_migration_decisions(self, decisions: List[PendingMigrationDecision]) -> None:
+        """
+        Evaluates pending decisions of any instances together. The decisions must then be finished in the same order.
+        :param decisions: pending decisions
+        """
+        raise NotImplementedError()
+
+    def get_performance_counters(self) -> Dict[str, int]:
+        """
+        :return: cumulative counters of the work that the algorithm did so far (e.g. the number of neural network
+                 evaluations), for profiling
+        """
+        return {}
+
+    def get_checkpoint_state(self, services: List[Service]) -> Dict[str, Any]:
+        """
+        Returns the state of the algorithm (e.g. learned parameters), see INPsim.Utils.checkpointState.
+        :param services: all services in their checkpoint order. Services are stored as indices into this list.
+        :return: checkpoint state
+        """
+        return {}
+
+    def set_checkpoint_state(self, state: Dict[str, Any], services: List[Service]) -> None:
+        """
+        Restores a state from get_checkpoint_state.
+        :param state: checkpoint state
+        :param services: all services in their checkpoint order
+        """
+        pass
@@ -15,14 +15,21 @@
 # along with flbrandh/MEC-Simulator-2-BigMEC.  If not, see <http://www.gnu.org/licenses/>.
 
 
-from typing import Union, List
+from typing import Any, Dict, Union, List, Set
 from INPsim.ServicePlacement.servicePlacementStrategy import IndependentServicePlacementStrategy
 from INPsim.Network.Service.service import Service
 from INPsim.Network.network import CloudNetwork
-from INPsim.ServicePlacement.Migration.Algorithms import MigrationAlgorithm
+from INPsim.Network.Nodes import Cloud
+from INPsim.Network.User.Manager import UserManager
+from INPsim.ServicePlacement.Migration.Algorithms.migrationAlgorithm import MigrationAlgorithm, PendingMigrationDecision
 from INPsim.ServicePlacement.Migration.Action import Action, MigrationAction, NoMigrationAction, InitialPlacementAction
 from INPsim.ServicePlacement.Migration.CostFunctions import ServiceCostFunction
 from INPsim.ServicePlacement.Migration.Algorithms.initialServicePlacementStrategy import InitialPlacementStrategy
+from INPsim.Utils.checkpointState import prefixed, unprefixed
+
+
+# the counters of MigrationAlgorithmServicePlacementStrategy that are stored in checkpoints
+_COUNTERS = ('num_migration_actions', 'num_no_migration_actions', 'num_decision_batches', 'num_batched_decisions')
 
 
 class MigrationAlgorithmServicePlacementStrategy(IndependentServicePlacementStrategy):
@@ -32,9 +39,15 @@ class MigrationAlgorithmServicePlacementStrategy(IndependentServicePlacementStra
                  cloud_network: CloudNetwork,
                  cost_function: ServiceCostFunction,
                  migration_trigger: str,
-                 initial_placement_strategy: InitialPlacementStrategy) -> None:
+                 initial_placement_strategy: InitialPlacementStrategy,
+                 batched_decisions: bool = False,
+                 max_decision_batch_size: int = 64) -> None:
         """
         Initializes the service placement_cost strategy
+        :param batched_decisions: if True and the migration algorithm supports it, the decisions of services whose
+                                  decisions can't influence each other are evaluated together (see
+                                  update_service_placements()).
+        :param max_decision_batch_size: maximum number of decisions that are evaluated together
         """
         super(MigrationAlgorithmServicePlacementStrategy, self).__init__()
         self._migration_algorithm: MigrationAlgorithm = migration_algorithm
@@ -45,6 +58,11 @@ class MigrationAlgorithmServicePlacementStrategy(IndependentServicePlacementStra
         self.num_migration_actions = 0
         self.num_no_migration_actions = 0
 
+        self._batched_decisions = batched_decisions and migration_algorithm.supports_batched_decisions()
+        self._max_decision_batch_size = max_decision_batch_size
+        self.num_decision_batches = 0
+        self.num_batched_decisions = 0
+
         def migration_trigger_always(service, cloud_network):
             return True
 
@@ -76,6 +94,26 @@ class MigrationAlgorithmServicePlacementStrategy(IndependentServicePlacementStra
     def get_service_cost_function(self) -> ServiceCostFunction:
         return self._cost_function
 
+    def get_performance_counters(self) -> Dict[str, int]:
+        counters = {'migration_actions': self.num_migration_actions,
+                    'no_migration_actions': self.num_no_migration_actions,
+                    'decision_batches': self.num_decision_batches,
+                    'batched_decisions': self.num_batched_decisions}
+        counters.update(self._migration_algorithm.get_performance_counters())
+        return counters
+
+    def get_checkpoint_state(self, services: List[Service]) -> Dict[str, Any]:
+        state = super(MigrationAlgorithmServicePlacementStrategy, self).get_checkpoint_state(services)
+        state.update((name, getattr(self, name)) for name in _COUNTERS)
+        state.update(prefixed(self._migration_algorithm.get_checkpoint_state(services), 'migration_algorithm'))
+        return state
+
+    def set_checkpoint_state(self, state: Dict[str, Any], services: List[Service]) -> None:
+        super(MigrationAlgorithmServicePlacementStrategy, self).set_checkpoint_state(state, services)
+        for name in _COUNTERS:
+            setattr(self, name, state[name])
+        self._migration_algorithm.set_checkpoint_state(unprefixed(state, 'migration_algorithm'), services)
+
     def _initialize_migration_algorithm_instances(
             self, cloud_network: CloudNetwork) -> None:
         for cloud in cloud_network.clouds():
@@ -115,6 +153,98 @@ class MigrationAlgorithmServicePlacementStrategy(IndependentServicePlacementStra
         else:
             return []
 
+    def update_service_placements(self,
+                                  cloud_network: CloudNetwork,
+                                  user_manager: UserManager,
+                                  time_step: float) -> List[Action]:
+        """
+        Updates the service placements in random order. In batched decision mode, consecutive migration decisions are
+        collected in a batch as long as no decision in the batch can change the state that a later decision depends on.
+        The batch is then evaluated at once (e.g. in one forward pass of a neural network) and its decisions are finished
+        and executed one by one, in order. This makes the same decisions as evaluating them one by one.
+        :param cloud_network: the cloud network
+        :param user_manager: the user manager
+        :param time_step: the timestep between this call and the last call of this method
+        :return: List of all performed actions
+        """
+        self._migration_algorithm.begin_placement_update()
+        if not self._batched_decisions:
+            return super(MigrationAlgorithmServicePlacementStrategy, self).update_service_placements(cloud_network,
+                                                                                                    user_manager,
+                                                                                                    time_step)
+        services_in_random_order = list(user_manager.services())
+        self.rng.shuffle(services_in_random_order)
+        action_list: List[Action] = []
+        batch = DecisionBatch()
+        for service in services_in_random_order:
+            assert service.owner()  # safety check: make sure that there are no services whose owner is already destroyed
+
+            if not service.get_cloud():  # this means the service is new.
+                action_list.extend(self._execute_decision_batch(cloud_network, batch))
+                action_list.extend(self.place_service_initially(service, cloud_network))
+                continue
+            if service in batch.moved_services:  # the migration trigger may depend on the service's cloud
+                action_list.extend(self._execute_decision_batch(cloud_network, batch))
+            if not self._migration_trigger(service, cloud_network):
+                continue
+
+            instance = service.get_cloud().get_migration_algorithm_instance()
+            decision = instance.prepare_migration_decision(service)
+            if not batch.is_independent(decision):
+                # the decision must be prepared again after the batch is executed
+                action_list.extend(self._execute_decision_batch(cloud_network, batch))
+                decision = instance.prepare_migration_decision(service)
+            if not batch.decisions:
+                max_batch_size = min(self._max_decision_batch_size, self._migration_algorithm.max_decision_batch_size())
+            batch.add(decision)
+            if len(batch.decisions) >= max_batch_size:
+                action_list.extend(self._execute_decision_batch(cloud_network, batch))
+        action_list.extend(self._execute_decision_batch(cloud_network, batch))
+        return action_list
+
+    def _execute_decision_batch(self,
+                                cloud_network: CloudNetwork,
+                                batch: 'DecisionBatch') -> List[Action]:
+        """
+        Evaluates a batch of pending decisions and finishes and executes them in order. The batch is emptied.
+        The decisions of a batch don't influence each other (see DecisionBatch.is_independent()), so each chosen plan is
+        as feasible as if the decisions were made one by one.
+        :param cloud_network: the cloud network
+        :param batch: pending decisions
+        :return: the performed actions
+        """
+        if not batch.decisions:
+            return []
+        self._migration_algorithm.evaluate_migration_decisions(batch.decisions)
+        self.num_decision_batches += 1
+        self.num_batched_decisions += len(batch.decisions)
+        action_list: List[Action] = []
+        for decision in batch.decisions:
+            service = decision.service
+            migration_actions = service.get_cloud().get_migration_algorithm_instance().finish_migration_decision(decision)
+            # the agent has already recorded the plan as its last action, so it must not be replaced
+            assert self._is_feasible(migration_actions)
+            action_list.extend(self._execute_migration_actions(cloud_network, service, migration_actions))
+        batch.clear()
+        return action_list
+
+    @staticmethod
+    def _is_feasible(migration_actions: List[Union[MigrationAction, NoMigrationAction]]) -> bool:
+        """
+        :return: True, if the migration actions can be executed in order without exceeding any cloud's memory capacity
+        """
+        memory_changes: Dict[Cloud, int] = {}
+        for action in migration_actions:
+            if isinstance(action, MigrationAction):
+                memory = action.get_service().get_memory_requirement()
+                target_cloud = action.get_target_cloud()
+                if target_cloud.total_memory_requirement() + memory_changes.get(target_cloud, 0) + memory > target_cloud.memory_capacity():
+                    return False
+                memory_changes[target_cloud] = memory_changes.get(target_cloud, 0) + memory
+                source_cloud = action.get_service().get_cloud()
+                memory_changes[source_cloud] = memory_changes.get(source_cloud, 0) - memory
+        return True
+
     def get_reward(self,
                    cloud_network: CloudNetwork,
                    action: Union[MigrationAction,
@@ -127,6 +257,20 @@ class MigrationAlgorithmServicePlacementStrategy(IndependentServicePlacementStra
             service: Service) -> List[Action]:
         cloud = service.get_cloud()
         action_list: List[Union[MigrationAction, NoMigrationAction]] = cloud.get_migration_algorithm_instance().process_migration_event(service)
+        return self._execute_migration_actions(cloud_network, service, action_list)
+
+    def _execute_migration_actions(self,
+                                   cloud_network: CloudNetwork,
+                                   service: Service,
+                                   action_list: List[Union[MigrationAction, NoMigrationAction]]) -> List[Action]:
+        """
+        Executes the migration actions of a migration decision and rewards the migration algorithm instance.
+        :param cloud_network: the cloud network
+        :param service: the service that the decision was made for
+        :param action_list: the decided actions
+        :return: action_list
+        """
+        cloud = service.get_cloud()
         # print('#migration actions:', len(action_list))
         if isinstance(action_list[-1], MigrationAction):
             before_services = action_list[-1].get_target_cloud().services().copy()
@@ -155,3 +299,55 @@ class MigrationAlgorithmServicePlacementStrategy(IndependentServicePlacementStra
         assert cloud.total_memory_requirement() <= cloud.memory_capacity()
         cloud.add_service(action.get_service())
         assert cloud.total_memory_requirement() <= cloud.memory_capacity()
+
+
+class DecisionBatch:
+    """
+    A batch of pending migration decisions that don't influence each other when they are executed in order.
+    """
+
+    def __init__(self) -> None:
+        self.decisions: List[PendingMigrationDecision] = []
+        self.moved_services: Set[Service] = set()  # services that the batch may migrate
+        self._incoming_memory: Dict[Cloud, int] = {}  # memory that the batch may move into each cloud
+        self._outgoing_memory: Dict[Cloud, int] = {}  # memory that the batch may move out of each cloud
+
+    def add(self, decision: PendingMigrationDecision) -> None:
+        self.decisions.append(decision)
+        for service, target_cloud in decision.possible_moves:
+            memory = service.get_memory_requirement()
+            self._incoming_memory[target_cloud] = self._incoming_memory.get(target_cloud, 0) + memory
+            if service not in self.moved_services:
+                self.moved_services.add(service)
+                source_cloud = service.get_cloud()
+                self._outgoing_memory[source_cloud] = self._outgoing_memory.get(source_cloud, 0) + memory
+
+    def clear(self) -> None:
+        self.decisions.clear()
+        self.moved_services.clear()
+        self._incoming_memory.clear()
+        self._outgoing_memory.clear()
+
+    def is_independent(self, decision: PendingMigrationDecision) -> bool:
+        """
+        Checks whether executing the decisions of the batch can't change what a decision was prepared from.
+        This is the case if the batch doesn't migrate the decision's service or any service of a cloud whose services
+        the decision inspected, and if each capacity check of the decision has the same outcome no matter which of its
+        possible migrations the batch performs.
+        :param decision: pending decision that would be appended to the batch
+        :return: True, if the decision can be appended to the batch
+        """
+        if decision.service in self.moved_services:
+            return False
+        for cloud in decision.inspected_clouds:
+            if cloud in self._incoming_memory or cloud in self._outgoing_memory:
+                return False
+        for cloud, (min_memory, max_memory) in decision.capacity_checks.items():
+            if cloud in self._incoming_memory or cloud in self._outgoing_memory:
+                max_load = cloud.total_memory_requirement() + self._incoming_memory.get(cloud, 0)
+                min_load = cloud.total_memory_requirement() - self._outgoing_memory.get(cloud, 0)
+                always_succeeds = max_load + max_memory <= cloud.memory_capacity()
+                always_fails = min_load + min_memory > cloud.memory_capacity()
+                if not (always_succeeds or always_fails):
+                    return False
+        return True
@@ -0,0 +1,143 @@
+# Copyright (C) 2020 Florian Brandherm
+# This file is part of flbrandh/MEC-Simulator-2-BigMEC <https://github.com/flbrandh/MEC-Simulator-2-BigMEC>.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with flbrandh/MEC-Simulator-2-BigMEC.  If not, see <http://www.gnu.org/licenses/>.
+
+
+
+import random
+from unittest import TestCase
+import numpy as np
+from INPsim.Network.Nodes.node import CloudNode
+from INPsim.Network.Nodes.cloud import LimitedMemoryCloud
+from INPsim.Network.Service.service import Service
+from INPsim.ServicePlacement.Migration.Algorithms.migrationAlgorithm import PendingMigrationDecision
+from INPsim.ServicePlacement.Migration.Algorithms.migrationAlgorithmServicePlacementStrategy import DecisionBatch
+from INPsim.ServicePlacement.Migration.Action import MigrationAction
+from INPsim.Simulation import Simulation, SimulationObserver
+from INPsim.Simulation.testSimulations import OrderedUserManager, create_test_network, create_test_service_model, \
+    create_test_dqn_strategy
+
+
+class TestDecisionBatch(TestCase):
+
+    def setUp(self):
+        self.clouds = [LimitedMemoryCloud(CloudNode(), 3) for _ in range(4)]
+        self.services = [Service(1, 10) for _ in range(6)]
+        for service, cloud in zip(self.services, [0, 0, 1, 1, 2, 3]):
+            self.clouds[cloud].add_service(service)
+
+    def decision(self, service, checked_clouds, moves, inspected_clouds=()):
+        return PendingMigrationDecision(self.services[service],
+                                        dict((self.clouds[c], (1, 1)) for c in checked_clouds),
+                                        set(self.clouds[c] for c in inspected_clouds),
+                                        set((self.services[s], self.clouds[c]) for s, c in moves))
+
+    def test_disjoint_decisions_are_independent(self):
+        batch = DecisionBatch()
+        batch.add(self.decision(0, [1], [(0, 1)]))
+        self.assertTrue(batch.is_independent(self.decision(4, [3], [(4, 3)])))
+        self.assertFalse(batch.is_independent(self.decision(0, [3], [(0, 3)])))  # the batch may migrate the service
+        batch.clear()
+        self.assertTrue(batch.is_independent(self.decision(0, [3], [(0, 3)])))
+
+    def test_capacity_checks(self):
+        batch = DecisionBatch()
+        batch.add(self.decision(0, [2], [(0, 2)]))
+        # cloud 2 has enough memory for both services
+        self.assertTrue(batch.is_independent(self.decision(5, [2], [(5, 2)])))
+        batch.add(self.decision(5, [2], [(5, 2)]))
+        # cloud 2 may be full after the batch
+        self.assertFalse(batch.is_independent(self.decision(2, [2], [(2, 2)])))
+
+        # a check at a full cloud fails before and after the batch moves a service there
+        self.clouds[1].add_service(Service(1, 10))
+        batch.clear()
+        batch.add(self.decision(5, [1], [(5, 1)]))
+        self.assertTrue(batch.is_independent(self.decision(4, [1], [])))
+        # but not if the batch may free memory there
+        batch.add(self.decision(3, [3], [(3, 3)]))
+        self.assertFalse(batch.is_independent(self.decision(4, [1], [])))
+
+    def test_inspected_services(self):
+        batch = DecisionBatch()
+        batch.add(self.decision(4, [1], [(4, 1)]))
+        self.assertFalse(batch.is_independent(self.decision(0, [], [], inspected_clouds=[1])))
+        self.assertFalse(batch.is_independent(self.decision(0, [], [], inspected_clouds=[2])))
+        self.assertTrue(batch.is_independent(self.decision(0, [], [], inspected_clouds=[0])))
+
+
+class ActionRecorder(SimulationObserver):
+    """
+    Records the actions of each step as (type, service index, target cloud index).
+    """
+
+    def __init__(self):
+        self.actions = []
+
+    def after_simulation_step(self, simulation, actions):
+        services = dict((service, i) for i, service in enumerate(simulation.get_user_manager().checkpoint_services()))
+        clouds = dict((cloud, i) for i, cloud in enumerate(simulation.get_clouds()))
+        self.actions.append([(type(action).__name__, services[action.get_service()],
+                              clouds[action.get_target_cloud()] if isinstance(action, MigrationAction) else -1)
+                             for action in actions])
+
+
+class TestBatchedDecisions(TestCase):
+
+    def simulate(self, max_decision_batch_size, model_parameters=None):
+        rng = random.Random(42)
+        network = create_test_network(rng)
+        user_manager = OrderedUserManager(create_test_service_model(), rng, 30)
+        strategy = create_test_dqn_strategy(network, 1, batched_decisions=True,
+                                            max_decision_batch_size=max_decision_batch_size)
+        agent = strategy.get_migration_algorithm().shared_agent
+        if model_parameters is not None:
+            agent.set_model_parameters(model_parameters)
+        recorder = ActionRecorder()
+        Simulation(network, user_manager, strategy).simulate(4, recorder)
+        return strategy, agent, recorder.actions
+
+    def test_batched_decisions_equal_sequential_decisions(self):
+        sequential_strategy, sequential_agent, sequential_actions = self.simulate(1)
+        self.assertEqual(sequential_strategy.num_decision_batches, sequential_strategy.num_batched_decisions)
+        batched_strategy, batched_agent, batched_actions = self.simulate(
+            64, sequential_agent.get_model_parameters())
+        self.assertLess(batched_strategy.num_decision_batches, batched_strategy.num_batched_decisions)
+        self.assertEqual(sequential_strategy.num_batched_decisions, batched_strategy.num_batched_decisions)
+
+        self.assertEqual(sequential_actions, batched_actions)
+        self.assertGreater(sum(name == 'MigrationAction' for actions in batched_actions for name, _, _ in actions), 0)
+
+        # the same experiences are recorded
+        sequential_memory, batched_memory = sequential_agent.replay_memory, batched_agent.replay_memory
+        self.assertGreater(len(sequential_memory), 0)
+        self.assertEqual(len(sequential_memory), len(batched_memory))
+        samples = list(range(len(sequential_memory)))
+        self.assertTrue(np.array_equal(sequential_memory.state_action_features(samples),
+                                       batched_memory.state_action_features(samples)))
+        self.assertTrue(np.array_equal(sequential_memory.rewards(samples), batched_memory.rewards(samples)))
+        # the possible next actions of a sample are collected in a set, so only their order may differ
+        features, counts = sequential_memory.state_next_action_features(samples)
+        batched_features, batched_counts = batched_memory.state_next_action_features(samples)
+        self.assertEqual(counts.tolist(), batched_counts.tolist())
+        for begin, end in zip(np.cumsum(counts) - counts, np.cumsum(counts)):
+            self.assertEqual(sorted(map(tuple, features[begin:end].tolist())),
+                             sorted(map(tuple, batched_features[begin:end].tolist())))
+        for attribute in ('last_state_features', 'last_action_features', 'last_reward', 'sample_last_experience'):
+            self.assertEqual([np.asarray(value).tolist() for value in getattr(sequential_agent, attribute).values()],
+                             [np.asarray(value).tolist() for value in getattr(batched_agent, attribute).values()],
+                             attribute)
+        self.assertEqual(sequential_agent.iteration, batched_agent.iteration)
+        self.assertEqual(sequential_agent.rng.getstate(), batched_agent.rng.getstate())
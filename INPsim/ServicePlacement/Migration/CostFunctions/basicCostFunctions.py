@@ -15,10 +15,13 @@
 # along with flbrandh/MEC-Simulator-2-BigMEC.  If not, see <http://www.gnu.org/licenses/>.
 
 
-from INPsim.ServicePlacement.Migration.CostFunctions.costFunctionInterface import ServiceCostFunction
+from typing import List
+import numpy as np
+from INPsim.ServicePlacement.Migration.CostFunctions.costFunctionInterface import ServiceCostFunction, measured_latency_matrix
 from INPsim.ServicePlacement.Migration.Action import MigrationAction
 from INPsim.Network.network import CloudNetwork
 from INPsim.Network.Service.service import Service
+from INPsim.Network.Nodes.cloud import Cloud
 
 #
 #
@@ -66,6 +69,13 @@ class LatencyCostFunction(ServiceCostFunction):
             service: Service) -> float:
         return service.measured_latency(self._cloud_network)
 
+    def calculate_static_cost_matrix(
+            self,
+            cloud_network: CloudNetwork,
+            services: List[Service],
+            clouds: List[Cloud]) -> np.ndarray:
+        return measured_latency_matrix(self._cloud_network, services, clouds)
+
     # def get_name(self):
     #     return 'LatencyBasedCostFunction'
 
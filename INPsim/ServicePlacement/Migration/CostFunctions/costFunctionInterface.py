@@ -17,13 +17,15 @@
 
 from typing import Union
 import abc
-from typing import List
+from typing import List, Optional
+import numpy as np
 from .cost import Cost
 from INPsim.ServicePlacement.Migration.Action import Action, MigrationAction, NoMigrationAction
 from INPsim.Network.network import CloudNetwork
 from INPsim.Network.User.Manager import UserManager
 from INPsim.Network.Service.service import Service
 from INPsim.Network.Nodes.cloud import Cloud
+from INPsim.Network.User.user import User
 
 
 class GlobalCostFunction:
@@ -114,3 +116,45 @@ class ServiceCostFunction:
         """
         pass
 
+    def calculate_static_cost_matrix(self,
+                                     cloud_network: CloudNetwork,
+                                     services: List[Service],
+                                     clouds: List[Cloud]) -> Optional[np.ndarray]:
+        """
+        Override this method to calculate the static placement cost of many services at many clouds at once, as if each
+        service was placed at each cloud. The result must equal that of calculate_static_cost().
+        :param cloud_network: the cloud network within which the cost is calculated.
+        :param services: the services
+        :param clouds: the clouds
+        :return: float64 array of shape (len(services), len(clouds)), or None if the cost function doesn't support it
+        """
+        return None
+
+
+def measured_latency_matrix(cloud_network: CloudNetwork, services: List[Service], clouds: List[Cloud]) -> np.ndarray:
+    """
+    Computes the latency that each service would measure at each cloud (see Service.measured_latency()).
+    :param cloud_network: the cloud network
+    :param services: services whose owners are users
+    :param clouds: the clouds
+    :return: float64 array of shape (len(services), len(clouds))
+    """
+    base_stations = []
+    for service in services:
+        owner = service.owner()
+        if not isinstance(owner, User):
+            raise Exception('Cannot measure the Latency of a Service Owner that is not a User!')
+        base_stations.append(owner.get_base_station())
+    # the latencies are computed once per base station
+    unique_base_stations = list(dict.fromkeys(base_stations))
+    base_station_indices = dict((base_station, i) for i, base_station in enumerate(unique_base_stations))
+    cloud_node_ids = np.array([cloud_network.node_index(cloud.node()) for cloud in clouds], dtype=np.int64)
+    base_station_ids = np.array([cloud_network.node_index(base_station) for base_station in unique_base_stations],
+                                dtype=np.int64)
+    access_point_latencies = np.array([base_station.access_point_latency() for base_station in unique_base_stations],
+                                      dtype=np.float64)
+    distances = cloud_network.pair_dists(np.tile(cloud_node_ids, len(base_station_ids)),
+                                         np.repeat(base_station_ids, len(cloud_node_ids)))
+    latencies = distances.reshape(len(base_station_ids), len(cloud_node_ids)) + access_point_latencies[:, np.newaxis]
+    return latencies[np.array([base_station_indices[base_station] for base_station in base_stations], dtype=np.int64)
+                     .reshape(len(services))]
@@ -15,7 +15,9 @@
 # along with flbrandh/MEC-Simulator-2-BigMEC.  If not, see <http://www.gnu.org/licenses/>.
 
 
-from .costFunctionInterface import ServiceCostFunction
+from typing import List
+import numpy as np
+from .costFunctionInterface import ServiceCostFunction, measured_latency_matrix
 from INPsim.ServicePlacement.Migration.Action import MigrationAction
 from INPsim.Network.network import CloudNetwork
 from INPsim.Network.Service.service import Service
@@ -55,6 +57,14 @@ class PriorityBasedCostFunction(ServiceCostFunction):
             service: Service) -> float:
         return self._get_latency_cost(service, cloud_network)
 
+    def calculate_static_cost_matrix(
+            self,
+            cloud_network: CloudNetwork,
+            services: List[Service],
+            clouds: List[Cloud]) -> np.ndarray:
+        priorities = np.array([self._get_service_priority(service) for service in services], dtype=np.float64)
+        return self.latency_cost_factor * measured_latency_matrix(cloud_network, services, clouds) * priorities[:, np.newaxis]
+
 
 
 class SquaredLatencyPlusMigrationCost(ServiceCostFunction):
@@ -87,6 +97,14 @@ class SquaredLatencyPlusMigrationCost(ServiceCostFunction):
             service: Service) -> float:
         return self._get_latency_cost(service, cloud_network)
 
+    def calculate_static_cost_matrix(
+            self,
+            cloud_network: CloudNetwork,
+            services: List[Service],
+            clouds: List[Cloud]) -> np.ndarray:
+        latencies = self.latency_cost_factor * measured_latency_matrix(cloud_network, services, clouds)
+        return latencies * latencies
+
 
 class SLACostFunction(ServiceCostFunction):
     """
@@ -121,3 +139,13 @@ class SLACostFunction(ServiceCostFunction):
             cloud_network: CloudNetwork,
             service: Service) -> float:
         return self._get_latency_cost(service, cloud_network)
+
+    def calculate_static_cost_matrix(
+            self,
+            cloud_network: CloudNetwork,
+            services: List[Service],
+            clouds: List[Cloud]) -> np.ndarray:
+        priorities = np.array([self._get_service_priority(service) for service in services], dtype=np.float64)
+        latency_requirements = np.array([service.latency_requirement for service in services], dtype=np.float64)
+        fulfilled = measured_latency_matrix(cloud_network, services, clouds) <= latency_requirements[:, np.newaxis]
+        return np.where(fulfilled, 0.0, (self.latency_cost_factor * priorities * 10)[:, np.newaxis])
@@ -38,6 +38,13 @@ class PerServiceGlobalAverageCostFunction(GlobalCostFunction):
         """
         self._service_cost_function = service_cost_function
 
+    def get_service_cost_function(self) -> ServiceCostFunction:
+        """
+        Returns the per-service cost function that defines the global cost.
+        :return: the ServiceCostFunction
+        """
+        return self._service_cost_function
+
     def calculate_global_cost(self, cloud_network: CloudNetwork, user_manager: UserManager, actions: List[Action]) -> Cost:
         """
         Calculates the global cost of the transition_cost from one service placement_cost configuration to the next.
@@ -15,36 +15,55 @@
 # along with flbrandh/MEC-Simulator-2-BigMEC.  If not, see <http://www.gnu.org/licenses/>.
 
 
-from typing import Tuple, List, Dict, Any
+import logging
+from typing import Tuple, List, Dict, Any, Optional, Union
 from INPsim.Network.Nodes.cloud import LimitedMemoryCloud
 from INPsim.Network.Service.service import Service
 from INPsim.Network.network import CloudNetwork
-from INPsim.ServicePlacement.Migration.Learning.model import QModel
+from INPsim.ServicePlacement.Migration.Learning.model import QModel, NumpyQNetwork
+from INPsim.ServicePlacement.Migration.Learning.Features.configurable import ConfigurableFeatures
+from INPsim.ServicePlacement.Migration.Learning.DQNAgent.replayBuffer import ReplayBuffer
+from INPsim.ServicePlacement.Migration.Learning.DQNAgent.migrationPlans import (MigrationPlanEnumerator, MigrationPlans,
+                                                                               ResourceInspections)
 from INPsim.ServicePlacement.Migration.Action.migrationActionInterface import MigrationAction
 from INPsim.ServicePlacement.Migration.Action.noMigrationActionInterface import NoMigrationAction
+from INPsim.ServicePlacement.Migration.Algorithms.migrationAlgorithm import PendingMigrationDecision
 import math
 import numpy as np
 import time
 from INPsim.Utils.histogram import EquidistantHistogram, OutOfHistogramBoundsError
+from INPsim.Utils.checkpointState import (prefixed, unprefixed, attribute_state, restore_attribute_state,
+                                          python_random_state, restore_python_random_state)
+
+logger = logging.getLogger(__name__)
+
+
+class DQNMigrationDecision(PendingMigrationDecision):
+    """
+    A pending decision of a DQNAgent: the possible migration plans and their migration queries. The features and
+    Q-values of the migration queries are added when the decision is evaluated.
+    """
+
+    def __init__(self,
+                 service: Service,
+                 cloud: LimitedMemoryCloud,
+                 cloud_network: CloudNetwork,
+                 migration_plans: MigrationPlans,
+                 inspections: ResourceInspections,
+                 computation_time: float) -> None:
+        super(DQNMigrationDecision, self).__init__(service, inspections.capacity_checks, inspections.inspected_clouds,
+                                                   migration_plans.possible_moves())
+        self.cloud = cloud
+        self.cloud_network = cloud_network
+        self.migration_plans = migration_plans
+        self.migration_queries = migration_plans.migration_queries()
+        self.state_feature_vectors: Optional[List[List[float]]] = None
+        self.action_feature_vectors: Optional[Union[List[List[float]], np.ndarray]] = None
+        self.migration_query_qs: Optional[Dict[Tuple[Service, LimitedMemoryCloud], float]] = None
+        self.computation_time = computation_time  # time spent on the decision so far
 
 
 class DQNAgent:
-    class QSample:
-        """
-        Represents one sample of the q-function : (s,a,r,s',[a'])
-        """
-
-        def __init__(self,
-                     state_features,
-                     action_features,
-                     reward,
-                     next_state_features,
-                     possible_next_action_features):
-            self.state_features = state_features
-            self.action_features = action_features
-            self.reward = reward
-            self.next_state_features = next_state_features
-            self.possible_next_action_features = possible_next_action_features
 
     def __init__(self, hyperparameters, features, rng, verbose):
         self.hyperparameters = hyperparameters
@@ -61,7 +80,11 @@ class DQNAgent:
         self.last_action_features = {}  # None
         self.sample_last_experience = {}  # None
         self.last_reward = {}  # None
-        self.replay_memory = []
+        # samples of the q-function: (s,a,r,s',[a'])
+        self.replay_memory = ReplayBuffer(hyperparameters.max_replay_memory_size,
+                                          len(features.state_features()),
+                                          len(features.action_features()))
+        self.migration_plan_enumerator = MigrationPlanEnumerator()
         # statistics:
         self.total_episode_reward = 0
         self.avg_rewards = []
@@ -78,6 +101,7 @@ class DQNAgent:
         self.reward_standard_deviation = 0
 
         self.num_decisions = 0
+        self.num_nn_calls = 0
         self.num_decisions_service_at_cloud = 0
         self.num_decisions_service_at_edge = 0
         self.mean_computation_time = 0
@@ -98,6 +122,7 @@ class DQNAgent:
         self.decision_time_histogram_service_at_edge = EquidistantHistogram(histogram_length_ms, 0, histogram_length_ms * 0.001)
 
         self._init_models()
+        self._refresh_inference_network()
 
     def _init_models(self) -> None:
         self.Q_model = QModel(self.hyperparameters, self.features).Q_model
@@ -112,6 +137,8 @@ class DQNAgent:
         state = self.__dict__.copy()
         state['Q_model'] = state['Q_model'].get_weights()
         state['Q_target_model'] = state['Q_target_model'].get_weights()
+        del state['_inference_network']
+        state['migration_plan_enumerator'] = MigrationPlanEnumerator()  # the memoized options refer to the clouds
         return state
 
     def __setstate__(self, newstate):
@@ -130,6 +157,9 @@ class DQNAgent:
                 self.hyperparameters, self.features).Q_model
         newstate['Q_target_model'].set_weights(Q_target_model_weights)
         self.__dict__.update(newstate)
+        if 'migration_plan_enumerator' not in newstate:  # agents pickled before the enumerator existed
+            self.migration_plan_enumerator = MigrationPlanEnumerator()
+        self._refresh_inference_network()
 
     def get_model_parameters(self):
         return {"Q_model":        self.Q_model.get_weights(),
@@ -138,36 +168,101 @@ class DQNAgent:
     def set_model_parameters(self, models):
         self.Q_model.set_weights(models["Q_model"])
         self.Q_target_model.set_weights(models["Q_model"])
+        self._refresh_inference_network()
+
+    def get_checkpoint_state(self, services: List[Service]) -> Dict[str, Any]:
+        """
+        Returns the state of the agent as flat arrays (see INPsim.Utils.checkpointState): the weights of all models,
+        the replay memory, the random number generator, the statistics and the last experience of each service.
+        :param services: all services in their checkpoint order
+        :return: checkpoint state
+        """
+        state = prefixed(attribute_state(self, exclude=('verbose',), nested_types=(EquidistantHistogram,)),
+                         'attributes')
+        for model_name, weights in self.get_model_parameters().items():
+            state['models/' + model_name + '/num_weights'] = len(weights)
+            for i, weight in enumerate(weights):
+                state['models/' + model_name + '/' + str(i)] = weight
+        state.update(prefixed(self.replay_memory.get_checkpoint_state(), 'replay_memory'))
+        state.update(prefixed(python_random_state(self.rng), 'rng'))
+
+        # the last experience of each service, which becomes a sample when the service's next decision is made.
+        # Services that don't exist anymore are dropped.
+        experience_services = [(i, service) for i, service in enumerate(services)
+                               if self.last_state_features.get(service) is not None]
+        state['last_experience/services'] = np.array([i for i, _ in experience_services], dtype=np.int64)
+        state['last_experience/state_features'] = np.array(
+            [self.last_state_features[service] for _, service in experience_services],
+            dtype=np.float32).reshape(len(experience_services), len(self.features.state_features()))
+        state['last_experience/action_features'] = np.array(
+            [self.last_action_features[service] for _, service in experience_services],
+            dtype=np.float32).reshape(len(experience_services), len(self.features.action_features()))
+        state['last_experience/rewards'] = np.array(
+            [np.nan if self.last_reward[service] is None else self.last_reward[service]
+             for _, service in experience_services], dtype=np.float64)
+        state['last_experience/sample'] = np.array(
+            [bool(self.sample_last_experience[service]) for _, service in experience_services], dtype=bool)
+        service_indices = dict((service, i) for i, service in enumerate(services))
+        state['last_service'] = service_indices.get(self.last_service, -1)
+        return state
+
+    def set_checkpoint_state(self, state: Dict[str, Any], services: List[Service]) -> None:
+        """
+        Restores a state from get_checkpoint_state.
+        :param state: checkpoint state
+        :param services: all services in their checkpoint order
+        """
+        restore_attribute_state(self, unprefixed(state, 'attributes'), nested_types=(EquidistantHistogram,))
+        for model_name in self.get_model_parameters():
+            num_weights = state['models/' + model_name + '/num_weights']
+            getattr(self, model_name).set_weights([state['models/' + model_name + '/' + str(i)]
+                                                   for i in range(num_weights)])
+        self._refresh_inference_network()
+        self.replay_memory.set_checkpoint_state(unprefixed(state, 'replay_memory'))
+        restore_python_random_state(self.rng, unprefixed(state, 'rng'))
+
+        self.last_state_features = {}
+        self.last_action_features = {}
+        self.last_reward = {}
+        self.sample_last_experience = {}
+        for i, state_features, action_features, reward, sample in zip(
+                state['last_experience/services'].tolist(),
+                state['last_experience/state_features'].tolist(),
+                state['last_experience/action_features'].tolist(),
+                state['last_experience/rewards'].tolist(),
+                state['last_experience/sample'].tolist()):
+            service = services[i]
+            self.last_state_features[service] = state_features
+            self.last_action_features[service] = action_features
+            self.last_reward[service] = None if math.isnan(reward) else reward
+            self.sample_last_experience[service] = sample
+        self.last_service = services[state['last_service']] if state['last_service'] >= 0 else None
+        self.migration_plan_enumerator = MigrationPlanEnumerator()  # the memoized options refer to the clouds
 
     def get_prediction_model(self):
         return self.Q_model
 
+    def _refresh_inference_network(self):
+        """
+        Takes a snapshot of the prediction model's weights for the numpy inference backend.
+        Must be called whenever the weights of the prediction model change.
+        """
+        if getattr(self.hyperparameters, 'inference_backend', 'keras') == 'numpy':
+            self._inference_network = NumpyQNetwork(self.get_prediction_model())
+        else:
+            self._inference_network = None
+
     def _construct_training_inputs(self, minibatch_indices):
-        minibatch_size = len(minibatch_indices)
-        x = np.zeros((minibatch_size,
-                      len(self.features.state_features()) + len(
-                              self.features.action_features())))
-        for i, batch_sample in enumerate(minibatch_indices):
-            qsample = self.replay_memory[batch_sample]
-            x[i, :] = np.array(
-                    qsample.state_features + qsample.action_features)
-        return x
+        return self.replay_memory.state_action_features(minibatch_indices)
 
     def _construct_training_outputs(self, minibatch_indices):
-        minibatch_size = len(minibatch_indices)
-        y = np.zeros(minibatch_size)
-        for i, batch_sample in enumerate(minibatch_indices):
-            qsample = self.replay_memory[batch_sample]
-            state_features = qsample.state_features
-            nn_inputs = []
-            for action_features in qsample.possible_next_action_features:
-                nn_inputs.append(state_features + action_features)
-            # max_state_action_value = max(self.Q_target_model.predict(np.array(nn_inputs)))  # finding the value of the next action
-            max_state_action_value2 = max(self.Q_target_model(np.array(nn_inputs), training=False).numpy())
-            # assert max_state_action_value == max_state_action_value2
-            y[i] = qsample.reward + self.hyperparameters.discount_factor * \
-                   max_state_action_value  # bellman equation
-        return y
+        nn_inputs, num_possible_actions = self.replay_memory.state_next_action_features(minibatch_indices)
+        nn_outputs = self.Q_target_model(nn_inputs, training=False).numpy().reshape(-1)
+        # finding the value of the next action
+        max_state_action_values = np.maximum.reduceat(nn_outputs, np.cumsum(num_possible_actions) - num_possible_actions)
+        # bellman equation
+        return self.replay_memory.rewards(minibatch_indices) + \
+            self.hyperparameters.discount_factor * max_state_action_values
 
     def _train_minibatch(self, minibatch_indices):
         # construct x
@@ -185,8 +280,7 @@ class DQNAgent:
         if 0 == self.episode % self.hyperparameters.target_model_update_frequency:
             self.Q_target_model.set_weights(self.Q_model.get_weights())
             if self.verbose:
-                print('**** Updated the target model in iteration ' +
-                      str(self.iteration) + '. ****')
+                logger.info('**** Updated the target model in iteration %d. ****', self.iteration)
 
         return history
 
@@ -201,24 +295,19 @@ class DQNAgent:
                 self.hyperparameters.max_replay_memory_size * self.hyperparameters.batch_fraction_of_replay_memory))
         assert isinstance(minibatch_size, int)
         if self.verbose:
-            print('minibatch_size: ', minibatch_size,
-                  ' replay memory size:', len(self.replay_memory))
+            logger.info('minibatch_size: %d replay memory size: %d', minibatch_size, len(self.replay_memory))
         if minibatch_size > 10:  # it's not worth it below that
             minibatch_indices = self.rng.sample(
                     range(len(self.replay_memory)), minibatch_size)
 
             history = self._train_minibatch(minibatch_indices)
+            self._refresh_inference_network()
 
             self.losses.append(history.history['loss'][0])
 
             if self.verbose:
-                print(
-                        'iteration=',
-                        self.iteration,
-                        ', epsilon=',
-                        self.hyperparameters.epsilon,
-                        ', discount factor=',
-                        self.hyperparameters.discount_factor)
+                logger.info('iteration=%d, epsilon=%s, discount factor=%s', self.iteration,
+                            self.hyperparameters.epsilon, self.hyperparameters.discount_factor)
 
             self.episode += 1
 
@@ -236,100 +325,32 @@ class DQNAgent:
                             possible_migration_target, service, cloud_network))
         return state_feature_vector, migration_action_feature_vectors
 
-    def gather_possible_migration_plans(self,
-                                        service: Service,
-                                        cloud: LimitedMemoryCloud,
-                                        max_recursion_depth: int) -> List[List[Tuple[Service, LimitedMemoryCloud]]]:
-        # get immediate neighborhood
-        possible_migration_targets = cloud.get_migration_algorithm_instance(
-                ).get_neighboring_clouds(service).copy()
-        # add the current cloud to the neighborhood if it's not included already (to facilitate non-migration)
-        if not cloud in possible_migration_targets:
-            possible_migration_targets = possible_migration_targets + [cloud]
-        assert len(possible_migration_targets) <= self.hyperparameters.max_num_neighbor_clouds + 1
-
-        possible_migration_plans = []
-        for target in possible_migration_targets:
-            if target != cloud:  # cannot displace from the current cloud
-                if max_recursion_depth > 0 or target.total_memory_requirement() + service.get_memory_requirement() <= target.memory_capacity():  # resource check in case there is no further recursion
-                    possible_migration_plans.append((service, target, self.gather_possible_migration_plans_by_freeing_space_rec(service, target, max_recursion_depth)))
-        possible_migration_plans.append((service, cloud, []))  # one plan is always to just stay
-
-        # flatten the migration plan tree
-        possible_migration_plans_flat = []
-
-        def flatten_possible_migration_plans(possible_subplans, flat_plan_so_far=[]):
-            for service, target, following_subplans in possible_subplans:
-                if following_subplans == []:
-                    possible_migration_plans_flat.append(flat_plan_so_far + [(service, target)])
-                else:
-                    flatten_possible_migration_plans(following_subplans, flat_plan_so_far + [(service, target)])
-
-        flatten_possible_migration_plans(possible_migration_plans)
-
-        return possible_migration_plans_flat
-
-    def gather_possible_migration_plans_by_freeing_space_rec(self,
-                                                             incoming_service,
-                                                             cloud,
-                                                             max_recursion_depth,
-                                                             recursion_depth=0):
-        # don't add any cloudlets if the maximum depth is reached.
-        if recursion_depth == max_recursion_depth:
-            return []
-        assert recursion_depth <= max_recursion_depth
-
-        # if there is enough space, no further migrations necessary. #TODO what if we still considered that case and leave not propagating as an option?
-        if cloud.total_memory_requirement() + incoming_service.get_memory_requirement() <= cloud.memory_capacity():
-            return []  # no displacement necessary
-
-        possible_migration_plans = []
-        for service in cloud.services():
-            current_service_cloud = service.get_cloud()
-            possible_migration_targets = cloud.get_migration_algorithm_instance().get_neighboring_clouds(service).copy()
-            for target in possible_migration_targets:
-                if (target is not current_service_cloud and  # not possible to displace from the current cloud
-                        (recursion_depth + 1 < max_recursion_depth or
-                         target.total_memory_requirement() + service.get_memory_requirement() <= target.memory_capacity())):  # TODO put the resource-checks here
-                    possible_migration_plans.append((service,
-                                                     target,
-                                                     self.gather_possible_migration_plans_by_freeing_space_rec(service,
-                                                                                                               target,
-                                                                                                               max_recursion_depth,
-                                                                                                               recursion_depth + 1)))
-                else:
-                    pass  # If not a viable migration target, don't add it to the possible plans
-        return possible_migration_plans
-
-    def gather_migration_queries(self, possible_migration_plans):
-        migration_queries = set()
-        for plan in possible_migration_plans:
-            for (service, target) in plan:
-                service_current_cloud = service.get_cloud()
-                migration_queries.add((service, service_current_cloud))
-                migration_queries.add((service, target))
-        return list(migration_queries)
-
     def generate_migration_query_features(self, migration_queries: List[Tuple[Service, LimitedMemoryCloud]],
-                                          cloud_network: CloudNetwork) -> Tuple[List[List[float]], List[List[float]]]:
+                                          cloud_network: CloudNetwork
+                                          ) -> Tuple[List[List[float]], Union[List[List[float]], np.ndarray]]:
         """
         Generates the features for migration queries.
         :param migration_queries: the migration queries (a list of service -> cloud pairs)
         :param cloud_network: the network within the services operate
-        :return: a list of feature vectors for the state-features and a list of action-feature vectors for each migration query
+        :return: a list of feature vectors for the state-features and the action-feature vectors for each migration query
+                 (an array with one row per query if the features support batch computation)
         """
-        state_feature_vectors: List[List[float]] = []
+        state_feature_vectors: List[List[float]] = [self.features.state_features(service.get_cloud())
+                                                    for (service, target) in migration_queries]
+        if isinstance(self.features, ConfigurableFeatures):
+            return state_feature_vectors, self.features.batch_action_features(
+                    [service for (service, target) in migration_queries],
+                    [target for (service, target) in migration_queries],
+                    cloud_network)
         action_feature_vectors: List[List[float]] = []
         for (service, target) in migration_queries:
-            service_cloud = service.get_cloud()
-            state_feature_vectors.append(self.features.state_features(service_cloud))
             action_feature_vectors.append(self.features.action_features(target, service, cloud_network))
         return state_feature_vectors, action_feature_vectors
 
     def process_migration_queries(self,
                                   migration_queries: List[Tuple[Service, LimitedMemoryCloud]],
                                   state_feature_vectors: List[List[float]],
-                                  action_feature_vectors: List[List[float]]) -> Dict[Tuple[Service, LimitedMemoryCloud], Any]:
+                                  action_feature_vectors: Union[List[List[float]], np.ndarray]) -> Dict[Tuple[Service, LimitedMemoryCloud], Any]:
         """
         Processes migration queries, predicting the Q-values from the input features using the NN.
         :param migration_queries: list of migration queries (pairs of service -> dst-cloud)
@@ -337,11 +358,30 @@ class DQNAgent:
         :param action_feature_vectors: list of corresponding action feature vectors
         :return: a dictionary that assigns the Q-value to each migration query
         """
-        nn_inputs = [sfv + afv for sfv, afv in zip(state_feature_vectors, action_feature_vectors)]
-        outputs = self.get_prediction_model()(np.array(nn_inputs), training=False).numpy()
+        outputs = self._predict(self._nn_inputs(state_feature_vectors, action_feature_vectors))
         #outputs = [self.get_prediction_model()(np.array([nn_input]), training=False).numpy() for nn_input in nn_inputs]
         return dict([(k, o.item()) for k, o in zip(migration_queries, outputs)])
 
+    @staticmethod
+    def _nn_inputs(state_feature_vectors, action_feature_vectors) -> np.ndarray:
+        """
+        Concatenates state and action feature vectors to the NN's inputs.
+        :return: float32 array with one row per pair of feature vectors
+        """
+        return np.concatenate([np.array(state_feature_vectors, dtype=np.float32).reshape(len(action_feature_vectors), -1),
+                               np.array(action_feature_vectors, dtype=np.float32).reshape(len(action_feature_vectors), -1)],
+                              axis=1)
+
+    def _predict(self, nn_inputs: np.ndarray) -> np.ndarray:
+        """
+        Predicts the Q-values of a batch of NN inputs with the prediction model.
+        """
+        self.num_nn_calls += 1
+        if self._inference_network is not None:
+            return self._inference_network(nn_inputs)
+        else:
+            return self.get_prediction_model()(np.array(nn_inputs), training=False).numpy()
+
     # def process_migration_queries_no_nn(self,
     #                               migration_queries: List[Tuple[Service, LimitedMemoryCloud]],
     #                               state_feature_vectors: List[List[float]],
@@ -351,65 +391,45 @@ class DQNAgent:
     #         cost =
 
 
-    def compute_global_advantages(self, possible_migration_plans, migration_query_Qs):
-        global_advantages = []
-
-        service = possible_migration_plans[0][0][0]
-        stay_baseline = migration_query_Qs[(service, service.get_cloud())]
-
-        for migration_plan in possible_migration_plans:
-            global_advantage = 0
-
-            for (service, target) in migration_plan:
-                service_cloud = service.get_cloud()
-                if len(migration_plan) > 1:
-                    a = migration_query_Qs[(service, target)]
-                    b = migration_query_Qs[(service, service_cloud)]
-                global_advantage += migration_query_Qs[(service, target)] - migration_query_Qs[(service, service_cloud)]
-            global_advantages.append(global_advantage + stay_baseline)
-        return global_advantages
-
     def epsilon_greedy_policy(self,
-                              possible_migration_plans,
-                              global_advantages,
+                              migration_plans: MigrationPlans,
+                              migration_query_qs: Dict[Tuple[Service, LimitedMemoryCloud], float],
                               epsilon,
                               exp_boost,
-                              iteration):
-
+                              iteration) -> List[Tuple[Service, LimitedMemoryCloud]]:
+        """
+        Chooses a migration plan. The global advantage of a plan is the Q-value of the service staying at its cloud plus
+        the advantages (Q-value differences) of the plan's moves. Instead of computing it for every plan, a branch and
+        bound search only computes it for the plans that can be maximal.
+        :param migration_plans: the possible migration plans
+        :param migration_query_qs: the Q-values of the migration queries
+        :return: the chosen plan
+        """
         if exp_boost != 0:
             epsilon += (1 - epsilon) * math.exp(-iteration / exp_boost)
 
+        stay_baseline = migration_query_qs[(migration_plans.service, migration_plans.cloud)]
+        move_advantages = migration_plans.move_advantages(migration_query_qs)
         if self.rng.random() < epsilon:
-            # choose random action:
-            best_plan_per_action = {}  # action : (global_advantage, plan)
-            for plan, global_advantage in zip(possible_migration_plans, global_advantages):
-                first_action = plan[0]
-                if first_action not in best_plan_per_action or best_plan_per_action[first_action][0] < global_advantage:
-                    best_plan_per_action[first_action] = (global_advantage, plan)
-            _, chosen_plan = self.rng.choice(list(best_plan_per_action.values()))
+            # choose random action, followed by the best plan that starts with it:
+            first_edge = self.rng.choice(migration_plans.root_edges())
+            chosen_plan_edges, best_global_advantage = None, -math.inf
+            for plan_edges, advantage in migration_plans.near_optimal_plans(move_advantages, [first_edge]):
+                if chosen_plan_edges is None or best_global_advantage < advantage + stay_baseline:
+                    chosen_plan_edges, best_global_advantage = plan_edges, advantage + stay_baseline
         else:
-            ga_array = np.array(global_advantages)
+            candidates = migration_plans.near_optimal_plans(move_advantages)
+            ga_array = np.array([advantage + stay_baseline for _, advantage in candidates])
             indices_of_maxima = (ga_array == ga_array.max()).nonzero()[0]
             # tie breaker 1: choose the plan that involves doing nothing if it's a maximum
             for i in indices_of_maxima:
-                migration_plan = possible_migration_plans[i]
-                if len(migration_plan):
-                    service, target_cloud = migration_plan[0]
-                    if service.get_cloud() is target_cloud:
-                        return migration_plan
+                if candidates[i][0][0] == migration_plans.stay_edge():
+                    return migration_plans.plan(candidates[i][0])
             # tie breaker 2: choose a random shortest plan
-            min_length_of_maxima = math.inf
-            for i in indices_of_maxima:
-                if len(possible_migration_plans[i]) < min_length_of_maxima:
-                    min_length_of_maxima = len(possible_migration_plans[i])
-            indices_of_min_length_maxima = []
-            for i in indices_of_maxima:
-                if len(possible_migration_plans[i]) == min_length_of_maxima:
-                    indices_of_min_length_maxima.append(i)
-            chosen_plan_index = self.rng.choice(indices_of_min_length_maxima)
-            chosen_plan = possible_migration_plans[chosen_plan_index]
-            #chosen_plan = possible_migration_plans[np.argmax(global_advantages)]
-        return chosen_plan
+            min_length_of_maxima = min(len(candidates[i][0]) for i in indices_of_maxima)
+            indices_of_min_length_maxima = [i for i in indices_of_maxima if len(candidates[i][0]) == min_length_of_maxima]
+            chosen_plan_edges = candidates[self.rng.choice(indices_of_min_length_maxima)][0]
+        return migration_plans.plan(chosen_plan_edges)
 
     def compute_communication_time(self, cloud_network, service, displacing):
         """
@@ -458,6 +478,80 @@ class DQNAgent:
         :param cloud_neighborhood: the neighborhood of the cloud
         :return: a list of migration actions, with the first one being the action of the service in question. If no action was taken, there is one NoMigrationAction in the list.
         """
+        decision = self.prepare_migration_decision(service, cloud, cloud_network)
+        self.evaluate_migration_decisions([decision])
+        return self.finish_migration_decision(decision)
+
+    def prepare_migration_decision(self, service, cloud, cloud_network) -> DQNMigrationDecision:
+        """
+        Gathers the possible migration plans of a service and their migration queries.
+        :param service: the service at the cloud that this function was invoked for
+        :param cloud: the cloud that this function was invoked for
+        :param cloud_network: the network
+        :return: the pending decision
+        """
+        start_time = time.process_time()
+        inspections = ResourceInspections()
+        migration_plans = self.migration_plan_enumerator.gather_migration_plans(
+                service, cloud, self.hyperparameters.recursion_depth, inspections)
+        assert len(migration_plans.root_edges()) <= self.hyperparameters.max_num_neighbor_clouds + 1
+        return DQNMigrationDecision(service, cloud, cloud_network, migration_plans, inspections,
+                                    time.process_time() - start_time)
+
+    def begin_placement_update(self) -> None:
+        """
+        Forgets the memoized displacement options, since the neighborhoods of the services may have changed.
+        """
+        self.migration_plan_enumerator.clear()
+
+    def evaluate_migration_decisions(self, decisions: List[DQNMigrationDecision]) -> None:
+        """
+        Generates the features of the migration queries of pending decisions and predicts their Q-values, each in a
+        single pass. The decisions are independent of each other, so the results equal those of separate passes.
+        :param decisions: pending decisions
+        """
+        start_time = time.process_time()
+        migration_queries = [query for decision in decisions for query in decision.migration_queries]
+        state_feature_vectors, action_feature_vectors = self.generate_migration_query_features(
+                migration_queries, decisions[0].cloud_network)
+        outputs = self._predict(self._nn_inputs(state_feature_vectors, action_feature_vectors)).reshape(-1)
+        offset = 0
+        for decision in decisions:
+            num_queries = len(decision.migration_queries)
+            decision.state_feature_vectors = state_feature_vectors[offset:offset + num_queries]
+            decision.action_feature_vectors = action_feature_vectors[offset:offset + num_queries]
+            decision.migration_query_qs = dict(zip(decision.migration_queries,
+                                                   outputs[offset:offset + num_queries].tolist()))
+            offset += num_queries
+        # the evaluation time is shared equally between the decisions
+        evaluation_time = time.process_time() - start_time
+        for decision in decisions:
+            decision.computation_time += evaluation_time / len(decisions)
+
+    def num_decisions_until_training(self) -> float:
+        """
+        :return: the number of decisions until (and including) the next decision that trains the network
+        """
+        if not self.hyperparameters.do_training:
+            return math.inf
+        return (-self.iteration) % self.hyperparameters.episode_length + 1
+
+    def finish_migration_decision(self, decision: DQNMigrationDecision):
+        """
+        Chooses a migration plan for an evaluated pending decision, records the experience and trains the network if the
+        episode length has passed.
+        :param decision: the pending decision
+        :return: a list of migration actions, with the first one being the action of the service in question. If no action was taken, there is one NoMigrationAction in the list.
+        """
+        assert decision.migration_query_qs is not None
+        service = decision.service
+        cloud = decision.cloud
+        cloud_network = decision.cloud_network
+        migration_plans = decision.migration_plans
+        migration_queries = decision.migration_queries
+        action_feature_vectors = decision.action_feature_vectors
+        migration_query_qs = decision.migration_query_qs
+
         # initialize cache if necessary
         if service not in self.last_state_features:
             self.last_state_features[service] = None
@@ -466,16 +560,8 @@ class DQNAgent:
             self.sample_last_experience[service] = False
 
         start_time = time.process_time()
-        possible_migration_plans: List[List[Tuple[Service, LimitedMemoryCloud]]] = self.gather_possible_migration_plans(service, cloud, self.hyperparameters.recursion_depth)
-        migration_queries: List[Tuple[Service, LimitedMemoryCloud]] = self.gather_migration_queries(possible_migration_plans)
-        state_feature_vectors: List[List[float]]
-        action_feature_vectors: List[List[float]]
-        state_feature_vectors, action_feature_vectors = self.generate_migration_query_features(migration_queries, cloud_network)
-        migration_query_qs = self.process_migration_queries(migration_queries, state_feature_vectors, action_feature_vectors)
-        global_advantages = self.compute_global_advantages(possible_migration_plans, migration_query_qs)
         #(reward + 500) / 300
         #print("qs: ", [v*300 -500 for v in migration_query_qs.values()])
-        #print("global_advantages: ", global_advantages)
         sample_this_experience = self.rng.random() <= self.hyperparameters.replay_buffer_sampling_rate
         if sample_this_experience:
             epsilon = self.hyperparameters.epsilon
@@ -483,15 +569,15 @@ class DQNAgent:
             epsilon = 0
         #epsilon = self.hyperparameters.epsilon
 
-        chosen_plan = self.epsilon_greedy_policy(possible_migration_plans,
-                                                 global_advantages,
+        chosen_plan = self.epsilon_greedy_policy(migration_plans,
+                                                 migration_query_qs,
                                                  epsilon,
                                                  self.hyperparameters.initial_exploration_boost,
                                                  self.iteration)
 
         # compute decision's computation, communication (distributed computation), and decision times
         end_time = time.process_time()
-        computation_time = end_time - start_time
+        computation_time = decision.computation_time + end_time - start_time
         self.num_decisions += 1
         communciation_time = self.compute_communication_time(cloud_network, service, self.hyperparameters.recursion_depth > 0)
 
@@ -543,15 +629,11 @@ class DQNAgent:
             assert self.last_reward[service] is not None
             #if self.rng.random() <= self.hyperparameters.replay_buffer_sampling_rate:
             if self.sample_last_experience[service]:
-                qsample = DQNAgent.QSample(
-                        self.last_state_features[service],
-                        self.last_action_features[service],
-                        self.last_reward[service],
-                        state_feature_vector,
-                        migration_action_feature_vectors)
-                self.replay_memory.append(qsample)
-                if len(self.replay_memory) > self.hyperparameters.max_replay_memory_size:
-                    self.replay_memory.pop(0)
+                self.replay_memory.append(self.last_state_features[service],
+                                          self.last_action_features[service],
+                                          self.last_reward[service],
+                                          state_feature_vector,
+                                          migration_action_feature_vectors)
         # buffer the features of the current state and the chosen action
         self.last_state_features[service] = state_feature_vector
         self.last_action_features[service] = selected_migration_action_features
@@ -606,10 +688,7 @@ class DQNAgent:
         if self.hyperparameters.episode_length - \
                 1 == self.iteration % self.hyperparameters.episode_length:
             if self.verbose:
-                print(
-                        'avg reward: ',
-                        self.total_episode_reward /
-                        self.hyperparameters.episode_length)
+                logger.info('avg reward: %s', self.total_episode_reward / self.hyperparameters.episode_length)
             # track statistics
             self.avg_rewards.append(
                     self.total_episode_reward /
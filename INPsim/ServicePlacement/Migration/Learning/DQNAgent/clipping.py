@@ -15,9 +15,13 @@
 # along with flbrandh/MEC-Simulator-2-BigMEC.  If not, see <http://www.gnu.org/licenses/>.
 
 
+import logging
 from INPsim.ServicePlacement.Migration.Learning.DQNAgent.agent import DQNAgent
 from INPsim.ServicePlacement.Migration.Learning.model import QModel
 import numpy as np
+import tensorflow.keras as K
+
+logger = logging.getLogger(__name__)
 
 
 class ClippingDDQNAgent(DQNAgent):
@@ -29,6 +33,15 @@ class ClippingDDQNAgent(DQNAgent):
         self.Q_b = QModel(self.hyperparameters, self.features).Q_model
         self.Q_b_target = QModel(self.hyperparameters, self.features).Q_model
         self.Q_b_target.set_weights(self.Q_b.get_weights())
+        self._init_target_pair_model()
+
+    def _init_target_pair_model(self):
+        """
+        Builds a model that evaluates both target models in one call. It shares its weights with the target models.
+        """
+        inputs = K.Input(shape=self.Q_a_target.input_shape[1:])
+        outputs = K.layers.Concatenate()([self.Q_a_target(inputs), self.Q_b_target(inputs)])
+        self.Q_target_pair = K.Model(inputs=inputs, outputs=outputs)
 
     def __getstate__(self):
         """
@@ -40,6 +53,8 @@ class ClippingDDQNAgent(DQNAgent):
         state['Q_a_target'] = state['Q_a_target'].get_weights()
         state['Q_b'] = state['Q_b'].get_weights()
         state['Q_b_target'] = state['Q_b_target'].get_weights()
+        del state['Q_target_pair']
+        del state['_inference_network']
         return state
 
     def __setstate__(self, newstate):
@@ -55,6 +70,8 @@ class ClippingDDQNAgent(DQNAgent):
                 self.hyperparameters, self.features).Q_model
             newstate[model].set_weights(params)
         self.__dict__.update(newstate)
+        self._init_target_pair_model()
+        self._refresh_inference_network()
 
     def get_prediction_model(self):
         return self.Q_a
@@ -70,48 +87,29 @@ class ClippingDDQNAgent(DQNAgent):
         self.Q_a_target.set_weights(models["Q_a_target"])
         self.Q_b.set_weights(models["Q_b"])
         self.Q_b_target.set_weights(models["Q_b_target"])
+        self._refresh_inference_network()
 
 
     def _construct_training_outputs(self, minibatch_indices):
-        minibatch_size = len(minibatch_indices)
-        y = np.zeros(minibatch_size)
-
-        nn_inputs = []
-        for i, batch_sample in enumerate(minibatch_indices):
-            qsample = self.replay_memory[batch_sample]
-            state_features = qsample.state_features
-            for action_features in qsample.possible_next_action_features:
-                nn_inputs.append(state_features + action_features)
-
-        nn_inputs = np.array(nn_inputs)
-        nn_outputs_a = self.Q_a_target.predict(nn_inputs)
-        nn_outputs_b = self.Q_b_target.predict(nn_inputs)
-
-        print(
-            'mean a:',
-            np.mean(nn_outputs_a),
-            'var a:',
-            np.var(nn_outputs_a),
-            'mean b:',
-            np.mean(nn_outputs_b),
-            'var b:',
-            np.var(nn_outputs_b))
-        r = []
-
-
-        last_index = 0
-        for i, batch_sample in enumerate(minibatch_indices):
-            qsample = self.replay_memory[batch_sample]
-            normalized_reward = self.normalize_reward(qsample.reward)
-            num_possible_actions = len(qsample.possible_next_action_features)
-            max_state_action_value = min(max(nn_outputs_a[last_index:last_index + num_possible_actions]),
-                                         max(nn_outputs_b[last_index:last_index + num_possible_actions]))  # finding the value of the next action
-            #print('max_a:',max(nn_outputs_a[last_index:last_index + num_possible_actions]), ' max_b:', max(nn_outputs_b[last_index:last_index + num_possible_actions]), ' min_a:',min(nn_outputs_a[last_index:last_index + num_possible_actions]), ' min_b:', min(nn_outputs_b[last_index:last_index + num_possible_actions]), ' minmax:', max_state_action_value)
-            r.append(normalized_reward)
-            y[i] = normalized_reward + self.hyperparameters.discount_factor * max_state_action_value  # bellman equation
-            last_index += num_possible_actions
-        print('mean_norm_rew.: ', np.mean(r), ' mean_discount_part:', np.mean(y)-np.mean(r))
-        self.predicted_Qs.append(np.mean(y)-np.mean(r))
+        nn_inputs, num_possible_next_actions = self.replay_memory.state_next_action_features(minibatch_indices)
+        assert num_possible_next_actions.min() > 0
+        nn_outputs = self.Q_target_pair(nn_inputs, training=False).numpy()
+        nn_outputs_a = nn_outputs[:, 0]
+        nn_outputs_b = nn_outputs[:, 1]
+
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('mean a: %s var a: %s mean b: %s var b: %s', np.mean(nn_outputs_a), np.var(nn_outputs_a),
+                         np.mean(nn_outputs_b), np.var(nn_outputs_b))
+
+        # finding the value of the next action: the minimum of both target models' maxima over the possible actions
+        first_action_indices = np.cumsum(num_possible_next_actions) - num_possible_next_actions
+        max_state_action_values = np.minimum(np.maximum.reduceat(nn_outputs_a, first_action_indices),
+                                             np.maximum.reduceat(nn_outputs_b, first_action_indices))
+        r = self.normalize_reward(self.replay_memory.rewards(minibatch_indices))
+        y = r + self.hyperparameters.discount_factor * max_state_action_values  # bellman equation
+        mean_discount_part = np.mean(y) - np.mean(r)
+        logger.debug('mean_norm_rew.: %s mean_discount_part: %s', np.mean(r), mean_discount_part)
+        self.predicted_Qs.append(mean_discount_part)
         return y
 
     def _train_minibatch(self, minibatch_indices):
@@ -121,7 +119,8 @@ class ClippingDDQNAgent(DQNAgent):
 
         #self.predicted_Qs.append(np.mean(y))
 
-        print('mean y:', np.mean(y), 'var y:', np.var(y))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('mean y: %s var y: %s', np.mean(y), np.var(y))
 
         # train
         history = self.Q_b.fit(
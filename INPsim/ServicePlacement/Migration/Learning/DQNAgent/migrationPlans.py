@@ -0,0 +1,368 @@
+# Copyright (C) 2020 Florian Brandherm
+# This file is part of flbrandh/MEC-Simulator-2-BigMEC <https://github.com/flbrandh/MEC-Simulator-2-BigMEC>.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with flbrandh/MEC-Simulator-2-BigMEC.  If not, see <http://www.gnu.org/licenses/>.
+
+
+
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple
+from INPsim.Network.Nodes.cloud import LimitedMemoryCloud
+from INPsim.Network.Service.service import Service
+import numpy as np
+
+Move = Tuple[Service, LimitedMemoryCloud]
+
+
+class ResourceInspections:
+    """
+    Records which resources of which clouds the gathering of migration plans depends on.
+    """
+
+    def __init__(self) -> None:
+        self.capacity_checks: Dict[LimitedMemoryCloud, Tuple[float, float]] = {}
+        self.inspected_clouds: Set[LimitedMemoryCloud] = set()
+
+    def check_capacity(self, cloud: LimitedMemoryCloud, memory: float) -> bool:
+        """
+        :param memory: the memory requirement of an incoming service
+        :return: True, if the cloud has enough free memory for the incoming service
+        """
+        min_memory, max_memory = self.capacity_checks.get(cloud, (memory, memory))
+        self.capacity_checks[cloud] = (min(min_memory, memory), max(max_memory, memory))
+        return cloud.total_memory_requirement() + memory <= cloud.memory_capacity()
+
+    def inspect_services(self, cloud: LimitedMemoryCloud) -> List[Service]:
+        """
+        :return: the services of the cloud
+        """
+        self.inspected_clouds.add(cloud)
+        return cloud.services()
+
+    def include(self, other: 'ResourceInspections') -> None:
+        """
+        Adds the inspections of another object to this one.
+        """
+        for cloud, (other_min_memory, other_max_memory) in other.capacity_checks.items():
+            min_memory, max_memory = self.capacity_checks.get(cloud, (other_min_memory, other_max_memory))
+            self.capacity_checks[cloud] = (min(min_memory, other_min_memory), max(max_memory, other_max_memory))
+        self.inspected_clouds.update(other.inspected_clouds)
+
+    def clouds(self) -> Set[LimitedMemoryCloud]:
+        """
+        :return: all clouds whose resources were inspected
+        """
+        return self.inspected_clouds.union(self.capacity_checks)
+
+
+class DisplacementOptions:
+    """
+    The ways to make room for an incoming service at a cloud, displacing at most a given number of services in a chain.
+    Either the cloud has enough free memory (fits), or each edge (service, target, options) displaces one of the cloud's
+    services to a target cloud, which in turn has the options to make room for it. A cloud without any of these options
+    is infeasible. The options of each cloud are gathered for its current memory, so a chain that visits a cloud twice
+    may not be executable.
+    """
+
+    def __init__(self,
+                 fits: bool,
+                 edges: List[Tuple[Service, LimitedMemoryCloud, 'DisplacementOptions']],
+                 inspections: ResourceInspections) -> None:
+        self.fits = fits
+        self.edges = edges
+        self.inspections = inspections
+        self._cloud_versions = [(cloud, cloud.version()) for cloud in inspections.clouds()]
+
+    def is_feasible(self) -> bool:
+        return self.fits or len(self.edges) > 0
+
+    def is_up_to_date(self) -> bool:
+        """
+        :return: True, if the services of none of the inspected clouds changed since the options were gathered
+        """
+        return all(cloud.version() == version for cloud, version in self._cloud_versions)
+
+
+class MigrationPlanEnumerator:
+    """
+    Gathers the possible migration plans of services that may displace other services to make room for them.
+    The displacement options of a cloud only depend on the cloud, the memory that is needed and the remaining depth of
+    the displacement chain. They are memoized, so that the sub-plans that the decisions of one placement update share
+    are only gathered once. Memoized options are reused as long as none of the clouds that they inspected changed.
+    The memo must be cleared when the neighborhoods of the services may have changed, i.e. before each placement
+    update.
+    """
+
+    def __init__(self) -> None:
+        self._memo: Dict[Tuple[LimitedMemoryCloud, float, int], DisplacementOptions] = {}
+
+    def clear(self) -> None:
+        self._memo.clear()
+
+    def gather_migration_plans(self,
+                               service: Service,
+                               cloud: LimitedMemoryCloud,
+                               max_recursion_depth: int,
+                               inspections: ResourceInspections) -> 'MigrationPlans':
+        """
+        :param service: the service to be migrated
+        :param cloud: the current cloud of the service
+        :param max_recursion_depth: the maximum number of displaced services in a chain
+        :param inspections: records the resources of the clouds that the plans depend on
+        :return: the possible migration plans
+        """
+        # get immediate neighborhood
+        possible_migration_targets = cloud.get_migration_algorithm_instance().get_neighboring_clouds(service)
+        root_edges = []
+        for target in possible_migration_targets:
+            if target is not cloud:  # staying at the current cloud is added as the last plan
+                options = self._target_options(target, service.get_memory_requirement(), max_recursion_depth,
+                                               inspections)
+                if options is not None:
+                    root_edges.append((service, target, options))
+        return MigrationPlans(service, cloud, root_edges)
+
+    def _target_options(self,
+                        cloud: LimitedMemoryCloud,
+                        memory: float,
+                        remaining_depth: int,
+                        inspections: ResourceInspections) -> Optional[DisplacementOptions]:
+        """
+        :param cloud: the target cloud of an incoming service
+        :param memory: the memory requirement of the incoming service
+        :param remaining_depth: the maximum number of services that may be displaced in a chain
+        :param inspections: records the resources of the clouds that the options depend on
+        :return: the displacement options at the cloud, or None if the cloud can't make room
+        """
+        if inspections.check_capacity(cloud, memory):
+            return _FITS
+        if remaining_depth == 0:
+            return None
+        options = self._displacement_options(cloud, memory, remaining_depth)
+        inspections.include(options.inspections)
+        return options if options.is_feasible() else None
+
+    def _displacement_options(self,
+                              cloud: LimitedMemoryCloud,
+                              memory: float,
+                              remaining_depth: int) -> DisplacementOptions:
+        """
+        Gathers (or looks up) the options to make room at a cloud that doesn't have enough free memory.
+        :param cloud: the cloud that should make room
+        :param memory: the memory requirement of the incoming service
+        :param remaining_depth: the maximum number of services that may be displaced in a chain (at least 1)
+        :return: the displacement options
+        """
+        key = (cloud, memory, remaining_depth)
+        options = self._memo.get(key)
+        if options is not None and options.is_up_to_date():
+            return options
+
+        inspections = ResourceInspections()
+        inspections.check_capacity(cloud, memory)
+        edges = []
+        options_per_target: Dict[Tuple[LimitedMemoryCloud, float], Optional[DisplacementOptions]] = {}
+        for service in inspections.inspect_services(cloud):
+            service_memory = service.get_memory_requirement()
+            # the same comparison as when the services are actually moved
+            if cloud.total_memory_requirement() - service_memory + memory > cloud.memory_capacity():
+                continue  # displacing this service doesn't free enough memory
+            for target in cloud.get_migration_algorithm_instance().get_neighboring_clouds(service):
+                if target is not cloud:  # not possible to displace to the current cloud
+                    if (target, service_memory) not in options_per_target:
+                        options_per_target[(target, service_memory)] = self._target_options(
+                                target, service_memory, remaining_depth - 1, inspections)
+                    target_options = options_per_target[(target, service_memory)]
+                    if target_options is not None:
+                        edges.append((service, target, target_options))
+        options = DisplacementOptions(False, edges, inspections)
+        self._memo[key] = options
+        return options
+
+
+_FITS = DisplacementOptions(True, [], ResourceInspections())  # the options of a cloud with enough free memory
+
+
+class MigrationPlans:
+    """
+    The possible migration plans of a service, stored compactly as a directed acyclic graph whose edges are moves
+    (service, target cloud). Every path from the root node to the end of an edge without a following node is a plan.
+    Displacement options that several plans share are stored only once.
+    The graph is stored in index arrays: the edges of node i are node_edge_offsets[i] to node_edge_offsets[i+1]-1,
+    edge e performs moves[edge_moves[e]] and is followed by node edge_nodes[e], or ends the plan if that is -1.
+    Nodes are numbered such that the nodes following the edges of a node have smaller indices; the root is the last
+    node. Its last edge is the plan of staying at the current cloud.
+    """
+
+    def __init__(self,
+                 service: Service,
+                 cloud: LimitedMemoryCloud,
+                 root_edges: List[Tuple[Service, LimitedMemoryCloud, DisplacementOptions]]) -> None:
+        """
+        :param service: the service to be migrated
+        :param cloud: the current cloud of the service
+        :param root_edges: the feasible migrations of the service and the displacement options at their targets
+        """
+        self.service = service
+        self.cloud = cloud
+        self.moves: List[Move] = []
+        self._move_indices: Dict[Move, int] = {}
+        self._node_indices: Dict[DisplacementOptions, int] = {}
+        node_edges: List[List[Tuple[int, int]]] = []
+        root = [(self._move_index(plan_service, target), self._compile(options, node_edges))
+                for plan_service, target, options in root_edges]
+        root.append((self._move_index(service, cloud), -1))  # one plan is always to just stay
+        node_edges.append(root)
+        del self._move_indices, self._node_indices
+
+        self.node_edge_offsets = np.cumsum([0] + [len(edges) for edges in node_edges])
+        self.edge_moves = np.array([move for edges in node_edges for move, _ in edges], dtype=np.int64)
+        self.edge_nodes = np.array([node for edges in node_edges for _, node in edges], dtype=np.int64)
+
+    def _move_index(self, service: Service, target: LimitedMemoryCloud) -> int:
+        move = (service, target)
+        if move not in self._move_indices:
+            self._move_indices[move] = len(self.moves)
+            self.moves.append(move)
+        return self._move_indices[move]
+
+    def _compile(self, options: DisplacementOptions, node_edges: List[List[Tuple[int, int]]]) -> int:
+        """
+        Adds the displacement options and the options that follow them as nodes.
+        :return: the index of the options' node, or -1 if the cloud has enough free memory
+        """
+        if options.fits:
+            return -1
+        if options not in self._node_indices:
+            edges = [(self._move_index(service, target), self._compile(target_options, node_edges))
+                     for service, target, target_options in options.edges]
+            self._node_indices[options] = len(node_edges)
+            node_edges.append(edges)
+        return self._node_indices[options]
+
+    def num_nodes(self) -> int:
+        return len(self.node_edge_offsets) - 1
+
+    def root_edges(self) -> range:
+        root = self.num_nodes() - 1
+        return range(int(self.node_edge_offsets[root]), int(self.node_edge_offsets[root + 1]))
+
+    def stay_edge(self) -> int:
+        return int(self.node_edge_offsets[-1]) - 1
+
+    def migration_queries(self) -> List[Move]:
+        """
+        :return: the migration queries that the plans need, i.e. the moves and the current clouds of their services
+        """
+        migration_queries: Dict[Move, None] = {}
+        for service, target in self.moves:
+            migration_queries[(service, service.get_cloud())] = None
+            migration_queries[(service, target)] = None
+        return list(migration_queries)
+
+    def possible_moves(self) -> Set[Move]:
+        """
+        :return: the moves of the plans that actually change the placement of a service
+        """
+        return set((service, target) for service, target in self.moves if service.get_cloud() is not target)
+
+    def plan(self, edges: Sequence[int]) -> List[Move]:
+        """
+        :param edges: a path of edges from the root
+        :return: the plan as a list of moves
+        """
+        return [self.moves[self.edge_moves[edge]] for edge in edges]
+
+    def edge_paths(self) -> Iterator[List[int]]:
+        """
+        Generates the paths of edges of all plans, in order.
+        """
+        offsets = self.node_edge_offsets.tolist()
+        edge_nodes = self.edge_nodes.tolist()
+
+        def paths(first_edge, end_edge, path):
+            for edge in range(first_edge, end_edge):
+                node = edge_nodes[edge]
+                if node < 0:
+                    yield path + [edge]
+                else:
+                    yield from paths(offsets[node], offsets[node + 1], path + [edge])
+
+        root_edges = self.root_edges()
+        return paths(root_edges.start, root_edges.stop, [])
+
+    def __iter__(self) -> Iterator[List[Move]]:
+        """
+        Generates all plans, in order.
+        """
+        return (self.plan(edges) for edges in self.edge_paths())
+
+    def move_advantages(self, migration_query_qs: Dict[Move, float]) -> List[float]:
+        """
+        :param migration_query_qs: the Q-values of the migration queries
+        :return: for each move, the difference of the Q-values of the service at the target and at its current cloud
+        """
+        return [migration_query_qs[(service, target)] - migration_query_qs[(service, service.get_cloud())]
+                for service, target in self.moves]
+
+    def upper_bounds(self, move_advantages: Sequence[float]) -> List[float]:
+        """
+        :param move_advantages: the advantage of each move
+        :return: for each node, the maximum sum of the advantages of the moves on a path from the node to the end of a
+                 plan
+        """
+        offsets = self.node_edge_offsets.tolist()
+        edge_moves = self.edge_moves.tolist()
+        edge_nodes = self.edge_nodes.tolist()
+        bounds: List[float] = []
+        for node in range(self.num_nodes()):
+            bounds.append(max(move_advantages[edge_moves[edge]] + (bounds[edge_nodes[edge]] if edge_nodes[edge] >= 0 else 0.0)
+                              for edge in range(offsets[node], offsets[node + 1])))
+        return bounds
+
+    def near_optimal_plans(self,
+                           move_advantages: Sequence[float],
+                           first_edges: Optional[Sequence[int]] = None,
+                           tolerance: float = 1e-9) -> List[Tuple[List[int], float]]:
+        """
+        Finds all plans whose advantage is maximal up to a tolerance with a branch and bound search.
+        The advantage of a plan is the sum of the advantages of its moves, added up in the order of the plan.
+        :param move_advantages: the advantage of each move
+        :param first_edges: if given, only plans starting with one of these root edges are considered
+        :param tolerance: relative tolerance (to absorb the rounding differences between the bounds and the sums)
+        :return: the edge paths of the plans and their advantages, in the order of the plans. All maximal plans are
+                 among them.
+        """
+        offsets = self.node_edge_offsets.tolist()
+        edge_moves = self.edge_moves.tolist()
+        edge_nodes = self.edge_nodes.tolist()
+        bounds = self.upper_bounds(move_advantages)
+        if first_edges is None:
+            first_edges = self.root_edges()
+        best_bound = max(move_advantages[edge_moves[edge]] + (bounds[edge_nodes[edge]] if edge_nodes[edge] >= 0 else 0.0)
+                         for edge in first_edges)
+        threshold = best_bound - tolerance * (1 + abs(best_bound))
+        plans: List[Tuple[List[int], float]] = []
+
+        def search(edges, path, advantage_so_far):
+            for edge in edges:
+                advantage = advantage_so_far + move_advantages[edge_moves[edge]]
+                node = edge_nodes[edge]
+                if node < 0:
+                    if advantage >= threshold:
+                        plans.append((path + [edge], advantage))
+                elif advantage + bounds[node] >= threshold:
+                    search(range(offsets[node], offsets[node + 1]), path + [edge], advantage)
+
+        search(first_edges, [], 0)
+        return plans
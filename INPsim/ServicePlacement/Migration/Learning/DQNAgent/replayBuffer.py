@@ -0,0 +1,240 @@
+# Copyright (C) 2020 Florian Brandherm
+# This file is part of flbrandh/MEC-Simulator-2-BigMEC <https://github.com/flbrandh/MEC-Simulator-2-BigMEC>.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with flbrandh/MEC-Simulator-2-BigMEC.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from typing import Any, Dict, Sequence, Tuple
+
+import numpy as np
+
+_INITIAL_NUM_SLOTS = 1024
+
+
+class ReplayBuffer:
+    """
+    Replay memory of q-samples (s, a, r, s', [a']) that is backed by preallocated numpy arrays.
+    The samples are stored in a ring buffer: appending a sample to a full buffer evicts the oldest sample in O(1).
+    The features of the possible next actions [a'], whose number varies from sample to sample, are stored in a ring
+    arena that grows when needed. Sample i (0 being the oldest sample) owns the arena rows
+    next_action_offsets[slot(i)] to next_action_offsets[slot(i)] + next_action_counts[slot(i)] - 1.
+    Features are stored as float32, which is the precision of the Q-network's inputs, rewards as float64.
+    The sample arrays are allocated in geometrically growing chunks until they reach the capacity, so that large
+    capacities don't cost memory up front.
+    """
+
+    def __init__(self, capacity: int, num_state_features: int, num_action_features: int) -> None:
+        """
+        :param capacity: maximum number of samples
+        :param num_state_features: length of the state feature vectors
+        :param num_action_features: length of the action feature vectors
+        """
+        self._capacity = capacity
+        self._num_state_features = num_state_features
+        self._num_action_features = num_action_features
+        self._size = 0
+        self._next_slot = 0
+        self._state_features = np.zeros((0, num_state_features), dtype=np.float32)
+        self._action_features = np.zeros((0, num_action_features), dtype=np.float32)
+        self._rewards = np.zeros(0)
+        self._next_state_features = np.zeros((0, num_state_features), dtype=np.float32)
+        self._next_action_offsets = np.zeros(0, dtype=np.int64)
+        self._next_action_counts = np.zeros(0, dtype=np.int64)
+        self._reserve(min(capacity, _INITIAL_NUM_SLOTS))
+        self._arena = np.zeros((16, num_action_features), dtype=np.float32)
+        self._arena_head = 0  # arena row of the next insertion
+        self._arena_used = 0  # number of arena rows that belong to samples in the buffer
+
+    def _reserve(self, num_slots: int) -> None:
+        """
+        Enlarges the sample arrays. This is only possible as long as the ring buffer hasn't wrapped around.
+        """
+        assert self._next_slot == self._size
+        for name in ('_state_features', '_action_features', '_rewards', '_next_state_features',
+                     '_next_action_offsets', '_next_action_counts'):
+            array = getattr(self, name)
+            new_array = np.zeros((num_slots,) + array.shape[1:], dtype=array.dtype)
+            new_array[:self._size] = array[:self._size]
+            setattr(self, name, new_array)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def capacity(self) -> int:
+        return self._capacity
+
+    def _slots(self, indices: Sequence[int]) -> np.ndarray:
+        """
+        Converts sample indices (0 being the oldest sample) to slots of the ring buffer.
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        assert len(indices) == 0 or (indices.min() >= 0 and indices.max() < self._size)
+        return (self._next_slot - self._size + indices) % self._capacity
+
+    def _allocate_next_action_rows(self, num_rows: int) -> int:
+        """
+        Finds contiguous free arena rows, growing the arena if necessary.
+        :return: the first of the allocated rows
+        """
+        if self._arena_used == 0:
+            self._arena_head = 0
+        head = self._arena_head
+        tail = int(self._next_action_offsets[self._slots([0])[0]]) if self._size else 0
+        wrapped = head < tail or (head == tail and self._arena_used > 0)
+        if not wrapped:
+            if head + num_rows <= len(self._arena):
+                return head
+            if num_rows <= tail:
+                return 0
+        elif head + num_rows <= tail:
+            return head
+        self._compact_arena(max(2 * len(self._arena), self._arena_used + num_rows))
+        return self._arena_head
+
+    def _live_arena_rows(self, slots: np.ndarray) -> np.ndarray:
+        """
+        :return: the arena rows of the next actions of slots, in order
+        """
+        counts = self._next_action_counts[slots]
+        starts = self._next_action_offsets[slots]
+        first_positions = np.cumsum(counts) - counts
+        return np.repeat(starts - first_positions, counts) + np.arange(int(counts.sum()))
+
+    def _compact_arena(self, arena_size: int) -> None:
+        """
+        Moves the next action features of all samples to the beginning of a new arena, in the order of the samples.
+        """
+        slots = self._slots(np.arange(self._size))
+        rows = self._live_arena_rows(slots)
+        arena = np.zeros((arena_size, self._num_action_features), dtype=np.float32)
+        arena[:len(rows)] = self._arena[rows]
+        counts = self._next_action_counts[slots]
+        self._next_action_offsets[slots] = np.cumsum(counts) - counts
+        self._arena = arena
+        self._arena_head = len(rows)
+
+    def append(self,
+               state_features: Sequence[float],
+               action_features: Sequence[float],
+               reward: float,
+               next_state_features: Sequence[float],
+               possible_next_action_features: Sequence[Sequence[float]]) -> None:
+        """
+        Adds a sample. If the buffer is full, the oldest sample is evicted.
+        """
+        if self._capacity == 0:
+            return
+        if self._size == len(self._rewards) < self._capacity:
+            self._reserve(min(self._capacity, 2 * self._size))
+        slot = self._next_slot
+        if self._size == self._capacity:
+            # evict the oldest sample, which occupies the slot
+            self._arena_used -= int(self._next_action_counts[slot])
+            self._size -= 1
+
+        num_next_actions = len(possible_next_action_features)
+        arena_row = self._allocate_next_action_rows(num_next_actions)
+        if num_next_actions:
+            self._arena[arena_row:arena_row + num_next_actions] = possible_next_action_features
+        self._arena_head = arena_row + num_next_actions
+        self._arena_used += num_next_actions
+
+        self._state_features[slot] = state_features
+        self._action_features[slot] = action_features
+        self._rewards[slot] = reward
+        self._next_state_features[slot] = next_state_features
+        self._next_action_offsets[slot] = arena_row
+        self._next_action_counts[slot] = num_next_actions
+        self._next_slot = (slot + 1) % self._capacity
+        self._size += 1
+
+    def state_action_features(self, indices: Sequence[int]) -> np.ndarray:
+        """
+        :param indices: sample indices, 0 being the oldest sample
+        :return: array of shape (len(indices), #state features + #action features) with the concatenated state and
+                 action features of the samples
+        """
+        slots = self._slots(indices)
+        return np.concatenate([self._state_features[slots], self._action_features[slots]], axis=1)
+
+    def rewards(self, indices: Sequence[int]) -> np.ndarray:
+        return self._rewards[self._slots(indices)]
+
+    def next_state_features(self, indices: Sequence[int]) -> np.ndarray:
+        return self._next_state_features[self._slots(indices)]
+
+    def next_action_counts(self, indices: Sequence[int]) -> np.ndarray:
+        """
+        :param indices: sample indices, 0 being the oldest sample
+        :return: the number of possible next actions of each sample
+        """
+        return self._next_action_counts[self._slots(indices)]
+
+    def state_next_action_features(self, indices: Sequence[int]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Concatenates the state features of each sample with the features of each of its possible next actions.
+        :param indices: sample indices, 0 being the oldest sample
+        :return: (features, counts): features has one row per possible next action, with the rows of sample indices[i]
+                 following those of indices[i-1]. counts contains the number of rows of each sample.
+        """
+        slots = self._slots(indices)
+        counts = self._next_action_counts[slots]
+        next_action_features = self._arena[self._live_arena_rows(slots)]
+        state_features = np.repeat(self._state_features[slots], counts, axis=0)
+        return np.concatenate([state_features, next_action_features], axis=1), counts
+
+    def __getstate__(self) -> Dict[str, Any]:
+        """
+        For pickling. Only the samples in the buffer are stored, without the unused preallocated memory.
+        """
+        slots = self._slots(np.arange(self._size))
+        return {'capacity': self._capacity,
+                'num_state_features': self._num_state_features,
+                'num_action_features': self._num_action_features,
+                'state_features': self._state_features[slots],
+                'action_features': self._action_features[slots],
+                'rewards': self._rewards[slots],
+                'next_state_features': self._next_state_features[slots],
+                'next_action_counts': self._next_action_counts[slots],
+                'next_action_features': self._arena[self._live_arena_rows(slots)]}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        """
+        For unpickling.
+        """
+        self.__init__(state['capacity'], state['num_state_features'], state['num_action_features'])
+        size = len(state['rewards'])
+        self._reserve(max(len(self._rewards), size))
+        self._state_features[:size] = state['state_features']
+        self._action_features[:size] = state['action_features']
+        self._rewards[:size] = state['rewards']
+        self._next_state_features[:size] = state['next_state_features']
+        counts = state['next_action_counts']
+        self._next_action_counts[:size] = counts
+        self._next_action_offsets[:size] = np.cumsum(counts) - counts
+        next_action_features = state['next_action_features']
+        self._arena = np.zeros((max(16, 2 * len(next_action_features)), self._num_action_features), dtype=np.float32)
+        self._arena[:len(next_action_features)] = next_action_features
+        self._arena_head = self._arena_used = len(next_action_features)
+        self._size = size
+        self._next_slot = size % self._capacity if self._capacity else 0
+
+    def get_checkpoint_state(self) -> Dict[str, Any]:
+        """
+        :return: the samples of the buffer as flat arrays, see INPsim.Utils.checkpointState
+        """
+        return self.__getstate__()
+
+    def set_checkpoint_state(self, state: Dict[str, Any]) -> None:
+        self.__setstate__(state)
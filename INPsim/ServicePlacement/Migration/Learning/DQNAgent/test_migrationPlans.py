@@ -0,0 +1,131 @@
+# Copyright (C) 2020 Florian Brandherm
+# This file is part of flbrandh/MEC-Simulator-2-BigMEC <https://github.com/flbrandh/MEC-Simulator-2-BigMEC>.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with flbrandh/MEC-Simulator-2-BigMEC.  If not, see <http://www.gnu.org/licenses/>.
+
+
+
+import random
+from unittest import TestCase
+from INPsim.Network.Nodes.node import CloudNode
+from INPsim.Network.Nodes.cloud import LimitedMemoryCloud
+from INPsim.Network.Service.service import Service
+from INPsim.ServicePlacement.Migration.Learning.DQNAgent.migrationPlans import (MigrationPlanEnumerator,
+                                                                               ResourceInspections)
+
+
+class NeighborhoodInstance:
+    """
+    Stands in for a migration algorithm instance: the neighboring clouds of a service are those of its cloud.
+    """
+
+    def __init__(self, neighborhoods):
+        self._neighborhoods = neighborhoods
+
+    def get_neighboring_clouds(self, service):
+        return self._neighborhoods[service.get_cloud()]
+
+
+def random_network(rng, num_clouds=6, num_services=14):
+    clouds = [LimitedMemoryCloud(CloudNode(), rng.randint(2, 6)) for _ in range(num_clouds)]
+    neighborhoods = dict((cloud, rng.sample(clouds, 3)) for cloud in clouds)
+    instance = NeighborhoodInstance(neighborhoods)
+    for cloud in clouds:
+        cloud.set_migration_algorithm_instance(instance)
+    services = []
+    for _ in range(num_services):
+        service = Service(rng.randint(1, 3), 10)
+        candidates = [cloud for cloud in clouds if cloud.free_memory_capacity() >= service.get_memory_requirement()]
+        if candidates:
+            rng.choice(candidates).add_service(service)
+            services.append(service)
+    return clouds, services
+
+
+def reference_plans(service, cloud, max_recursion_depth):
+    """
+    Enumerates all plans naively and keeps those that can be executed without exceeding a cloud's capacity.
+    """
+    def displacement_plans(incoming_memory, target, remaining_depth):
+        if target.total_memory_requirement() + incoming_memory <= target.memory_capacity():
+            return [[]]
+        if remaining_depth == 0:
+            return []
+        plans = []
+        for displaced_service in target.services():
+            displaced_memory = displaced_service.get_memory_requirement()
+            if target.total_memory_requirement() - displaced_memory + incoming_memory > target.memory_capacity():
+                continue
+            for next_target in target.get_migration_algorithm_instance().get_neighboring_clouds(displaced_service):
+                if next_target is not target:
+                    plans.extend([(displaced_service, next_target)] + plan for plan in
+                                 displacement_plans(displaced_memory, next_target, remaining_depth - 1))
+        return plans
+
+    plans = []
+    for target in cloud.get_migration_algorithm_instance().get_neighboring_clouds(service):
+        if target is not cloud:
+            plans.extend([(service, target)] + plan for plan in
+                         displacement_plans(service.get_memory_requirement(), target, max_recursion_depth))
+    return plans + [[(service, cloud)]]
+
+
+class TestMigrationPlanEnumerator(TestCase):
+
+    def test_plans_match_reference(self):
+        rng = random.Random(42)
+        for _ in range(30):
+            clouds, services = random_network(rng)
+            enumerator = MigrationPlanEnumerator()
+            for _ in range(20):
+                service = rng.choice(services)
+                max_recursion_depth = rng.randint(0, 3)
+                plans = enumerator.gather_migration_plans(service, service.get_cloud(), max_recursion_depth,
+                                                          ResourceInspections())
+                self.assertEqual(reference_plans(service, service.get_cloud(), max_recursion_depth), list(plans))
+                self.assertEqual([(service, service.get_cloud())], plans.plan([plans.stay_edge()]))
+                # moving a service changes the clouds, which invalidates memoized displacement options
+                moved_service = rng.choice(services)
+                targets = [cloud for cloud in clouds if cloud.free_memory_capacity() >= moved_service.get_memory_requirement()]
+                if targets:
+                    rng.choice(targets).add_service(moved_service)
+
+    def test_near_optimal_plans(self):
+        rng = random.Random(43)
+        for _ in range(30):
+            clouds, services = random_network(rng)
+            service = rng.choice(services)
+            plans = MigrationPlanEnumerator().gather_migration_plans(service, service.get_cloud(), 2,
+                                                                     ResourceInspections())
+            # few distinct values, so that there are ties
+            migration_query_qs = dict((query, rng.choice([0.0, 0.25, 0.5])) for query in plans.migration_queries())
+            move_advantages = plans.move_advantages(migration_query_qs)
+            advantages = []
+            for plan in plans:
+                advantage = 0
+                for plan_service, target in plan:
+                    advantage += (migration_query_qs[(plan_service, target)]
+                                  - migration_query_qs[(plan_service, plan_service.get_cloud())])
+                advantages.append(advantage)
+            all_edge_paths = list(plans.edge_paths())
+            self.assertEqual(len(advantages), len(all_edge_paths))
+            expected = [(edges, advantage) for edges, advantage in zip(all_edge_paths, advantages)
+                        if advantage == max(advantages)]
+            near_optimal_plans = plans.near_optimal_plans(move_advantages)
+            self.assertEqual(expected, [(edges, advantage) for edges, advantage in near_optimal_plans
+                                        if advantage == max(advantages)])
+            for first_edge in plans.root_edges():
+                subtree = [advantage for edges, advantage in zip(all_edge_paths, advantages) if edges[0] == first_edge]
+                self.assertEqual(max(subtree), max(advantage for _, advantage in
+                                                   plans.near_optimal_plans(move_advantages, [first_edge])))
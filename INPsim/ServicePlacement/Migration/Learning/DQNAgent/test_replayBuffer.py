@@ -0,0 +1,72 @@
+# Copyright (C) 2020 Florian Brandherm
+# This file is part of flbrandh/MEC-Simulator-2-BigMEC <https://github.com/flbrandh/MEC-Simulator-2-BigMEC>.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with flbrandh/MEC-Simulator-2-BigMEC.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import pickle
+import random
+from unittest import TestCase
+import numpy as np
+from INPsim.ServicePlacement.Migration.Learning.DQNAgent.replayBuffer import ReplayBuffer
+
+
+class TestReplayBuffer(TestCase):
+
+    def random_sample(self, rng):
+        return ([rng.random() for _ in range(3)],
+                [rng.random() for _ in range(2)],
+                rng.uniform(-500, 0),
+                [rng.random() for _ in range(3)],
+                [[rng.random() for _ in range(2)] for _ in range(rng.randint(1, 12))])
+
+    def assert_equal_to_samples(self, replay_buffer, samples):
+        self.assertEqual(len(samples), len(replay_buffer))
+        indices = list(range(len(samples)))
+        random.Random(1).shuffle(indices)
+        x = replay_buffer.state_action_features(indices)
+        next_inputs, counts = replay_buffer.state_next_action_features(indices)
+        expected_next_inputs = [s + a for i in indices for s, a in
+                                zip([samples[i][0]] * len(samples[i][4]), samples[i][4])]
+        self.assertTrue(np.array_equal(np.array([samples[i][0] + samples[i][1] for i in indices], dtype=np.float32), x))
+        self.assertEqual([samples[i][2] for i in indices], replay_buffer.rewards(indices).tolist())
+        self.assertEqual([len(samples[i][4]) for i in indices], counts.tolist())
+        self.assertTrue(np.array_equal(np.array(expected_next_inputs, dtype=np.float32), next_inputs))
+
+    def test_ring_buffer(self):
+        rng = random.Random(42)
+        for capacity in (1, 7, 50, 1500):
+            replay_buffer = ReplayBuffer(capacity, 3, 2)
+            samples = []
+            for _ in range(capacity + 300):
+                sample = self.random_sample(rng)
+                replay_buffer.append(*sample)
+                samples = (samples + [sample])[-capacity:]
+                if rng.random() < 20 / capacity:
+                    self.assert_equal_to_samples(replay_buffer, samples)
+            self.assert_equal_to_samples(replay_buffer, samples)
+
+            # pickling only stores the samples, and the unpickled buffer continues to work as a ring buffer
+            replay_buffer = pickle.loads(pickle.dumps(replay_buffer))
+            self.assert_equal_to_samples(replay_buffer, samples)
+            for _ in range(capacity + 3):
+                sample = self.random_sample(rng)
+                replay_buffer.append(*sample)
+                samples = (samples + [sample])[-capacity:]
+            self.assert_equal_to_samples(replay_buffer, samples)
+
+    def test_zero_capacity(self):
+        replay_buffer = ReplayBuffer(0, 3, 2)
+        replay_buffer.append(*self.random_sample(random.Random(42)))
+        self.assertEqual(0, len(replay_buffer))
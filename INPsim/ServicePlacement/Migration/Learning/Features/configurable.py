@@ -15,7 +15,8 @@
 # along with flbrandh/MEC-Simulator-2-BigMEC.  If not, see <http://www.gnu.org/licenses/>.
 
 
-from typing import List
+from typing import List, Sequence
+import numpy as np
 
 class ConfigurableFeatures:
     """
@@ -35,7 +36,25 @@ class ConfigurableFeatures:
         self._use_latency_requirements = use_latency_requirements
         self._world_coordinate_scale = 0.0001
         self._world_coordinate_center = None
+        # scaled node positions of the last network that batch features were computed for
+        self._scaled_node_positions_network = None
+        self._scaled_node_positions_cache = None
 
+    def __getstate__(self):
+        """
+        For pickling. The cached node positions (and the reference to their network) are not stored.
+        """
+        state = self.__dict__.copy()
+        state['_scaled_node_positions_network'] = None
+        state['_scaled_node_positions_cache'] = None
+        return state
+
+
+    def _init_world_coordinate_center(self, cloud_network):
+        if self._world_coordinate_center is None:
+            if cloud_network is not None:
+                aabb = cloud_network.aabb()
+                self._world_coordinate_center = aabb.center()
 
     def _absolute_node_position(self, node):
         if node is not None:
@@ -91,10 +110,7 @@ class ConfigurableFeatures:
             dst_cloud=None,
             service=None,
             cloud_network=None):
-        if self._world_coordinate_center is None:
-            if cloud_network is not None:
-                aabb = cloud_network.aabb()
-                self._world_coordinate_center = aabb.center()
+        self._init_world_coordinate_center(cloud_network)
 
         if service is not None:
             user = service.owner()
@@ -167,6 +183,100 @@ class ConfigurableFeatures:
         return features
 
 
+    def batch_action_features(self, services: Sequence, dst_clouds: Sequence, cloud_network) -> np.ndarray:
+        """
+        Computes the action features of many (service, destination cloud) pairs at once from the node position array
+        and the distances of the network. The result equals the vectors of action_features() converted to float32, with
+        each feature computed by the same float64 operations, so that trained networks can be used with either method.
+        :param services: services that are placed at a cloud and owned by a user with a base station
+        :param dst_clouds: the destination cloud of each service
+        :param cloud_network: the network
+        :return: float32 array of shape (len(services), #action features)
+        """
+        node_positions = self._scaled_node_positions(cloud_network)
+        num_pairs = len(services)
+
+        # gather the nodes and attributes of each distinct service once
+        service_rows = {}
+        rows = np.empty(num_pairs, dtype=np.int64)
+        service_node_ids = []  # src cloud node, user base station, previous user base station (-1 if there is none)
+        service_attributes = []  # access point latency, latency requirement, priority
+        movement_models = []
+        for i, service in enumerate(services):
+            row = service_rows.get(service)
+            if row is None:
+                row = service_rows[service] = len(movement_models)
+                user = service.owner()
+                user_base_station = user.get_base_station()
+                prev_user_base_station = user.get_previous_base_station()
+                service_node_ids.append((cloud_network.node_index(service.get_cloud().node()),
+                                         cloud_network.node_index(user_base_station),
+                                         cloud_network.node_index(prev_user_base_station)
+                                         if prev_user_base_station is not None else -1))
+                service_attributes.append((user_base_station.access_point_latency(),
+                                           service.get_latency_requirement(),
+                                           service.priority))
+                movement_models.append(user.get_movement_model())
+            rows[i] = row
+        src_node_ids, base_station_ids, prev_base_station_ids = np.array(service_node_ids, dtype=np.int64)[rows].T
+        access_point_latencies, latency_requirements, priorities = np.array(service_attributes, dtype=np.float64)[rows].T
+        dst_node_ids = np.fromiter((cloud_network.node_index(dst_cloud.node()) for dst_cloud in dst_clouds),
+                                   dtype=np.int64, count=num_pairs)
+
+        # absolute positions
+        src_pos = node_positions[src_node_ids]
+        base_station_pos = node_positions[base_station_ids]
+        dst_pos = node_positions[dst_node_ids]
+        center = np.array([self._world_coordinate_center.x, self._world_coordinate_center.y])
+        user_pos = (self._world_coordinate_scale * (self._movement_model_positions(movement_models) - center))[rows]
+        # the last row of node_positions is (0, 0), the position of a missing previous base station
+        prev_base_station_pos = node_positions[prev_base_station_ids]
+
+        columns = []
+        if self._use_relative_positions:
+            columns += [src_pos - base_station_pos, dst_pos - base_station_pos, user_pos - base_station_pos]
+            if self._use_user_last_base_station:
+                columns += [prev_base_station_pos - base_station_pos]
+        if self._use_absolute_positions:
+            columns += [src_pos, dst_pos, user_pos]
+            if self._use_user_last_base_station:
+                columns += [prev_base_station_pos]
+        scalar_columns = []
+        if self._use_measured_latencies:
+            scalar_columns += [0.1 * (cloud_network.pair_dists(src_node_ids, base_station_ids) + access_point_latencies),
+                               0.1 * (cloud_network.pair_dists(dst_node_ids, base_station_ids) + access_point_latencies)]
+        if self._use_latency_requirements:
+            scalar_columns += [0.1 * latency_requirements]
+        scalar_columns += [0.01 * priorities - 0.5,
+                           np.where(src_node_ids == dst_node_ids, 1.0, -1.0)]
+        columns.append(np.stack(scalar_columns, axis=1))
+        return np.concatenate(columns, axis=1).astype(np.float32)
+
+    def _scaled_node_positions(self, cloud_network) -> np.ndarray:
+        """
+        :return: the scaled absolute positions of the network's nodes (see _absolute_node_position()), followed by a row
+                 of zeros. The array is cached for the last network.
+        """
+        self._init_world_coordinate_center(cloud_network)
+        # (the cache attributes are missing in features that were pickled before they existed)
+        if getattr(self, '_scaled_node_positions_network', None) is not cloud_network:
+            center = np.array([self._world_coordinate_center.x, self._world_coordinate_center.y])
+            self._scaled_node_positions_cache = np.concatenate(
+                    [self._world_coordinate_scale * (cloud_network.node_positions() - center), np.zeros((1, 2))])
+            self._scaled_node_positions_network = cloud_network
+        return self._scaled_node_positions_cache
+
+    @staticmethod
+    def _movement_model_positions(movement_models) -> np.ndarray:
+        """
+        :return: the positions of the movement models as an array of shape (len(movement_models), 2), read directly from
+                 the population movement engine if all models are attached to the same one
+        """
+        engine = movement_models[0].movement_engine() if movement_models else None
+        if engine is not None and all(model.movement_engine() is engine for model in movement_models):
+            return engine.get_positions(movement_models)
+        return np.array([model.get_pos() for model in movement_models], dtype=np.float64).reshape(-1, 2)
+
     def deprecated_action_features(
             self,
             dst_cloud=None,
@@ -0,0 +1,72 @@
+# Copyright (C) 2020 Florian Brandherm
+# This file is part of flbrandh/MEC-Simulator-2-BigMEC <https://github.com/flbrandh/MEC-Simulator-2-BigMEC>.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with flbrandh/MEC-Simulator-2-BigMEC.  If not, see <http://www.gnu.org/licenses/>.
+
+
+
+import itertools
+import random
+from unittest import TestCase
+import numpy as np
+from INPsim.Network.Nodes.node import CloudBaseStation
+from INPsim.Network.Nodes.cloud import LimitedMemoryCloud
+from INPsim.Network.connection import ConstantLatencyConnection
+from INPsim.Network.network import CloudNetwork
+from INPsim.Network.Service.service import Service
+from INPsim.Network.User.user import User
+from INPsim.Network.User.MovementModel.brownianModel import BrownianMovementModel
+from INPsim.Network.User.MovementModel.populationEngine import PopulationMovementEngine
+from INPsim.ServicePlacement.Migration.Learning.Features.configurable import ConfigurableFeatures
+
+
+class TestConfigurableFeatures(TestCase):
+
+    def setUp(self):
+        rng = random.Random(42)
+        self.nodes = [CloudBaseStation((rng.uniform(-5000, 5000), rng.uniform(-5000, 5000))) for _ in range(12)]
+        for node1, node2 in zip(self.nodes, self.nodes[1:]):
+            ConstantLatencyConnection.connect_default_bidirectional(node1, node2)
+        ConstantLatencyConnection.connect_default_bidirectional(self.nodes[0], self.nodes[7])
+        for node in self.nodes[::3]:
+            node.set_cloud(LimitedMemoryCloud(node, 10))
+        self.clouds = [node.get_cloud() for node in self.nodes[::3]]
+
+        self.engine = PopulationMovementEngine()
+        self.services = []
+        for i in range(6):
+            user = User(BrownianMovementModel((rng.uniform(-5000, 5000), rng.uniform(-5000, 5000)), 1, rng), [])
+            service = Service(1, 5, priority=rng.randint(0, 100))
+            user.add_service(service)
+            user.set_base_station(rng.choice(self.nodes))
+            if i % 2:
+                user.set_base_station(rng.choice(self.nodes))
+            if i % 3:
+                self.engine.attach(user.get_movement_model())
+            rng.choice(self.clouds).add_service(service)
+            self.services.append(service)
+
+    def test_batch_action_features_equal_action_features(self):
+        pairs = list(itertools.product(self.services, self.clouds))
+        for backend in ('dense', 'sparse'):
+            network = CloudNetwork(self.nodes, central_cloud=self.clouds[0], distance_backend=backend)
+            for options in itertools.product([False, True], repeat=5):
+                features = ConfigurableFeatures(*options)
+                expected = np.array([features.action_features(cloud, service, network) for service, cloud in pairs],
+                                    dtype=np.float32)
+                actual = features.batch_action_features([service for service, _ in pairs],
+                                                        [cloud for _, cloud in pairs],
+                                                        network)
+                self.assertEqual(np.float32, actual.dtype)
+                self.assertTrue(np.array_equal(expected, actual))
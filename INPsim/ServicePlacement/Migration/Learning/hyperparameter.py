@@ -38,7 +38,8 @@ class QHyperparameters:
                  num_epochs=50,
                  target_model_update_frequency=1,
                  recursion_depth=2,
-                 replay_buffer_sampling_rate = 1.0):
+                 replay_buffer_sampling_rate = 1.0,
+                 inference_backend='numpy'):
         if default:
             # problem-posing-related:
             self.max_num_neighbor_clouds = max_num_neighbor_clouds
@@ -50,6 +51,7 @@ class QHyperparameters:
             self.network_depth = network_depth
             self.discount_factor = discount_factor
             self.max_replay_memory_size = max_replay_memory_size
+            self.inference_backend = inference_backend  # 'numpy' or 'keras', see DQNAgent.process_migration_queries
             # training-related
             self.episode_length = episode_length
             self.epsilon = epsilon
@@ -77,6 +79,7 @@ class QHyperparameters:
                             self.network_depth = h['network_depth']
                             self.discount_factor = h['discount_factor']
                             self.max_replay_memory_size = h['max_replay_memory_size']
+                            self.inference_backend = h.get('inference_backend', 'numpy')
                         for h in hparam['training_related']:
                             self.episode_length = h['episode_length']
                             self.epsilon = h['epsilon']
@@ -99,6 +102,7 @@ class QHyperparameters:
         self.network_depth = random.randint(1, 50)
         self.discount_factor = round(random.random(), 2)
         self.max_replay_memory_size = 10000
+        self.inference_backend = 'numpy'
 
         # training related
         self.episode_length = random.randint(50, 500)
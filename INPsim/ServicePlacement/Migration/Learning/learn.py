@@ -19,6 +19,7 @@ from INPsim.ServicePlacement.Migration.Algorithms.migrationAlgorithm import Migr
 from INPsim.ServicePlacement.Migration.CloudCandidateSelector.destinationCloudCandidateSelector import KnnBaseStationNeighborhoodBasedCandidateSelector
 from INPsim.ServicePlacement.Migration.Learning.Features.configurable import ConfigurableFeatures
 from INPsim.ServicePlacement.Migration.Learning.DQNAgent.clipping import ClippingDDQNAgent
+from INPsim.Utils.checkpointState import prefixed, unprefixed
 import random
 
 
@@ -45,6 +46,30 @@ class DQNMigrationAlgorithm(MigrationAlgorithm):
     def get_name(self):
         return 'DQNMigrationAlgorithm'
 
+    def supports_batched_decisions(self):
+        return True
+
+    def max_decision_batch_size(self):
+        # the network must not change between the evaluation of a batch and its last decision
+        return self.shared_agent.num_decisions_until_training()
+
+    def begin_placement_update(self):
+        self.shared_agent.begin_placement_update()
+
+    def evaluate_migration_decisions(self, decisions):
+        self.shared_agent.evaluate_migration_decisions(decisions)
+
+    def get_checkpoint_state(self, services):
+        return prefixed(self.shared_agent.get_checkpoint_state(services), 'agent')
+
+    def set_checkpoint_state(self, state, services):
+        self.shared_agent.set_checkpoint_state(unprefixed(state, 'agent'), services)
+
+    def get_performance_counters(self):
+        return {'decisions': self.shared_agent.num_decisions,
+                'nn_calls': self.shared_agent.num_nn_calls,
+                'training_episodes': self.shared_agent.num_training_episodes}
+
     def create_instance(self, cloud, cloud_network):
         if not self._destination_cloud_candidate_selector:
             self._destination_cloud_candidate_selector = KnnBaseStationNeighborhoodBasedCandidateSelector(
@@ -78,5 +103,12 @@ class DQNMigrationAlgorithm(MigrationAlgorithm):
             return self._shared_agent.process_migration_event(
                 service, self._cloud, self._cloud_network)
 
+        def prepare_migration_decision(self, service):
+            return self._shared_agent.prepare_migration_decision(
+                service, self._cloud, self._cloud_network)
+
+        def finish_migration_decision(self, decision):
+            return self._shared_agent.finish_migration_decision(decision)
+
         def give_reward(self, reward):
             self._shared_agent.give_reward(reward)
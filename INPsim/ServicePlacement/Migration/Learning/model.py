@@ -15,6 +15,7 @@
 # along with flbrandh/MEC-Simulator-2-BigMEC.  If not, see <http://www.gnu.org/licenses/>.
 
 
+import numpy as np
 import tensorflow.keras as K
 import tensorflow as tf
 
@@ -70,3 +71,45 @@ class QModel:
 
     def deserialize_model(self, weights):
         self.Q_model.set_weights(weights)
+
+
+class NumpyQNetwork:
+    """
+    Pure numpy forward pass of a Q model that consists of Dense layers (and Dropout layers, which are inactive during
+    inference). It is a snapshot of the weights of the model at construction time. For the small inputs of single
+    migration decisions, it avoids the dispatch overhead of calling the Keras model.
+    """
+
+    _ACTIVATIONS = {'linear': lambda x: x,
+                    'tanh': np.tanh,
+                    'relu': lambda x: np.maximum(x, 0),
+                    'sigmoid': lambda x: 1 / (1 + np.exp(-x))}
+
+    def __init__(self, model):
+        """
+        :param model: a Keras Q model
+        """
+        self.layers = []
+        for layer in model.layers:
+            if isinstance(layer, (K.layers.InputLayer, K.layers.Dropout)):
+                continue
+            if not isinstance(layer, K.layers.Dense):
+                raise ValueError('NumpyQNetwork does not support layers of type ' + type(layer).__name__)
+            activation = layer.get_config()['activation']
+            if activation not in NumpyQNetwork._ACTIVATIONS:
+                raise ValueError('NumpyQNetwork does not support the activation ' + str(activation))
+            weights = layer.get_weights()
+            kernel = weights[0].astype(np.float32)
+            bias = weights[1].astype(np.float32) if layer.use_bias else np.zeros(kernel.shape[1], dtype=np.float32)
+            self.layers.append((kernel, bias, NumpyQNetwork._ACTIVATIONS[activation]))
+
+    def __call__(self, x):
+        """
+        Evaluates the network.
+        :param x: array of shape (batch size, #features)
+        :return: array of shape (batch size, 1)
+        """
+        x = np.asarray(x, dtype=np.float32)
+        for kernel, bias, activation in self.layers:
+            x = activation(x @ kernel + bias)
+        return x
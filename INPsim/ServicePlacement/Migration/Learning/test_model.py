@@ -0,0 +1,34 @@
+# Copyright (C) 2020 Florian Brandherm
+# This file is part of flbrandh/MEC-Simulator-2-BigMEC <https://github.com/flbrandh/MEC-Simulator-2-BigMEC>.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with flbrandh/MEC-Simulator-2-BigMEC.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from unittest import TestCase
+import numpy as np
+from INPsim.ServicePlacement.Migration.Learning.hyperparameter import QHyperparameters
+from INPsim.ServicePlacement.Migration.Learning.Features.configurable import ConfigurableFeatures
+from INPsim.ServicePlacement.Migration.Learning.model import QModel, NumpyQNetwork
+
+
+class TestNumpyQNetwork(TestCase):
+
+    def test_matches_keras_model(self):
+        features = ConfigurableFeatures()
+        model = QModel(QHyperparameters(network_width=20, network_depth=3), features).Q_model
+        x = np.random.default_rng(42).uniform(-1, 1, (50, model.input_shape[1]))
+        expected = model(x, training=False).numpy()
+        actual = NumpyQNetwork(model)(x.tolist())
+        self.assertEqual(expected.shape, actual.shape)
+        self.assertTrue(np.allclose(expected, actual, rtol=1e-5, atol=1e-6))
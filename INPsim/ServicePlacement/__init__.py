@@ -17,4 +17,5 @@
 
 from .servicePlacementStrategy import ServicePlacementStrategy, IndependentServicePlacementStrategy
 from .staticGreedyServicePlacementStrategy import StaticGreedyServicePlacementStrategy
-from .myopicOptimalServicePlacementStrategy import MyopicOptimalServicePlacementStrategy
\ No newline at end of file
+from .myopicOptimalServicePlacementStrategy import MyopicOptimalServicePlacementStrategy
+from .myopicOptimalFlowServicePlacementStrategy import MyopicOptimalFlowServicePlacementStrategy
\ No newline at end of file
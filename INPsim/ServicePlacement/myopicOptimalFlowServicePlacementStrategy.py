@@ -0,0 +1,206 @@
+# Copyright (C) 2020 Florian Brandherm
+# This file is part of flbrandh/MEC-Simulator-2-BigMEC <https://github.com/flbrandh/MEC-Simulator-2-BigMEC>.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with flbrandh/MEC-Simulator-2-BigMEC.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import logging
+from typing import Any, Dict, List, Optional
+import gurobipy as grb
+import numpy as np
+from scipy.optimize import linprog
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import min_weight_full_bipartite_matching
+
+from .myopicOptimalServicePlacementStrategy import MyopicOptimalServicePlacementStrategy
+from .placementProblem import PlacementProblem
+
+from INPsim.ServicePlacement.Migration.CostFunctions import ServiceCostFunction
+from INPsim.ServicePlacement.Migration.CloudCandidateSelector import DestinationCloudCandidateSelectorInterface
+from INPsim.Network.Service import Service
+from INPsim.Utils.runningMean import RunningMean
+from INPsim.Utils.checkpointState import prefixed, unprefixed
+
+logger = logging.getLogger(__name__)
+
+
+def relative_optimality_gap(cost: float, optimal_cost: float) -> Optional[float]:
+    """
+    Computes the relative optimality gap (cost - optimal cost) / |optimal cost| of a solution.
+    :param cost: the cost of the solution
+    :param optimal_cost: the cost of an optimal solution
+    :return: the relative optimality gap, or None if it is undefined because the optimal cost is zero and the solution
+    is not optimal
+    """
+    if cost == optimal_cost:
+        return 0.0
+    if optimal_cost == 0:
+        return None
+    return (cost - optimal_cost) / abs(optimal_cost)
+
+
+class MyopicOptimalFlowServicePlacementStrategy(MyopicOptimalServicePlacementStrategy):
+    """
+    Myopic optimal service placement that doesn't need an ILP solver.
+    If all services have the same memory requirement, the placement problem is an assignment problem: each cloud
+    provides as many slots as services fit into its memory (but not more than it has candidate services), and every
+    service is matched to a slot of one of its candidate clouds at minimum total cost. This is solved exactly with a sparse minimum weight bipartite matching.
+    Otherwise, the LP relaxation of the placement problem is solved and rounded, which is not necessarily optimal.
+    Optionally, every solution is compared to the solution of the ILP in order to report the optimality gap.
+    """
+
+    def __init__(self, service_cost_function: ServiceCostFunction, update_interval: int, cloud_candidate_selector: Optional[DestinationCloudCandidateSelectorInterface] = None, compare_with_ilp: bool = False):
+        """
+        Initializes the Service Placement Strategy.
+        :param service_cost_function: Per-service cost function that is used to evaluate each possible placement in order to find a global cost-optimum (only static placement cost is considered, not the transition cost!)
+        :param update_interval: Placement will be updated every update_interval number of calls to update_service_placements()
+        :param compare_with_ilp: if True, the ILP is solved as well (this requires a gurobipy license that is sufficient for the problem size) and the optimality gap of each solution is reported
+        """
+        super().__init__(service_cost_function, update_interval, cloud_candidate_selector)
+        self._compare_with_ilp: bool = compare_with_ilp
+        self._mean_optimality_gap: RunningMean = RunningMean()
+
+    def get_mean_optimality_gap(self) -> Optional[float]:
+        """
+        Returns the mean relative optimality gap (cost - optimal cost) / |optimal cost| of the solutions compared to
+        the ILP. Suboptimal solutions of problems with an optimal cost of zero are not counted, since their relative
+        gap is undefined.
+        :return: The mean optimality gap if solutions were compared to the ILP. If not, None.
+        """
+        return self._mean_optimality_gap.get_mean()
+
+    def get_checkpoint_state(self, services: List[Service]) -> Dict[str, Any]:
+        state = super().get_checkpoint_state(services)
+        state['compare_with_ilp'] = self._compare_with_ilp
+        state.update(prefixed(self._mean_optimality_gap.get_checkpoint_state(), 'mean_optimality_gap'))
+        return state
+
+    def set_checkpoint_state(self, state: Dict[str, Any], services: List[Service]) -> None:
+        super().set_checkpoint_state(state, services)
+        self._compare_with_ilp = state['compare_with_ilp']
+        self._mean_optimality_gap.set_checkpoint_state(unprefixed(state, 'mean_optimality_gap'))
+
+    def _solve_placement_problem(self, problem: PlacementProblem) -> Optional[np.ndarray]:
+        if problem.num_services() == 0:
+            return np.zeros(0, dtype=np.int64)
+        memory_requirements = problem.memory_requirements
+        if np.all(memory_requirements == memory_requirements[0]):
+            service_cloud_indices = self._solve_assignment(problem, memory_requirements[0])
+        else:
+            service_cloud_indices = self._solve_rounded_lp_relaxation(problem)
+
+        if self._compare_with_ilp and service_cloud_indices is not None:
+            try:
+                optimal_service_cloud_indices = self._solve_new_model(problem)
+            except grb.GurobiError as e:
+                logger.warning("Cannot compare with the ILP: %s", e)
+                self._compare_with_ilp = False
+            else:
+                if optimal_service_cloud_indices is not None:
+                    cost = problem.placement_cost(service_cloud_indices)
+                    optimal_cost = problem.placement_cost(optimal_service_cloud_indices)
+                    optimality_gap = relative_optimality_gap(cost, optimal_cost)
+                    if optimality_gap is None:
+                        logger.debug("Undefined optimality gap: cost %f, optimal cost 0", cost)
+                    else:
+                        logger.debug("Optimality gap: %f", optimality_gap)
+                        self._mean_optimality_gap.add_sample(optimality_gap)
+        return service_cloud_indices
+
+    @staticmethod
+    def _solve_assignment(problem: PlacementProblem, memory_requirement: float) -> Optional[np.ndarray]:
+        """
+        Solves a placement problem in which all services have the same memory requirement as an assignment problem.
+        A cloud whose capacity is binding provides one slot per service that fits into its memory, and each of its
+        candidate services is connected to all of its slots. A cloud that can hold all of its candidate services (like
+        the central cloud) provides a separate slot for each of them instead, so that it only adds one edge per
+        candidate service.
+        :param problem: the placement problem
+        :param memory_requirement: the memory requirement of every service
+        :return: the index of the optimal cloud of each service, or None if there is no feasible placement
+        """
+        num_candidate_services = np.bincount(problem.pair_clouds, minlength=problem.num_clouds())
+        if memory_requirement > 0:
+            num_slots = np.minimum(np.floor(problem.memory_capacities / memory_requirement), num_candidate_services)
+        else:
+            num_slots = num_candidate_services
+        num_slots = num_slots.astype(np.int64)
+        slot_offsets = np.cumsum(num_slots) - num_slots
+        if num_slots.sum() < problem.num_services():
+            return None
+
+        # a candidate pair of a binding cloud is connected to every slot of its cloud, a candidate pair of any other
+        # cloud only to its own slot, the one at the rank of the pair among the pairs of the cloud
+        binding = (num_slots < num_candidate_services)[problem.pair_clouds]
+        cloud_pairs = np.argsort(problem.pair_clouds, kind='stable')
+        pair_ranks = np.empty(problem.num_pairs(), dtype=np.int64)
+        pair_ranks[cloud_pairs] = np.arange(problem.num_pairs()) - \
+            (np.cumsum(num_candidate_services) - num_candidate_services)[problem.pair_clouds[cloud_pairs]]
+        first_pair_slots = slot_offsets[problem.pair_clouds] + np.where(binding, 0, pair_ranks)
+        edge_counts = np.where(binding, num_slots[problem.pair_clouds], 1)
+        edge_pairs = np.repeat(np.arange(problem.num_pairs()), edge_counts)
+        first_edges = np.cumsum(edge_counts) - edge_counts
+        edge_slots = (np.repeat(first_pair_slots - first_edges, edge_counts)
+                      + np.arange(int(edge_counts.sum())))
+        # the weights are shifted to be positive, because zero entries of a sparse matrix are no edges.
+        # This doesn't change the optimum, since every service is matched to exactly one slot.
+        weights = problem.pair_costs[edge_pairs] - problem.pair_costs.min() + 1
+        graph = csr_matrix((weights, (problem.pair_services()[edge_pairs], edge_slots)),
+                           shape=(problem.num_services(), int(num_slots.sum())))
+        try:
+            services, slots = min_weight_full_bipartite_matching(graph)
+        except ValueError:
+            return None  # there is no matching that places all services
+        slot_clouds = np.repeat(np.arange(problem.num_clouds()), num_slots)
+        service_cloud_indices = np.empty(problem.num_services(), dtype=np.int64)
+        service_cloud_indices[services] = slot_clouds[slots]
+        return service_cloud_indices
+
+    @staticmethod
+    def _solve_rounded_lp_relaxation(problem: PlacementProblem) -> Optional[np.ndarray]:
+        """
+        Solves the LP relaxation of a placement problem and rounds the solution: services are placed in the order of
+        decreasing confidence (their largest fractional assignment), each at the candidate cloud with the largest
+        fractional assignment (ties broken by cost) that still has enough free memory.
+        :param problem: the placement problem
+        :return: the index of the chosen cloud of each service, or None if no feasible placement was found
+        """
+        num_pairs = problem.num_pairs()
+        pair_services = problem.pair_services()
+        pairs = np.arange(num_pairs)
+        assignment_matrix = csr_matrix((np.ones(num_pairs), (pair_services, pairs)),
+                                       shape=(problem.num_services(), num_pairs))
+        memory_matrix = csr_matrix((problem.memory_requirements[pair_services], (problem.pair_clouds, pairs)),
+                                   shape=(problem.num_clouds(), num_pairs))
+        result = linprog(problem.pair_costs, A_ub=memory_matrix, b_ub=problem.memory_capacities,
+                         A_eq=assignment_matrix, b_eq=np.ones(problem.num_services()), bounds=(0, 1), method='highs')
+        if result.status != 0:
+            return None
+        x = result.x
+
+        free_memory = problem.memory_capacities.copy()
+        memory_requirements = problem.memory_requirements.tolist()
+        service_cloud_indices = np.empty(problem.num_services(), dtype=np.int64)
+        confidences = np.maximum.reduceat(x, problem.pair_offsets[:-1])
+        for s in np.argsort(-confidences, kind='stable').tolist():
+            begin, end = problem.pair_offsets[s], problem.pair_offsets[s + 1]
+            clouds = problem.pair_clouds[begin:end]
+            order = np.lexsort((problem.pair_costs[begin:end], -x[begin:end]))
+            fitting = order[free_memory[clouds[order]] >= memory_requirements[s]]
+            if len(fitting) == 0:
+                return None
+            c = clouds[fitting[0]]
+            free_memory[c] -= memory_requirements[s]
+            service_cloud_indices[s] = c
+        return service_cloud_indices
@@ -15,41 +15,76 @@
 # along with flbrandh/MEC-Simulator-2-BigMEC.  If not, see <http://www.gnu.org/licenses/>.
 
 
-from typing import Dict, List, Optional
+import logging
+import atexit
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
 import gurobipy as grb
 import numpy as np
+from scipy.sparse import csr_matrix
 import time
 import copy
 
 from .servicePlacementStrategy import ServicePlacementStrategy
+from .placementProblem import PlacementProblem
 from .Migration.Action import Action, InitialPlacementAction, MigrationAction, NoMigrationAction
 
 from INPsim.Network.network import CloudNetwork
 from INPsim.Network.Service import Service
 from INPsim.Network.User.user import User
-from INPsim.Network.User.serviceOwner import ServiceOwner
 from INPsim.Network.User.Manager import UserManager
 from INPsim.Network.Nodes.cloud import Cloud, LimitedMemoryCloud
 from INPsim.ServicePlacement.Migration.CostFunctions import ServiceCostFunction
 from INPsim.ServicePlacement.Migration.CloudCandidateSelector import DestinationCloudCandidateSelectorInterface
 from INPsim.Utils.runningMean import RunningMean
+from INPsim.Utils.checkpointState import prefixed, unprefixed
+
+logger = logging.getLogger(__name__)
 
 
 class MyopicOptimalServicePlacementStrategy(ServicePlacementStrategy):
 
-    def __init__(self, service_cost_function: ServiceCostFunction, update_interval: int, cloud_candidate_selector: Optional[DestinationCloudCandidateSelectorInterface] = None):
+    def __init__(self, service_cost_function: ServiceCostFunction, update_interval: int, cloud_candidate_selector: Optional[DestinationCloudCandidateSelectorInterface] = None, persistent_model: bool = False, decomposition_workers: int = 0):
         """
         Initializes the Service Placement Strategy.
         :param service_cost_function: Per-service cost function that is used to evaluate each possible placement in order to find a global cost-optimum (only static placement cost is considered, not the transition cost!)
         :param update_interval: Placement will be updated every update_interval number of calls to update_service_placements()
+        :param persistent_model: if True, the ILP model is kept across updates and only changed where services arrived, departed or changed their candidate clouds (see PersistentPlacementModel)
+        :param decomposition_workers: if positive, the placement problem is decomposed into independent sub-problems (see PlacementProblem.independent_service_groups()), which are solved by this many worker processes (1: in this process). This is most effective with a cloud candidate selector.
         """
+        if persistent_model and decomposition_workers > 0:
+            raise Exception('The persistent model cannot be combined with the decomposition into sub-problems.')
         self._service_cost_function = service_cost_function
         self._update_interval: int = update_interval
         self._steps_since_update: int = 0
         self._cloud_candidate_selector: Optional[DestinationCloudCandidateSelectorInterface] = cloud_candidate_selector
+        self._persistent_model_enabled: bool = persistent_model
+        self._persistent_model: Optional[PersistentPlacementModel] = None
+        self._decomposition_workers: int = decomposition_workers
+        self._executor: Optional[ProcessPoolExecutor] = None
         self._mean_computation_time: RunningMean = RunningMean()
         self._mean_communication_time: Optional[float] = None
 
+    def __getstate__(self) -> Dict[str, Any]:
+        """
+        For pickling. The ILP model and the worker processes are not stored; they are recreated when needed.
+        """
+        state = self.__dict__.copy()
+        state['_persistent_model'] = None
+        state['_executor'] = None
+        return state
+
+    def get_checkpoint_state(self, services: List[Service]) -> Dict[str, Any]:
+        state: Dict[str, Any] = {'steps_since_update': self._steps_since_update}
+        state.update(prefixed(self._mean_computation_time.get_checkpoint_state(), 'mean_computation_time'))
+        return state
+
+    def set_checkpoint_state(self, state: Dict[str, Any], services: List[Service]) -> None:
+        self._steps_since_update = state['steps_since_update']
+        self._mean_computation_time.set_checkpoint_state(unprefixed(state, 'mean_computation_time'))
+        # the persistent model refers to the services that it was built for
+        self._persistent_model = None
+
     def get_mean_computation_time(self) -> Optional[float]:
         """
         Returns the mean computation time.
@@ -101,7 +136,7 @@ class MyopicOptimalServicePlacementStrategy(ServicePlacementStrategy):
         start = time.time()
         self._execute_myopic_optimal_service_placement(cloud_network, user_manager)
         end = time.time()
-        print("The optimization took ", end - start, "s.")
+        logger.debug("The optimization took %f s.", end - start)
         self._mean_computation_time.add_sample(end - start)
 
         # 4) List the performed actions
@@ -148,118 +183,200 @@ class MyopicOptimalServicePlacementStrategy(ServicePlacementStrategy):
         # 1) gather data
         services: List[Service] = list(user_manager.services())
         clouds: List[LimitedMemoryCloud] = cloud_network.clouds()
-        num_services: int = len(services)
-        num_clouds: int = len(clouds)
-        memory_capacities: List[float] = [c.memory_capacity() for c in clouds]
-        service_memory_requirements: List[float] = [s.get_memory_requirement() for s in services]
-
-        def get_cost(s: Service, c: LimitedMemoryCloud) -> float:
-            owner: ServiceOwner = s.owner()
-            if isinstance(owner, User):
-                # this is a hack to evaluate the service cost for positions that don't exist
-                original_last_cloud = s.get_last_cloud()
-                original_cloud = s.get_cloud()
-                s.set_cloud(c)
-                placement_cost: float = self._service_cost_function.calculate_cost(cloud_network, s, []).placement_cost()
-                s.set_cloud(original_last_cloud)
-                s.set_cloud(original_cloud)
-                return placement_cost
-                # return cloud_network.dist_to_node(owner.get_base_station(), c.node())
-            else:
-                raise Exception('Expected a User as ServiceOwner!')
-
-        service_cloud_cost_matrix: List[List[float]] = [[get_cost(s, c) for c in clouds] for s in services]
-
-        service_cloud_candidates: Dict[Service, List[Cloud]] = dict()
-        service_cloud_candidate_indices: Dict[int, List[int]] = dict()
-        for service_index, service in enumerate(services):
-            cloud_candidates: List[Cloud] = []
-            cloud_candidate_indices: List[int] = []
-            for cloud_index, cloud in enumerate(clouds):
-                if self._cloud_is_viable_candidate(cloud, service):
-                    cloud_candidates.append(cloud)
-                    cloud_candidate_indices.append(cloud_index)
-            service_cloud_candidates[service] = cloud_candidates
-            service_cloud_candidate_indices[service_index] = cloud_candidate_indices
-
-        # 2) configure the optimization model
-        opt_model = grb.Model(name="MIP Model")
-        # placement_cost decision variables
-        x_vars = {(s, c): opt_model.addVar(lb=0,  # lower bound
-                                           ub=1,  # upper bound
-                                           obj=0,  # objective coefficient (no idea what this is)
-                                           vtype=grb.GRB.BINARY,  # variable type
-                                           name="x_{0}_{1}".format(s, c),  # variable name
-                                           column=None)  # column object that indicates the set of constraints in which the new variable participates
-                  for s in range(num_services) for c in service_cloud_candidate_indices[s]}
-
-        # every service placed constraint
-        user_to_one_node_constraints = {s: opt_model.addConstr(grb.quicksum(x_vars[s, n] for n in service_cloud_candidate_indices[s]) == 1,
-                                                               name="user_to_one_node_constraint_{0}".format(s))
-                                        for s in range(num_services)}
+        problem = PlacementProblem.from_network(cloud_network, services, self._service_cost_function,
+                                                self._cloud_candidate_selector)
 
-        # memory constraint
-        memory_constraints = {c: opt_model.addConstr(
-                grb.quicksum(service_memory_requirements[s] * x_vars[s, c] for s in range(num_services) if c in service_cloud_candidate_indices[s]) <= memory_capacities[c],
-                name="node_memory_constraint_{0}".format(c))
-            for c in range(num_clouds)}
-
-        # objective
-        objective = grb.quicksum(x_vars[s, c] * service_cloud_cost_matrix[s][c]
-                                 for s in range(num_services)
-                                 for c in service_cloud_candidate_indices[s])
-        opt_model.ModelSense = grb.GRB.MINIMIZE
-        opt_model.setObjective(objective)
-
-        # 3) solve the model
-        opt_model.setParam(grb.GRB.Param.OutputFlag, 0)
-        opt_model.optimize()
+        # 2) solve the optimization model
+        service_cloud_indices = self._solve_placement_problem(problem)
 
-        # 4) apply the solution
-        if opt_model.Status == grb.GRB.OPTIMAL:
+        # 3) apply the solution
+        if service_cloud_indices is not None:
             # register each service to its new cloud
-            for service_index, service in enumerate(services):
-                for c in service_cloud_candidate_indices[service_index]:
-                    if x_vars[service_index, c].X > 0.5:
-                        try:
-                            clouds[c].add_service(service)
-                        except LimitedMemoryCloud.CloudOverallocatedException:
-                            pass  # ignore momentary cloud overallocation (could be an interesting statistic though)
-                        break # stop since there can only be one cloud per service.
+            for service, c in zip(services, service_cloud_indices.tolist()):
+                try:
+                    clouds[c].add_service(service)
+                except LimitedMemoryCloud.CloudOverallocatedException:
+                    pass  # ignore momentary cloud overallocation (could be an interesting statistic though)
         else:
-            print("model infeasible")
+            logger.warning("model infeasible")
             # do nothing if optimization failed...
 
-        # print("|")
-        # print("V service, cloud ->")
-        # col_sums = [0]*num_clouds
-        # for si in range(num_services):
-        #     line = ''
-        #     line_sum = 0
-        #     for ci in range(num_clouds):
-        #         if not (si, ci) in x_vars:
-        #             line += '- , '
-        #         else:
-        #             line += f'{int(x_vars[si, ci].X):01d} , '
-        #             line_sum += x_vars[si, ci].X
-        #             col_sums[ci] += x_vars[si, ci].X
-        #     print(f's{si:02d}| ' + line + '= '+str(line_sum))
-        # print('     '+"-"*num_clouds*3)
-        # print('     '+''.join(f'{int(s):02d} ,' for s in col_sums))
-
         for cloud in clouds:
             assert cloud.memory_capacity() >= cloud.total_memory_requirement()
             assert cloud.total_memory_requirement() >= 0
 
 
-    def _cloud_is_viable_candidate(self, cloud: Cloud, service: Service) -> bool:
+    def _solve_placement_problem(self, problem: PlacementProblem) -> Optional[np.ndarray]:
+        """
+        Finds the optimal placement of a placement problem.
+        :param problem: the placement problem
+        :return: the index of the chosen cloud of each service, or None if no feasible placement was found
+        """
+        if self._persistent_model_enabled:
+            if self._persistent_model is None:
+                self._persistent_model = PersistentPlacementModel(problem.memory_capacities)
+            return self._persistent_model.solve(problem)
+        elif self._decomposition_workers > 0:
+            return self._solve_decomposed(problem)
+        else:
+            return self._solve_new_model(problem)
+
+    def _solve_decomposed(self, problem: PlacementProblem) -> Optional[np.ndarray]:
         """
-        Checks if a cloud is a viable placement candidate for a service.
-        :param cloud:  Cloud for which should be determined, if it is viable for the service.
-        :param service: Service that is to be placed.
-        :return: True, if cloud is viable for service, False if not
+        Decomposes a placement problem into independent sub-problems and solves them concurrently.
+        Since there are typically many small components, they are packed into a few sub-problems of similar size
+        (a few per worker), which keeps the overhead per model low while balancing the load of the workers.
+        :param problem: the placement problem
+        :return: the index of the optimal cloud of each service, or None if any sub-problem is infeasible
         """
-        if self._cloud_candidate_selector:
-            return cloud in self._cloud_candidate_selector.get_candidate_clouds(service)
+        service_cloud_indices = problem.cheapest_cloud_indices()
+        # services without binding candidate clouds are placed at their cheapest candidate cloud without a model
+        constrained_services = np.zeros(problem.num_services(), dtype=bool)
+        np.logical_or.at(constrained_services, problem.pair_services(), problem.binding_clouds()[problem.pair_clouds])
+        groups = [group for group in problem.independent_service_groups() if constrained_services[group[0]]]
+        num_batches = 1 if self._decomposition_workers == 1 else min(len(groups), 4 * self._decomposition_workers)
+        # longest processing time first: assign the largest remaining group to the smallest batch
+        batch_groups: List[List[np.ndarray]] = [[] for _ in range(num_batches)]
+        batch_sizes = np.zeros(num_batches, dtype=np.int64)
+        group_sizes = [int(np.diff(problem.pair_offsets)[group].sum()) for group in groups]
+        for g in sorted(range(len(groups)), key=lambda g: -group_sizes[g]):
+            b = int(np.argmin(batch_sizes))
+            batch_groups[b].append(groups[g])
+            batch_sizes[b] += group_sizes[g]
+        batches = [np.sort(np.concatenate(b)) for b in batch_groups if b]
+        subproblems = [problem.subproblem(batch) for batch in batches]
+
+        if self._decomposition_workers == 1 or len(subproblems) <= 1:
+            solutions = [self._solve_new_model(subproblem) for subproblem in subproblems]
         else:
-            return True
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self._decomposition_workers)
+                atexit.register(self._executor.shutdown)
+            solutions = list(self._executor.map(MyopicOptimalServicePlacementStrategy._solve_new_model, subproblems))
+
+        for batch, solution in zip(batches, solutions):
+            if solution is None:
+                return None
+            service_cloud_indices[batch] = solution
+        return service_cloud_indices
+
+    @staticmethod
+    def _solve_new_model(problem: PlacementProblem) -> Optional[np.ndarray]:
+        """
+        Builds and solves a new ILP model of the placement problem with one binary variable per candidate pair.
+        The model is built with the matrix API from the problem's arrays.
+        :return: the index of the optimal cloud of each service, or None if the model is infeasible
+        """
+        num_pairs = problem.num_pairs()
+        pair_services = problem.pair_services()
+        pairs = np.arange(num_pairs)
+
+        opt_model = grb.Model(name="MIP Model")
+        opt_model.setParam(grb.GRB.Param.OutputFlag, 0)
+        # placement decision variables, with the placement costs as objective coefficients
+        x = opt_model.addMVar(num_pairs, vtype=grb.GRB.BINARY, obj=problem.pair_costs, name="x")
+
+        # every service placed constraint
+        assignment_matrix = csr_matrix((np.ones(num_pairs), (pair_services, pairs)),
+                                       shape=(problem.num_services(), num_pairs))
+        opt_model.addMConstr(assignment_matrix, x, grb.GRB.EQUAL, np.ones(problem.num_services()),
+                             name="user_to_one_node_constraint")
+
+        # memory constraint
+        memory_matrix = csr_matrix((problem.memory_requirements[pair_services], (problem.pair_clouds, pairs)),
+                                   shape=(problem.num_clouds(), num_pairs))
+        opt_model.addMConstr(memory_matrix, x, grb.GRB.LESS_EQUAL, problem.memory_capacities,
+                             name="node_memory_constraint")
+        opt_model.ModelSense = grb.GRB.MINIMIZE
+
+        # solve the model
+        opt_model.optimize()
+        if opt_model.Status != grb.GRB.OPTIMAL:
+            return None
+        # there is exactly one chosen pair per service, and the pairs are sorted by service
+        chosen_pairs = np.asarray(x.X) > 0.5
+        assert chosen_pairs.sum() == problem.num_services()
+        return problem.pair_clouds[chosen_pairs]
+
+
+class PersistentPlacementModel:
+    """
+    ILP model of the myopic optimal service placement that is kept alive across updates.
+    Each service has a binary variable per candidate cloud. When the model is solved again, only the variables and
+    assignment constraints of services that arrived, departed or changed their candidate clouds are added or removed;
+    the objective coefficients of all variables are updated in bulk, and the current placement is used as MIP start.
+    """
+
+    def __init__(self, memory_capacities: np.ndarray) -> None:
+        """
+        :param memory_capacities: the memory capacity of each cloud
+        """
+        self._model = grb.Model(name="MIP Model")
+        self._model.setParam(grb.GRB.Param.OutputFlag, 0)
+        self._model.ModelSense = grb.GRB.MINIMIZE
+        self._memory_constraints = [self._model.addConstr(grb.LinExpr() <= memory_capacity,
+                                                          name="node_memory_constraint_{0}".format(c))
+                                    for c, memory_capacity in enumerate(memory_capacities.tolist())]
+        # per service: the indices of the candidate clouds, their variables and the assignment constraint
+        self._service_variables: Dict[Service, Tuple[List[int], List[grb.Var], grb.Constr]] = {}
+        self.num_added_services = 0
+        self.num_removed_services = 0
+
+    def __len__(self) -> int:
+        """
+        :return: the number of services in the model
+        """
+        return len(self._service_variables)
+
+    def _add_service(self, service: Service, memory_requirement: float, cloud_indices: List[int]) -> None:
+        variables = [self._model.addVar(vtype=grb.GRB.BINARY,
+                                        column=grb.Column([memory_requirement], [self._memory_constraints[c]]))
+                     for c in cloud_indices]
+        assignment_constraint = self._model.addConstr(grb.LinExpr([1.0] * len(variables), variables) == 1)
+        self._service_variables[service] = (cloud_indices, variables, assignment_constraint)
+        self.num_added_services += 1
+
+    def _remove_service(self, service: Service) -> None:
+        _, variables, assignment_constraint = self._service_variables.pop(service)
+        self._model.remove(variables)
+        self._model.remove(assignment_constraint)
+        self.num_removed_services += 1
+
+    def solve(self, problem: PlacementProblem) -> Optional[np.ndarray]:
+        """
+        Updates the model to the given placement problem and solves it.
+        :param problem: the placement problem. The clouds must be the same as in previous calls.
+        :return: the index of the optimal cloud of each service, or None if the model is infeasible
+        """
+        # 1) add and remove the services that changed
+        services = problem.services
+        for service in set(self._service_variables).difference(services):
+            self._remove_service(service)
+        memory_requirements = problem.memory_requirements.tolist()
+        for service_index, service in enumerate(services):
+            cloud_indices = problem.candidate_cloud_indices(service_index).tolist()
+            if service in self._service_variables:
+                if self._service_variables[service][0] == cloud_indices:
+                    continue
+                self._remove_service(service)
+            self._add_service(service, memory_requirements[service_index], cloud_indices)
+        self._model.update()
+
+        # 2) update the objective and the start values (the current placement) in bulk.
+        # The variables are collected in the order of the problem's candidate pairs.
+        variables: List[grb.Var] = []
+        for service in services:
+            variables.extend(self._service_variables[service][1])
+        current_pair_clouds = problem.current_cloud_indices()[problem.pair_services()]
+        start_values = np.where(current_pair_clouds < 0, grb.GRB.UNDEFINED,
+                                (problem.pair_clouds == current_pair_clouds).astype(np.float64))
+        self._model.setAttr(grb.GRB.Attr.Obj, variables, problem.pair_costs.tolist())
+        self._model.setAttr(grb.GRB.Attr.Start, variables, start_values.tolist())
+
+        # 3) solve the model
+        self._model.optimize()
+        if self._model.Status != grb.GRB.OPTIMAL:
+            return None
+        chosen_pairs = np.array(self._model.getAttr(grb.GRB.Attr.X, variables)) > 0.5
+        assert chosen_pairs.sum() == problem.num_services()
+        return problem.pair_clouds[chosen_pairs]
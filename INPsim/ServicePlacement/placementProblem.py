@@ -0,0 +1,233 @@
+# Copyright (C) 2020 Florian Brandherm
+# This file is part of flbrandh/MEC-Simulator-2-BigMEC <https://github.com/flbrandh/MEC-Simulator-2-BigMEC>.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with flbrandh/MEC-Simulator-2-BigMEC.  If not, see <http://www.gnu.org/licenses/>.
+
+
+
+from typing import Any, Dict, List, Optional
+import numpy as np
+from scipy.sparse import bmat, csr_matrix
+from scipy.sparse.csgraph import connected_components
+
+from INPsim.Network.network import CloudNetwork
+from INPsim.Network.Service import Service
+from INPsim.Network.User.user import User
+from INPsim.Network.Nodes.cloud import Cloud, LimitedMemoryCloud
+from INPsim.ServicePlacement.Migration.CostFunctions import ServiceCostFunction
+from INPsim.ServicePlacement.Migration.CloudCandidateSelector import DestinationCloudCandidateSelectorInterface
+
+
+class PlacementProblem:
+    """
+    The data of a myopic placement problem in arrays: each service is to be placed at one of its candidate clouds,
+    without exceeding the memory capacity of any cloud, such that the total static placement cost is minimal.
+    The candidate pairs (service, cloud) are sorted by service and cloud. The pairs of service s are
+    pair_offsets[s] to pair_offsets[s+1]-1; pair p places its service at cloud pair_clouds[p] at cost pair_costs[p].
+    """
+
+    def __init__(self,
+                 services: List[Service],
+                 clouds: List[LimitedMemoryCloud],
+                 memory_capacities: np.ndarray,
+                 memory_requirements: np.ndarray,
+                 pair_offsets: np.ndarray,
+                 pair_clouds: np.ndarray,
+                 pair_costs: np.ndarray) -> None:
+        """
+        :param services: the services
+        :param clouds: the clouds
+        :param memory_capacities: the memory capacity of each cloud
+        :param memory_requirements: the memory requirement of each service
+        :param pair_offsets: the index of the first candidate pair of each service, and the number of pairs at the end
+        :param pair_clouds: the cloud index of each candidate pair
+        :param pair_costs: the static placement cost of each candidate pair
+        """
+        assert len(pair_offsets) == len(memory_requirements) + 1
+        assert len(pair_clouds) == len(pair_costs) == pair_offsets[-1]
+        self.services = services
+        self.clouds = clouds
+        self.memory_capacities = memory_capacities
+        self.memory_requirements = memory_requirements
+        self.pair_offsets = pair_offsets
+        self.pair_clouds = pair_clouds
+        self.pair_costs = pair_costs
+
+    @staticmethod
+    def from_network(cloud_network: CloudNetwork,
+                     services: List[Service],
+                     service_cost_function: ServiceCostFunction,
+                     cloud_candidate_selector: Optional[DestinationCloudCandidateSelectorInterface] = None
+                     ) -> 'PlacementProblem':
+        """
+        Gathers the placement problem of services in a network.
+        :param cloud_network: the cloud network
+        :param services: the services to be placed
+        :param service_cost_function: the cost function whose static placement cost is minimized. If it doesn't
+                                      support calculate_static_cost_matrix(), each pair is evaluated on its own.
+        :param cloud_candidate_selector: selects the candidate clouds of each service. If None, all clouds are
+                                         candidates.
+        :return: the placement problem
+        """
+        clouds: List[LimitedMemoryCloud] = cloud_network.clouds()
+        memory_capacities = np.array([c.memory_capacity() for c in clouds], dtype=np.float64)
+        memory_requirements = np.array([s.get_memory_requirement() for s in services], dtype=np.float64)
+
+        if cloud_candidate_selector:
+            cloud_indices: Dict[Cloud, int] = dict((cloud, cloud_index) for cloud_index, cloud in enumerate(clouds))
+            candidates = [sorted(set(cloud_indices[c] for c in cloud_candidate_selector.get_candidate_clouds(s)))
+                          for s in services]
+            pair_offsets = np.cumsum([0] + [len(service_candidates) for service_candidates in candidates])
+            pair_clouds = np.array([c for service_candidates in candidates for c in service_candidates],
+                                   dtype=np.int64)
+        else:
+            pair_offsets = np.arange(len(services) + 1) * len(clouds)
+            pair_clouds = np.tile(np.arange(len(clouds), dtype=np.int64), len(services))
+        pair_services = np.repeat(np.arange(len(services)), np.diff(pair_offsets))
+
+        cost_matrix = service_cost_function.calculate_static_cost_matrix(cloud_network, services, clouds)
+        if cost_matrix is not None:
+            pair_costs = np.asarray(cost_matrix, dtype=np.float64)[pair_services, pair_clouds]
+        else:
+            pair_costs = np.array([_static_cost_at_cloud(cloud_network, service_cost_function, services[s], clouds[c])
+                                   for s, c in zip(pair_services.tolist(), pair_clouds.tolist())], dtype=np.float64)
+        return PlacementProblem(services, clouds, memory_capacities, memory_requirements,
+                                pair_offsets.astype(np.int64), pair_clouds, pair_costs)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        """
+        For pickling. Only the arrays are stored, not the services and clouds (and with them, the whole network), so
+        that problems can be sent to worker processes cheaply. Unpickled problems have no services and clouds.
+        """
+        state = self.__dict__.copy()
+        state['services'] = None
+        state['clouds'] = None
+        return state
+
+    def num_services(self) -> int:
+        return len(self.pair_offsets) - 1
+
+    def num_clouds(self) -> int:
+        return len(self.memory_capacities)
+
+    def num_pairs(self) -> int:
+        return len(self.pair_clouds)
+
+    def pair_services(self) -> np.ndarray:
+        """
+        :return: the service index of each candidate pair
+        """
+        return np.repeat(np.arange(self.num_services()), np.diff(self.pair_offsets))
+
+    def candidate_cloud_indices(self, service_index: int) -> np.ndarray:
+        """
+        :return: the indices of the candidate clouds of a service, in ascending order
+        """
+        return self.pair_clouds[self.pair_offsets[service_index]:self.pair_offsets[service_index + 1]]
+
+    def pair_indices(self, service_cloud_indices: np.ndarray) -> np.ndarray:
+        """
+        :param service_cloud_indices: the index of a candidate cloud of each service
+        :return: the index of the candidate pair of each service and its cloud
+        """
+        keys = self.pair_services() * self.num_clouds() + self.pair_clouds
+        pair_indices = np.searchsorted(keys, np.arange(self.num_services()) * self.num_clouds() + service_cloud_indices)
+        pair_indices = np.minimum(pair_indices, self.num_pairs() - 1)
+        assert np.array_equal(self.pair_clouds[pair_indices], service_cloud_indices), 'not a candidate cloud'
+        return pair_indices
+
+    def placement_cost(self, service_cloud_indices: np.ndarray) -> float:
+        """
+        :param service_cloud_indices: the index of a candidate cloud of each service
+        :return: the total static placement cost of placing each service at the given cloud
+        """
+        return float(self.pair_costs[self.pair_indices(service_cloud_indices)].sum())
+
+    def binding_clouds(self) -> np.ndarray:
+        """
+        :return: for each cloud, whether its memory capacity is smaller than the total memory requirement of its
+                 candidate services. Only the memory constraints of binding clouds can be violated.
+        """
+        memory_demands = np.bincount(self.pair_clouds, weights=self.memory_requirements[self.pair_services()],
+                                     minlength=self.num_clouds())
+        return memory_demands > self.memory_capacities
+
+    def cheapest_cloud_indices(self) -> np.ndarray:
+        """
+        :return: the index of the cheapest candidate cloud of each service (of the first one if there are several)
+        """
+        pairs_by_cost = np.lexsort((self.pair_costs, self.pair_services()))
+        return self.pair_clouds[pairs_by_cost[self.pair_offsets[:-1]]]
+
+    def independent_service_groups(self) -> List[np.ndarray]:
+        """
+        Splits the services into the connected components of the graph in which services are connected to their
+        binding candidate clouds. Services of different components don't compete for memory, so each component can
+        be solved on its own, and the optimal placements of all components form an optimal placement.
+        In particular, a service without binding candidate clouds forms a component of its own, and its optimal
+        placement is its cheapest candidate cloud.
+        :return: the service indices of each component, in ascending order
+        """
+        pair_services = self.pair_services()
+        binding_pairs = self.binding_clouds()[self.pair_clouds]
+        service_cloud_graph = csr_matrix((np.ones(int(binding_pairs.sum())),
+                                          (pair_services[binding_pairs], self.pair_clouds[binding_pairs])),
+                                         shape=(self.num_services(), self.num_clouds()))
+        _, labels = connected_components(bmat([[None, service_cloud_graph], [service_cloud_graph.T, None]]),
+                                         directed=False)
+        service_labels = labels[:self.num_services()]
+        services_by_label = np.argsort(service_labels, kind='stable')
+        boundaries = np.flatnonzero(np.diff(service_labels[services_by_label])) + 1
+        return np.split(services_by_label, boundaries) if self.num_services() else []
+
+    def subproblem(self, service_indices: np.ndarray) -> 'PlacementProblem':
+        """
+        :param service_indices: indices of services, in ascending order
+        :return: the placement problem of only these services, at the same clouds
+        """
+        counts = np.diff(self.pair_offsets)[service_indices]
+        first_positions = np.cumsum(counts) - counts
+        pairs = np.repeat(self.pair_offsets[service_indices] - first_positions, counts) + np.arange(int(counts.sum()))
+        services = [self.services[s] for s in service_indices.tolist()] if self.services is not None else None
+        return PlacementProblem(services, self.clouds, self.memory_capacities,
+                                self.memory_requirements[service_indices], np.append(first_positions, len(pairs)),
+                                self.pair_clouds[pairs], self.pair_costs[pairs])
+
+    def current_cloud_indices(self) -> np.ndarray:
+        """
+        :return: the index of the current cloud of each service, -1 for services that aren't placed at any cloud
+        """
+        cloud_indices: Dict[Cloud, int] = dict((cloud, cloud_index) for cloud_index, cloud in enumerate(self.clouds))
+        return np.array([cloud_indices.get(s.get_cloud(), -1) for s in self.services], dtype=np.int64)
+
+
+def _static_cost_at_cloud(cloud_network: CloudNetwork,
+                          service_cost_function: ServiceCostFunction,
+                          service: Service,
+                          cloud: Cloud) -> float:
+    """
+    Evaluates the static placement cost of a service as if it was placed at a cloud.
+    """
+    owner = service.owner()
+    if isinstance(owner, User):
+        # this is a hack to evaluate the service cost for positions that don't exist
+        original_last_cloud = service.get_last_cloud()
+        original_cloud = service.get_cloud()
+        service.set_cloud(cloud)
+        placement_cost: float = service_cost_function.calculate_cost(cloud_network, service, []).placement_cost()
+        service.set_cloud(original_last_cloud)
+        service.set_cloud(original_cloud)
+        return placement_cost
+    else:
+        raise Exception('Expected a User as ServiceOwner!')
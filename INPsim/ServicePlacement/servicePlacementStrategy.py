@@ -17,11 +17,12 @@
 
 import abc
 import random
-from typing import List
+from typing import Any, Dict, List
 from INPsim.Network.Service import Service
 from INPsim.Network import CloudNetwork
 from INPsim.Network.User.Manager import UserManager
 from INPsim.ServicePlacement.Migration.Action import Action
+from INPsim.Utils.checkpointState import prefixed, unprefixed, python_random_state, restore_python_random_state
 
 
 class ServicePlacementStrategy:
@@ -44,6 +45,28 @@ class ServicePlacementStrategy:
         """
         pass
 
+    def get_performance_counters(self) -> Dict[str, int]:
+        """
+        :return: cumulative counters of the work that the strategy did so far, for profiling
+        """
+        return {}
+
+    def get_checkpoint_state(self, services: List[Service]) -> Dict[str, Any]:
+        """
+        Returns the state of the strategy, e.g. its random number generators, see INPsim.Utils.checkpointState.
+        :param services: all services in their checkpoint order. Services are stored as indices into this list.
+        :return: checkpoint state
+        """
+        return {}
+
+    def set_checkpoint_state(self, state: Dict[str, Any], services: List[Service]) -> None:
+        """
+        Restores a state from get_checkpoint_state.
+        :param state: checkpoint state
+        :param services: all services in their checkpoint order
+        """
+        pass
+
 
 class IndependentServicePlacementStrategy(ServicePlacementStrategy):
     """
@@ -55,6 +78,12 @@ class IndependentServicePlacementStrategy(ServicePlacementStrategy):
         self.rng = random.Random()
         self.rng.seed(6151)
 
+    def get_checkpoint_state(self, services: List[Service]) -> Dict[str, Any]:
+        return prefixed(python_random_state(self.rng), 'rng')
+
+    def set_checkpoint_state(self, state: Dict[str, Any], services: List[Service]) -> None:
+        restore_python_random_state(self.rng, unprefixed(state, 'rng'))
+
     def update_service_placements(
             self,
             cloud_network: CloudNetwork,
@@ -0,0 +1,103 @@
+# Copyright (C) 2020 Florian Brandherm
+# This file is part of flbrandh/MEC-Simulator-2-BigMEC <https://github.com/flbrandh/MEC-Simulator-2-BigMEC>.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with flbrandh/MEC-Simulator-2-BigMEC.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import random
+from unittest import TestCase
+import numpy as np
+from INPsim.Network.Service import Service
+from INPsim.ServicePlacement.myopicOptimalServicePlacementStrategy import MyopicOptimalServicePlacementStrategy
+from INPsim.ServicePlacement.myopicOptimalFlowServicePlacementStrategy import MyopicOptimalFlowServicePlacementStrategy, \
+    relative_optimality_gap
+from INPsim.ServicePlacement.test_myopicOptimalServicePlacementStrategy import candidate_problem
+
+
+class TestMyopicOptimalFlowServicePlacementStrategy(TestCase):
+
+    def random_problem(self, rng, memory_requirements, max_memory_capacity=6):
+        num_clouds = 8
+        memory_capacities = [rng.randint(2, max_memory_capacity) for _ in range(num_clouds - 1)] + [1000]
+        services = [Service(rng.choice(memory_requirements), 10) for _ in range(40)]
+        candidates = dict((service, sorted(rng.sample(range(num_clouds - 1), 3)) + [num_clouds - 1])
+                          for service in services)
+        cost_matrix = np.array([[rng.choice([0.0, 1.0, 2.0, 5.0, 20.0]) for _ in range(num_clouds)] for _ in services])
+        return candidate_problem(services, [None] * num_clouds, memory_capacities, candidates, cost_matrix)
+
+    def assert_feasible(self, problem, solution):
+        problem.pair_indices(solution)  # asserts that every service is placed at a candidate cloud
+        for c in range(problem.num_clouds()):
+            self.assertLessEqual(problem.memory_requirements[solution == c].sum(), problem.memory_capacities[c])
+
+    def test_assignment_is_optimal(self):
+        rng = random.Random(42)
+        for memory_requirements in ([1], [2], [0]):
+            for _ in range(20):
+                problem = self.random_problem(rng, memory_requirements)
+                solution = MyopicOptimalFlowServicePlacementStrategy._solve_assignment(problem, memory_requirements[0])
+                self.assert_feasible(problem, solution)
+                optimal_solution = MyopicOptimalServicePlacementStrategy._solve_new_model(problem)
+                self.assertAlmostEqual(problem.placement_cost(optimal_solution), problem.placement_cost(solution))
+
+    def test_assignment_with_non_binding_capacities_is_optimal(self):
+        rng = random.Random(42)
+        for _ in range(20):
+            # some clouds can hold all of their candidate services, others can't
+            problem = self.random_problem(rng, [1], max_memory_capacity=25)
+            solution = MyopicOptimalFlowServicePlacementStrategy._solve_assignment(problem, 1)
+            self.assert_feasible(problem, solution)
+            optimal_solution = MyopicOptimalServicePlacementStrategy._solve_new_model(problem)
+            self.assertAlmostEqual(problem.placement_cost(optimal_solution), problem.placement_cost(solution))
+
+    def test_rounded_lp_relaxation_is_feasible(self):
+        rng = random.Random(42)
+        for _ in range(20):
+            problem = self.random_problem(rng, [1, 2, 3])
+            solution = MyopicOptimalFlowServicePlacementStrategy._solve_rounded_lp_relaxation(problem)
+            self.assert_feasible(problem, solution)
+            optimal_solution = MyopicOptimalServicePlacementStrategy._solve_new_model(problem)
+            self.assertGreaterEqual(problem.placement_cost(solution), problem.placement_cost(optimal_solution) - 1e-9)
+
+    def test_infeasible(self):
+        rng = random.Random(42)
+        problem = self.random_problem(rng, [1])
+        problem.memory_capacities[-1] = 0
+        problem.memory_capacities[:-1] = 1
+        self.assertIsNone(MyopicOptimalFlowServicePlacementStrategy._solve_assignment(problem, 1))
+        self.assertIsNone(MyopicOptimalFlowServicePlacementStrategy._solve_rounded_lp_relaxation(problem))
+
+    def test_mean_optimality_gap(self):
+        rng = random.Random(42)
+        strategy = MyopicOptimalFlowServicePlacementStrategy(None, 1, compare_with_ilp=True)
+        self.assertIsNone(strategy.get_mean_optimality_gap())
+        for _ in range(5):
+            strategy._solve_placement_problem(self.random_problem(rng, [1]))
+        self.assertEqual(0.0, strategy.get_mean_optimality_gap())  # the assignment is exact
+        optimality_gaps = [0.0] * 5
+        for _ in range(5):
+            problem = self.random_problem(rng, [1, 2, 3])
+            cost = problem.placement_cost(strategy._solve_placement_problem(problem))
+            optimal_cost = problem.placement_cost(MyopicOptimalServicePlacementStrategy._solve_new_model(problem))
+            self.assertGreater(optimal_cost, 0.0)
+            optimality_gaps.append((cost - optimal_cost) / optimal_cost)
+        self.assertAlmostEqual(np.mean(optimality_gaps), strategy.get_mean_optimality_gap())
+        self.assertGreaterEqual(strategy.get_mean_optimality_gap(), 0.0)
+
+    def test_relative_optimality_gap(self):
+        self.assertEqual(0.0, relative_optimality_gap(4.0, 4.0))
+        self.assertEqual(0.0, relative_optimality_gap(0.0, 0.0))
+        self.assertEqual(3.0, relative_optimality_gap(8.0, 2.0))  # not bounded by 1
+        self.assertEqual(0.5, relative_optimality_gap(-1.0, -2.0))
+        self.assertIsNone(relative_optimality_gap(1.0, 0.0))
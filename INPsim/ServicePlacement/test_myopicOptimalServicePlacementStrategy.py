@@ -0,0 +1,169 @@
+# Copyright (C) 2020 Florian Brandherm
+# This file is part of flbrandh/MEC-Simulator-2-BigMEC <https://github.com/flbrandh/MEC-Simulator-2-BigMEC>.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with flbrandh/MEC-Simulator-2-BigMEC.  If not, see <http://www.gnu.org/licenses/>.
+
+
+
+import random
+from unittest import TestCase
+import numpy as np
+from INPsim.Network.Nodes.node import CloudNode, CloudBaseStation
+from INPsim.Network.Nodes.cloud import Cloud, LimitedMemoryCloud
+from INPsim.Network.connection import ConstantLatencyConnection
+from INPsim.Network.network import CloudNetwork
+from INPsim.Network.Service import Service
+from INPsim.Network.User.user import User
+from INPsim.Network.User.MovementModel.brownianModel import BrownianMovementModel
+from INPsim.ServicePlacement.Migration.CostFunctions import (LatencyCostFunction, PriorityBasedCostFunction,
+                                                            SquaredLatencyPlusMigrationCost, SLACostFunction)
+from INPsim.ServicePlacement.placementProblem import PlacementProblem, _static_cost_at_cloud
+from INPsim.ServicePlacement.myopicOptimalServicePlacementStrategy import MyopicOptimalServicePlacementStrategy, PersistentPlacementModel
+
+
+def candidate_problem(services, clouds, memory_capacities, candidates, cost_matrix):
+    """
+    Creates a placement problem in which the services can be placed at the clouds in candidates[service].
+    """
+    pair_services = np.repeat(np.arange(len(services)), [len(candidates[service]) for service in services])
+    pair_clouds = np.array([c for service in services for c in candidates[service]], dtype=np.int64)
+    return PlacementProblem(services, clouds, np.array(memory_capacities, dtype=np.float64),
+                            np.array([service.get_memory_requirement() for service in services], dtype=np.float64),
+                            np.cumsum([0] + [len(candidates[service]) for service in services]),
+                            pair_clouds, cost_matrix[pair_services, pair_clouds])
+
+
+class TestPersistentPlacementModel(TestCase):
+
+    def test_same_optimum_as_new_model(self):
+        rng = random.Random(42)
+        num_clouds = 8
+        memory_capacities = [rng.randint(2, 6) for _ in range(num_clouds - 1)] + [1000]
+        # the clouds only keep track of the current placement, their capacity is not enforced in between updates
+        clouds = [Cloud(CloudNode()) for _ in range(num_clouds)]
+        model = PersistentPlacementModel(np.array(memory_capacities, dtype=np.float64))
+        services = [Service(rng.randint(1, 3), 10) for _ in range(40)]
+        candidates = dict((service, sorted(rng.sample(range(num_clouds - 1), 3)) + [num_clouds - 1]) for service in services)
+        for _ in range(15):
+            # churn: services depart, arrive and change their candidate clouds
+            for service in rng.sample(services, 5):
+                services.remove(service)
+                if service.get_cloud():
+                    service.get_cloud().remove_service(service)
+            for _ in range(5):
+                service = Service(rng.randint(1, 3), 10)
+                services.append(service)
+                candidates[service] = sorted(rng.sample(range(num_clouds - 1), 3)) + [num_clouds - 1]
+            for service in rng.sample(services, 5):
+                candidates[service] = sorted(rng.sample(range(num_clouds - 1), 3)) + [num_clouds - 1]
+
+            cost_matrix = np.array([[rng.choice([1.0, 2.0, 5.0, 20.0]) for _ in range(num_clouds)] for _ in services])
+            problem = candidate_problem(services, clouds, memory_capacities, candidates, cost_matrix)
+            solution = model.solve(problem)
+            expected_solution = MyopicOptimalServicePlacementStrategy._solve_new_model(problem)
+            self.assertEqual(len(services), len(model))
+            self.assertAlmostEqual(cost_matrix[np.arange(len(services)), expected_solution].sum(),
+                                   cost_matrix[np.arange(len(services)), solution].sum())
+            for c, memory_capacity in enumerate(memory_capacities):
+                self.assertLessEqual(problem.memory_requirements[solution == c].sum(), memory_capacity)
+            for i, service in enumerate(services):
+                self.assertIn(solution[i], candidates[service])
+                clouds[solution[i]].add_service(service)
+        # only arriving services and services whose candidates changed were added
+        self.assertLessEqual(model.num_added_services, 40 + 15 * 10)
+
+
+class FirstCloudsCandidateSelector:
+
+    def __init__(self, clouds):
+        self._clouds = clouds
+
+    def get_candidate_clouds(self, service):
+        return self._clouds[:service.get_memory_requirement() + 1]
+
+
+class TestPlacementProblem(TestCase):
+
+    def test_cost_matrix_equals_per_pair_costs(self):
+        rng = random.Random(42)
+        nodes = [CloudBaseStation((rng.uniform(-5000, 5000), rng.uniform(-5000, 5000))) for _ in range(12)]
+        for node1, node2 in zip(nodes[:-1], nodes[1:-1]):  # the last node is not connected
+            ConstantLatencyConnection.connect_default_bidirectional(node1, node2)
+        for node in nodes[::3] + nodes[-1:]:
+            node.set_cloud(LimitedMemoryCloud(node, 20))
+        clouds = [node.get_cloud() for node in nodes[::3] + nodes[-1:]]
+        services = []
+        for _ in range(20):
+            user = User(BrownianMovementModel((0, 0), 1, rng), [])
+            service = Service(rng.randint(1, 3), 4, priority=rng.randint(0, 100))
+            user.add_service(service)
+            user.set_base_station(rng.choice(nodes))
+            if rng.random() < 0.8:
+                rng.choice(clouds).add_service(service)
+            services.append(service)
+
+        for backend in ('dense', 'sparse'):
+            network = CloudNetwork(nodes, central_cloud=clouds[0], distance_backend=backend)
+            for cost_function in (LatencyCostFunction(network), PriorityBasedCostFunction(network, 0, 1.5),
+                                  SquaredLatencyPlusMigrationCost(network, 0, 1.5), SLACostFunction(network, 0, 1.5)):
+                for selector in (None, FirstCloudsCandidateSelector(clouds[::-1])):
+                    problem = PlacementProblem.from_network(network, services, cost_function, selector)
+                    pair_services = problem.pair_services()
+                    expected_costs = [_static_cost_at_cloud(network, cost_function, services[s], clouds[c])
+                                      for s, c in zip(pair_services, problem.pair_clouds)]
+                    self.assertEqual(expected_costs, problem.pair_costs.tolist())
+                    for s, service in enumerate(services):
+                        expected_candidates = (range(len(clouds)) if selector is None else
+                                               sorted(clouds.index(c) for c in selector.get_candidate_clouds(service)))
+                        self.assertEqual(list(expected_candidates), problem.candidate_cloud_indices(s).tolist())
+                    self.assertEqual([clouds.index(s.get_cloud()) if s.get_cloud() else -1 for s in services],
+                                     problem.current_cloud_indices().tolist())
+
+
+class TestDecomposition(TestCase):
+
+    def test_decomposed_optimum(self):
+        rng = random.Random(42)
+        num_regions, clouds_per_region = 10, 3
+        num_clouds = num_regions * clouds_per_region + 1
+        # small regional clouds and a central cloud that isn't binding
+        memory_capacities = [rng.randint(1, 4) for _ in range(num_clouds - 1)] + [1000]
+        services = [Service(rng.randint(1, 2), 10) for _ in range(80)]
+        candidates = {}
+        for service in services:
+            region = rng.randrange(num_regions)
+            regional_clouds = range(region * clouds_per_region, (region + 1) * clouds_per_region)
+            candidates[service] = sorted(rng.sample(regional_clouds, rng.randint(1, clouds_per_region))) + [num_clouds - 1]
+        cost_matrix = np.array([[rng.choice([1.0, 2.0, 5.0, 20.0]) for _ in range(num_clouds)] for _ in services])
+        cost_matrix[:, -1] = 30.0
+        problem = candidate_problem(services, [None] * num_clouds, memory_capacities, candidates, cost_matrix)
+
+        groups = problem.independent_service_groups()
+        self.assertGreater(len(groups), 1)
+        self.assertEqual(list(range(len(services))), sorted(np.concatenate(groups).tolist()))
+        binding_clouds = problem.binding_clouds()
+        self.assertFalse(binding_clouds[-1])
+        group_clouds = [set(c for s in group.tolist() for c in candidates[services[s]] if binding_clouds[c])
+                        for group in groups]
+        for i in range(len(groups)):
+            for j in range(i):
+                self.assertFalse(group_clouds[i] & group_clouds[j])
+
+        optimal_cost = problem.placement_cost(MyopicOptimalServicePlacementStrategy._solve_new_model(problem))
+        for decomposition_workers in (1, 2):
+            strategy = MyopicOptimalServicePlacementStrategy(None, 1, decomposition_workers=decomposition_workers)
+            solution = strategy._solve_placement_problem(problem)
+            self.assertAlmostEqual(optimal_cost, problem.placement_cost(solution))
+            for c, memory_capacity in enumerate(memory_capacities):
+                self.assertLessEqual(problem.memory_requirements[solution == c].sum(), memory_capacity)
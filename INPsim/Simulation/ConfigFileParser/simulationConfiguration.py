@@ -15,6 +15,7 @@
 # along with flbrandh/MEC-Simulator-2-BigMEC.  If not, see <http://www.gnu.org/licenses/>.
 
 
+import logging
 from typing import Any, Dict, Tuple
 from INPsim.Simulation import simulator
 from INPsim.Simulation.StatisticsSimulationObserver import StatisticsSimulationObserver
@@ -25,6 +26,8 @@ import os
 from .version_0_1 import Version_0_1
 from .version_0_2 import Version_0_2
 
+logger = logging.getLogger(__name__)
+
 
 def configure_simulation(configuration: Dict[str, Any], configuration_path: str) -> Tuple[simulator.Simulation, StatisticsSimulationObserver, int]:
     """
@@ -36,7 +39,7 @@ def configure_simulation(configuration: Dict[str, Any], configuration_path: str)
     version = parse_str_options(configuration, 'version', ['0.1', '0.2'])
     newest_version = '0.2'
     if version != newest_version:
-        print("Warning: Configuration file version ", version, " is deprecated. Please update to version ", newest_version, ".")
+        logger.warning("Configuration file version %s is deprecated. Please update to version %s.", version, newest_version)
 
     if version == '0.1':
         return Version_0_1.configure_simulation(configuration, configuration_path)
@@ -31,7 +31,10 @@ from INPsim.ServicePlacement.Migration.Learning.learn import DQNMigrationAlgorit
 from INPsim.Network.Service import Service, ServiceModel, ConstantServiceModel, PrototypeBasedServiceConfigurator
 from INPsim.Network.User.Manager import UserManager, ConstantRandomUserManager, MobilityTraceUserManager
 from INPsim.Network.generator import generate_san_francisco_cloud_network
+from INPsim.Network.distances import DISTANCE_BACKENDS
+from INPsim.Network.networkCache import load_or_generate_san_francisco_cloud_network
 from INPsim.Network.network import CloudNetwork
+from INPsim.Network.RANModel import RANModel, NearestNeighborRANModel, RasterNearestNeighborRANModel
 from INPsim.Simulation import simulator
 from INPsim.Simulation.ConfigFileParser.parsingUtilities import parse_bool, parse_int, parse_non_negative_float, parse_non_negative_int, \
     parse_object, parse_str, parse_str_options
@@ -67,9 +70,12 @@ class Version_0_1:
                                                                                       network,
                                                                                       service_cost_function)
 
+        ran_model = Version_0_1.configure_ran_model(configuration, network)
+
         simulation = simulator.Simulation(cloud_network=network,
                                           user_manager=user_manager,
-                                          service_placement_strategy=service_placement_strategy)
+                                          service_placement_strategy=service_placement_strategy,
+                                          ran_model=ran_model)
 
         statistics_simulation_observer = StatisticsSimulationObserver(PerServiceGlobalAverageCostFunction(service_cost_function))
 
@@ -90,12 +96,26 @@ class Version_0_1:
             cloudlet_memory_capacity = parse_non_negative_int(network_config, 'cloudlet_memory_capacity')
             cloud_memory_capacity = parse_non_negative_int(network_config, 'cloud_memory_capacity')
             random_seed = parse_non_negative_int(network_config, 'random_seed', default_value=42)
-            network = generate_san_francisco_cloud_network(
-                    topology=topology,
-                    num_clouds=num_clouds,
-                    cloudlet_memory_capacity=cloudlet_memory_capacity,
-                    cloud_memory_capacity=cloud_memory_capacity,
-                    random_seed=random_seed)
+            distance_backend = parse_str_options(network_config, 'distance_backend', DISTANCE_BACKENDS,
+                                                 default_value='dense')
+            if 'cache_directory' in network_config:
+                # networks are cached on disk, keyed by all generator parameters
+                network = load_or_generate_san_francisco_cloud_network(
+                        cache_directory=parse_str(network_config, 'cache_directory'),
+                        topology=topology,
+                        num_clouds=num_clouds,
+                        cloudlet_memory_capacity=cloudlet_memory_capacity,
+                        cloud_memory_capacity=cloud_memory_capacity,
+                        random_seed=random_seed,
+                        distance_backend=distance_backend)
+            else:
+                network = generate_san_francisco_cloud_network(
+                        topology=topology,
+                        num_clouds=num_clouds,
+                        cloudlet_memory_capacity=cloudlet_memory_capacity,
+                        cloud_memory_capacity=cloud_memory_capacity,
+                        random_seed=random_seed,
+                        distance_backend=distance_backend)
             network_aabb = AABB2(
                     542688.443644256,
                     556765.7262020159,
@@ -103,6 +123,29 @@ class Version_0_1:
                     4185052.3668366373)  # Zone 10S, San Francisco (peninsula in the SF Bay)
             return network, network_aabb
 
+    @staticmethod
+    def configure_ran_model(configuration: Dict[str, Any], network: CloudNetwork) -> RANModel:
+        """
+        Configures the RAN model that assigns users to base stations. The 'ran_model' object is optional.
+        :param configuration: The root containing_object object.
+        :param network: The CloudNetwork Object that is used in the simulation.
+        :return: a configured RANModel
+        """
+        ran_model_config = configuration['ran_model'] if 'ran_model' in configuration else {}
+        ran_model_type = parse_str_options(ran_model_config, 'type', ['nearest_neighbor', 'raster'],
+                                           default_value='nearest_neighbor')
+        grid_resolution = parse_non_negative_int(ran_model_config, 'grid_resolution', default_value=40)
+        if ran_model_type == 'nearest_neighbor':
+            return NearestNeighborRANModel(network.base_stations(), grid_resolution)
+        elif ran_model_type == 'raster':
+            raster_subdivisions = parse_non_negative_int(ran_model_config, 'raster_subdivisions', default_value=16)
+            max_raster_memory_mb = parse_non_negative_float(ran_model_config, 'max_raster_memory_mb',
+                                                            default_value=64.0)
+            return RasterNearestNeighborRANModel(network.base_stations(),
+                                                 grid_resolution,
+                                                 raster_subdivisions=raster_subdivisions,
+                                                 max_raster_memory=max_raster_memory_mb * 2**20)
+
     @staticmethod
     def configure_cost_function(configuration: Dict[str, Any], network: CloudNetwork) -> ServiceCostFunction:
         """
@@ -351,6 +394,8 @@ class Version_0_1:
                     migration_strategy_config, 'network_depth')
             hparam.network_width = parse_non_negative_int(
                     migration_strategy_config, 'network_width')
+            hparam.inference_backend = parse_str_options(
+                    migration_strategy_config, 'inference_backend', ['numpy', 'keras'], default_value='numpy')
             hparam.max_num_services = 3
             hparam.initial_exploration_boost = 1e4  # 1e4
             hparam.discount_factor = parse_non_negative_float(
@@ -450,9 +495,17 @@ class Version_0_1:
         # configure the initial placement_cost strategy
         initial_placement_strategy = Version_0_1.configure_initial_placement_strategy(containing_object)
 
+        # parse the optional batched decision mode
+        migration_strategy_config = parse_object(containing_object, 'migration_strategy')
+        batched_decisions = parse_bool(migration_strategy_config, 'batched_decisions', default_value=False)
+        max_decision_batch_size = parse_int(migration_strategy_config, 'max_decision_batch_size', lower_bound=1,
+                                            default_value=64)
+
         return MigrationAlgorithmServicePlacementStrategy(
                 migration_algorithm=migration_algorithm,
                 cloud_network=network,
                 cost_function=service_cost_function,
                 migration_trigger=migration_trigger,
-                initial_placement_strategy=initial_placement_strategy)
+                initial_placement_strategy=initial_placement_strategy,
+                batched_decisions=batched_decisions,
+                max_decision_batch_size=max_decision_batch_size)
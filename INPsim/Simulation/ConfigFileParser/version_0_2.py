@@ -14,14 +14,14 @@
 # You should have received a copy of the GNU General Public License
 # along with flbrandh/MEC-Simulator-2-BigMEC.  If not, see <http://www.gnu.org/licenses/>.
 
-
+import os
 from typing import Any, Dict, Tuple, Optional
 
 from INPsim.Simulation import Simulation, StatisticsSimulationObserver
-from INPsim.ServicePlacement import ServicePlacementStrategy, StaticGreedyServicePlacementStrategy, MyopicOptimalServicePlacementStrategy
+from INPsim.ServicePlacement import ServicePlacementStrategy, StaticGreedyServicePlacementStrategy, MyopicOptimalServicePlacementStrategy, MyopicOptimalFlowServicePlacementStrategy
 from INPsim.Network.network import CloudNetwork
 from INPsim.ServicePlacement.Migration.CostFunctions import PerServiceGlobalAverageCostFunction, ServiceCostFunction
-from INPsim.Simulation.ConfigFileParser.parsingUtilities import parse_non_negative_int, parse_object, parse_str_options
+from INPsim.Simulation.ConfigFileParser.parsingUtilities import parse_bool, parse_int, parse_non_negative_int, parse_object, parse_str_options
 from INPsim.ServicePlacement.Migration.CloudCandidateSelector import DestinationCloudCandidateSelectorInterface, KnnBaseStationNeighborhoodBasedCandidateSelector
 from .version_0_1 import Version_0_1
 
@@ -55,9 +55,12 @@ class Version_0_2:
                                                                                       network,
                                                                                       service_cost_function)
 
+        ran_model = Version_0_1.configure_ran_model(configuration, network)
+
         simulation = Simulation(cloud_network=network,
                                 user_manager=user_manager,
-                                service_placement_strategy=service_placement_strategy)
+                                service_placement_strategy=service_placement_strategy,
+                                ran_model=ran_model)
 
         statistics_simulation_observer = StatisticsSimulationObserver(PerServiceGlobalAverageCostFunction(service_cost_function))
 
@@ -78,7 +81,7 @@ class Version_0_2:
         """
 
         service_placement_strategy_object: Dict[str, Any] = parse_object(containing_object, 'service_placement_strategy')
-        strategy_type: str = parse_str_options(service_placement_strategy_object, 'type', ['independent', 'static-greedy', 'myopic-optimal'])
+        strategy_type: str = parse_str_options(service_placement_strategy_object, 'type', ['independent', 'static-greedy', 'myopic-optimal', 'myopic-optimal-flow'])
 
         if strategy_type == 'independent':
             return Version_0_1.configure_service_placement_strategy(service_placement_strategy_object,
@@ -87,14 +90,27 @@ class Version_0_2:
                                                                     service_cost_function)
         elif strategy_type == 'static-greedy':
             return StaticGreedyServicePlacementStrategy()
-        elif strategy_type == 'myopic-optimal':
+        elif strategy_type in ('myopic-optimal', 'myopic-optimal-flow'):
             update_interval = parse_non_negative_int(service_placement_strategy_object, 'update-interval')
             neighborhood: Optional[DestinationCloudCandidateSelectorInterface] = None
             if "neighborhood_size" in service_placement_strategy_object:
                 neighborhood_size = parse_non_negative_int(service_placement_strategy_object, "neighborhood_size")
                 neighborhood = KnnBaseStationNeighborhoodBasedCandidateSelector(neighborhood_size, network)
+            if strategy_type == 'myopic-optimal-flow':
+                compare_with_ilp = parse_bool(service_placement_strategy_object, "compare_with_ilp", False)
+                return MyopicOptimalFlowServicePlacementStrategy(service_cost_function=service_cost_function,
+                                                                 update_interval=update_interval,
+                                                                 cloud_candidate_selector=neighborhood,
+                                                                 compare_with_ilp=compare_with_ilp)
+            persistent_model = parse_bool(service_placement_strategy_object, "persistent_model", False)
+            decomposition_workers = 0
+            if parse_bool(service_placement_strategy_object, "decomposition", False):
+                decomposition_workers = parse_int(service_placement_strategy_object, "decomposition_workers", 1,
+                                                  default_value=os.cpu_count() or 1)
             return MyopicOptimalServicePlacementStrategy(service_cost_function=service_cost_function,
                                                          update_interval=update_interval,
-                                                         cloud_candidate_selector=neighborhood)
+                                                         cloud_candidate_selector=neighborhood,
+                                                         persistent_model=persistent_model,
+                                                         decomposition_workers=decomposition_workers)
         else:
             raise Exception('Service placement_cost strategy "' + strategy_type + 'does not exist!')
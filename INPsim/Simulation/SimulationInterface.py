@@ -16,7 +16,7 @@
 
 
 from abc import abstractmethod
-from typing import Iterable, Optional
+from typing import Any, Dict, Iterable, List, Optional
 from .SimulationObserver import SimulationObserver
 from INPsim.Network.network import CloudNetwork
 from INPsim.Network.Service.service import Service
@@ -59,6 +59,14 @@ class SimulationInterface:
         :return: iterable of users
         """
 
+    @abstractmethod
+    def get_relocated_users(self) -> List[User]:
+        """
+        Returns the users whose base station changed during the last simulation step.
+        :return: list of users
+        """
+        pass
+
     @abstractmethod
     def get_cloud_network(self) -> CloudNetwork:
         """
@@ -90,6 +98,22 @@ class SimulationInterface:
         """
         pass
 
+    @abstractmethod
+    def get_checkpoint_state(self) -> Dict[str, Any]:
+        """
+        Returns the state of the simulation as flat arrays, see INPsim.Utils.checkpointState.
+        :return: checkpoint state
+        """
+        pass
+
+    @abstractmethod
+    def set_checkpoint_state(self, state: Dict[str, Any]) -> None:
+        """
+        Restores a state from get_checkpoint_state.
+        :param state: checkpoint state
+        """
+        pass
+
     @abstractmethod
     def simulate(self, num_steps: int, observer: Optional[SimulationObserver] = None) -> None:
         """
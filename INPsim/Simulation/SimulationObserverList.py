@@ -15,10 +15,11 @@
 # along with flbrandh/MEC-Simulator-2-BigMEC.  If not, see <http://www.gnu.org/licenses/>.
 
 
-from typing import Tuple, Iterable
+from typing import Tuple, Iterable, Optional
 from .SimulationObserver import SimulationObserver
 from .SimulationInterface import SimulationInterface
 from INPsim.ServicePlacement.Migration.Action import Action
+from INPsim.Utils.profiler import PhaseProfiler
 
 
 class SimulationObserverList (SimulationObserver):
@@ -31,6 +32,14 @@ class SimulationObserverList (SimulationObserver):
         Initializes the obj with a list of configured_simulation observers that are called sequentially for every method.
         """
         self.simulation_observers: Tuple[SimulationObserver] = simulation_observers
+        self._profiler: Optional[PhaseProfiler] = None
+
+    def set_profiler(self, profiler: Optional[PhaseProfiler]) -> None:
+        """
+        Sets a profiler that records the time spent in each observer (as phase 'observer:<class name>'), or None.
+        :param profiler: PhaseProfiler or None
+        """
+        self._profiler = profiler
 
     def before_simulation_step(self, simulator: SimulationInterface) -> None:
         """
@@ -38,8 +47,13 @@ class SimulationObserverList (SimulationObserver):
         :param simulator: Simulator that is observed
         :return: None
         """
+        profiler = self._profiler
         for simulation_observer in self.simulation_observers:
+            if profiler:
+                start = profiler.clock()
             simulation_observer.before_simulation_step(simulator)
+            if profiler:
+                profiler.add_duration('observer:' + type(simulation_observer).__name__, start, profiler.clock())
 
     def after_simulation_step(self, simulator: SimulationInterface, actions: Iterable[Action]) -> None:
         """
@@ -48,5 +62,10 @@ class SimulationObserverList (SimulationObserver):
         :param actions: A list of all actions that happened during the step.
         :return: None
         """
+        profiler = self._profiler
         for simulation_observer in self.simulation_observers:
+            if profiler:
+                start = profiler.clock()
             simulation_observer.after_simulation_step(simulator, actions)
+            if profiler:
+                profiler.add_duration('observer:' + type(simulation_observer).__name__, start, profiler.clock())
@@ -15,7 +15,8 @@
 # along with flbrandh/MEC-Simulator-2-BigMEC.  If not, see <http://www.gnu.org/licenses/>.
 
 
-from typing import DefaultDict, Optional, List, Iterable
+import logging
+from typing import Any, DefaultDict, Dict, Optional, List, Iterable
 from collections import defaultdict
 import numpy as np
 from INPsim.Network.Service.service import Service
@@ -24,32 +25,80 @@ from INPsim.Network.Nodes.cloud import Cloud
 from INPsim.ServicePlacement.Migration.Action import Action, MigrationAction
 from .SimulationObserver import SimulationObserver
 from .SimulationInterface import SimulationInterface
-from INPsim.ServicePlacement.Migration.CostFunctions import GlobalCostFunction
+from .incrementalStatistics import IncrementalStatisticsEngine
+from INPsim.Utils.checkpointState import prefixed
+from INPsim.ServicePlacement.Migration.CostFunctions import GlobalCostFunction, PerServiceGlobalAverageCostFunction, ServiceCostFunction
+
+logger = logging.getLogger(__name__)
+
+
+# the per-step statistics and their types
+_SERIES = (('global_cost', np.float64),
+           ('dissatisfaction_rate', np.float64),
+           ('num_migrations', np.int64),
+           ('avg_latency', np.float64),
+           ('num_services', np.int64),
+           ('num_services_at_cloud', np.int64))
 
 
 class StatisticsSimulationObserver(SimulationObserver):
     """
     A SimulationObserver that collects many useful statistics.
+    The statistics of each step are stored in preallocated arrays, which are exposed as the attributes global_cost,
+    dissatisfaction_rate, num_migrations, avg_latency, num_services and num_services_at_cloud (with one entry per step).
+    By default, the statistics are computed incrementally by an IncrementalStatisticsEngine, which only re-evaluates
+    the services that were affected by a step.
     TODO: separate this into many different classes for each statistic?
     """
 
-    def __init__(self, global_cost_function: GlobalCostFunction) -> None:
+    def __init__(self, global_cost_function: GlobalCostFunction, incremental: bool = True) -> None:
         """
         Initializes all statistics.
+        :param global_cost_function: the global cost function
+        :param incremental: if True, the statistics are computed incrementally. Otherwise, all services are evaluated in
+                            every step. The global cost can only be computed incrementally for a
+                            PerServiceGlobalAverageCostFunction.
         """
         self._global_cost_function = global_cost_function
+        self._service_cost_function: Optional[ServiceCostFunction] = None
+        if isinstance(global_cost_function, PerServiceGlobalAverageCostFunction):
+            self._service_cost_function = global_cost_function.get_service_cost_function()
+        self._statistics_engine: Optional[IncrementalStatisticsEngine] = None
+        if incremental:
+            self._statistics_engine = IncrementalStatisticsEngine(self._service_cost_function)
 
-        self.global_cost: List[float] = []
-        self.dissatisfaction_rate: List[float] = []
-        self.num_migrations: List[int] = []
-        self.avg_latency: List[float] = []
-        self.num_services: List[int] = []
-        self.num_services_at_cloud: List[int] = []
+        self._num_steps = 0
+        self._series: Dict[str, np.ndarray] = dict((name, np.zeros(1024, dtype=dtype)) for name, dtype in _SERIES)
+        self._summed_avg_latency = 0.0
 
         # temporary variable to snapshot the placement_cost config before a
         # step to compare against it afterwards:
         #self.previous_placement: DefaultDict[Service, Optional[Cloud]] = defaultdict(lambda: None)
 
+    @property
+    def global_cost(self) -> np.ndarray:
+        return self._series['global_cost'][:self._num_steps]
+
+    @property
+    def dissatisfaction_rate(self) -> np.ndarray:
+        return self._series['dissatisfaction_rate'][:self._num_steps]
+
+    @property
+    def num_migrations(self) -> np.ndarray:
+        return self._series['num_migrations'][:self._num_steps]
+
+    @property
+    def avg_latency(self) -> np.ndarray:
+        return self._series['avg_latency'][:self._num_steps]
+
+    @property
+    def num_services(self) -> np.ndarray:
+        return self._series['num_services'][:self._num_steps]
+
+    @property
+    def num_services_at_cloud(self) -> np.ndarray:
+        return self._series['num_services_at_cloud'][:self._num_steps]
+
     def before_simulation_step(self, simulator: SimulationInterface) -> None:
         """
         This method is called before each configured_simulation step.
@@ -124,19 +173,68 @@ class StatisticsSimulationObserver(SimulationObserver):
         return num_migrations
 
     def __add_simulation_step(self, sim: SimulationInterface, actions: List[Action]) -> None:
-        self.global_cost.append(self.get_global_cost(sim, actions))
-        num_services = sim.get_num_services()
-        if num_services > 0:
-            self.dissatisfaction_rate.append(self.get_num_dissatisfied_services(sim) / num_services)
+        num_migrations = self.get_num_migrations(sim, actions)
+        num_services_at_cloud = len(sim.get_cloud_network().central_cloud().services())
+        engine = self._statistics_engine
+        if engine is not None:
+            engine.update(sim.get_cloud_network(), sim.get_user_manager(), sim.get_relocated_users(), actions)
+            num_services = len(engine)
+            if self._service_cost_function is not None:
+                transition_cost = sum(self._service_cost_function.calculate_action_transition_cost(sim.get_cloud_network(), action)
+                                      for action in actions)
+                global_cost = (engine.total_static_cost() + transition_cost) / num_services if num_services > 0 else 0.0
+            else:
+                global_cost = self.get_global_cost(sim, actions)
+            dissatisfaction_rate = engine.num_dissatisfied() / num_services if num_services > 0 else 0.0
+            avg_latency = engine.total_latency() / num_services if num_services > 0 else 0.0
         else:
-            self.dissatisfaction_rate.append(0)
-        self.num_migrations.append(self.get_num_migrations(sim, actions))
-
-        self.avg_latency.append(self.get_avg_latency(sim))
-        print("avg avg latency:", np.mean(self.avg_latency))
-        self.num_services.append(len(list(sim.get_services())))
-        self.num_services_at_cloud.append(len(sim.get_cloud_network().central_cloud().services()))
+            global_cost = self.get_global_cost(sim, actions)
+            num_services = sim.get_num_services()
+            if num_services > 0:
+                dissatisfaction_rate = self.get_num_dissatisfied_services(sim) / num_services
+            else:
+                dissatisfaction_rate = 0
+            avg_latency = self.get_avg_latency(sim)
+
+        if self._num_steps == len(self._series['global_cost']):
+            for name, series in self._series.items():
+                self._series[name] = np.concatenate([series, np.zeros_like(series)])
+        step = self._num_steps
+        self._series['global_cost'][step] = global_cost
+        self._series['dissatisfaction_rate'][step] = dissatisfaction_rate
+        self._series['num_migrations'][step] = num_migrations
+        self._series['avg_latency'][step] = avg_latency
+        self._series['num_services'][step] = num_services
+        self._series['num_services_at_cloud'][step] = num_services_at_cloud
+        self._num_steps += 1
+        self._summed_avg_latency += avg_latency
+        logger.debug("avg avg latency: %f", self._summed_avg_latency / self._num_steps)
         # self.avg_latency_lower_bound.append(self.get_avg_latency_lower_bound(configured_simulation))
 
     def get_num_steps(self) -> int:
-        return len(self.global_cost)
+        return self._num_steps
+
+    def get_checkpoint_state(self) -> Dict[str, Any]:
+        """
+        Returns the statistics of all steps so far, see INPsim.Utils.checkpointState.
+        :return: checkpoint state
+        """
+        state: Dict[str, Any] = {'num_steps': self._num_steps, 'summed_avg_latency': self._summed_avg_latency}
+        state.update(prefixed(dict((name, series[:self._num_steps]) for name, series in self._series.items()),
+                              'series'))
+        return state
+
+    def set_checkpoint_state(self, state: Dict[str, Any]) -> None:
+        """
+        Restores a state from get_checkpoint_state. The cached values of the incremental statistics are not part of
+        the state, all services are evaluated again in the next step.
+        :param state: checkpoint state
+        """
+        self._num_steps = state['num_steps']
+        self._summed_avg_latency = state['summed_avg_latency']
+        capacity = max(1024, self._num_steps)
+        for name, dtype in _SERIES:
+            self._series[name] = np.zeros(capacity, dtype=dtype)
+            self._series[name][:self._num_steps] = state['series/' + name]
+        if self._statistics_engine is not None:
+            self._statistics_engine.reset()
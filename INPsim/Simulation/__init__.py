@@ -20,3 +20,4 @@ from .SimulationInterface import SimulationInterface
 from .SimulationObserver import SimulationObserver
 from .SimulationObserverList import SimulationObserverList
 from .StatisticsSimulationObserver import StatisticsSimulationObserver
+from .checkpointSimulationObserver import CheckpointSimulationObserver, restore_checkpoint
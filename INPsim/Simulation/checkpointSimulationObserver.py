@@ -0,0 +1,98 @@
+# Copyright (C) 2020 Florian Brandherm
+# This file is part of flbrandh/MEC-Simulator-2-BigMEC <https://github.com/flbrandh/MEC-Simulator-2-BigMEC>.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with flbrandh/MEC-Simulator-2-BigMEC.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import logging
+from typing import Any, Dict, Mapping, Optional
+from .SimulationObserver import SimulationObserver
+from .SimulationInterface import SimulationInterface
+from INPsim.Utils.checkpointState import prefixed, unprefixed, read_checkpoint, write_checkpoint
+from INPsim.Utils.metricsSink import BufferedMetricsSink
+
+logger = logging.getLogger(__name__)
+
+
+class CheckpointSimulationObserver(SimulationObserver):
+    """
+    Periodically writes a checkpoint of the simulation, from which an interrupted run can be resumed with
+    restore_checkpoint().
+    Besides the simulation, the checkpoint contains the state of additional components (objects with
+    get_checkpoint_state() and set_checkpoint_state(state) methods, e.g. a StatisticsSimulationObserver) and the number
+    of rows of the metrics sinks, which are flushed before the checkpoint is written.
+    The checkpoint is taken at the beginning of a step, when the previous step is completely observed, and overwrites
+    the previous checkpoint atomically.
+    """
+
+    def __init__(self,
+                 path: str,
+                 interval: int,
+                 components: Optional[Mapping[str, Any]] = None,
+                 metrics_sinks: Optional[Mapping[str, BufferedMetricsSink]] = None,
+                 first_step: int = 0) -> None:
+        """
+        :param path: path of the checkpoint file (.npz)
+        :param interval: number of steps between two checkpoints
+        :param components: additional components, by name
+        :param metrics_sinks: metrics sinks whose rows belong to the checkpointed steps, by name
+        :param first_step: the step at which the simulation starts, e.g. when it was resumed from a checkpoint. No
+                           checkpoint is written at this step.
+        """
+        if interval <= 0:
+            raise ValueError('The checkpoint interval must be positive.')
+        self._path = path
+        self._interval = interval
+        self._components = dict(components) if components else {}
+        self._metrics_sinks = dict(metrics_sinks) if metrics_sinks else {}
+        self._first_step = first_step
+
+    def before_simulation_step(self, simulation: SimulationInterface) -> None:
+        step = simulation.get_current_step()
+        if step > self._first_step and step % self._interval == 0:
+            self.write(simulation)
+
+    def write(self, simulation: SimulationInterface) -> None:
+        """
+        Writes a checkpoint of the current state.
+        :param simulation: the simulation, which must not be in the middle of a step
+        """
+        state = prefixed(simulation.get_checkpoint_state(), 'simulation')
+        for name, component in self._components.items():
+            state.update(prefixed(component.get_checkpoint_state(), 'components/' + name))
+        for name, metrics_sink in self._metrics_sinks.items():
+            metrics_sink.flush()
+            state['metrics_sinks/' + name + '/num_rows'] = len(metrics_sink)
+        write_checkpoint(self._path, state)
+        logger.info('wrote checkpoint of step %d to %s', simulation.get_current_step(), self._path)
+
+
+def restore_checkpoint(path: str,
+                       simulation: SimulationInterface,
+                       components: Optional[Mapping[str, Any]] = None) -> Dict[str, int]:
+    """
+    Restores a checkpoint that was written by a CheckpointSimulationObserver. The simulation and the components must be
+    configured like the ones that the checkpoint was taken from.
+    :param path: path of the checkpoint file
+    :param simulation: the simulation
+    :param components: the additional components, by name
+    :return: the number of rows of each metrics sink at the time of the checkpoint, by name
+    """
+    state = read_checkpoint(path)
+    simulation.set_checkpoint_state(unprefixed(state, 'simulation'))
+    if components:
+        for name, component in components.items():
+            component.set_checkpoint_state(unprefixed(state, 'components/' + name))
+    metrics_sink_rows = unprefixed(state, 'metrics_sinks')
+    return dict((name[:-len('/num_rows')], num_rows) for name, num_rows in metrics_sink_rows.items())
@@ -0,0 +1,184 @@
+# Copyright (C) 2020 Florian Brandherm
+# This file is part of flbrandh/MEC-Simulator-2-BigMEC <https://github.com/flbrandh/MEC-Simulator-2-BigMEC>.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with flbrandh/MEC-Simulator-2-BigMEC.  If not, see <http://www.gnu.org/licenses/>.
+
+
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+
+from INPsim.Network.network import CloudNetwork
+from INPsim.Network.Service.service import Service
+from INPsim.Network.User.user import User
+from INPsim.Network.User.Manager import UserManager
+from INPsim.ServicePlacement.Migration.Action import Action, NoMigrationAction
+from INPsim.ServicePlacement.Migration.CostFunctions import ServiceCostFunction
+
+
+class IncrementalStatisticsEngine:
+    """
+    Keeps the sums of the latency, the number of dissatisfied services and (optionally) the static cost of all services
+    up to date, without evaluating all services in every step.
+    The values of each service are cached in slot arrays (the slots are kept dense, like in PopulationMovementEngine).
+    A service is only re-evaluated if it may have changed: if its user arrived or changed the base station, or if it is
+    the subject of an action other than a NoMigrationAction. This assumes that the latency and static cost of a service only depend on its cloud and
+    on the base station of its user.
+    The running sums are recomputed from the cached values every resync_interval updates, so that floating point
+    errors of the incremental updates don't accumulate.
+    """
+
+    def __init__(self, service_cost_function: Optional[ServiceCostFunction] = None, resync_interval: int = 1000) -> None:
+        """
+        :param service_cost_function: the cost function whose static cost is summed up. If None, only latencies and
+                                      dissatisfaction are tracked.
+        :param resync_interval: number of updates between recomputations of the sums
+        """
+        self._service_cost_function = service_cost_function
+        self._resync_interval = resync_interval
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Forgets all services, so that all services are evaluated again by the next update, e.g. after the simulation
+        was restored from a checkpoint.
+        """
+        self._num_updates = 0
+        self._initialized = False
+        self._size = 0
+        self._slots: Dict[Service, int] = {}
+        self._services: List[Optional[Service]] = []
+        self._latencies = np.zeros(0)
+        self._dissatisfied = np.zeros(0)
+        self._static_costs = np.zeros(0)
+        # the services of each known user, because departed users don't own their services anymore
+        self._user_services: Dict[User, List[Service]] = {}
+        self._total_latency = 0.0
+        self._num_dissatisfied = 0.0
+        self._total_static_cost = 0.0
+
+    def __len__(self) -> int:
+        """
+        :return: the number of tracked services
+        """
+        return self._size
+
+    def total_latency(self) -> float:
+        return self._total_latency
+
+    def num_dissatisfied(self) -> int:
+        return int(round(self._num_dissatisfied))
+
+    def total_static_cost(self) -> float:
+        return self._total_static_cost
+
+    def update(self,
+               cloud_network: CloudNetwork,
+               user_manager: UserManager,
+               relocated_users: Iterable[User],
+               actions: Iterable[Action]) -> None:
+        """
+        Updates the statistics after a simulation step. On the first call, all services are evaluated.
+        :param cloud_network: the cloud network
+        :param user_manager: the user manager
+        :param relocated_users: the users whose base station changed during the step
+        :param actions: the actions that were performed during the step
+        """
+        if not self._initialized:
+            for user in user_manager.users():
+                self._add_user(cloud_network, user)
+            self._initialized = True
+        else:
+            for user in user_manager.departed_users():
+                self._remove_user(user)
+            users = user_manager.users()
+            for user in user_manager.arrived_users():
+                if user in users:  # the user might have departed in the same step
+                    self._add_user(cloud_network, user)
+            for user in relocated_users:
+                for service in self._user_services.get(user, []):
+                    self._evaluate(cloud_network, service)
+            for action in actions:
+                if isinstance(action, NoMigrationAction):
+                    continue  # the service stayed at its cloud
+                service = action.get_service()
+                if service in self._slots:
+                    self._evaluate(cloud_network, service)
+
+        self._num_updates += 1
+        if self._num_updates % self._resync_interval == 0:
+            self.resync()
+
+    def resync(self) -> None:
+        """
+        Recomputes the sums from the cached values of the services.
+        """
+        self._total_latency = float(self._latencies[:self._size].sum())
+        self._num_dissatisfied = float(self._dissatisfied[:self._size].sum())
+        self._total_static_cost = float(self._static_costs[:self._size].sum())
+
+    def _add_user(self, cloud_network: CloudNetwork, user: User) -> None:
+        services = list(user.services())
+        self._user_services[user] = services
+        for service in services:
+            if self._size == len(self._services):
+                self._grow(max(64, 2 * self._size))
+            slot = self._size
+            self._size += 1
+            self._slots[service] = slot
+            self._services[slot] = service
+            self._latencies[slot] = self._dissatisfied[slot] = self._static_costs[slot] = 0.0
+            self._evaluate(cloud_network, service)
+
+    def _remove_user(self, user: User) -> None:
+        for service in self._user_services.pop(user, []):
+            slot = self._slots.pop(service)
+            self._total_latency -= self._latencies[slot]
+            self._num_dissatisfied -= self._dissatisfied[slot]
+            self._total_static_cost -= self._static_costs[slot]
+            # move the last slot into the gap
+            last_slot = self._size - 1
+            if slot != last_slot:
+                last_service = self._services[last_slot]
+                self._services[slot] = last_service
+                self._slots[last_service] = slot
+                self._latencies[slot] = self._latencies[last_slot]
+                self._dissatisfied[slot] = self._dissatisfied[last_slot]
+                self._static_costs[slot] = self._static_costs[last_slot]
+            self._services[last_slot] = None
+            self._size -= 1
+
+    def _grow(self, capacity: int) -> None:
+        for name in ('_latencies', '_dissatisfied', '_static_costs'):
+            array = getattr(self, name)
+            new_array = np.zeros(capacity)
+            new_array[:len(array)] = array
+            setattr(self, name, new_array)
+        self._services.extend([None] * (capacity - len(self._services)))
+
+    def _evaluate(self, cloud_network: CloudNetwork, service: Service) -> None:
+        """
+        Re-evaluates a service and updates the sums by the difference to its previous values.
+        """
+        slot = self._slots[service]
+        latency = service.measured_latency(cloud_network)
+        dissatisfied = 0.0 if latency <= service.get_latency_requirement() else 1.0
+        static_cost = 0.0
+        if self._service_cost_function is not None:
+            static_cost = self._service_cost_function.calculate_static_cost(cloud_network, service)
+        self._total_latency += latency - self._latencies[slot]
+        self._num_dissatisfied += dissatisfied - self._dissatisfied[slot]
+        self._total_static_cost += static_cost - self._static_costs[slot]
+        self._latencies[slot] = latency
+        self._dissatisfied[slot] = dissatisfied
+        self._static_costs[slot] = static_cost
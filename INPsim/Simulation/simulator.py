@@ -15,21 +15,25 @@
 # along with flbrandh/MEC-Simulator-2-BigMEC.  If not, see <http://www.gnu.org/licenses/>.
 
 
-from typing import Optional, Iterable, List
+import logging
+from typing import Any, Dict, Optional, Iterable, List
 import numpy as np
 
 from .SimulationInterface import SimulationInterface
 from .SimulationObserver import SimulationObserver
 
-from INPsim.Network.RANModel import NearestNeighborRANModel
+from INPsim.Network.RANModel import RANModel, NearestNeighborRANModel
 from INPsim.Network.network import CloudNetwork
 from INPsim.Network.Nodes.cloud import Cloud
 from INPsim.ServicePlacement import ServicePlacementStrategy
 from INPsim.Network.User.user import User
 from INPsim.Network.User.Manager.userManager import UserManager
 from INPsim.Network.Service.service import Service
-from INPsim.ServicePlacement.Migration.Action import Action
+from INPsim.ServicePlacement.Migration.Action import Action, MigrationAction
+from INPsim.Utils.profiler import PhaseProfiler
+from INPsim.Utils.checkpointState import prefixed, unprefixed
 
+logger = logging.getLogger(__name__)
 
 
 class Simulation(SimulationInterface):
@@ -37,20 +41,34 @@ class Simulation(SimulationInterface):
     def __init__(self,
                  cloud_network: CloudNetwork,
                  user_manager: UserManager,
-                 service_placement_strategy: ServicePlacementStrategy) -> None:
+                 service_placement_strategy: ServicePlacementStrategy,
+                 ran_model: Optional[RANModel] = None) -> None:
         """
         Configures a simulation with a specific setup.
         :param self: self
         :param cloud_network: The cloud network that defines the clouds' positions and internetworking.
         :param user_manager: UserManager that manages users and their movement.
         :param service_placement_strategy: The service placement_cost strategy of the simulation.
+        :param ran_model: The RANModel that assigns users to base stations. By default, users are assigned to the closest base station.
         """
         self._time_step = 1  # time step is one second.
         self._current_step = 0
         self._user_manager = user_manager
         self._cloud_network = cloud_network
-        self._ran_model = NearestNeighborRANModel(self._cloud_network.base_stations(), 40)
+        if ran_model is None:
+            ran_model = NearestNeighborRANModel(self._cloud_network.base_stations(), 40)
+        self._ran_model = ran_model
         self._service_placement_strategy = service_placement_strategy
+        # users whose base station changed during the last step
+        self._relocated_users: List[User] = []
+        self._profiler: Optional[PhaseProfiler] = None
+
+    def set_profiler(self, profiler: Optional[PhaseProfiler]) -> None:
+        """
+        Sets a profiler that records the duration of each phase of every step, or None to disable profiling.
+        :param profiler: PhaseProfiler or None
+        """
+        self._profiler = profiler
 
     def get_service_placement_strategy(self) -> ServicePlacementStrategy:
         """
@@ -101,6 +119,13 @@ class Simulation(SimulationInterface):
         """
         return self._user_manager.num_services()
 
+    def get_relocated_users(self) -> List[User]:
+        """
+        Returns the users whose base station changed during the last step.
+        :return: list of users
+        """
+        return self._relocated_users
+
     def get_current_step(self) -> int:
         """
         Returns the index of the current/last finished step.
@@ -108,6 +133,40 @@ class Simulation(SimulationInterface):
         """
         return self._current_step
 
+    def get_checkpoint_state(self) -> Dict[str, Any]:
+        """
+        Returns the state of the simulation as flat arrays (see INPsim.Utils.checkpointState): the step, the users and
+        their services and the state of the service placement strategy. The cloud network is immutable, so only its
+        identity is stored.
+        :return: checkpoint state
+        """
+        state = {'current_step': self._current_step,
+                 'network_cache_key': self._cloud_network.cache_key(),
+                 'network_fingerprint': self._cloud_network.fingerprint()}
+        state.update(prefixed(self._user_manager.get_checkpoint_state(self._cloud_network), 'user_manager'))
+        state.update(prefixed(self._service_placement_strategy.get_checkpoint_state(
+            self._user_manager.checkpoint_services()), 'strategy'))
+        return state
+
+    def set_checkpoint_state(self, state: Dict[str, Any]) -> None:
+        """
+        Restores a state from get_checkpoint_state. The simulation must be configured like the one that the state was
+        taken from, e.g. from the same configuration file.
+        :param state: checkpoint state
+        """
+        cache_key = self._cloud_network.cache_key()
+        if state['network_cache_key'] is not None and cache_key is not None \
+                and state['network_cache_key'] != cache_key:
+            raise Exception('The checkpoint was taken with network ' + state['network_cache_key'] +
+                            ', but the simulation uses network ' + cache_key + '.')
+        if state['network_fingerprint'] != self._cloud_network.fingerprint():
+            raise Exception('The checkpoint was taken with a different cloud network.')
+        self._user_manager.set_checkpoint_state(unprefixed(state, 'user_manager'), self._cloud_network)
+        self._service_placement_strategy.set_checkpoint_state(unprefixed(state, 'strategy'),
+                                                              self._user_manager.checkpoint_services())
+        self._current_step = state['current_step']
+        self._relocated_users = []
+
     def simulate(self, num_steps: int, observer: Optional[SimulationObserver] = None) -> None:
         """
         Executes a specified number of configured_simulation steps.
@@ -121,45 +180,88 @@ class Simulation(SimulationInterface):
     def __assign_users_to_base_stations(self, users: Iterable[User]) -> None:
         """
         Assigns the users to their new base stations if their closest base station changed since the last step.
+        All users are looked up with one batched query of the RAN model.
         :param users: list of users
         """
-        for user in users:
-            new_closest_base_station = self._ran_model.get_closest_base_station(
-                    user.get_movement_model().get_pos())
-            assert new_closest_base_station
+        users = list(users)
+        positions = self._user_manager.get_user_positions(users)
+        base_stations = self._ran_model.base_stations()
+        base_station_indices = self._ran_model.get_closest_base_station_indices(positions)
+        self._relocated_users = []
+        for user, base_station_index in zip(users, base_station_indices.tolist()):
+            new_closest_base_station = base_stations[base_station_index]
             if new_closest_base_station is not user.get_base_station():
                 user.set_base_station(new_closest_base_station)
+                self._relocated_users.append(user)
+
+    @staticmethod
+    def __add_phase(profiler: PhaseProfiler, phase: str, start: int) -> int:
+        """
+        Records a phase that started at start and ends now.
+        :return: the end of the phase
+        """
+        end = profiler.clock()
+        profiler.add_duration(phase, start, end)
+        return end
 
     def step(self, observer: Optional[SimulationObserver] = None) -> None:
+        # if a profiler is set, the duration of each phase is recorded, otherwise profiling costs only the checks
+        profiler = self._profiler
+        if profiler:
+            step_start = time = profiler.clock()
+
         # notify the observer of the beginning of the step:
         if observer:
             observer.before_simulation_step(self)
+            if profiler:
+                time = self.__add_phase(profiler, 'observers', time)
 
         # move users one time step
         self._user_manager.step(self._time_step)
+        if profiler:
+            time = self.__add_phase(profiler, 'user_movement', time)
 
         # assign users to new base stations
         self.__assign_users_to_base_stations(self.get_users())
+        if profiler:
+            time = self.__add_phase(profiler, 'ran_assignment', time)
 
         # execute the service placement_cost strategy
         performed_actions: List[Action] = self._service_placement_strategy.update_service_placements(
                         cloud_network=self._cloud_network,
                         user_manager=self._user_manager,
                         time_step=self._time_step)
+        if profiler:
+            time = self.__add_phase(profiler, 'placement_strategy', time)
 
         # safety check: no cloud is over-allocated
         for cloud in self.get_cloud_network().clouds():
             assert cloud.memory_capacity() >= cloud.total_memory_requirement()
             assert cloud.total_memory_requirement() >= 0
+        if profiler:
+            time = self.__add_phase(profiler, 'capacity_checks', time)
 
         # notify the observer of the end of the step:
         if observer:
             observer.after_simulation_step(self, performed_actions)
+            if profiler:
+                time = self.__add_phase(profiler, 'observers', time)
+
+        if profiler:
+            profiler.add_duration('step', step_start, time)
+            profiler.add_count('actions', len(performed_actions))
+            profiler.add_count('migrations', sum(isinstance(action, MigrationAction) for action in performed_actions))
+            profiler.add_count('relocated_users', len(self._relocated_users))
+            profiler.set_counters(self._service_placement_strategy.get_performance_counters())
 
-        # some logging:
-        central_cloud = self.get_cloud_network().central_cloud()
-        # print("services @ cloud: ", 100*float(len(central_cloud.services()))/float(len(self.user_manager().users())),"%")
-        print("mean priority @cloud: ", np.mean([s.priority for s in central_cloud.services()]), " #services @cloud:", len(central_cloud.services()))
+        # some logging (only computed if it is output):
+        if logger.isEnabledFor(logging.DEBUG):
+            central_cloud = self.get_cloud_network().central_cloud()
+            # print("services @ cloud: ", 100*float(len(central_cloud.services()))/float(len(self.user_manager().users())),"%")
+            central_cloud_services = central_cloud.services()
+            logger.debug("mean priority @cloud: %s #services @cloud: %d",
+                         np.mean([s.priority for s in central_cloud_services]) if central_cloud_services else np.nan,
+                         len(central_cloud_services))
 
         # increase step:
         self._current_step += 1
@@ -0,0 +1,106 @@
+# Copyright (C) 2020 Florian Brandherm
+# This file is part of flbrandh/MEC-Simulator-2-BigMEC <https://github.com/flbrandh/MEC-Simulator-2-BigMEC>.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with flbrandh/MEC-Simulator-2-BigMEC.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Small simulation setups that are shared by the tests.
+"""
+
+import random
+from INPsim.Network.Nodes.node import CloudBaseStation
+from INPsim.Network.Nodes.cloud import LimitedMemoryCloud
+from INPsim.Network.connection import ConstantLatencyConnection
+from INPsim.Network.network import CloudNetwork
+from INPsim.Network.Service.service import Service
+from INPsim.Network.Service.serviceModel import ConstantServiceModel, PrototypeBasedServiceConfigurator
+from INPsim.Network.User.Manager.constantRandomUserManager import ConstantRandomUserManager
+from INPsim.ServicePlacement.Migration.CostFunctions import PriorityBasedCostFunction
+from INPsim.ServicePlacement.Migration.Algorithms import MigrationAlgorithmServicePlacementStrategy, InitialPlacementAtCloud
+from INPsim.ServicePlacement.Migration.Learning import DQNMigrationAlgorithm, QHyperparameters
+from INPsim.vmath import AABB2
+
+# the area of the test networks and users
+TEST_AABB = AABB2(-5000, 5000, -5000, 5000)
+
+
+def create_test_network(rng: random.Random) -> CloudNetwork:
+    """
+    Creates a chain of 20 base stations at random positions. The first one has the central cloud, every fourth one has
+    a cloudlet with room for a few services.
+    :param rng: random number generator
+    :return: CloudNetwork
+    """
+    nodes = [CloudBaseStation((rng.uniform(TEST_AABB.min_x, TEST_AABB.max_x),
+                               rng.uniform(TEST_AABB.min_y, TEST_AABB.max_y))) for _ in range(20)]
+    for node1, node2 in zip(nodes, nodes[1:]):
+        ConstantLatencyConnection.connect_default_bidirectional(node1, node2)
+    for node in nodes[::4]:
+        node.set_cloud(LimitedMemoryCloud(node, 1000 if node is nodes[0] else 6))
+    return CloudNetwork(nodes, central_cloud=nodes[0].get_cloud())
+
+
+def create_test_service_model() -> ConstantServiceModel:
+    """
+    :return: a service model that creates two services with random requirements per user
+    """
+    return ConstantServiceModel(PrototypeBasedServiceConfigurator(Service(1, 3), 1, 100, 1, 2, 2, 8), 2)
+
+
+def create_test_cost_function(network: CloudNetwork) -> PriorityBasedCostFunction:
+    return PriorityBasedCostFunction(network, 3.0, 1.0)
+
+
+class OrderedUserManager(ConstantRandomUserManager):
+    """
+    A ConstantRandomUserManager that iterates the services in the order of their users' ids instead of the order of
+    the set of users, so that the placement updates of separately created setups are identical.
+    """
+
+    def __init__(self, service_model, rng, num_users):
+        super(OrderedUserManager, self).__init__(service_model, rng, 'linear', num_users, TEST_AABB)
+
+    def services(self):
+        return iter(self.checkpoint_services())
+
+
+def create_test_dqn_strategy(network: CloudNetwork,
+                             seed: int,
+                             batched_decisions: bool = False,
+                             max_decision_batch_size: int = 64,
+                             **hyperparameters) -> MigrationAlgorithmServicePlacementStrategy:
+    """
+    Creates a MigrationAlgorithmServicePlacementStrategy with a small DQN migration algorithm that decides at every
+    step.
+    :param network: the cloud network
+    :param seed: seed of the agent's and the strategy's random number generators
+    :param batched_decisions: see MigrationAlgorithmServicePlacementStrategy
+    :param max_decision_batch_size: see MigrationAlgorithmServicePlacementStrategy
+    :param hyperparameters: overrides of the QHyperparameters
+    :return: the strategy
+    """
+    hparam = QHyperparameters(network_width=8, network_depth=2, max_num_neighbor_clouds=3, recursion_depth=1,
+                              num_epochs=1, episode_length=1000, initial_exploration_boost=0)
+    for name, value in hyperparameters.items():
+        setattr(hparam, name, value)
+    strategy = MigrationAlgorithmServicePlacementStrategy(DQNMigrationAlgorithm(hparam, random.Random(seed)),
+                                                          network,
+                                                          create_test_cost_function(network),
+                                                          'always',
+                                                          InitialPlacementAtCloud(),
+                                                          batched_decisions=batched_decisions,
+                                                          max_decision_batch_size=max_decision_batch_size)
+    strategy.rng.seed(seed)
+    return strategy
@@ -0,0 +1,68 @@
+# Copyright (C) 2020 Florian Brandherm
+# This file is part of flbrandh/MEC-Simulator-2-BigMEC <https://github.com/flbrandh/MEC-Simulator-2-BigMEC>.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with flbrandh/MEC-Simulator-2-BigMEC.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import random
+from unittest import TestCase
+import numpy as np
+from INPsim.Network.User.Manager.userManager import UserManager
+from INPsim.Network.User.MovementModel.brownianModel import BrownianMovementModel
+from INPsim.ServicePlacement import MyopicOptimalFlowServicePlacementStrategy
+from INPsim.ServicePlacement.Migration.CostFunctions import PerServiceGlobalAverageCostFunction
+from INPsim.Simulation import Simulation, StatisticsSimulationObserver
+from INPsim.Simulation.SimulationObserverList import SimulationObserverList
+from INPsim.Simulation.testSimulations import create_test_network, create_test_service_model, create_test_cost_function
+
+
+class ChurningUserManager(UserManager):
+
+    def __init__(self, service_model, rng):
+        super().__init__(service_model)
+        self._rng = rng
+        for _ in range(30):
+            self._create_random_user()
+
+    def _create_random_user(self):
+        self.create_user(BrownianMovementModel((self._rng.uniform(-5000, 5000), self._rng.uniform(-5000, 5000)),
+                                               800, self._rng))
+
+    def _update_population(self, time_step):
+        for user in self._rng.sample(sorted(self.users(), key=id), self._rng.randint(0, 3)):
+            self.remove_user(user)
+        for _ in range(self._rng.randint(0, 3)):
+            self._create_random_user()
+
+
+class TestStatisticsSimulationObserver(TestCase):
+
+    def test_incremental_statistics_equal_full_evaluation(self):
+        rng = random.Random(42)
+        network = create_test_network(rng)
+        user_manager = ChurningUserManager(create_test_service_model(), rng)
+        cost_function = create_test_cost_function(network)
+        simulation = Simulation(network, user_manager, MyopicOptimalFlowServicePlacementStrategy(cost_function, 1))
+
+        incremental_statistics = StatisticsSimulationObserver(PerServiceGlobalAverageCostFunction(cost_function))
+        full_statistics = StatisticsSimulationObserver(PerServiceGlobalAverageCostFunction(cost_function),
+                                                       incremental=False)
+        simulation.simulate(60, SimulationObserverList(incremental_statistics, full_statistics))
+
+        self.assertEqual(60, incremental_statistics.get_num_steps())
+        self.assertGreater(incremental_statistics.num_migrations.sum(), 0)
+        for name in ('global_cost', 'dissatisfaction_rate', 'avg_latency'):
+            self.assertTrue(np.allclose(getattr(full_statistics, name), getattr(incremental_statistics, name)), name)
+        for name in ('num_migrations', 'num_services', 'num_services_at_cloud'):
+            self.assertEqual(getattr(full_statistics, name).tolist(), getattr(incremental_statistics, name).tolist())
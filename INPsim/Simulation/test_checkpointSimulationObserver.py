@@ -0,0 +1,170 @@
+# Copyright (C) 2020 Florian Brandherm
+# This file is part of flbrandh/MEC-Simulator-2-BigMEC <https://github.com/flbrandh/MEC-Simulator-2-BigMEC>.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with flbrandh/MEC-Simulator-2-BigMEC.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import os
+import random
+import tempfile
+from unittest import TestCase
+import numpy as np
+from INPsim.ServicePlacement import MyopicOptimalFlowServicePlacementStrategy
+from INPsim.ServicePlacement.Migration.CostFunctions import PerServiceGlobalAverageCostFunction
+from INPsim.Simulation import Simulation, SimulationObserver, StatisticsSimulationObserver
+from INPsim.Simulation import CheckpointSimulationObserver, restore_checkpoint
+from INPsim.Simulation.SimulationObserverList import SimulationObserverList
+from INPsim.Simulation.testSimulations import (OrderedUserManager, create_test_network, create_test_service_model,
+                                               create_test_cost_function, create_test_dqn_strategy)
+from INPsim.Utils.metricsSink import BinaryMetricsSink, read_metrics
+
+
+def create_simulation():
+    rng = random.Random(42)
+    network = create_test_network(rng)
+    user_manager = OrderedUserManager(create_test_service_model(), rng, 30)
+    cost_function = create_test_cost_function(network)
+    simulation = Simulation(network, user_manager, MyopicOptimalFlowServicePlacementStrategy(cost_function, 1))
+    statistics = StatisticsSimulationObserver(PerServiceGlobalAverageCostFunction(cost_function))
+    return simulation, statistics
+
+
+def create_dqn_simulation():
+    rng = random.Random(42)
+    network = create_test_network(rng)
+    user_manager = OrderedUserManager(create_test_service_model(), rng, 30)
+    # small episodes and replay memory, so that the network is trained, the target network is updated and the replay
+    # memory wraps around
+    strategy = create_test_dqn_strategy(network, 1, episode_length=20, max_replay_memory_size=60,
+                                        batch_fraction_of_replay_memory=0.5, target_model_update_frequency=2,
+                                        epsilon=0.2)
+    return Simulation(network, user_manager, strategy)
+
+
+class TestCheckpointSimulationObserver(TestCase):
+
+    def assertStatesEqual(self, expected, actual):
+        self.assertEqual(sorted(expected.keys()), sorted(actual.keys()))
+        for name, value in expected.items():
+            if isinstance(value, np.ndarray):
+                self.assertTrue(np.array_equal(value, actual[name], equal_nan=value.dtype.kind == 'f'), name)
+            else:
+                self.assertEqual(value, actual[name], name)
+
+    def test_resume(self):
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint_path = os.path.join(directory, 'checkpoint.npz')
+            metrics_path = os.path.join(directory, 'metrics.bin')
+
+            simulation, statistics = create_simulation()
+            metrics_sink = BinaryMetricsSink(metrics_path, [('global_cost', 'f8')], flush_interval=7)
+
+            class MetricsObserver(SimulationObserver):
+                def after_simulation_step(self, simulator, actions):
+                    metrics_sink.append((statistics.global_cost[-1],))
+
+            class StateObserver(SimulationObserver):
+                # records the state at the time of the last checkpoint, at the beginning of step 20
+                def before_simulation_step(self, simulator):
+                    if simulator.get_current_step() == 20:
+                        self.state = simulator.get_checkpoint_state()
+                        self.statistics = statistics.get_checkpoint_state()
+
+            state_observer = StateObserver()
+            checkpoints = CheckpointSimulationObserver(checkpoint_path, 10, {'statistics': statistics},
+                                                       {'metrics': metrics_sink})
+            simulation.simulate(25, SimulationObserverList(statistics, MetricsObserver(), checkpoints,
+                                                           state_observer))
+            metrics_sink.close()
+
+            resumed_simulation, resumed_statistics = create_simulation()
+            resumed_simulation.simulate(3, resumed_statistics)  # the state is replaced completely
+            metrics_sink_rows = restore_checkpoint(checkpoint_path, resumed_simulation,
+                                                   {'statistics': resumed_statistics})
+            self.assertEqual(20, resumed_simulation.get_current_step())
+            self.assertStatesEqual(state_observer.state, resumed_simulation.get_checkpoint_state())
+            self.assertStatesEqual(state_observer.statistics, resumed_statistics.get_checkpoint_state())
+
+            metrics_sink = BinaryMetricsSink(metrics_path, [('global_cost', 'f8')], flush_interval=7,
+                                             num_existing_rows=metrics_sink_rows['metrics'])
+            self.assertEqual(20, len(metrics_sink))
+            metrics_sink.close()
+            self.assertEqual(statistics.global_cost[:20].tolist(), read_metrics(metrics_path)['global_cost'].tolist())
+
+            resumed_simulation.simulate(5, resumed_statistics)
+            self.assertEqual(25, resumed_statistics.get_num_steps())
+
+    def test_different_network(self):
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint_path = os.path.join(directory, 'checkpoint.npz')
+            simulation, statistics = create_simulation()
+            simulation.simulate(2, statistics)
+            CheckpointSimulationObserver(checkpoint_path, 1).write(simulation)
+
+            other_simulation, _ = create_simulation()
+            other_simulation.get_cloud_network().set_cache_key('other')
+            simulation.get_cloud_network().set_cache_key('network')
+            CheckpointSimulationObserver(checkpoint_path, 1).write(simulation)
+            with self.assertRaises(Exception):
+                restore_checkpoint(checkpoint_path, other_simulation)
+
+    def test_dqn_agent(self):
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint_path = os.path.join(directory, 'checkpoint.npz')
+            simulation = create_dqn_simulation()
+            simulation.simulate(6)
+            agent = simulation.get_service_placement_strategy().get_migration_algorithm().shared_agent
+            self.assertGreater(agent.num_training_episodes, 2)
+            self.assertEqual(agent.replay_memory.capacity(), len(agent.replay_memory))
+            CheckpointSimulationObserver(checkpoint_path, 1).write(simulation)
+
+            resumed_simulation = create_dqn_simulation()
+            restore_checkpoint(checkpoint_path, resumed_simulation)
+            resumed_agent = resumed_simulation.get_service_placement_strategy().get_migration_algorithm().shared_agent
+            self.assertStatesEqual(simulation.get_checkpoint_state(), resumed_simulation.get_checkpoint_state())
+
+            # the online and target networks
+            resumed_model_parameters = resumed_agent.get_model_parameters()
+            for model_name, weights in agent.get_model_parameters().items():
+                resumed_weights = resumed_model_parameters[model_name]
+                self.assertEqual(len(weights), len(resumed_weights))
+                for weight, resumed_weight in zip(weights, resumed_weights):
+                    self.assertTrue(np.array_equal(weight, resumed_weight), model_name)
+
+            samples = list(range(len(agent.replay_memory)))
+            self.assertEqual(len(agent.replay_memory), len(resumed_agent.replay_memory))
+            self.assertTrue(np.array_equal(agent.replay_memory.state_action_features(samples),
+                                           resumed_agent.replay_memory.state_action_features(samples)))
+            self.assertTrue(np.array_equal(agent.replay_memory.rewards(samples),
+                                           resumed_agent.replay_memory.rewards(samples)))
+            for features, resumed_features in zip(agent.replay_memory.state_next_action_features(samples),
+                                                  resumed_agent.replay_memory.state_next_action_features(samples)):
+                self.assertTrue(np.array_equal(features, resumed_features))
+
+            services = simulation.get_user_manager().checkpoint_services()
+            resumed_services = resumed_simulation.get_user_manager().checkpoint_services()
+            for service, resumed_service in zip(services, resumed_services):
+                self.assertEqual(np.array(agent.last_state_features[service], dtype=np.float32).tolist(),
+                                 resumed_agent.last_state_features[resumed_service])
+                self.assertEqual(np.array(agent.last_action_features[service], dtype=np.float32).tolist(),
+                                 resumed_agent.last_action_features[resumed_service])
+                self.assertEqual(agent.last_reward[service], resumed_agent.last_reward[resumed_service])
+                self.assertEqual(agent.sample_last_experience[service],
+                                 resumed_agent.sample_last_experience[resumed_service])
+            self.assertIs(resumed_services[services.index(agent.last_service)], resumed_agent.last_service)
+
+            for name in ('iteration', 'episode', 'num_decisions', 'num_training_episodes', 'num_received_rewards',
+                         'mean_reward', 'reward_standard_deviation'):
+                self.assertEqual(getattr(agent, name), getattr(resumed_agent, name), name)
+            self.assertEqual(agent.rng.getstate(), resumed_agent.rng.getstate())
@@ -0,0 +1,152 @@
+# Copyright (C) 2020 Florian Brandherm
+# This file is part of flbrandh/MEC-Simulator-2-BigMEC <https://github.com/flbrandh/MEC-Simulator-2-BigMEC>.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with flbrandh/MEC-Simulator-2-BigMEC.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+Checkpoints store the state of the simulation as a flat dictionary that maps names to numpy arrays or to
+json-serializable values (numbers, strings, lists and dicts of them). Components contribute their state with
+get_checkpoint_state() methods, whose entries are prefixed with the component's name (see prefixed()).
+The checkpoint file is an uncompressed .npz archive, in which the json-serializable values are stored as one json
+document. Reading it never unpickles anything.
+"""
+
+import json
+import numbers
+import os
+import random
+from typing import Any, Dict, Iterable
+
+import numpy as np
+
+# bump this whenever the stored state of any component changes incompatibly
+CHECKPOINT_FORMAT_VERSION = 1
+
+_METADATA_KEY = '__metadata__'
+
+
+def prefixed(state: Dict[str, Any], prefix: str) -> Dict[str, Any]:
+    """
+    :return: the entries of state, with prefix + '/' prepended to their names
+    """
+    return dict((prefix + '/' + name, value) for name, value in state.items())
+
+
+def unprefixed(state: Dict[str, Any], prefix: str) -> Dict[str, Any]:
+    """
+    :return: the entries of state whose names start with prefix + '/', without it
+    """
+    prefix = prefix + '/'
+    return dict((name[len(prefix):], value) for name, value in state.items() if name.startswith(prefix))
+
+
+def write_checkpoint(path: str, state: Dict[str, Any]) -> None:
+    """
+    Writes a checkpoint atomically: the file at path is either the previous or the new checkpoint, even if the process
+    is killed while writing.
+    :param path: path of the checkpoint file (.npz)
+    :param state: flat checkpoint state
+    """
+    arrays = dict((name, value) for name, value in state.items() if isinstance(value, np.ndarray))
+    metadata = dict((name, value) for name, value in state.items() if not isinstance(value, np.ndarray))
+    metadata['format_version'] = CHECKPOINT_FORMAT_VERSION
+    arrays[_METADATA_KEY] = np.frombuffer(json.dumps(metadata).encode('utf-8'), dtype=np.uint8)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as checkpoint_file:
+        np.savez(checkpoint_file, **arrays)
+        checkpoint_file.flush()
+        os.fsync(checkpoint_file.fileno())
+    os.replace(tmp_path, path)
+
+
+def read_checkpoint(path: str) -> Dict[str, Any]:
+    """
+    Reads a checkpoint that was written with write_checkpoint.
+    :param path: path of the checkpoint file
+    :return: flat checkpoint state
+    """
+    with np.load(path, allow_pickle=False) as checkpoint_file:
+        state = dict((name, checkpoint_file[name]) for name in checkpoint_file.files)
+    metadata = json.loads(state.pop(_METADATA_KEY).tobytes().decode('utf-8'))
+    if metadata['format_version'] != CHECKPOINT_FORMAT_VERSION:
+        raise Exception('Unsupported checkpoint format version ' + str(metadata['format_version']))
+    state.update(metadata)
+    return state
+
+
+def python_random_state(rng: random.Random) -> Dict[str, Any]:
+    """
+    :return: the state of a random.Random as checkpoint state
+    """
+    version, internal_state, gauss_next = rng.getstate()
+    return {'version': version,
+            'internal_state': np.array(internal_state, dtype=np.uint32),
+            'gauss_next': gauss_next}
+
+
+def restore_python_random_state(rng: random.Random, state: Dict[str, Any]) -> None:
+    rng.setstate((state['version'], tuple(state['internal_state'].tolist()), state['gauss_next']))
+
+
+def numpy_random_state(generator: np.random.Generator) -> Dict[str, Any]:
+    """
+    :return: the state of a numpy random generator as checkpoint state
+    """
+    return {'bit_generator_state': generator.bit_generator.state}
+
+
+def restore_numpy_random_state(generator: np.random.Generator, state: Dict[str, Any]) -> None:
+    generator.bit_generator.state = state['bit_generator_state']
+
+
+def attribute_state(obj: Any, exclude: Iterable[str] = (), nested_types: Iterable[type] = ()) -> Dict[str, Any]:
+    """
+    Collects the simple attributes of an object: numbers, strings, None and lists of numbers (as arrays). Attributes
+    that are objects of one of nested_types are collected recursively. All other attributes are ignored, they must be
+    restored by other means.
+    :param obj: an object
+    :param exclude: names of attributes to ignore
+    :param nested_types: types whose objects are collected recursively
+    :return: checkpoint state
+    """
+    exclude = set(exclude)
+    nested_types = tuple(nested_types)
+    state: Dict[str, Any] = {}
+    for name, value in vars(obj).items():
+        if name in exclude:
+            continue
+        if value is None or isinstance(value, (bool, str)):
+            state[name] = value
+        elif isinstance(value, numbers.Number):
+            state[name] = value.item() if isinstance(value, np.generic) else value
+        elif isinstance(value, list) and all(isinstance(item, numbers.Number) for item in value):
+            state[name] = np.array(value)
+        elif nested_types and isinstance(value, nested_types):
+            state.update(prefixed(attribute_state(value), name))
+    return state
+
+
+def restore_attribute_state(obj: Any, state: Dict[str, Any], nested_types: Iterable[type] = ()) -> None:
+    """
+    Restores the attributes that were collected with attribute_state.
+    """
+    nested_types = tuple(nested_types)
+    for name, value in vars(obj).items():
+        if nested_types and isinstance(value, nested_types):
+            restore_attribute_state(value, unprefixed(state, name))
+    for name, value in state.items():
+        if '/' in name:
+            continue
+        setattr(obj, name, value.tolist() if isinstance(value, np.ndarray) else value)
@@ -0,0 +1,108 @@
+# Copyright (C) 2020 Florian Brandherm
+# This file is part of flbrandh/MEC-Simulator-2-BigMEC <https://github.com/flbrandh/MEC-Simulator-2-BigMEC>.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with flbrandh/MEC-Simulator-2-BigMEC.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import logging
+import sys
+import time
+from typing import Callable, Optional, TextIO
+
+# All loggers of the simulator are children of this logger, e.g. logging.getLogger(__name__) in any INPsim module.
+ROOT_LOGGER_NAME = 'INPsim'
+# Progress reports are logged to this logger, whose level can be configured independently.
+PROGRESS_LOGGER_NAME = ROOT_LOGGER_NAME + '.progress'
+
+LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR')
+
+
+def configure_logging(level: str = 'INFO',
+                      progress: bool = True,
+                      stream: TextIO = sys.stdout) -> None:
+    """
+    Configures the output of the simulator's loggers. Messages are written without decoration, like print() would.
+    Per-step messages (e.g. statistics of each step) are logged at level DEBUG, one-off messages at INFO, so that at the
+    default level nothing is formatted per step.
+    :param level: one of LEVELS
+    :param progress: if True, progress reports are output regardless of the level
+    :param stream: output stream
+    """
+    if level not in LEVELS:
+        raise ValueError('unknown log level ' + str(level) + ', expected one of ' + str(LEVELS))
+    root_logger = logging.getLogger(ROOT_LOGGER_NAME)
+    for handler in list(root_logger.handlers):
+        root_logger.removeHandler(handler)
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    root_logger.addHandler(handler)
+    root_logger.setLevel(getattr(logging, level))
+    root_logger.propagate = False
+    progress_logger = logging.getLogger(PROGRESS_LOGGER_NAME)
+    progress_logger.setLevel(logging.INFO if progress else logging.CRITICAL + 1)
+
+
+class ProgressReporter:
+    """
+    Rate-limited progress reports: report() can be called every step, but the message is only formatted and logged if
+    at least min_interval seconds have passed since the last report (and always for the last step).
+    """
+
+    def __init__(self,
+                 num_steps: int,
+                 min_interval: float = 10.0,
+                 logger: Optional[logging.Logger] = None,
+                 clock: Callable[[], float] = time.monotonic,
+                 first_step: int = 0) -> None:
+        """
+        :param num_steps: total number of steps
+        :param min_interval: minimum number of seconds between two reports; 0 reports every step
+        :param logger: logger of the reports (default: the progress logger)
+        :param clock: monotonic clock in seconds
+        :param first_step: number of steps that were finished before, e.g. when the simulation was resumed
+        """
+        self._num_steps = num_steps
+        self._min_interval = min_interval
+        self._logger = logger if logger is not None else logging.getLogger(PROGRESS_LOGGER_NAME)
+        self._clock = clock
+        self._start_time = clock()
+        self._last_report_time: Optional[float] = None
+        self._last_report_step = first_step
+
+    def report(self, step: int, details: Optional[Callable[[], str]] = None) -> bool:
+        """
+        Reports the progress if it is due.
+        :param step: number of finished steps
+        :param details: optional function that returns additional information; only called if a report is made
+        :return: True, if a report was made
+        """
+        now = self._clock()
+        if step < self._num_steps and self._last_report_time is not None \
+                and now - self._last_report_time < self._min_interval:
+            return False
+        if not self._logger.isEnabledFor(logging.INFO):
+            return False
+        elapsed_time = now - self._start_time
+        # the rate since the last report
+        last_report_time = self._last_report_time if self._last_report_time is not None else self._start_time
+        steps_per_second = (step - self._last_report_step) / (now - last_report_time) if now > last_report_time else 0.0
+        message = 'step {} / {} ({:.1f} %), {:.1f} s elapsed, {:.1f} steps/s'.format(
+            step, self._num_steps, 100 * step / max(self._num_steps, 1), elapsed_time, steps_per_second)
+        details_string = details() if details is not None else ''
+        if details_string:
+            message += '   ' + details_string
+        self._logger.info(message)
+        self._last_report_time = now
+        self._last_report_step = step
+        return True
@@ -0,0 +1,218 @@
+# Copyright (C) 2020 Florian Brandherm
+# This file is part of flbrandh/MEC-Simulator-2-BigMEC <https://github.com/flbrandh/MEC-Simulator-2-BigMEC>.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with flbrandh/MEC-Simulator-2-BigMEC.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import abc
+import json
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+
+# version of the binary metrics format, stored in the schema file
+METRICS_FORMAT_VERSION = 1
+
+
+class MetricsSink:
+    """
+    Abstract base class for metrics sinks, which record one row of metrics per simulation step.
+    """
+
+    @abc.abstractmethod
+    def append(self, row: Sequence[float]) -> None:
+        """
+        Records a row of metrics.
+        :param row: one value per column
+        """
+        pass
+
+    @abc.abstractmethod
+    def close(self) -> None:
+        """
+        Writes all recorded rows and releases the output.
+        """
+        pass
+
+
+class BufferedMetricsSink(MetricsSink):
+    """
+    A metrics sink that collects the rows in a preallocated columnar buffer (a numpy structured array) and writes them
+    in chunks of flush_interval rows, so that recording a row costs O(1) and no I/O.
+    """
+
+    def __init__(self, columns: Sequence[Tuple[str, str]], flush_interval: int = 1000) -> None:
+        """
+        :param columns: the schema: (name, numpy type) of each column, e.g. ('num_migrations', 'i8')
+        :param flush_interval: number of rows after which the buffer is written
+        """
+        if flush_interval <= 0:
+            raise ValueError('The flush interval of a metrics sink must be positive.')
+        self._dtype = np.dtype([(name, np.dtype(dtype).newbyteorder('<')) for name, dtype in columns])
+        self._buffer = np.zeros(flush_interval, dtype=self._dtype)
+        self._size = 0
+        self._num_rows = 0
+
+    def column_names(self) -> List[str]:
+        return list(self._dtype.names)
+
+    def __len__(self) -> int:
+        """
+        :return: the number of rows that were recorded so far
+        """
+        return self._num_rows
+
+    def append(self, row: Sequence[float]) -> None:
+        self._buffer[self._size] = tuple(row)
+        self._size += 1
+        self._num_rows += 1
+        if self._size == len(self._buffer):
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Writes the buffered rows.
+        """
+        if self._size > 0:
+            self._write_chunk(self._buffer[:self._size])
+            self._size = 0
+
+    def close(self) -> None:
+        self.flush()
+
+    @abc.abstractmethod
+    def _write_chunk(self, chunk: np.ndarray) -> None:
+        """
+        Writes a chunk of rows.
+        :param chunk: structured array of rows
+        """
+        pass
+
+
+class BinaryMetricsSink(BufferedMetricsSink):
+    """
+    Writes the rows as packed little-endian records to a binary file, which is extended by every flush. The schema is
+    stored next to it in <path>.schema.json. The file can be read back with read_metrics(); if the simulation is
+    interrupted, all flushed rows are readable.
+    """
+
+    def __init__(self,
+                 path: str,
+                 columns: Sequence[Tuple[str, str]],
+                 flush_interval: int = 1000,
+                 csv_path: Optional[str] = None,
+                 num_existing_rows: int = 0) -> None:
+        """
+        :param path: path of the binary file. An existing file is overwritten, unless num_existing_rows is positive.
+        :param columns: the schema: (name, numpy type) of each column
+        :param flush_interval: number of rows after which the buffer is written
+        :param csv_path: if not None, the metrics are exported to this CSV file when the sink is closed
+        :param num_existing_rows: if positive, the first num_existing_rows rows of the existing file are kept and the
+                                  new rows are appended to them, e.g. when a simulation is resumed from a checkpoint.
+                                  Rows after them are discarded. The existing file must have the same schema.
+        """
+        super().__init__(columns, flush_interval)
+        self._path = path
+        self._csv_path = csv_path
+        schema = {'version': METRICS_FORMAT_VERSION,
+                  'columns': [[name, self._dtype[name].str] for name in self._dtype.names]}
+        if num_existing_rows > 0:
+            # the existing rows can only be extended if they have the same layout
+            with open(_schema_path(path), 'r') as schema_file:
+                if json.load(schema_file) != schema:
+                    raise ValueError('The schema of the metrics file ' + path + ' differs from the columns.')
+            self._file = open(path, 'r+b')
+            existing_size = num_existing_rows * self._dtype.itemsize
+            if self._file.seek(0, 2) < existing_size:
+                self._file.close()
+                raise ValueError('The metrics file ' + path + ' has less than ' + str(num_existing_rows) + ' rows.')
+            self._file.truncate(existing_size)
+            self._file.seek(existing_size)
+            self._num_rows = num_existing_rows
+        else:
+            with open(_schema_path(path), 'w') as schema_file:
+                json.dump(schema, schema_file)
+            self._file = open(path, 'wb')
+
+    def _write_chunk(self, chunk: np.ndarray) -> None:
+        self._file.write(chunk.tobytes())
+        self._file.flush()
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+        super().close()
+        self._file.close()
+        if self._csv_path is not None:
+            export_csv(self._path, self._csv_path)
+
+
+class CsvMetricsSink(BufferedMetricsSink):
+    """
+    Writes the rows to a CSV file with a header line, one chunk at a time.
+    """
+
+    def __init__(self, path: str, columns: Sequence[Tuple[str, str]], flush_interval: int = 1000) -> None:
+        """
+        :param path: path of the CSV file. An existing file is overwritten.
+        :param columns: the schema: (name, numpy type) of each column
+        :param flush_interval: number of rows after which the buffer is written
+        """
+        super().__init__(columns, flush_interval)
+        self._file = open(path, 'w')
+        self._file.write(','.join(self._dtype.names) + '\n')
+
+    def _write_chunk(self, chunk: np.ndarray) -> None:
+        self._file.write(_csv_lines(chunk))
+        self._file.flush()
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+        super().close()
+        self._file.close()
+
+
+def _schema_path(path: str) -> str:
+    return path + '.schema.json'
+
+
+def _csv_lines(rows: np.ndarray) -> str:
+    return ''.join(','.join(str(value) for value in row) + '\n' for row in rows.tolist())
+
+
+def read_metrics(path: str) -> Dict[str, np.ndarray]:
+    """
+    Reads the metrics that were written by a BinaryMetricsSink.
+    :param path: path of the binary file
+    :return: the array of each column, in the order of the schema
+    """
+    with open(_schema_path(path), 'r') as schema_file:
+        schema = json.load(schema_file)
+    if schema['version'] != METRICS_FORMAT_VERSION:
+        raise ValueError('Unsupported metrics format version ' + str(schema['version']) + '.')
+    rows = np.fromfile(path, dtype=np.dtype([(name, dtype) for name, dtype in schema['columns']]))
+    return dict((name, rows[name].copy()) for name, _ in schema['columns'])
+
+
+def export_csv(path: str, csv_path: str) -> None:
+    """
+    Exports the metrics that were written by a BinaryMetricsSink to a CSV file with a header line.
+    :param path: path of the binary file
+    :param csv_path: path of the CSV file
+    """
+    columns = read_metrics(path)
+    rows = np.rec.fromarrays(list(columns.values()), names=list(columns.keys()))
+    with open(csv_path, 'w') as csv_file:
+        csv_file.write(','.join(columns.keys()) + '\n')
+        csv_file.write(_csv_lines(rows))
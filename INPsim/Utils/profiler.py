@@ -0,0 +1,204 @@
+# Copyright (C) 2020 Florian Brandherm
+# This file is part of flbrandh/MEC-Simulator-2-BigMEC <https://github.com/flbrandh/MEC-Simulator-2-BigMEC>.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with flbrandh/MEC-Simulator-2-BigMEC.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import json
+import time
+from typing import Any, Dict, List, Optional
+
+
+class LogarithmicHistogram:
+    """
+    HDR-style histogram of non-negative integer values, e.g. durations in nanoseconds.
+    Values below 2 * sub_buckets have a bucket each. Above, every power of two is split into sub_buckets buckets of
+    equal width, so that the relative error of the bucket boundaries is at most 1 / sub_buckets, and values of any
+    magnitude can be recorded without configuring bounds.
+    """
+
+    def __init__(self, sub_buckets_bits: int = 4) -> None:
+        """
+        :param sub_buckets_bits: the number of buckets per power of two is 2 ** sub_buckets_bits
+        """
+        self._bits = sub_buckets_bits
+        self._sub_buckets = 1 << sub_buckets_bits
+        self._buckets: List[int] = []
+        self._count = 0
+        self._total = 0
+        self._min: Optional[int] = None
+        self._max: Optional[int] = None
+
+    def _bucket(self, value: int) -> int:
+        if value < self._sub_buckets:
+            return value
+        shift = value.bit_length() - self._bits - 1
+        return shift * self._sub_buckets + (value >> shift)
+
+    def bucket_lower_bound(self, bucket: int) -> int:
+        """
+        :return: the smallest value of a bucket
+        """
+        if bucket < 2 * self._sub_buckets:
+            return bucket
+        shift = bucket // self._sub_buckets - 1
+        return (bucket - shift * self._sub_buckets) << shift
+
+    def add_value(self, value: int) -> None:
+        """
+        Adds a value to the histogram.
+        :param value: a non-negative integer
+        """
+        bucket = self._bucket(value)
+        if bucket >= len(self._buckets):
+            self._buckets.extend([0] * (bucket + 1 - len(self._buckets)))
+        self._buckets[bucket] += 1
+        self._count += 1
+        self._total += value
+        if self._min is None or value < self._min:
+            self._min = value
+        if self._max is None or value > self._max:
+            self._max = value
+
+    def count(self) -> int:
+        return self._count
+
+    def total(self) -> int:
+        return self._total
+
+    def min(self) -> Optional[int]:
+        return self._min
+
+    def max(self) -> Optional[int]:
+        return self._max
+
+    def mean(self) -> Optional[float]:
+        return self._total / self._count if self._count else None
+
+    def percentile(self, percentile: float) -> Optional[int]:
+        """
+        :param percentile: percentile between 0 and 100
+        :return: the lower bound of the bucket that contains the percentile (clamped to the recorded range), or None if
+                 the histogram is empty
+        """
+        if self._count == 0:
+            return None
+        rank = max(1, int(round(percentile / 100.0 * self._count)))
+        cumulative = 0
+        for bucket, bucket_count in enumerate(self._buckets):
+            cumulative += bucket_count
+            if cumulative >= rank:
+                return min(max(self.bucket_lower_bound(bucket), self._min), self._max)
+        return self._max
+
+
+class PhaseProfiler:
+    """
+    Collects the durations of named phases (e.g. the phases of a simulation step) in LogarithmicHistograms, along with
+    counters, and optionally a timeline of all phases that can be exported in the Chrome trace event format
+    (chrome://tracing, Perfetto).
+    Durations are measured with the monotonic clock PhaseProfiler.clock() in nanoseconds. Code that is instrumented
+    should only call the profiler if one is set, so that the instrumentation costs nothing but a None check otherwise.
+    """
+
+    clock = staticmethod(time.perf_counter_ns)
+
+    def __init__(self, record_timeline: bool = True, max_timeline_events: int = 1000000) -> None:
+        """
+        :param record_timeline: if True, every phase and counter update is recorded in the timeline
+        :param max_timeline_events: the timeline stops recording after this many events, to bound its memory usage
+        """
+        self._histograms: Dict[str, LogarithmicHistogram] = {}
+        self._counters: Dict[str, int] = {}
+        self._record_timeline = record_timeline
+        self._max_timeline_events = max_timeline_events
+        # timeline events: phases (name, start, duration) and counter values (name, time, value)
+        self._phase_events: List[Any] = []
+        self._counter_events: List[Any] = []
+        self._origin = PhaseProfiler.clock()
+
+    def add_duration(self, phase: str, start: int, end: int) -> None:
+        """
+        Records the duration of a phase.
+        :param phase: name of the phase
+        :param start: start time (from clock())
+        :param end: end time (from clock())
+        """
+        histogram = self._histograms.get(phase)
+        if histogram is None:
+            histogram = self._histograms[phase] = LogarithmicHistogram()
+        histogram.add_value(end - start)
+        if self._record_timeline and len(self._phase_events) < self._max_timeline_events:
+            self._phase_events.append((phase, start, end - start))
+
+    def add_count(self, counter: str, count: int = 1) -> None:
+        """
+        Increments a counter.
+        """
+        self._set_counter(counter, self._counters.get(counter, 0) + count)
+
+    def set_counters(self, counters: Dict[str, int]) -> None:
+        """
+        Sets counters that are counted elsewhere (e.g. cumulative counters of a placement strategy).
+        """
+        for counter, value in counters.items():
+            if self._counters.get(counter) != value:
+                self._set_counter(counter, value)
+
+    def _set_counter(self, counter: str, value: int) -> None:
+        self._counters[counter] = value
+        if self._record_timeline and len(self._counter_events) < self._max_timeline_events:
+            self._counter_events.append((counter, PhaseProfiler.clock(), value))
+
+    def histogram(self, phase: str) -> Optional[LogarithmicHistogram]:
+        return self._histograms.get(phase)
+
+    def counters(self) -> Dict[str, int]:
+        return dict(self._counters)
+
+    def summary_table(self) -> str:
+        """
+        :return: a text table with the count, total and mean duration and percentiles of each phase, followed by the
+                 counters
+        """
+        lines = ['{:<45} {:>10} {:>12} {:>10} {:>10} {:>10} {:>10}'.format(
+            'phase', 'count', 'total [s]', 'mean [ms]', 'p50 [ms]', 'p99 [ms]', 'max [ms]')]
+        for phase, histogram in sorted(self._histograms.items(), key=lambda item: -item[1].total()):
+            lines.append('{:<45} {:>10} {:>12.3f} {:>10.3f} {:>10.3f} {:>10.3f} {:>10.3f}'.format(
+                phase, histogram.count(), histogram.total() * 1e-9, histogram.mean() * 1e-6,
+                histogram.percentile(50) * 1e-6, histogram.percentile(99) * 1e-6, histogram.max() * 1e-6))
+        for counter, value in sorted(self._counters.items()):
+            lines.append('{:<45} {:>10}'.format(counter, value))
+        return '\n'.join(lines)
+
+    def chrome_trace(self) -> Dict[str, Any]:
+        """
+        :return: the timeline in the Chrome trace event format (times in microseconds since the profiler was created)
+        """
+        events: List[Dict[str, Any]] = []
+        for phase, start, duration in self._phase_events:
+            events.append({'name': phase, 'ph': 'X', 'pid': 0, 'tid': 0,
+                           'ts': (start - self._origin) * 1e-3, 'dur': duration * 1e-3})
+        for counter, timestamp, value in self._counter_events:
+            events.append({'name': counter, 'ph': 'C', 'pid': 0, 'tid': 0,
+                           'ts': (timestamp - self._origin) * 1e-3, 'args': {counter: value}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write_summary(self, path: str) -> None:
+        with open(path, 'w') as summary_file:
+            summary_file.write(self.summary_table() + '\n')
+
+    def write_chrome_trace(self, path: str) -> None:
+        with open(path, 'w') as trace_file:
+            json.dump(self.chrome_trace(), trace_file)
@@ -15,7 +15,7 @@
 # along with flbrandh/MEC-Simulator-2-BigMEC.  If not, see <http://www.gnu.org/licenses/>.
 
 
-from typing import Optional
+from typing import Any, Dict, Optional
 
 
 class RunningMean:
@@ -44,3 +44,10 @@ class RunningMean:
             return None
         else:
             return self._sum/self._num_samples
+
+    def get_checkpoint_state(self) -> Dict[str, Any]:
+        return {'num_samples': self._num_samples, 'sum': self._sum}
+
+    def set_checkpoint_state(self, state: Dict[str, Any]) -> None:
+        self._num_samples = state['num_samples']
+        self._sum = state['sum']
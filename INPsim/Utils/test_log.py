@@ -0,0 +1,62 @@
+# Copyright (C) 2020 Florian Brandherm
+# This file is part of flbrandh/MEC-Simulator-2-BigMEC <https://github.com/flbrandh/MEC-Simulator-2-BigMEC>.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with flbrandh/MEC-Simulator-2-BigMEC.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import io
+import logging
+from unittest import TestCase
+from INPsim.Utils.log import ProgressReporter, configure_logging
+
+
+class TestProgressReporter(TestCase):
+
+    def tearDown(self):
+        root_logger = logging.getLogger('INPsim')
+        for handler in list(root_logger.handlers):
+            root_logger.removeHandler(handler)
+        root_logger.setLevel(logging.NOTSET)
+        root_logger.propagate = True
+
+    def test_rate_limit(self):
+        stream = io.StringIO()
+        configure_logging('WARNING', progress=True, stream=stream)
+        now = [0.0]
+        num_details_calls = [0]
+
+        def details():
+            num_details_calls[0] += 1
+            return 'details'
+
+        reporter = ProgressReporter(100, min_interval=10, clock=lambda: now[0])
+        reports = []
+        for step in range(1, 101):
+            now[0] += 0.5
+            if reporter.report(step, details):
+                reports.append(step)
+        # the first step, then every 20 steps (10 s), and the last step
+        self.assertEqual([1, 21, 41, 61, 81, 100], reports)
+        self.assertEqual(len(reports), num_details_calls[0])
+        self.assertEqual(len(reports), len(stream.getvalue().splitlines()))
+        self.assertIn('step 100 / 100 (100.0 %)', stream.getvalue())
+
+        # other messages are filtered by level, and disabled progress reports aren't formatted
+        configure_logging('WARNING', progress=False, stream=stream)
+        logging.getLogger('INPsim.test').info('filtered')
+        reporter = ProgressReporter(100, min_interval=0, clock=lambda: now[0])
+        self.assertFalse(reporter.report(100, details))
+        self.assertEqual(6, num_details_calls[0])
+        self.assertNotIn('filtered', stream.getvalue())
+        self.assertRaises(ValueError, configure_logging, 'VERBOSE')
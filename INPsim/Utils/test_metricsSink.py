@@ -0,0 +1,98 @@
+# Copyright (C) 2020 Florian Brandherm
+# This file is part of flbrandh/MEC-Simulator-2-BigMEC <https://github.com/flbrandh/MEC-Simulator-2-BigMEC>.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with flbrandh/MEC-Simulator-2-BigMEC.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import os
+import random
+import tempfile
+from unittest import TestCase
+import numpy as np
+from INPsim.Utils.metricsSink import BinaryMetricsSink, CsvMetricsSink, read_metrics
+
+COLUMNS = [('global_cost', 'f8'), ('num_migrations', 'i8'), ('sim_time', 'f8')]
+
+
+class TestMetricsSinks(TestCase):
+
+    def random_rows(self, num_rows):
+        rng = random.Random(42)
+        return [(rng.uniform(0, 100), rng.randint(0, 50), step * 0.5) for step in range(num_rows)]
+
+    def test_binary_round_trip(self):
+        rows = self.random_rows(25)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'statistics.bin')
+            csv_path = os.path.join(directory, 'statistics.csv')
+            sink = BinaryMetricsSink(path, COLUMNS, flush_interval=7, csv_path=csv_path)
+            for i, row in enumerate(rows):
+                sink.append(row)
+                # flushed rows are readable before the sink is closed
+                self.assertEqual(7 * ((i + 1) // 7), len(read_metrics(path)['global_cost']))
+            sink.close()
+            sink.close()
+            self.assertEqual(len(rows), len(sink))
+
+            metrics = read_metrics(path)
+            self.assertEqual([name for name, _ in COLUMNS], list(metrics.keys()))
+            self.assertEqual(np.int64, metrics['num_migrations'].dtype)
+            for c, (name, _) in enumerate(COLUMNS):
+                self.assertEqual([row[c] for row in rows], metrics[name].tolist())
+
+            with open(csv_path) as csv_file:
+                lines = csv_file.read().splitlines()
+            self.assertEqual('global_cost,num_migrations,sim_time', lines[0])
+            self.assertEqual([[float(value) for value in line.split(',')] for line in lines[1:]],
+                             [list(row) for row in rows])
+
+    def test_binary_resume(self):
+        rows = self.random_rows(10)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'statistics.bin')
+            sink = BinaryMetricsSink(path, COLUMNS, flush_interval=4)
+            for row in rows:
+                sink.append(row)
+            sink.close()
+
+            # rows after the resumed row are discarded
+            sink = BinaryMetricsSink(path, COLUMNS, flush_interval=4, num_existing_rows=6)
+            for row in rows[6:]:
+                sink.append(row)
+            sink.close()
+            self.assertEqual(len(rows), len(sink))
+            self.assertEqual([row[1] for row in rows], read_metrics(path)['num_migrations'].tolist())
+
+            with self.assertRaises(ValueError):
+                BinaryMetricsSink(path, COLUMNS + [('optimality_gap', 'f8')], num_existing_rows=6)
+            with self.assertRaises(ValueError):
+                BinaryMetricsSink(path, [('global_cost', 'f8'), ('num_migrations', 'f8'), ('sim_time', 'f8')],
+                                  num_existing_rows=6)
+            with self.assertRaises(ValueError):
+                BinaryMetricsSink(path, COLUMNS, num_existing_rows=11)
+            # the rejected sinks leave the file readable
+            self.assertEqual([row[0] for row in rows], read_metrics(path)['global_cost'].tolist())
+
+    def test_csv(self):
+        rows = self.random_rows(10)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'statistics.csv')
+            sink = CsvMetricsSink(path, COLUMNS, flush_interval=4)
+            for row in rows:
+                sink.append(row)
+            sink.close()
+            with open(path) as csv_file:
+                lines = csv_file.read().splitlines()
+            self.assertEqual(len(rows) + 1, len(lines))
+            self.assertEqual(str(rows[3][0]) + ',' + str(rows[3][1]) + ',' + str(rows[3][2]), lines[4])
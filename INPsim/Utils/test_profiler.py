@@ -0,0 +1,69 @@
+# Copyright (C) 2020 Florian Brandherm
+# This file is part of flbrandh/MEC-Simulator-2-BigMEC <https://github.com/flbrandh/MEC-Simulator-2-BigMEC>.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# flbrandh/MEC-Simulator-2-BigMEC is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with flbrandh/MEC-Simulator-2-BigMEC.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import random
+from unittest import TestCase
+import numpy as np
+from INPsim.Utils.profiler import LogarithmicHistogram, PhaseProfiler
+
+
+class TestLogarithmicHistogram(TestCase):
+
+    def test_buckets(self):
+        histogram = LogarithmicHistogram(sub_buckets_bits=4)
+        for value in list(range(1000)) + [2 ** 40 + 12345]:
+            bucket = histogram._bucket(value)
+            lower_bound = histogram.bucket_lower_bound(bucket)
+            # buckets are contiguous, and their width is at most 1/16 of their values
+            self.assertLessEqual(lower_bound, value)
+            self.assertGreater(histogram.bucket_lower_bound(bucket + 1), value)
+            self.assertLessEqual(value - lower_bound, value / 16)
+
+    def test_percentiles(self):
+        rng = random.Random(42)
+        values = [int(rng.lognormvariate(12, 2)) for _ in range(5000)]
+        histogram = LogarithmicHistogram()
+        for value in values:
+            histogram.add_value(value)
+        self.assertEqual(len(values), histogram.count())
+        self.assertEqual(sum(values), histogram.total())
+        self.assertEqual(max(values), histogram.max())
+        for percentile in (1, 50, 90, 99):
+            exact = np.percentile(values, percentile, method='inverted_cdf')
+            self.assertLessEqual(abs(histogram.percentile(percentile) - exact), exact / 16)
+        self.assertIsNone(LogarithmicHistogram().percentile(50))
+
+
+class TestPhaseProfiler(TestCase):
+
+    def test_phases_and_trace(self):
+        profiler = PhaseProfiler(max_timeline_events=3)
+        for start in (0, 100, 200):
+            profiler.add_duration('step', start, start + 50)
+        profiler.add_duration('step', 300, 310)
+        profiler.add_count('migrations', 2)
+        profiler.set_counters({'nn_calls': 5})
+        profiler.set_counters({'nn_calls': 5})
+
+        self.assertEqual(4, profiler.histogram('step').count())
+        self.assertEqual(160, profiler.histogram('step').total())
+        self.assertEqual({'migrations': 2, 'nn_calls': 5}, profiler.counters())
+        events = profiler.chrome_trace()['traceEvents']
+        # the timeline is capped, and unchanged counters are not recorded again
+        self.assertEqual(3, len([event for event in events if event['ph'] == 'X']))
+        self.assertEqual(2, len([event for event in events if event['ph'] == 'C']))
+        self.assertIn('step', profiler.summary_table())
@@ -15,19 +15,25 @@
 # along with flbrandh/MEC-Simulator-2-BigMEC.  If not, see <http://www.gnu.org/licenses/>.
 
 
-from typing import List, Optional, Any, Iterable
+from typing import Dict, List, Optional, Any, Iterable
 from INPsim.Simulation.ConfigFileParser.simulationConfiguration import configure_simulation_from_configuration_file
 from INPsim.Simulation.simulator import Simulation
 from INPsim.Simulation import SimulationObserver, SimulationObserverList, SimulationInterface, StatisticsSimulationObserver
+from INPsim.Simulation import CheckpointSimulationObserver, restore_checkpoint
 from INPsim.Network.Nodes import LimitedMemoryCloud
-from INPsim.ServicePlacement import ServicePlacementStrategy, MyopicOptimalServicePlacementStrategy
+from INPsim.ServicePlacement import ServicePlacementStrategy, MyopicOptimalServicePlacementStrategy, \
+    MyopicOptimalFlowServicePlacementStrategy
 from INPsim.ServicePlacement.Migration.Algorithms import MigrationAlgorithm, MigrationAlgorithmServicePlacementStrategy
 from INPsim.ServicePlacement.Migration.Action import Action
 from INPsim.ServicePlacement.Migration.Learning import DQNMigrationAlgorithm
+from INPsim.Utils.metricsSink import BinaryMetricsSink
+from INPsim.Utils.profiler import PhaseProfiler
+from INPsim.Utils.log import LEVELS, ProgressReporter, configure_logging
 import datetime
 import time
 import os
 import argparse
+import logging
 import pickle
 
 os.environ["CUDA_VISIBLE_DEVICES"] = "-1"
@@ -54,25 +60,59 @@ ap.add_argument(
         required=False,
         help="Output directory.",
         type=str)
-# ap.add_argument(
-#         "-s",
-#         "--snapshotting",
-#         required=False,
-#         help="Enable Snapshotting.",
-#         type=str)
+ap.add_argument(
+        "--metrics-flush-interval",
+        required=False,
+        default=1000,
+        help="Number of steps after which the buffered statistics are written to the output directory.",
+        type=int)
+ap.add_argument(
+        "--profile",
+        required=False,
+        help="Profile the phases of each simulation step. A summary is written to profile_summary.txt and a timeline "
+             "to profile_trace.json (Chrome trace event format) in the output directory.",
+        action='store_true')
+ap.add_argument(
+        "--log-level",
+        required=False,
+        choices=LEVELS,
+        help="Log level. Per-step output (e.g. the statistics of each step) is logged at DEBUG. The default is WARNING "
+             "in headless mode and INFO otherwise.",
+        type=str)
+ap.add_argument(
+        "--progress-interval",
+        required=False,
+        help="Minimum number of seconds between two progress reports (0: report every step, negative: never). The "
+             "default is 60 in headless mode and 0 otherwise.",
+        type=float)
+ap.add_argument(
+        "--checkpoint-interval",
+        required=False,
+        help="Number of steps between two checkpoints, which are written to checkpoint.npz in the output directory. "
+             "By default, no checkpoints are written.",
+        type=int)
+ap.add_argument(
+        "--resume",
+        required=False,
+        help="Resume the simulation from the checkpoint in the output directory (if there is one), e.g. after the job "
+             "was preempted. The configuration must be the same.",
+        action='store_true')
 args = vars(ap.parse_args())
 
 if args['headless']:
     enable_visualization = False
     enable_plots = False
+    default_log_level = 'WARNING'
+    default_progress_interval = 60.0
 else:
     enable_visualization = True
     enable_plots = True
-
-# if args['snapshotting']:
-#     enable_snapshotting = True
-# else:
-enable_snapshotting = False
+    default_log_level = 'INFO'
+    default_progress_interval = 0.0
+log_level = args['log_level'] if args['log_level'] else default_log_level
+progress_interval = args['progress_interval'] if args['progress_interval'] is not None else default_progress_interval
+configure_logging(log_level, progress=progress_interval >= 0)
+logger = logging.getLogger('INPsim.main')
 
 if args['configuration']:
     configuration_file_name = args['configuration']
@@ -121,6 +161,30 @@ num_simulation_steps: int
 configured_simulation, simulation_statistics, num_simulation_steps = configure_simulation_from_configuration_file(
         configuration_file_name)
 
+
+class ElapsedTimeCheckpointState:
+    """
+    Stores the elapsed time in checkpoints, so that the sim_time statistic continues when the simulation is resumed.
+    """
+    def get_checkpoint_state(self):
+        return {'elapsed_seconds': (datetime.datetime.now() - start_time).total_seconds()}
+
+    def set_checkpoint_state(self, state):
+        global start_time
+        start_time = datetime.datetime.now() - datetime.timedelta(seconds=state['elapsed_seconds'])
+
+
+# the state of the simulation and of everything that depends on the past steps is stored in checkpoints
+checkpoint_path = output_dir + '/checkpoint.npz'
+checkpoint_components = {'statistics': simulation_statistics, 'elapsed_time': ElapsedTimeCheckpointState()}
+metrics_sink_rows = {}
+if args['resume']:
+    if os.path.exists(checkpoint_path):
+        metrics_sink_rows = restore_checkpoint(checkpoint_path, configured_simulation, checkpoint_components)
+        logger.info("resuming from %s at step %d", checkpoint_path, configured_simulation.get_current_step())
+    else:
+        logger.warning("there is no checkpoint %s, starting from the beginning", checkpoint_path)
+
 observers: List[SimulationObserver] = [simulation_statistics]
 
 if enable_visualization:
@@ -202,123 +266,132 @@ if hasattr(migration_algorithm, 'shared_agent'):
                     with open(filename, "wb") as nn_weights_file:
                         pickle.dump(
                                 migration_algorithm.shared_agent.get_model_parameters(), nn_weights_file)
-                    print("dumped NN_weights to " + filename)
+                    logger.info("dumped NN_weights to %s", filename)
 
 
         observers.append(LoggingNNWeightsSimulationObserver())
 
-if enable_snapshotting:
-    import sys
+metrics_sinks: Dict[str, BinaryMetricsSink] = {}
 
-    sys.setrecursionlimit(100000)
+# per-step statistics, written to statistics.bin (see INPsim.Utils.metricsSink.read_metrics) and exported to
+# statistics.csv at the end. Values that are not available for the service placement strategy are -1.
+statistics_sink = BinaryMetricsSink(output_dir + '/statistics.bin',
+                                    [('global_cost', 'f8'),
+                                     ('avg_latency', 'f8'),
+                                     ('sim_time', 'f8'),  # seconds since the start
+                                     ('num_migrations', 'i8'),
+                                     ('num_services', 'i8'),
+                                     ('num_services_at_cloud', 'i8'),
+                                     ('mean_computation_time', 'f8'),
+                                     ('mean_communication_time', 'f8'),
+                                     ('mean_communication_time_service_at_cloud', 'f8'),
+                                     ('mean_communication_time_service_at_edge', 'f8'),
+                                     ('mean_training_time', 'f8'),
+                                     ('optimality_gap', 'f8')],  # mean (cost - optimum) / |optimum|, -1 without ILP
+                                    flush_interval=args['metrics_flush_interval'],
+                                    csv_path=output_dir + '/statistics.csv',
+                                    num_existing_rows=metrics_sink_rows.get('statistics', 0))
+metrics_sinks['statistics'] = statistics_sink
 
+# the agent of the migration algorithm (if any) doesn't change during the simulation, so the available statistics are
+# determined once.
+migration_alg_shared_agent: Optional[Any] = getattr(migration_algorithm, 'shared_agent', None)  # this is still too hacky... -> refactor when time available
+
+
+def agent_statistic(name: str) -> float:
+    return getattr(migration_alg_shared_agent, name, -1) if migration_alg_shared_agent else -1
+
+
+def mean_computation_time() -> float:
+    if migration_alg_shared_agent and hasattr(migration_alg_shared_agent, 'mean_computation_time'):
+        return migration_alg_shared_agent.mean_computation_time
+    elif isinstance(sp_strategy, MyopicOptimalServicePlacementStrategy):
+        mean_time = sp_strategy.get_mean_computation_time()
+        return -1 if mean_time is None else mean_time
+    return -1
+
+
+def mean_communication_time() -> float:
+    if migration_alg_shared_agent and hasattr(migration_alg_shared_agent, 'mean_communication_time'):
+        return migration_alg_shared_agent.mean_communication_time
+    elif isinstance(sp_strategy, MyopicOptimalServicePlacementStrategy):
+        mean_time = sp_strategy.get_mean_communication_time()
+        return -1 if mean_time is None else mean_time
+    return -1
+
+
+def mean_training_time() -> float:
+    if getattr(migration_alg_shared_agent, 'num_training_episodes', 0) > 0 and hasattr(migration_alg_shared_agent, 'total_training_time'):
+        return migration_alg_shared_agent.total_training_time / migration_alg_shared_agent.num_training_episodes
+    return -1
 
-    class SnapshotObserver(SimulationObserver):
-        def after_simulation_step(self, simulation: SimulationInterface, actions: Iterable[Action]) -> None:
-            if simulation.get_current_step() % 10 == 0:
-                filename = output_dir + '/snapshot_at_step_' + \
-                           str(simulation.get_current_step()) + '.pickle'
-                with open(filename, "wb") as snapshot_file:
-                    pickle.dump(simulation, snapshot_file)
-
-                with open(filename, "rb") as snapshot_file:
-                    simulation.__dict__.update(pickle.load(snapshot_file).__dict__)
-                print("snapshot saved")
-
-
-    observers.append(SnapshotObserver())
-
-log_file_name = output_dir + '/statistics.csv'
-with open(log_file_name, 'w') as file:
-    file.write(
-            'global_cost, '
-            'avg_latency, '
-            'sim_time, '
-            'num_migrations, '
-            'num_services, '
-            'num_services_at_cloud, '
-            'mean_computation_time, '
-            'mean_communication_time, '
-            'mean_communication_time_service_at_cloud, '
-            'mean_communication_time_service_at_edge,'
-            'mean_training_time,\n')
+
+def mean_optimality_gap() -> float:
+    if isinstance(sp_strategy, MyopicOptimalFlowServicePlacementStrategy):
+        mean_gap = sp_strategy.get_mean_optimality_gap()
+        return -1 if mean_gap is None else mean_gap
+    return -1
 
 
 class StatsLoggingSimulationObserver(SimulationObserver):
     def after_simulation_step(self, simulation: SimulationInterface, actions: Iterable[Action]) -> None:
-        with open(log_file_name, 'a') as log_file:
-            line_str = str(simulation_statistics.global_cost[-1]) + ','
-            line_str += str(simulation_statistics.avg_latency[-1]) + ','
-            line_str += str(datetime.datetime.now() - start_time).split('.')[0].replace(',', '') + ','
-            line_str += str(simulation_statistics.num_migrations[-1]) + ','
-            line_str += str(simulation_statistics.num_services[-1]) + ','
-            line_str += str(simulation_statistics.num_services_at_cloud[-1]) + ','
-            mean_computation_time = -1
-            mean_communication_time = -1
-            mean_communication_time_service_at_cloud = -1
-            mean_communication_time_service_at_edge = -1
-            sp_strategy: ServicePlacementStrategy = simulation.get_service_placement_strategy()
-            migration_alg_shared_agent: Optional[Any]    # this is still too hacky... -> refactor when time available
-            if isinstance(sp_strategy, MigrationAlgorithmServicePlacementStrategy) and hasattr(sp_strategy.get_migration_algorithm(), 'shared_agent'):
-                migration_alg_shared_agent = sp_strategy.get_migration_algorithm().shared_agent
-            else:
-                migration_alg_shared_agent = None
-            if migration_alg_shared_agent and hasattr(migration_alg_shared_agent, 'mean_computation_time'):
-                mean_computation_time = migration_alg_shared_agent.mean_computation_time
-            elif isinstance(sp_strategy, MyopicOptimalServicePlacementStrategy):
-                mean_computation_time = sp_strategy.get_mean_computation_time()
-                if mean_computation_time is None:
-                    mean_computation_time = -1
-            line_str += str(mean_computation_time) + ','
-            if migration_alg_shared_agent and hasattr(migration_alg_shared_agent, 'mean_communication_time'):
-                mean_communication_time = migration_alg_shared_agent.mean_communication_time
-            elif isinstance(sp_strategy, MyopicOptimalServicePlacementStrategy):
-                mean_communication_time = sp_strategy.get_mean_communication_time()
-                if mean_communication_time is None:
-                    mean_communication_time = -1
-            line_str += str(mean_communication_time) + ','
-            if migration_alg_shared_agent and hasattr(migration_alg_shared_agent, 'mean_communication_time_service_at_cloud'):
-                mean_communication_time_service_at_cloud = migration_alg_shared_agent.mean_communication_time_service_at_cloud
-            line_str += str(mean_communication_time_service_at_cloud) + ','
-            if migration_alg_shared_agent and hasattr(migration_alg_shared_agent, 'mean_communication_time_service_at_edge'):
-                mean_communication_time_service_at_edge = migration_alg_shared_agent.mean_communication_time_service_at_edge
-            line_str += str(mean_communication_time_service_at_edge) + ','
-            if migration_alg_shared_agent and hasattr(migration_alg_shared_agent, 'total_training_time') and hasattr(migration_alg_shared_agent, 'num_training_episodes'):
-                mean_communication_time_service_at_edge = migration_alg_shared_agent.total_training_time/migration_alg_shared_agent.num_training_episodes
-            line_str += str(mean_communication_time_service_at_edge) + ','
-            log_file.write(line_str + '\n')
+        statistics_sink.append((simulation_statistics.global_cost[-1],
+                                simulation_statistics.avg_latency[-1],
+                                (datetime.datetime.now() - start_time).total_seconds(),
+                                simulation_statistics.num_migrations[-1],
+                                simulation_statistics.num_services[-1],
+                                simulation_statistics.num_services_at_cloud[-1],
+                                mean_computation_time(),
+                                mean_communication_time(),
+                                agent_statistic('mean_communication_time_service_at_cloud'),
+                                agent_statistic('mean_communication_time_service_at_edge'),
+                                mean_training_time(),
+                                mean_optimality_gap()))
 
 
 observers.append(StatsLoggingSimulationObserver())
 
-if hasattr(migration_algorithm, 'shared_agent'):
-    if hasattr(migration_algorithm.shared_agent, 'avg_rewards'):
-        agent_log_file_name = output_dir + '/agent_statistics.csv'
+if hasattr(migration_alg_shared_agent, 'avg_rewards'):
+    agent_statistics_sink = BinaryMetricsSink(output_dir + '/agent_statistics.bin',
+                                              [('avg_rewards', 'f8'), ('losses', 'f8'), ('Qs', 'f8')],
+                                              flush_interval=args['metrics_flush_interval'],
+                                              csv_path=output_dir + '/agent_statistics.csv',
+                                              num_existing_rows=metrics_sink_rows.get('agent_statistics', 0))
+    metrics_sinks['agent_statistics'] = agent_statistics_sink
 
 
-        class AgentStatsLoggingSimulationObserver(SimulationObserver):
-            def after_simulation_step(self, simulation: SimulationInterface, actions: Iterable[Action]) -> None:
-                with open(agent_log_file_name, 'w') as agent_log_file:
-                    agent_log_file.write('avg_rewards, losses, Qs\n')
-                    avg_rewards = migration_algorithm.shared_agent.avg_rewards
-                    if hasattr(migration_algorithm.shared_agent, 'losses'):
-                        losses = migration_algorithm.shared_agent.losses
-                    else:
-                        losses = [-1 for _ in avg_rewards]
-                    if hasattr(migration_algorithm.shared_agent, 'predicted_Qs'):
-                        qs = migration_algorithm.shared_agent.predicted_Qs
-                    else:
-                        qs = [0 for _ in avg_rewards]
-                    for r, l, q in zip(avg_rewards, losses, qs):
-                        agent_log_file.write(str(r) + ',' + str(l) + ',' + str(q) + '\n')
+    class AgentStatsLoggingSimulationObserver(SimulationObserver):
+        """
+        Records the entries of the agent's statistics lists that were added since the last step.
+        """
+        def after_simulation_step(self, simulation: SimulationInterface, actions: Iterable[Action]) -> None:
+            avg_rewards = migration_alg_shared_agent.avg_rewards
+            losses = getattr(migration_alg_shared_agent, 'losses', None)
+            qs = getattr(migration_alg_shared_agent, 'predicted_Qs', None)
+            num_rows = min(len(avg_rewards), len(losses) if losses is not None else len(avg_rewards),
+                           len(qs) if qs is not None else len(avg_rewards))
+            for i in range(len(agent_statistics_sink), num_rows):
+                agent_statistics_sink.append((avg_rewards[i],
+                                              losses[i] if losses is not None else -1,
+                                              qs[i] if qs is not None else 0))
 
 
-        observers.append(AgentStatsLoggingSimulationObserver())
+    observers.append(AgentStatsLoggingSimulationObserver())
 
 
 class ProgressPrintingSimulationObserver(SimulationObserver):
+    def __init__(self) -> None:
+        # reports are rate-limited, and nothing is formatted between reports
+        self._progress_reporter = ProgressReporter(num_simulation_steps, progress_interval,
+                                                   first_step=configured_simulation.get_current_step())
+
     def after_simulation_step(self, simulation: SimulationInterface, actions: Iterable[Action]) -> None:
-        step = simulation.get_current_step()
+        # the step counter is increased after the observers are notified
+        self._progress_reporter.report(simulation.get_current_step() + 1,
+                                       lambda: self.get_buffer_size_string(simulation))
+
+    @staticmethod
+    def get_buffer_size_string(simulation: SimulationInterface) -> str:
         buffer_size_str = ""
         sp_strategy: ServicePlacementStrategy = simulation.get_service_placement_strategy()
         migration_algo: MigrationAlgorithm
@@ -327,12 +400,11 @@ class ProgressPrintingSimulationObserver(SimulationObserver):
             if hasattr(
                     migration_algo.shared_agent,
                     'replay_memory') and migration_algo.hyperparameters.max_replay_memory_size > 0:
-                buffer_size_str = "   buffer: " + str(len(migration_algo.shared_agent.replay_memory)) + \
+                buffer_size_str = "buffer: " + str(len(migration_algo.shared_agent.replay_memory)) + \
                                  "/" + str(migration_algo.hyperparameters.max_replay_memory_size) + ' (' + str(
                         100 * (len(migration_algo.shared_agent.replay_memory) / float(
                             migration_algo.hyperparameters.max_replay_memory_size))) + '%)'
-        print('step ', step, '/', num_simulation_steps, '(', 100 *
-              (step / float(num_simulation_steps)), '%)' + buffer_size_str)
+        return buffer_size_str
 
     # print("ma:", configured_simulation.get_service_placement_strategy().num_migration_actions, "nma:", configured_simulation.get_service_placement_strategy().num_no_migration_actions)
 
@@ -400,6 +472,29 @@ class HistogramOutputSimulationObserver(SimulationObserver):
 
 observers.append(HistogramOutputSimulationObserver())
 
+if args['checkpoint_interval']:
+    observers.append(CheckpointSimulationObserver(checkpoint_path, args['checkpoint_interval'],
+                                                  checkpoint_components, metrics_sinks,
+                                                  first_step=configured_simulation.get_current_step()))
+
+observer_list = SimulationObserverList(*observers)
+profiler: Optional[PhaseProfiler] = None
+if args['profile']:
+    profiler = PhaseProfiler()
+    configured_simulation.set_profiler(profiler)
+    observer_list.set_profiler(profiler)
+
 st = time.time()
-configured_simulation.simulate(num_simulation_steps, SimulationObserverList(*observers))
+try:
+    configured_simulation.simulate(num_simulation_steps - configured_simulation.get_current_step(), observer_list)
+finally:
+    for metrics_sink in metrics_sinks.values():
+        metrics_sink.close()
+    final_optimality_gap = mean_optimality_gap()
+    if final_optimality_gap >= 0:
+        logger.info("mean optimality gap compared to the ILP: %f", final_optimality_gap)
+    if profiler:
+        print(profiler.summary_table())
+        profiler.write_summary(output_dir + '/profile_summary.txt')
+        profiler.write_chrome_trace(output_dir + '/profile_trace.json')
 print("----Simulation took %.2f seconds----"%(time.time()-st))
\ No newline at end of file